@@ -0,0 +1,328 @@
+#Filename : MeritAsyncIO.py
+#Version  :	1.0.0
+#Description : asyncio building blocks of the asyncio engine, serial port reader, paho network loop driver and
+#			   JSON HTTP post, on the standard library only
+#Date : Oct 2026
+
+#***********************************************************************************#
+#*************** Import Libraries **************************************************#
+#***********************************************************************************#
+import json
+import asyncio
+import logging
+import threading
+import urllib.parse
+import serial
+from paho.mqtt import client as mqtt_client
+from MeritLogging import MERIT_FRAME_RX
+
+#***********************************************************************************#
+#*************** File Constants ****************************************************#
+#***********************************************************************************#
+MERIT_ASYNC_MQTT_MISC_INTERVAL		= 1			#seconds between two paho loop_misc calls, keepalive and retries
+MERIT_ASYNC_MQTT_RECONNECT_MIN_DELAY	= 1			#seconds, the reconnect backoff doubles from this
+MERIT_ASYNC_HTTP_TIMEOUT			= 10		#seconds for a whole HTTP post
+
+#***********************************************************************************#
+#******************************* Classes *******************************************#
+#***********************************************************************************#
+#********************************************************************************************#
+#Description : Waiter of one coroutine, a future resolved True when woken or False by its timeout
+#Notes : Used instead of asyncio.wait_for, which creates a task per wait, on the per frame paths
+#********************************************************************************************#
+class MeritAsyncWaiter:
+	def __init__(self, Loop):
+		self.m_Loop = Loop
+		self.m_Future = None
+
+	#********************************************************************************************#
+	#Description : Function to resolve the pending wait
+	#Arguments : Result, True woken or False timed out
+	#Return : None
+	#********************************************************************************************#
+	def Resolve(self, Result = True):
+		if((self.m_Future is not None) and (self.m_Future.done() == False)):
+			self.m_Future.set_result(Result)
+
+	#********************************************************************************************#
+	#Description : Function to wait until resolved or the timeout
+	#Arguments : Timeout in seconds, None waits for ever
+	#Return : True if woken, False on timeout
+	#********************************************************************************************#
+	async def Wait(self, Timeout = None):
+		self.m_Future = self.m_Loop.create_future()
+		Handle = None
+		if(Timeout is not None):
+			Handle = self.m_Loop.call_later(Timeout, self.Resolve, False)
+		try:
+			return await self.m_Future
+		finally:
+			if(Handle is not None):
+				Handle.cancel()
+			self.m_Future = None
+
+#********************************************************************************************#
+#Description : asyncio event of the loop that any thread may set
+#Notes : Made in the loop thread, Set from the loop thread sets the event at once and from other threads
+#		 through call_soon_threadsafe. One coroutine waits on it.
+#********************************************************************************************#
+class MeritAsyncWake:
+	def __init__(self, Loop):
+		self.m_Loop = Loop
+		self.m_ThreadId = threading.get_ident()
+		self.m_SetFlag = False
+		self.m_Waiter = MeritAsyncWaiter(Loop)
+
+	#********************************************************************************************#
+	#Description : Function to wake the coroutine waiting on this event
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def Set(self):
+		if(threading.get_ident() == self.m_ThreadId):
+			self.SetInLoop()
+			return
+		try:
+			self.m_Loop.call_soon_threadsafe(self.SetInLoop)
+		except RuntimeError:
+			pass						#loop closed at shutdown
+
+	#********************************************************************************************#
+	#Description : Function to set the event from the loop thread
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def SetInLoop(self):
+		self.m_SetFlag = True
+		self.m_Waiter.Resolve()
+
+	#********************************************************************************************#
+	#Description : Function to clear the event before the state it guards is read
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def Clear(self):
+		self.m_SetFlag = False
+
+	#********************************************************************************************#
+	#Description : Function to wait for the event
+	#Arguments : Timeout in seconds, None waits for ever
+	#Return : True if set, False on timeout
+	#********************************************************************************************#
+	async def Wait(self, Timeout = None):
+		if(self.m_SetFlag == True):
+			return True
+		return await self.m_Waiter.Wait(Timeout)
+
+#********************************************************************************************#
+#Description : Serial port read side on the event loop, received bytes go straight into the frame decoder
+#Notes : The port is put in non blocking mode while attached and read from an add_reader callback (POSIX
+#		 file descriptor), a read error is kept and raised to the next WaitData or Write
+#********************************************************************************************#
+class MeritAsyncSerialTransport:
+	def __init__(self, Loop, Decoder, FrameRing = None):
+		self.m_Loop = Loop
+		self.m_Decoder = Decoder
+		self.m_FrameRing = FrameRing			#MeritFrameRing the raw reads are recorded in, None to not record
+		self.m_Port = None
+		self.m_Timeout = None				#port timeout restored on Detach
+		self.m_Waiter = MeritAsyncWaiter(Loop)
+		self.m_Error = None
+		self.m_ReadCount = 0
+
+	#********************************************************************************************#
+	#Description : Function to start reading an open serial port
+	#Arguments : Serial port
+	#Return : None
+	#********************************************************************************************#
+	def Attach(self, Port):
+		self.Detach()
+		self.m_Port = Port
+		self.m_Timeout = Port.timeout
+		self.m_Error = None
+		Port.timeout = 0
+		self.m_Loop.add_reader(Port.fileno(), self.OnReadable)
+
+	#********************************************************************************************#
+	#Description : Function to stop reading the port, the port is left open
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def Detach(self):
+		if(self.m_Port is None):
+			return
+		try:
+			self.m_Loop.remove_reader(self.m_Port.fileno())
+			self.m_Port.timeout = self.m_Timeout
+		except Exception as ex:
+			logging.error("Serial Detach : " + str(ex))		#port already closed
+		self.m_Port = None
+
+	#********************************************************************************************#
+	#Description : Reader callback, feeds the bytes waiting in the driver into the decoder
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def OnReadable(self):
+		try:
+			Data = self.m_Port.read(max(1, self.m_Port.in_waiting))
+			if(Data):
+				self.m_ReadCount = self.m_ReadCount + 1
+				if(self.m_FrameRing is not None):
+					self.m_FrameRing.Record(MERIT_FRAME_RX, Data)
+				self.m_Decoder.Feed(Data)
+		except serial.SerialException as e:
+			self.m_Error = e
+			self.m_Loop.remove_reader(self.m_Port.fileno())
+		self.m_Waiter.Resolve()
+
+	#********************************************************************************************#
+	#Description : Function to write a frame
+	#Arguments : Frame bytes
+	#Return : Bytes written
+	#Notes : A TLC frame fits the driver buffer, the write does not block the loop
+	#********************************************************************************************#
+	def Write(self, Frame):
+		if(self.m_Error is not None):
+			raise self.m_Error
+		if(self.m_Port is None):
+			raise serial.SerialException("Serial port not attached")
+		return self.m_Port.write(Frame)
+
+	#********************************************************************************************#
+	#Description : Function to wait until more bytes were fed into the decoder
+	#Arguments : Timeout in seconds
+	#Return : True if bytes arrived, False on timeout
+	#Notes : The caller checks the decoder first, nothing is read between that check and this wait
+	#********************************************************************************************#
+	async def WaitData(self, Timeout):
+		if(self.m_Error is not None):
+			raise self.m_Error
+		if(await self.m_Waiter.Wait(Timeout) == False):
+			return False
+		if(self.m_Error is not None):
+			raise self.m_Error
+		return True
+
+#********************************************************************************************#
+#Description : Drives the socket of a paho client from the event loop instead of the paho network thread
+#Notes : Socket reads and writes run in add_reader/add_writer callbacks, the blocking TCP and websocket
+#		 connect runs in the default executor. The paho socket callbacks may come from another thread
+#		 (connect, publish from a worker thread), the loop is then changed through call_soon_threadsafe.
+#********************************************************************************************#
+class MeritAsyncMqttLoop:
+	def __init__(self, Loop, MaxReconnectDelay):
+		self.m_Loop = Loop
+		self.m_ThreadId = threading.get_ident()
+		self.m_MaxReconnectDelay = MaxReconnectDelay
+		self.m_Client = None
+		self.m_ConnectCount = 0
+
+	#********************************************************************************************#
+	#Description : Function to hook the socket callbacks of a client, before it connects
+	#Arguments : Paho client
+	#Return : None
+	#********************************************************************************************#
+	def Attach(self, Client):
+		self.m_Client = Client
+		Client.on_socket_open = self.OnSocketOpen
+		Client.on_socket_close = self.OnSocketClose
+		Client.on_socket_register_write = self.OnSocketRegisterWrite
+		Client.on_socket_unregister_write = self.OnSocketUnregisterWrite
+
+	#********************************************************************************************#
+	#Description : Function to run a loop change in the loop thread
+	#Arguments : Function, Arguments
+	#Return : None
+	#********************************************************************************************#
+	def Call(self, Function, *Args):
+		if(threading.get_ident() == self.m_ThreadId):
+			Function(*Args)
+		else:
+			self.m_Loop.call_soon_threadsafe(Function, *Args)
+
+	#********************************************************************************************#
+	#Description : Paho socket callbacks, the socket is read while open and written while paho has data queued
+	#Arguments : Mqtt Client, userdata, socket
+	#Return : None
+	#Notes : The file descriptor is taken at once, the socket may be closed before the loop runs the change
+	#********************************************************************************************#
+	def OnSocketOpen(self, client, userdata, sock):
+		self.Call(self.m_Loop.add_reader, sock.fileno(), self.OnReadable)
+
+	def OnSocketClose(self, client, userdata, sock):
+		self.Call(self.m_Loop.remove_reader, sock.fileno())
+		self.Call(self.m_Loop.remove_writer, sock.fileno())
+
+	def OnSocketRegisterWrite(self, client, userdata, sock):
+		self.Call(self.m_Loop.add_writer, sock.fileno(), self.OnWritable)
+
+	def OnSocketUnregisterWrite(self, client, userdata, sock):
+		self.Call(self.m_Loop.remove_writer, sock.fileno())
+
+	#********************************************************************************************#
+	#Description : Reader and writer callbacks of the client socket
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def OnReadable(self):
+		self.m_Client.loop_read()
+
+	def OnWritable(self):
+		self.m_Client.loop_write()
+
+	#********************************************************************************************#
+	#Description : Coroutine keeping the client connected and calling loop_misc for the keepalive
+	#Arguments : None
+	#Return : None
+	#Notes : The client must be set up with connect_async, the first connect is done here like every reconnect
+	#********************************************************************************************#
+	async def Run(self):
+		Delay = MERIT_ASYNC_MQTT_RECONNECT_MIN_DELAY
+		while(True):
+			if(self.m_Client.socket() is None):
+				try:
+					rc = await self.m_Loop.run_in_executor(None, self.m_Client.reconnect)
+				except Exception as ex:
+					logging.error("Mqtt Connect : " + str(ex))
+					rc = mqtt_client.MQTT_ERR_NO_CONN
+				if(rc != mqtt_client.MQTT_ERR_SUCCESS):
+					await asyncio.sleep(Delay)
+					Delay = min(Delay * 2, self.m_MaxReconnectDelay)
+					continue
+				self.m_ConnectCount = self.m_ConnectCount + 1
+				Delay = MERIT_ASYNC_MQTT_RECONNECT_MIN_DELAY
+			self.m_Client.loop_misc()
+			await asyncio.sleep(MERIT_ASYNC_MQTT_MISC_INTERVAL)
+
+#***********************************************************************************#
+#******************************* Functions *****************************************#
+#***********************************************************************************#
+#********************************************************************************************#
+#Description : Function to post a JSON object over HTTP/1.1 on asyncio streams
+#Arguments : URL (http or https), Object, Timeout in seconds
+#Return : HTTP status code
+#Notes : Raises on connection errors and timeout like requests.post does
+#********************************************************************************************#
+async def Merit_AsyncHttpPostJson(Url, Object, Timeout = MERIT_ASYNC_HTTP_TIMEOUT):
+	UrlParts = urllib.parse.urlsplit(Url)
+	SslFlag = (UrlParts.scheme == "https")
+	Port = UrlParts.port or (443 if(SslFlag) else 80)
+	Path = UrlParts.path or "/"
+	if(UrlParts.query):
+		Path = Path + "?" + UrlParts.query
+	Body = json.dumps(Object).encode()
+	Request = ("POST " + Path + " HTTP/1.1\r\nHost: " + UrlParts.netloc + "\r\nContent-Type: application/json\r\nContent-Length: " + str(len(Body)) +
+		"\r\nConnection: close\r\n\r\n").encode() + Body
+
+	async def Post():
+		Reader, Writer = await asyncio.open_connection(UrlParts.hostname, Port, ssl = SslFlag)
+		try:
+			Writer.write(Request)
+			await Writer.drain()
+			StatusLine = await Reader.readline()
+			return int(StatusLine.split()[1])
+		finally:
+			Writer.close()
+
+	return await asyncio.wait_for(Post(), Timeout)
@@ -0,0 +1,161 @@
+#Filename : MeritCrc16.py
+#Version  :	1.0.0
+#Description : CRC16 checksum of the TLC serial protocol on bytes/bytearray/memoryview with incremental and batch APIs
+#Date : Oct 2026
+
+#***********************************************************************************#
+#*************** Import Libraries **************************************************#
+#***********************************************************************************#
+import sys
+import numpy as np
+
+#***********************************************************************************#
+#*************** File Constants ****************************************************#
+#***********************************************************************************#
+#CRC16 Table
+CRC16_TABLE = [
+	0x00000, 0x01189, 0x02312, 0x0329B, 0x04624, 0x057AD, 0x06536, 0x074BF, 0x08C48, 0x09DC1, 0x0AF5A, 0x0BED3, 0x0CA6C, 0x0DBE5, 0x0E97E, 0x0F8F7,
+	0x01081, 0x00108, 0x03393, 0x0221A, 0x056A5, 0x0472C, 0x075B7, 0x0643E, 0x09CC9, 0x08D40, 0x0BFDB, 0x0AE52, 0x0DAED, 0x0CB64, 0x0F9FF, 0x0E876,
+	0x02102, 0x0308B, 0x00210, 0x01399, 0x06726, 0x076AF, 0x04434, 0x055BD, 0x0AD4A, 0x0BCC3, 0x08E58, 0x09FD1, 0x0EB6E, 0x0FAE7, 0x0C87C, 0x0D9F5, 
+	0x03183, 0x0200A, 0x01291, 0x00318, 0x077A7, 0x0662E, 0x054B5, 0x0453C, 0x0BDCB, 0x0AC42, 0x09ED9, 0x08F50, 0x0FBEF, 0x0EA66, 0x0D8FD, 0x0C974,
+	0x04204, 0x0538D, 0x06116, 0x0709F, 0x00420, 0x015A9, 0x02732, 0x036BB, 0x0CE4C, 0x0DFC5, 0x0ED5E, 0x0FCD7, 0x08868, 0x099E1, 0x0AB7A, 0x0BAF3, 
+	0x05285, 0x0430C, 0x07197, 0x0601E, 0x014A1, 0x00528, 0x037B3, 0x0263A, 0x0DECD, 0x0CF44, 0x0FDDF, 0x0EC56, 0x098E9, 0x08960, 0x0BBFB, 0x0AA72, 
+	0x06306, 0x0728F, 0x04014, 0x0519D, 0x02522, 0x034AB, 0x00630, 0x017B9, 0x0EF4E, 0x0FEC7, 0x0CC5C, 0x0DDD5, 0x0A96A, 0x0B8E3, 0x08A78, 0x09BF1,
+	0x07387, 0x0620E, 0x05095, 0x0411C, 0x035A3, 0x0242A, 0x016B1, 0x00738, 0x0FFCF, 0x0EE46, 0x0DCDD, 0x0CD54, 0x0B9EB, 0x0A862, 0x09AF9, 0x08B70, 
+	0x08408, 0x09581, 0x0A71A, 0x0B693, 0x0C22C, 0x0D3A5, 0x0E13E, 0x0F0B7, 0x00840, 0x019C9, 0x02B52, 0x03ADB, 0x04E64, 0x05FED, 0x06D76, 0x07CFF, 
+	0x09489, 0x08500, 0x0B79B, 0x0A612, 0x0D2AD, 0x0C324, 0x0F1BF, 0x0E036, 0x018C1, 0x00948, 0x03BD3, 0x02A5A, 0x05EE5, 0x04F6C, 0x07DF7, 0x06C7E,
+	0x0A50A, 0x0B483, 0x08618, 0x09791, 0x0E32E, 0x0F2A7, 0x0C03C, 0x0D1B5, 0x02942, 0x038CB, 0x00A50, 0x01BD9, 0x06F66, 0x07EEF, 0x04C74, 0x05DFD, 
+	0x0B58B, 0x0A402, 0x09699, 0x08710, 0x0F3AF, 0x0E226, 0x0D0BD, 0x0C134, 0x039C3, 0x0284A, 0x01AD1, 0x00B58, 0x07FE7, 0x06E6E, 0x05CF5, 0x04D7C, 
+	0x0C60C, 0x0D785, 0x0E51E, 0x0F497, 0x08028, 0x091A1, 0x0A33A, 0x0B2B3, 0x04A44, 0x05BCD, 0x06956, 0x078DF, 0x00C60, 0x01DE9, 0x02F72, 0x03EFB, 
+	0x0D68D, 0x0C704, 0x0F59F, 0x0E416, 0x090A9, 0x08120, 0x0B3BB, 0x0A232, 0x05AC5, 0x04B4C, 0x079D7, 0x0685E, 0x01CE1, 0x00D68, 0x03FF3, 0x02E7A, 
+	0x0E70E, 0X0F687, 0x0C41C, 0x0D595, 0x0A12A, 0X0B0A3, 0x08238, 0x093B1, 0x06B46, 0x07ACF, 0x04854, 0x059DD, 0x02D62, 0x03CEB, 0x00E70, 0x01FF9, 
+	0x0F78F, 0x0E606, 0x0D49D, 0x0C514, 0x0B1AB, 0x0A022, 0x092B9, 0x08330, 0x07BC7, 0x06A4E, 0x058D5, 0x0495C, 0x03DE3, 0x02C6A, 0x01EF1, 0x00F78
+]
+
+#CRC16 table for two bytes at a time, index is (CheckSum ^ (Byte0 | (Byte1 << 8)))
+#Table is linear so the second byte step folds into CRC16_TABLE[CRC16_TABLE[x] & 0xff] ^ (CRC16_TABLE[x] >> 8)
+CRC16_PAIR_TABLE = [(CRC16_TABLE[Index] >> 8) ^ CRC16_TABLE[CRC16_TABLE[Index] & 0xff] for Index in range(256)]
+CRC16_WORD_TABLE = [CRC16_PAIR_TABLE[Word & 0xff] ^ CRC16_TABLE[Word >> 8] for Word in range(65536)]
+
+#Shortest frame the batch check accepts, one data byte and the two checksum bytes
+CRC16_MIN_FRAME_LENGTH = 3
+
+#NumPy copies of the tables for the batch checksum
+CRC16_TABLE_ARRAY = np.array(CRC16_TABLE, dtype = np.uint32)
+CRC16_WORD_TABLE_ARRAY = np.array(CRC16_WORD_TABLE, dtype = np.uint32)
+
+#Word lookup reads the data as native 16 bit words, only valid on little endian hosts
+CRC16_WORD_LOOKUP_FLAG = (sys.byteorder == "little")
+
+#***********************************************************************************#
+#******************************* Functions *****************************************#
+#***********************************************************************************#
+#********************************************************************************************#
+#Description : Function to calculate the CRC16 of bytes, continuing from a previous checksum
+#Arguments : Data (bytes, bytearray, memoryview or list of ints), CheckSum to continue from
+#Return : CheckSum
+#********************************************************************************************#
+def Merit_Crc16(Data, CheckSum = 0):
+	if(not isinstance(Data, (bytes, bytearray, memoryview))):
+		Data = bytes(Data)
+	Table = CRC16_TABLE
+	if(CRC16_WORD_LOOKUP_FLAG == True):
+		DataView = memoryview(Data).cast("B")
+		WordLength = len(DataView) & ~1
+		WordTable = CRC16_WORD_TABLE
+		for Word in DataView[ : WordLength].cast("H"):
+			CheckSum = WordTable[CheckSum ^ Word]
+		if(WordLength != len(DataView)):
+			CheckSum = (CheckSum >> 8) ^ Table[(CheckSum ^ DataView[WordLength]) & 0xff]
+		return CheckSum
+	for Element in Data:
+		CheckSum = (CheckSum >> 8) ^ Table[(CheckSum ^ Element) & 0xff]
+	return CheckSum
+
+#********************************************************************************************#
+#Description : Function to calculate the CRC16 of many frames at once with NumPy
+#Arguments : FrameArray (2D uint8 array, one frame per row), Lengths (bytes to check per row, None for full rows)
+#Return : uint16 array of checksums, one per row
+#********************************************************************************************#
+def Merit_Crc16Batch(FrameArray, Lengths = None):
+	FrameArray = np.asarray(FrameArray, dtype = np.uint8)
+	Rows, Columns = FrameArray.shape
+	CheckSum = np.zeros(Rows, dtype = np.uint32)
+	if(Lengths is None):
+		Lengths = np.full(Rows, Columns)
+	Lengths = np.asarray(Lengths)
+	WordCount = Lengths >> 1
+	SameLengthFlag = bool(np.all(Lengths == Columns))
+	Words = FrameArray[ : , 0 : (Columns & ~1) : 2].astype(np.uint32) | (FrameArray[ : , 1 : (Columns & ~1) : 2].astype(np.uint32) << 8)
+	for Index in range(Words.shape[1]):
+		NewCheckSum = CRC16_WORD_TABLE_ARRAY[CheckSum ^ Words[ : , Index]]
+		if(SameLengthFlag == True):
+			CheckSum = NewCheckSum
+		else:
+			CheckSum = np.where(Index < WordCount, NewCheckSum, CheckSum)
+	OddRows = (Lengths & 1) == 1
+	if(np.any(OddRows)):
+		LastByte = FrameArray[np.arange(Rows), np.maximum(Lengths - 1, 0)]
+		NewCheckSum = (CheckSum >> 8) ^ CRC16_TABLE_ARRAY[(CheckSum ^ LastByte) & 0xff]
+		CheckSum = np.where(OddRows, NewCheckSum, CheckSum)
+	return CheckSum.astype(np.uint16)
+
+#********************************************************************************************#
+#Description : Function to check the CRC16 of many captured (unstuffed) frames at once
+#Arguments : FrameList, each frame ends with its checksum LSB, MSB
+#Return : bool array, True where the checksum of the frame matches, False for frames below CRC16_MIN_FRAME_LENGTH
+#********************************************************************************************#
+def Merit_Crc16CheckBatch(FrameList):
+	Lengths = np.array([len(Frame) for Frame in FrameList], dtype = np.int64)
+	FrameArray = np.zeros((len(FrameList), max(Lengths.max(initial = 0), CRC16_MIN_FRAME_LENGTH)), dtype = np.uint8)
+	for Index, Frame in enumerate(FrameList):
+		FrameArray[Index, : len(Frame)] = np.frombuffer(bytes(Frame), dtype = np.uint8)
+	ValidRows = Lengths >= CRC16_MIN_FRAME_LENGTH
+	CheckLengths = np.maximum(Lengths, CRC16_MIN_FRAME_LENGTH)		#short rows are checked on zeros and then failed
+	Rows = np.arange(len(FrameList))
+	Givenchecksum = FrameArray[Rows, CheckLengths - 1].astype(np.uint16) << 8 | FrameArray[Rows, CheckLengths - 2]
+	return ValidRows & (Merit_Crc16Batch(FrameArray, CheckLengths - 2) == Givenchecksum)
+
+#***********************************************************************************#
+#******************************* Classes *******************************************#
+#***********************************************************************************#
+#********************************************************************************************#
+#Description : Incremental CRC16, update it with the bytes as they stream in
+#********************************************************************************************#
+class MeritCrc16:
+	def __init__(self, CheckSum = 0):
+		self.m_CheckSum = CheckSum
+
+	#********************************************************************************************#
+	#Description : Function to add bytes to the checksum
+	#Arguments : Data (bytes, bytearray, memoryview or list of ints)
+	#Return : CheckSum so far
+	#********************************************************************************************#
+	def Update(self, Data):
+		self.m_CheckSum = Merit_Crc16(Data, self.m_CheckSum)
+		return self.m_CheckSum
+
+	#********************************************************************************************#
+	#Description : Function to add one byte to the checksum
+	#Arguments : Byte value
+	#Return : CheckSum so far
+	#********************************************************************************************#
+	def UpdateByte(self, Element):
+		self.m_CheckSum = (self.m_CheckSum >> 8) ^ CRC16_TABLE[(self.m_CheckSum ^ Element) & 0xff]
+		return self.m_CheckSum
+
+	#********************************************************************************************#
+	#Description : Function to get the checksum so far
+	#Arguments : None
+	#Return : CheckSum
+	#********************************************************************************************#
+	def Value(self):
+		return self.m_CheckSum
+
+	#********************************************************************************************#
+	#Description : Function to restart the checksum
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def Reset(self):
+		self.m_CheckSum = 0
@@ -0,0 +1,200 @@
+#Filename : MeritLogging.py
+#Version  :	1.0.0
+#Description : Log file written by a background thread with size and time rotation, and a ring buffer of the raw serial frames
+#Date : Oct 2026
+
+#***********************************************************************************#
+#*************** Import Libraries **************************************************#
+#***********************************************************************************#
+import time
+import queue
+import atexit
+import logging
+import datetime
+import threading
+from array import array
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+#***********************************************************************************#
+#*************** File Constants ****************************************************#
+#***********************************************************************************#
+MERIT_LOG_FORMAT			= '%(asctime)s - %(message)s'
+MERIT_LOG_DATE_FORMAT		= '%d-%b-%y %H:%M:%S'
+MERIT_LOG_LEVEL				= logging.INFO			#per frame lines are logged at DEBUG
+MERIT_LOG_MAX_BYTES			= 10 * 1024 * 1024		#log file size that starts a new file
+MERIT_LOG_ROTATE_INTERVAL	= 24 * 60 * 60			#seconds after which a new file is started whatever its size
+MERIT_LOG_BACKUP_COUNT		= 7						#rotated files kept, MeritLogs.log.1 is the newest
+MERIT_LOG_FLUSH_TIMEOUT		= 2.0					#seconds Merit_FlushLogging waits for the queue to empty
+
+MERIT_FRAME_RING_SLOTS		= 256					#frames kept, the oldest is overwritten
+MERIT_FRAME_RING_SLOT_SIZE	= 256					#bytes kept per frame, longer frames are cut
+MERIT_FRAME_TX				= 0
+MERIT_FRAME_RX				= 1
+MeritFrameDirectionDict = {MERIT_FRAME_TX : "TX", MERIT_FRAME_RX : "RX"}
+
+#***********************************************************************************#
+#******************************* Classes *******************************************#
+#***********************************************************************************#
+#********************************************************************************************#
+#Description : Queue handler that leaves the formatting to the listener thread
+#Notes : QueueHandler.prepare formats the message in the logging thread, here the record is queued as it is so
+#		 callers must pass immutable arguments (no buffer views) to the lazy %s formatting
+#********************************************************************************************#
+class MeritQueueHandler(QueueHandler):
+	def prepare(self, record):
+		return record
+
+#********************************************************************************************#
+#Description : Rotating log file that also starts a new file every RotateInterval seconds
+#********************************************************************************************#
+class MeritRotatingFileHandler(RotatingFileHandler):
+	def __init__(self, FileName, MaxBytes = MERIT_LOG_MAX_BYTES, BackupCount = MERIT_LOG_BACKUP_COUNT, RotateInterval = MERIT_LOG_ROTATE_INTERVAL):
+		super().__init__(FileName, maxBytes = MaxBytes, backupCount = BackupCount, delay = True)
+		self.m_RotateInterval = RotateInterval
+		self.m_RolloverTime = time.time() + RotateInterval
+
+	def shouldRollover(self, record):
+		if(time.time() >= self.m_RolloverTime):
+			return True
+		return super().shouldRollover(record)
+
+	def doRollover(self):
+		super().doRollover()
+		self.m_RolloverTime = time.time() + self.m_RotateInterval
+
+#********************************************************************************************#
+#Description : Ring buffer of the raw serial frames, written instead of logging every frame as text
+#Notes : The slots are preallocated, a frame is copied into its slot without an allocation. Dump logs the frames
+#		 recorded since the last dump, so a fault repeating every cycle does not log the same frames again.
+#		 With m_Capture set (MeritSerialCapture) every frame is also written to the capture file.
+#********************************************************************************************#
+class MeritFrameRing:
+	def __init__(self, SlotCount = MERIT_FRAME_RING_SLOTS, SlotSize = MERIT_FRAME_RING_SLOT_SIZE):
+		self.m_SlotCount = SlotCount
+		self.m_SlotSize = SlotSize
+		self.m_Buffer = bytearray(SlotCount * SlotSize)
+		self.m_View = memoryview(self.m_Buffer)
+		self.m_LengthArray = array("I", [0]) * SlotCount		#length of the frame, may be above SlotSize
+		self.m_TimeArray = array("d", [0.0]) * SlotCount
+		self.m_DirectionArray = bytearray(SlotCount)
+		self.m_Count = 0					#frames recorded since the start
+		self.m_DumpedCount = 0				#m_Count at the last dump
+		self.m_Capture = None
+		self.m_Lock = threading.Lock()
+
+	#********************************************************************************************#
+	#Description : Function to record one frame
+	#Arguments : Direction (MERIT_FRAME_TX or MERIT_FRAME_RX), Frame bytes, bytearray or memoryview
+	#Return : None
+	#********************************************************************************************#
+	def Record(self, Direction, Frame):
+		Length = len(Frame)
+		CopyLength = min(Length, self.m_SlotSize)
+		with self.m_Lock:
+			Slot = self.m_Count % self.m_SlotCount
+			Offset = Slot * self.m_SlotSize
+			self.m_View[Offset : Offset + CopyLength] = Frame[ : CopyLength]
+			self.m_LengthArray[Slot] = Length
+			self.m_TimeArray[Slot] = time.time()
+			self.m_DirectionArray[Slot] = Direction
+			self.m_Count = self.m_Count + 1
+		if(self.m_Capture is not None):
+			self.m_Capture.Record(Direction, Frame)
+
+	#********************************************************************************************#
+	#Description : Function to get the recorded frames, oldest first
+	#Arguments : FromCount, first frame number wanted (0 for all the frames still in the ring)
+	#Return : List of (Time, Direction, Frame length, Frame bytes kept)
+	#********************************************************************************************#
+	def Frames(self, FromCount = 0):
+		with self.m_Lock:
+			FirstCount = max(FromCount, self.m_Count - self.m_SlotCount)
+			FrameList = []
+			for Count in range(FirstCount, self.m_Count):
+				Slot = Count % self.m_SlotCount
+				Offset = Slot * self.m_SlotSize
+				Length = self.m_LengthArray[Slot]
+				FrameList.append((self.m_TimeArray[Slot], self.m_DirectionArray[Slot], Length, bytes(self.m_View[Offset : Offset + min(Length, self.m_SlotSize)])))
+			return FrameList
+
+	#********************************************************************************************#
+	#Description : Function to log the frames recorded since the last dump as one record
+	#Arguments : Reason, Logger
+	#Return : Number of frames logged
+	#********************************************************************************************#
+	def Dump(self, Reason, Logger = None):
+		with self.m_Lock:
+			FromCount = self.m_DumpedCount
+			self.m_DumpedCount = self.m_Count
+		FrameList = self.Frames(FromCount)
+		if(len(FrameList) == 0):
+			return 0
+		LineList = ["Frame Ring Dump : " + Reason + ", Frames : " + str(len(FrameList))]
+		for FrameTime, Direction, Length, Frame in FrameList:
+			Line = datetime.datetime.fromtimestamp(FrameTime).strftime("%H:%M:%S.%f")[ : -3] + " " + MeritFrameDirectionDict[Direction] + " " + Frame.hex(" ")
+			if(Length > len(Frame)):
+				Line = Line + " ... (" + str(Length) + " bytes)"
+			LineList.append(Line)
+		(Logger or logging.getLogger()).error("\n".join(LineList))
+		return len(FrameList)
+
+#***********************************************************************************#
+#******************************* Functions *****************************************#
+#***********************************************************************************#
+m_LogListener = None				#QueueListener writing the log file
+m_LogQueue = None
+
+#********************************************************************************************#
+#Description : Function to send the root logger through a queue to a rotating log file written by a background thread
+#Arguments : Log file name, Log level
+#Return : None
+#Notes : Called again (session process) it replaces the previous file, the records still queued are written first
+#********************************************************************************************#
+def Merit_SetupLogging(FileName, Level = MERIT_LOG_LEVEL):
+	global m_LogListener
+	global m_LogQueue
+	Merit_StopLogging()
+	FileHandler = MeritRotatingFileHandler(FileName)
+	FileHandler.setFormatter(logging.Formatter(MERIT_LOG_FORMAT, MERIT_LOG_DATE_FORMAT))
+	m_LogQueue = queue.SimpleQueue()
+	RootLogger = logging.getLogger()
+	for Handler in list(RootLogger.handlers):
+		RootLogger.removeHandler(Handler)
+		Handler.close()
+	RootLogger.addHandler(MeritQueueHandler(m_LogQueue))
+	RootLogger.setLevel(Level)
+	m_LogListener = QueueListener(m_LogQueue, FileHandler)
+	m_LogListener.start()
+
+#********************************************************************************************#
+#Description : Function to write the queued records and stop the log thread
+#Arguments : None
+#Return : None
+#Notes : Registered with atexit, a session process calls it itself since it leaves with os._exit
+#********************************************************************************************#
+def Merit_StopLogging():
+	global m_LogListener
+	if(m_LogListener is None):
+		return
+	m_LogListener.stop()
+	for Handler in m_LogListener.handlers:
+		Handler.close()
+	m_LogListener = None
+
+#********************************************************************************************#
+#Description : Function to wait until the queued records are written to the log file
+#Arguments : Timeout in seconds
+#Return : True if the queue emptied in time
+#********************************************************************************************#
+def Merit_FlushLogging(Timeout = MERIT_LOG_FLUSH_TIMEOUT):
+	Deadline = time.monotonic() + Timeout
+	while((m_LogQueue is not None) and (m_LogQueue.empty() == False)):
+		if(time.monotonic() >= Deadline):
+			return False
+		time.sleep(0.001)
+	if(m_LogListener is not None):
+		for Handler in m_LogListener.handlers:
+			Handler.flush()
+	return True
+
+atexit.register(Merit_StopLogging)
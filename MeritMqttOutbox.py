@@ -0,0 +1,350 @@
+#Filename : MeritMqttOutbox.py
+#Version  :	1.0.0
+#Description : Disk backed store and forward outbox for mqtt publishes, drained at a controlled rate after a reconnect,
+#			   and the in-flight window of the QoS 1/2 publishes waiting for the broker acknowledgment
+#Date : Oct 2026
+
+#***********************************************************************************#
+#*************** Import Libraries **************************************************#
+#***********************************************************************************#
+import time
+import queue
+import sqlite3
+import logging
+import threading
+import collections
+
+#***********************************************************************************#
+#*************** File Constants ****************************************************#
+#***********************************************************************************#
+MERIT_OUTBOX_FILE				= "MeritMqttOutbox.db"
+MERIT_OUTBOX_MAX_MESSAGES		= 20000		#oldest messages are dropped beyond this backlog
+MERIT_OUTBOX_DRAIN_BATCH		= 20		#messages sent between two drain pauses
+MERIT_OUTBOX_DRAIN_INTERVAL		= 0.2		#seconds between two drain batches, 100 messages/s at most
+MERIT_OUTBOX_RETRY_INTERVAL		= 5			#seconds before a failed drain is tried again
+MERIT_OUTBOX_WRITE_WINDOW		= 0.5		#seconds the drain thread collects queued messages before a transaction while the link is down
+
+MERIT_INFLIGHT_EARLY_ACK_LIMIT	= 64		#acknowledgments kept for publishes whose message id is not registered yet
+MERIT_INFLIGHT_RTT_SAMPLES		= 200		#round trip times kept for the statistics
+MERIT_INFLIGHT_RATE_WINDOW		= 10		#seconds of acknowledgments the ack rate is measured over
+
+MERIT_OUTBOX_SCHEMA = [
+	"CREATE TABLE IF NOT EXISTS Outbox (MessageId INTEGER PRIMARY KEY AUTOINCREMENT, Topic TEXT, Payload BLOB, QueueEpoch REAL)",
+]
+
+#***********************************************************************************#
+#******************************* Classes *******************************************#
+#***********************************************************************************#
+#********************************************************************************************#
+#Description : Outbox of the publishes that could not be sent, kept in SQLite until the broker takes them
+#Notes : Send(Topic, Payload, Callback) returns True once the client accepted the message and calls
+#		 Callback(MessageId, AckFlag) when the broker acknowledged it, Connected() tells whether the link is up.
+#		 Put only queues the message in memory, the drain thread writes the queued messages in batches and
+#		 sends them in queue order. A message is deleted once acknowledged, a restart sends again the ones
+#		 that were not.
+#********************************************************************************************#
+class MeritMqttOutbox:
+	def __init__(self, Send, Connected, FileName = MERIT_OUTBOX_FILE, MaxMessages = MERIT_OUTBOX_MAX_MESSAGES):
+		self.m_Send = Send
+		self.m_Connected = Connected
+		self.m_MaxMessages = MaxMessages
+		self.m_Lock = threading.Lock()
+		self.m_WakeEvent = threading.Event()
+		self.m_Queue = queue.Queue()			#(Topic, Payload, QueueEpoch) not written to the database yet
+		self.m_AckedIdList = []					#MessageId acknowledged by the broker, deleted by the drain thread
+		self.m_SentMessageId = 0				#last MessageId handed to the client
+		self.m_Connection = sqlite3.connect(FileName, check_same_thread = False)
+		self.m_Connection.execute("PRAGMA journal_mode = WAL")
+		self.m_Connection.execute("PRAGMA synchronous = NORMAL")
+		for Statement in MERIT_OUTBOX_SCHEMA:
+			self.m_Connection.execute(Statement)
+		self.m_Connection.commit()
+		self.m_Depth = self.m_Connection.execute("SELECT COUNT(*) FROM Outbox").fetchone()[0]
+		self.m_QueuedCount = 0
+		self.m_DrainedCount = 0
+		self.m_DroppedCount = 0
+		self.m_DrainRate = 0.0				#messages per second of the last drain
+		self.m_StopFlag = False
+		if(self.m_Depth > 0):
+			logging.info("Mqtt Outbox Backlog At Startup : " + str(self.m_Depth))
+		self.m_Thread = threading.Thread(target = self.Run, args = (), daemon = True)
+		self.m_Thread.start()
+
+	#********************************************************************************************#
+	#Description : Function to get the number of messages waiting in the outbox, written or still queued
+	#Arguments : None
+	#Return : Backlog depth
+	#********************************************************************************************#
+	def Depth(self):
+		return self.m_Depth
+
+	#********************************************************************************************#
+	#Description : Function to queue a message until the drain thread stores and sends it
+	#Arguments : Topic, Payload
+	#Return : None
+	#Notes : Called on the publishing thread, the disk write is left to the drain thread. While the link is
+	#		 down a message stays in memory for up to MERIT_OUTBOX_WRITE_WINDOW seconds before it is written,
+	#		 a crash within that time loses it.
+	#********************************************************************************************#
+	def Put(self, Topic, Payload):
+		with self.m_Lock:
+			self.m_Queue.put((Topic, Payload, time.time()))
+			self.m_Depth = self.m_Depth + 1
+			self.m_QueuedCount = self.m_QueuedCount + 1
+		self.m_WakeEvent.set()
+
+	#********************************************************************************************#
+	#Description : Function to write the queued messages in one transaction, the oldest are dropped beyond the backlog limit
+	#Arguments : None
+	#Return : None
+	#Notes : Runs on the drain thread only
+	#********************************************************************************************#
+	def WriteQueued(self):
+		Batch = []
+		while(True):
+			try:
+				Batch.append(self.m_Queue.get_nowait())
+			except queue.Empty:
+				break
+		if(not Batch):
+			return
+		try:
+			with self.m_Lock:
+				with self.m_Connection:
+					self.m_Connection.executemany("INSERT INTO Outbox (Topic, Payload, QueueEpoch) VALUES (?, ?, ?)", Batch)
+					DropCount = max(0, self.m_Depth - self.m_MaxMessages)
+					if(DropCount > 0):
+						self.m_Connection.execute("DELETE FROM Outbox WHERE MessageId IN (SELECT MessageId FROM Outbox ORDER BY MessageId LIMIT ?)", (DropCount, ))
+						self.m_Depth = self.m_Depth - DropCount
+						self.m_DroppedCount = self.m_DroppedCount + DropCount
+		except sqlite3.Error as ex:
+			logging.error("Mqtt Outbox Write Failed : " + str(ex))
+
+	#********************************************************************************************#
+	#Description : Callback of a sent message, an acknowledged one is deleted, one not acknowledged is sent again
+	#Arguments : Outbox MessageId, AckFlag
+	#Return : None
+	#Notes : Called on the mqtt network thread, the delete is left to the drain thread
+	#********************************************************************************************#
+	def Acked(self, MessageId, AckFlag):
+		with self.m_Lock:
+			if(AckFlag == True):
+				self.m_AckedIdList.append((MessageId, ))
+			else:
+				self.m_SentMessageId = min(self.m_SentMessageId, MessageId - 1)
+		self.m_WakeEvent.set()
+
+	#********************************************************************************************#
+	#Description : Function to delete the acknowledged messages in one transaction
+	#Arguments : None
+	#Return : None
+	#Notes : Runs on the drain thread only
+	#********************************************************************************************#
+	def DeleteAcked(self):
+		with self.m_Lock:
+			AckedIdList = self.m_AckedIdList
+			self.m_AckedIdList = []
+		if(not AckedIdList):
+			return
+		try:
+			with self.m_Lock:
+				with self.m_Connection:
+					Cursor = self.m_Connection.executemany("DELETE FROM Outbox WHERE MessageId = ?", AckedIdList)
+				self.m_Depth = self.m_Depth - Cursor.rowcount
+				self.m_DrainedCount = self.m_DrainedCount + Cursor.rowcount
+		except sqlite3.Error as ex:
+			logging.error("Mqtt Outbox Delete Failed : " + str(ex))
+
+	#********************************************************************************************#
+	#Description : Function to wake the drain thread, called when the link comes back
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def Wake(self):
+		self.m_WakeEvent.set()
+
+	#********************************************************************************************#
+	#Description : Function to get the outbox counters
+	#Arguments : None
+	#Return : Metrics dictionary
+	#********************************************************************************************#
+	def Metrics(self):
+		return {"Backlog" : self.m_Depth, "Queued" : self.m_QueuedCount, "Drained" : self.m_DrainedCount,
+			"Dropped" : self.m_DroppedCount, "DrainRate" : round(self.m_DrainRate, 1)}
+
+	#********************************************************************************************#
+	#Description : Drain thread, writes the queued messages and sends the backlog in batches while the link is up
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def Run(self):
+		while(self.m_StopFlag == False):
+			self.m_WakeEvent.wait(MERIT_OUTBOX_RETRY_INTERVAL)
+			self.m_WakeEvent.clear()
+			if((self.m_Queue.empty() == False) and (self.m_Connected() == False)):
+				time.sleep(MERIT_OUTBOX_WRITE_WINDOW)		#collect the publishes of the outage into one transaction
+			self.WriteQueued()
+			self.DeleteAcked()
+			if((self.m_Depth == 0) or (self.m_Connected() == False)):
+				continue
+			StartTime = time.monotonic()
+			SentCount = 0
+			while((self.m_StopFlag == False) and (self.m_Depth > 0) and (self.m_Connected() == True)):
+				self.WriteQueued()						#messages queued during the drain go behind the stored ones
+				self.DeleteAcked()
+				BatchCount = self.DrainBatch()
+				if(BatchCount == 0):
+					break						#client refused or every message waits for its acknowledgment, retried on the next wake
+				SentCount = SentCount + BatchCount
+				time.sleep(MERIT_OUTBOX_DRAIN_INTERVAL)
+			if(SentCount > 0):
+				Elapsed = time.monotonic() - StartTime
+				self.m_DrainRate = SentCount / max(Elapsed, 0.001)
+				logging.info("Mqtt Outbox Drained : " + str(SentCount) + " messages in " + str(round(Elapsed, 2)) + " s, Backlog : " + str(self.m_Depth))
+		self.WriteQueued()
+		self.DeleteAcked()
+
+	#********************************************************************************************#
+	#Description : Function to send one batch of the oldest messages not handed to the client yet
+	#Arguments : None
+	#Return : Number of messages sent
+	#Notes : The messages stay on disk until Acked, a message not acknowledged is sent again with the ones after it
+	#********************************************************************************************#
+	def DrainBatch(self):
+		with self.m_Lock:
+			Batch = self.m_Connection.execute("SELECT MessageId, Topic, Payload FROM Outbox WHERE MessageId > ? ORDER BY MessageId LIMIT ?",
+				(self.m_SentMessageId, MERIT_OUTBOX_DRAIN_BATCH)).fetchall()
+		SentCount = 0
+		for MessageId, Topic, Payload in Batch:
+			if(self.m_Send(Topic, Payload, lambda ClientMessageId, AckFlag, MessageId = MessageId : self.Acked(MessageId, AckFlag)) == False):
+				break
+			with self.m_Lock:
+				self.m_SentMessageId = max(self.m_SentMessageId, MessageId)
+			SentCount = SentCount + 1
+		return SentCount
+
+	#********************************************************************************************#
+	#Description : Function to write the queued messages and stop the drain thread, the backlog stays on disk for the next start
+	#Arguments : Timeout in seconds
+	#Return : None
+	#********************************************************************************************#
+	def Close(self, Timeout = 2):
+		self.m_StopFlag = True
+		self.m_WakeEvent.set()
+		self.m_Thread.join(Timeout)
+
+#********************************************************************************************#
+#Description : Window of the QoS 1/2 publishes handed to the client and not acknowledged by the broker yet
+#Notes : The paho on_publish callback can run before publish() returned the message id, such an
+#		 acknowledgment is kept until the id is registered. Callback(MessageId, AckFlag) is called once per
+#		 publish, AckFlag False when it was not acknowledged within the timeout.
+#********************************************************************************************#
+class MeritMqttInFlightWindow:
+	def __init__(self, Size):
+		self.m_Size = Size
+		self.m_Lock = threading.Lock()
+		self.m_InFlightDict = {}			#MessageId : (Topic, Send time, Callback)
+		self.m_EarlyAckList = collections.deque(maxlen = MERIT_INFLIGHT_EARLY_ACK_LIMIT)
+		self.m_RttList = collections.deque(maxlen = MERIT_INFLIGHT_RTT_SAMPLES)
+		self.m_AckTimeList = collections.deque()
+		self.m_AckCount = 0
+		self.m_ExpiredCount = 0
+		self.m_MaxInFlight = 0
+
+	#********************************************************************************************#
+	#Description : Function to check if the window is full
+	#Arguments : None
+	#Return : True if no more publishes should be handed to the client
+	#********************************************************************************************#
+	def Full(self):
+		return (len(self.m_InFlightDict) >= self.m_Size)
+
+	#********************************************************************************************#
+	#Description : Function to get the number of publishes waiting for an acknowledgment
+	#Arguments : None
+	#Return : Count
+	#********************************************************************************************#
+	def Count(self):
+		return len(self.m_InFlightDict)
+
+	#********************************************************************************************#
+	#Description : Function to register a publish handed to the client
+	#Arguments : MessageId, Topic, Callback or None
+	#Return : None
+	#********************************************************************************************#
+	def Add(self, MessageId, Topic, Callback):
+		with self.m_Lock:
+			if(MessageId in self.m_EarlyAckList):
+				self.m_EarlyAckList.remove(MessageId)
+				EarlyFlag = True
+			else:
+				self.m_InFlightDict[MessageId] = (Topic, time.monotonic(), Callback)
+				self.m_MaxInFlight = max(self.m_MaxInFlight, len(self.m_InFlightDict))
+				EarlyFlag = False
+		if(EarlyFlag == True):
+			self.Acked(0.0, Callback, MessageId)
+
+	#********************************************************************************************#
+	#Description : Function to take a broker acknowledgment, called from the paho on_publish callback
+	#Arguments : MessageId
+	#Return : None
+	#********************************************************************************************#
+	def Ack(self, MessageId):
+		with self.m_Lock:
+			Entry = self.m_InFlightDict.pop(MessageId, None)
+			if(Entry is None):
+				self.m_EarlyAckList.append(MessageId)		#QoS 0 publishes end up here too and age out
+				return
+		self.Acked(time.monotonic() - Entry[1], Entry[2], MessageId)
+
+	#********************************************************************************************#
+	#Description : Function to count an acknowledged publish and call its callback
+	#Arguments : Round trip time, Callback or None, MessageId
+	#Return : None
+	#********************************************************************************************#
+	def Acked(self, RoundTripTime, Callback, MessageId):
+		with self.m_Lock:
+			Now = time.monotonic()
+			self.m_RttList.append(RoundTripTime)
+			self.m_AckTimeList.append(Now)
+			while(self.m_AckTimeList[0] < (Now - MERIT_INFLIGHT_RATE_WINDOW)):
+				self.m_AckTimeList.popleft()
+			self.m_AckCount = self.m_AckCount + 1
+		if(Callback is not None):
+			Callback(MessageId, True)
+
+	#********************************************************************************************#
+	#Description : Function to give up on the publishes not acknowledged within the timeout
+	#Arguments : Timeout in seconds
+	#Return : Number of publishes given up
+	#********************************************************************************************#
+	def Expire(self, Timeout):
+		ExpiredList = []
+		with self.m_Lock:
+			Now = time.monotonic()
+			for MessageId, Entry in list(self.m_InFlightDict.items()):
+				if((Now - Entry[1]) > Timeout):
+					ExpiredList.append((MessageId, Entry))
+					del self.m_InFlightDict[MessageId]
+			self.m_ExpiredCount = self.m_ExpiredCount + len(ExpiredList)
+		for MessageId, Entry in ExpiredList:
+			logging.error("Mqtt Publish Not Acknowledged : Message Id " + str(MessageId) + " Topic " + str(Entry[0]))
+			if(Entry[2] is not None):
+				Entry[2](MessageId, False)
+		return len(ExpiredList)
+
+	#********************************************************************************************#
+	#Description : Function to get the window counters
+	#Arguments : None
+	#Return : Metrics dictionary, round trip times in ms
+	#********************************************************************************************#
+	def Metrics(self):
+		with self.m_Lock:
+			RttList = sorted(self.m_RttList)
+			AckRate = len(self.m_AckTimeList) / MERIT_INFLIGHT_RATE_WINDOW
+			MetricsDict = {"InFlight" : len(self.m_InFlightDict), "MaxInFlight" : self.m_MaxInFlight, "Acked" : self.m_AckCount,
+				"Expired" : self.m_ExpiredCount, "AckRate" : round(AckRate, 2)}
+		if(RttList):
+			MetricsDict["RttMs"] = {"Mean" : round(1000 * sum(RttList) / len(RttList), 1), "P95" : round(1000 * RttList[int(0.95 * (len(RttList) - 1))], 1),
+				"Max" : round(1000 * RttList[-1], 1)}
+		return MetricsDict
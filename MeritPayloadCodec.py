@@ -0,0 +1,210 @@
+#Filename : MeritPayloadCodec.py
+#Version  :	1.0.0
+#Description : Per topic mqtt payload encodings, JSON or a compact binary layout, with field projection and zlib
+#Date : Oct 2026
+
+#***********************************************************************************#
+#*************** Import Libraries **************************************************#
+#***********************************************************************************#
+import json
+import zlib
+import struct
+import datetime
+from MeritProtocol import MERIT_FIELD_U8, MERIT_FIELD_S8, MERIT_FIELD_U16, MERIT_FIELD_S16
+
+#***********************************************************************************#
+#*************** File Constants ****************************************************#
+#***********************************************************************************#
+MERIT_ENCODING_JSON		= "json"
+MERIT_ENCODING_BINARY	= "binary"
+
+#The first payload byte tells the encoding : '{' JSON, 0x78 zlib compressed JSON, 0xB1 binary, 0xB2 zlib compressed binary
+MERIT_PAYLOAD_MARKER_JSON			= 0x7B
+MERIT_PAYLOAD_MARKER_JSON_ZLIB		= 0x78
+MERIT_PAYLOAD_MARKER_BINARY			= 0xB1
+MERIT_PAYLOAD_MARKER_BINARY_ZLIB	= 0xB2
+MERIT_PAYLOAD_ZLIB_LEVEL			= 6
+
+#Binary field types besides the MeritProtocol integer types, a field is (Name, Type, Scale) or (Name, MERIT_PAYLOAD_ENUM, Value list)
+MERIT_PAYLOAD_S32	= "i"
+MERIT_PAYLOAD_ENUM	= "E"		#index in the value list, one byte
+MERIT_PAYLOAD_CHAR	= "C"		#one character, "" is sent as 0
+MERIT_PAYLOAD_BOOL	= "?"
+MERIT_PAYLOAD_TIME	= "T"		#str(datetime) as microseconds since 1970-01-01 local time, "" is sent as 0
+
+MeritPayloadStructDict = {
+	MERIT_FIELD_U8		:	"B",
+	MERIT_FIELD_S8		:	"b",
+	MERIT_FIELD_U16		:	"H",
+	MERIT_FIELD_S16		:	"h",
+	MERIT_PAYLOAD_S32	:	"i",
+	MERIT_PAYLOAD_ENUM	:	"B",
+	MERIT_PAYLOAD_CHAR	:	"B",
+	MERIT_PAYLOAD_BOOL	:	"?",
+	MERIT_PAYLOAD_TIME	:	"q",
+}
+
+MERIT_PAYLOAD_SCALE_TOLERANCE = 1e-6		#a scaled value further than this from an integer is not exact
+MERIT_PAYLOAD_EPOCH = datetime.datetime(1970, 1, 1)
+MERIT_PAYLOAD_HEADER = struct.Struct("<BBI")		#marker, schema id, field mask
+
+#***********************************************************************************#
+#******************************* Classes *******************************************#
+#***********************************************************************************#
+#********************************************************************************************#
+#Description : Binary layout of a message dictionary, at most 32 fields
+#Notes : The header is the marker, the schema id and a mask of the fields present, the values of the
+#		 present fields follow in schema order, LSB first. Scaled fields are sent as round(Value * Scale).
+#********************************************************************************************#
+class MeritPayloadSchema:
+	def __init__(self, SchemaId, FieldList):
+		if(len(FieldList) > 32):
+			raise ValueError("Payload schema " + str(SchemaId) + " : more than 32 fields")
+		self.m_SchemaId = SchemaId
+		self.m_FieldList = FieldList
+		self.m_FieldIndexDict = {Field[0] : Index for Index, Field in enumerate(FieldList)}
+		self.m_StructDict = {}			#field mask : Struct of the present values
+
+	#********************************************************************************************#
+	#Description : Function to get the values struct of a field mask
+	#Arguments : Field mask
+	#Return : Struct
+	#********************************************************************************************#
+	def Struct(self, Mask):
+		ValueStruct = self.m_StructDict.get(Mask)
+		if(ValueStruct is None):
+			ValueStruct = struct.Struct("<" + "".join(MeritPayloadStructDict[Field[1]] for Index, Field in enumerate(self.m_FieldList) if(Mask & (1 << Index))))
+			self.m_StructDict[Mask] = ValueStruct
+		return ValueStruct
+
+	#********************************************************************************************#
+	#Description : Function to encode a message dictionary
+	#Arguments : Message dictionary, Field name set to project on (None for all fields)
+	#Return : Binary payload with the marker, None if a field is not in the schema or a value does not fit
+	#********************************************************************************************#
+	def Encode(self, MessageDict, FieldNameSet = None):
+		Mask = 0
+		ValueList = []
+		FoundCount = 0
+		try:
+			for Index, Field in enumerate(self.m_FieldList):
+				Name = Field[0]
+				if(Name not in MessageDict):
+					continue
+				FoundCount = FoundCount + 1
+				if((FieldNameSet is not None) and (Name not in FieldNameSet)):
+					continue
+				Mask = Mask | (1 << Index)
+				ValueList.append(self.EncodeValue(Field, MessageDict[Name]))
+			if(FoundCount != len(MessageDict)):
+				return None					#field not in the schema
+			return MERIT_PAYLOAD_HEADER.pack(MERIT_PAYLOAD_MARKER_BINARY, self.m_SchemaId, Mask) + self.Struct(Mask).pack(*ValueList)
+		except (ValueError, TypeError, struct.error):
+			return None
+
+	#********************************************************************************************#
+	#Description : Function to convert one value to its binary field value
+	#Arguments : Field (Name, Type, Scale or value list), Value
+	#Return : Field value
+	#********************************************************************************************#
+	def EncodeValue(self, Field, Value):
+		Type = Field[1]
+		if(Type == MERIT_PAYLOAD_ENUM):
+			return Field[2].index(Value)
+		if(Type == MERIT_PAYLOAD_CHAR):
+			return ord(Value) if(Value != "") else 0
+		if(Type == MERIT_PAYLOAD_BOOL):
+			if(isinstance(Value, bool) == False):
+				raise TypeError(Field[0])
+			return Value
+		if(Type == MERIT_PAYLOAD_TIME):
+			if(Value == ""):
+				return 0
+			return (datetime.datetime.fromisoformat(Value) - MERIT_PAYLOAD_EPOCH) // datetime.timedelta(microseconds = 1)
+		if(isinstance(Value, (int, float)) == False):
+			raise TypeError(Field[0])
+		Scaled = round(Value * Field[2])
+		if(abs(Scaled - (Value * Field[2])) > MERIT_PAYLOAD_SCALE_TOLERANCE):
+			raise ValueError(Field[0])			#not exact at this scale, sent as JSON
+		return Scaled
+
+	#********************************************************************************************#
+	#Description : Function to decode a binary payload made by Encode
+	#Arguments : Binary payload with the marker
+	#Return : Message dictionary of the fields present
+	#********************************************************************************************#
+	def Decode(self, Data):
+		Marker, SchemaId, Mask = MERIT_PAYLOAD_HEADER.unpack_from(Data)
+		ValueIter = iter(self.Struct(Mask).unpack_from(Data, MERIT_PAYLOAD_HEADER.size))
+		MessageDict = {}
+		for Index, Field in enumerate(self.m_FieldList):
+			if((Mask & (1 << Index)) == 0):
+				continue
+			Value = next(ValueIter)
+			Type = Field[1]
+			if(Type == MERIT_PAYLOAD_ENUM):
+				Value = Field[2][Value]
+			elif(Type == MERIT_PAYLOAD_CHAR):
+				Value = chr(Value) if(Value != 0) else ""
+			elif(Type == MERIT_PAYLOAD_TIME):
+				Value = str(MERIT_PAYLOAD_EPOCH + datetime.timedelta(microseconds = Value)) if(Value != 0) else ""
+			elif((Type != MERIT_PAYLOAD_BOOL) and (Field[2] != 1)):
+				Value = Value / Field[2]
+			MessageDict[Field[0]] = Value
+		return MessageDict
+
+#********************************************************************************************#
+#Description : Encoding of one topic
+#Notes : Messages the schema cannot carry are sent as JSON so nothing is lost
+#********************************************************************************************#
+class MeritPayloadEncoder:
+	def __init__(self, Encoding = MERIT_ENCODING_JSON, Schema = None, FieldNameList = None, CompressFlag = False):
+		if((Encoding == MERIT_ENCODING_BINARY) and (Schema is None)):
+			raise ValueError("Binary encoding needs a payload schema")
+		self.m_Encoding = Encoding
+		self.m_Schema = Schema
+		self.m_FieldNameSet = set(FieldNameList) if(FieldNameList) else None
+		self.m_CompressFlag = CompressFlag
+		self.m_PlainFlag = ((Encoding == MERIT_ENCODING_JSON) and (self.m_FieldNameSet is None) and (CompressFlag == False))
+
+	#********************************************************************************************#
+	#Description : Function to encode a message
+	#Arguments : Message dictionary or JSON string
+	#Return : Payload (str for plain JSON, bytes otherwise)
+	#********************************************************************************************#
+	def Encode(self, Message):
+		if(self.m_PlainFlag == True):
+			return json.dumps(Message) if(isinstance(Message, dict)) else Message
+		MessageDict = json.loads(Message) if(isinstance(Message, (str, bytes))) else Message
+		if(self.m_Encoding == MERIT_ENCODING_BINARY):
+			Payload = self.m_Schema.Encode(MessageDict, self.m_FieldNameSet)
+			if(Payload is not None):
+				if(self.m_CompressFlag == True):
+					return bytes((MERIT_PAYLOAD_MARKER_BINARY_ZLIB, )) + zlib.compress(Payload[1 : ], MERIT_PAYLOAD_ZLIB_LEVEL)
+				return Payload
+		if(self.m_FieldNameSet is not None):
+			MessageDict = {Name : Value for Name, Value in MessageDict.items() if(Name in self.m_FieldNameSet)}
+		Payload = json.dumps(MessageDict, separators = (",", ":"))
+		if(self.m_CompressFlag == True):
+			return zlib.compress(Payload.encode(), MERIT_PAYLOAD_ZLIB_LEVEL)
+		return Payload
+
+#***********************************************************************************#
+#******************************* Functions *****************************************#
+#***********************************************************************************#
+#********************************************************************************************#
+#Description : Function to decode a payload of any encoding, for consumers and the benchmark
+#Arguments : Payload (str or bytes), Dict of schema id : MeritPayloadSchema
+#Return : Message dictionary
+#********************************************************************************************#
+def Merit_DecodePayload(Payload, SchemaDict):
+	if(isinstance(Payload, str)):
+		return json.loads(Payload)
+	Marker = Payload[0]
+	if(Marker == MERIT_PAYLOAD_MARKER_JSON_ZLIB):
+		return json.loads(zlib.decompress(Payload))
+	if(Marker == MERIT_PAYLOAD_MARKER_BINARY_ZLIB):
+		Payload = bytes((MERIT_PAYLOAD_MARKER_BINARY, )) + zlib.decompress(Payload[1 : ])
+	if(Payload[0] == MERIT_PAYLOAD_MARKER_BINARY):
+		return SchemaDict[Payload[1]].Decode(Payload)
+	return json.loads(Payload)
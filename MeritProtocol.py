@@ -0,0 +1,100 @@
+#Filename : MeritProtocol.py
+#Version  :	1.0.0
+#Description : Declarative TLC response layouts compiled into struct based decoders
+#Date : Oct 2026
+
+#***********************************************************************************#
+#*************** Import Libraries **************************************************#
+#***********************************************************************************#
+import struct
+from collections import namedtuple
+
+#***********************************************************************************#
+#*************** File Constants ****************************************************#
+#***********************************************************************************#
+#Field types of a response layout, all multi byte fields are LSB first
+MERIT_FIELD_U8		=	"B"
+MERIT_FIELD_S8		=	"b"
+MERIT_FIELD_U16		=	"H"
+MERIT_FIELD_S16		=	"h"
+MERIT_FIELD_U24		=	"BH"	#LSB byte, then MID and MSB as one word, joined after unpack
+MERIT_FIELD_TEXT	=	"s"		#rest of the payload as text, only as the last field
+
+MeritFieldSizeDict = {
+	MERIT_FIELD_U8	:	1,
+	MERIT_FIELD_S8	:	1,
+	MERIT_FIELD_U16	:	2,
+	MERIT_FIELD_S16	:	2,
+	MERIT_FIELD_U24	:	3,
+}
+
+#***********************************************************************************#
+#******************************* Classes *******************************************#
+#***********************************************************************************#
+#********************************************************************************************#
+#Description : Response decoder compiled from a layout of (Offset, FieldName, FieldType)
+#Notes : Decode returns a namedtuple record, fields beyond a short payload are None
+#********************************************************************************************#
+class MeritResponseDecoder:
+	def __init__(self, Name, FieldList):
+		self.m_Name = Name
+		self.m_FieldNameList = []
+		self.m_Join24List = []			#raw positions of U24 fields, joined with the following word
+		self.m_PrefixList = []			#(End offset, Struct, raw value count) after every fixed field
+		self.m_TextOffset = None
+		Format = "<"
+		Offset = 0
+		RawCount = 0
+		for FieldOffset, FieldName, FieldType in sorted(FieldList):
+			if(self.m_TextOffset is not None):
+				raise ValueError(Name + " : text field must be the last field")
+			if(FieldOffset < Offset):
+				raise ValueError(Name + " : field " + FieldName + " overlaps the previous field")
+			self.m_FieldNameList.append(FieldName)
+			if(FieldType == MERIT_FIELD_TEXT):
+				self.m_TextOffset = FieldOffset
+				continue
+			Format = Format + ("x" * (FieldOffset - Offset)) + FieldType
+			if(FieldType == MERIT_FIELD_U24):
+				self.m_Join24List.insert(0, RawCount)
+			Offset = FieldOffset + MeritFieldSizeDict[FieldType]
+			RawCount = RawCount + len(FieldType)
+			self.m_PrefixList.insert(0, (Offset, struct.Struct(Format), RawCount))
+		self.m_Struct = struct.Struct(Format)
+		self.m_Size = self.m_Struct.size
+		self.m_Record = namedtuple(Name, self.m_FieldNameList)
+		self.m_FastFlag = ((len(self.m_Join24List) == 0) and (self.m_TextOffset is None))
+
+	#********************************************************************************************#
+	#Description : Function to decode a response payload in one call
+	#Arguments : Data (bytes, bytearray or memoryview) starting at the command id
+	#Return : Record namedtuple
+	#********************************************************************************************#
+	def Decode(self, Data):
+		if(len(Data) < self.m_Size):
+			return self.DecodeShort(Data)
+		if(self.m_FastFlag == True):
+			return self.m_Record._make(self.m_Struct.unpack_from(Data))
+		Values = list(self.m_Struct.unpack_from(Data))
+		for Position in self.m_Join24List:
+			Values[Position : Position + 2] = [Values[Position] + (Values[Position + 1] << 8)]
+		if(self.m_TextOffset is not None):
+			Values.append(bytes(Data[self.m_TextOffset : ]).decode("latin-1"))
+		return self.m_Record._make(Values)
+
+	#********************************************************************************************#
+	#Description : Function to decode the fields present in a payload shorter than the layout
+	#Arguments : Data (bytes, bytearray or memoryview) starting at the command id
+	#Return : Record namedtuple, missing fields are None
+	#********************************************************************************************#
+	def DecodeShort(self, Data):
+		Values = []
+		for Offset, PrefixStruct, RawCount in self.m_PrefixList:
+			if(Offset <= len(Data)):
+				Values = list(PrefixStruct.unpack_from(Data))
+				break
+		for Position in self.m_Join24List:
+			if(Position + 1 < len(Values)):
+				Values[Position : Position + 2] = [Values[Position] + (Values[Position + 1] << 8)]
+		Values.extend([None] * (len(self.m_FieldNameList) - len(Values)))
+		return self.m_Record._make(Values)
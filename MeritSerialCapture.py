@@ -0,0 +1,140 @@
+#Filename : MeritSerialCapture.py
+#Version  :	1.0.0
+#Description : Binary capture file of the raw serial frames sent to and read from the TLC, with monotonic timestamps
+#Date : Oct 2026
+
+#***********************************************************************************#
+#*************** Import Libraries **************************************************#
+#***********************************************************************************#
+import sys
+import time
+import struct
+import logging
+import argparse
+import datetime
+import threading
+from MeritLogging import MeritFrameDirectionDict
+
+#***********************************************************************************#
+#*************** File Constants ****************************************************#
+#***********************************************************************************#
+MERIT_CAPTURE_FILE_NAME			= "MeritSerial-%Y%m%d-%H%M%S.cap"		#strftime pattern, a new file per start
+MERIT_CAPTURE_MAX_BYTES			= 64 * 1024 * 1024		#capture stops once the file reaches this size
+MERIT_CAPTURE_BUFFER_SIZE		= 64 * 1024				#bytes buffered before a write to the disk
+MERIT_CAPTURE_FLUSH_INTERVAL	= 5.0					#seconds between two flushes, a killed process loses at most this much
+
+#File layout : header, then one record header followed by the frame bytes per frame, little endian
+MERIT_CAPTURE_MAGIC				= b"MCAP"
+MERIT_CAPTURE_VERSION			= 1
+MERIT_CAPTURE_HEADER			= struct.Struct("<4sBd")		#magic, version, wall clock time of the capture start
+MERIT_CAPTURE_RECORD			= struct.Struct("<IBH")			#microseconds since the previous frame, direction, frame length
+MERIT_CAPTURE_MAX_DELTA			= 0xFFFFFFFF					#about 71 minutes, a longer gap is cut to it
+
+#***********************************************************************************#
+#******************************* Classes *******************************************#
+#***********************************************************************************#
+#********************************************************************************************#
+#Description : Capture file writer, records every frame with the monotonic time since the capture start
+#Notes : Record only packs a 7 byte header into the file buffer, the disk write happens once per
+#		 MERIT_CAPTURE_BUFFER_SIZE bytes or MERIT_CAPTURE_FLUSH_INTERVAL seconds
+#********************************************************************************************#
+class MeritSerialCapture:
+	def __init__(self, FileName, MaxBytes = MERIT_CAPTURE_MAX_BYTES):
+		self.m_FileName = FileName
+		self.m_MaxBytes = MaxBytes
+		self.m_Lock = threading.Lock()
+		self.m_File = open(FileName, "wb", buffering = MERIT_CAPTURE_BUFFER_SIZE)
+		self.m_File.write(MERIT_CAPTURE_HEADER.pack(MERIT_CAPTURE_MAGIC, MERIT_CAPTURE_VERSION, time.time()))
+		self.m_StartTime = time.monotonic()
+		self.m_FlushTime = self.m_StartTime + MERIT_CAPTURE_FLUSH_INTERVAL
+		self.m_LastMicros = 0
+		self.m_Bytes = MERIT_CAPTURE_HEADER.size
+		self.m_FrameCount = 0
+
+	#********************************************************************************************#
+	#Description : Function to record one frame
+	#Arguments : Direction (MERIT_FRAME_TX or MERIT_FRAME_RX), Frame bytes, bytearray or memoryview
+	#Return : None
+	#********************************************************************************************#
+	def Record(self, Direction, Frame):
+		Now = time.monotonic()
+		with self.m_Lock:
+			if(self.m_File is None):
+				return
+			Micros = int((Now - self.m_StartTime) * 1000000)
+			Delta = min(Micros - self.m_LastMicros, MERIT_CAPTURE_MAX_DELTA)
+			self.m_LastMicros = self.m_LastMicros + Delta
+			self.m_File.write(MERIT_CAPTURE_RECORD.pack(Delta, Direction, len(Frame)))
+			self.m_File.write(Frame)
+			self.m_Bytes = self.m_Bytes + MERIT_CAPTURE_RECORD.size + len(Frame)
+			self.m_FrameCount = self.m_FrameCount + 1
+			if(self.m_Bytes >= self.m_MaxBytes):
+				logging.error("Serial Capture Full, Stopped : " + self.m_FileName + ", Frames : " + str(self.m_FrameCount))
+				self.m_File.close()
+				self.m_File = None
+			elif(Now >= self.m_FlushTime):
+				self.m_File.flush()
+				self.m_FlushTime = Now + MERIT_CAPTURE_FLUSH_INTERVAL
+
+	#********************************************************************************************#
+	#Description : Function to write the buffered frames and close the file
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def Close(self):
+		with self.m_Lock:
+			if(self.m_File is not None):
+				self.m_File.close()
+				self.m_File = None
+		logging.info("Serial Capture Closed : " + self.m_FileName + ", Frames : " + str(self.m_FrameCount) + ", Bytes : " + str(self.m_Bytes))
+
+#***********************************************************************************#
+#******************************* Functions *****************************************#
+#***********************************************************************************#
+#********************************************************************************************#
+#Description : Function to read a capture file
+#Arguments : Capture file name
+#Return : (Wall clock time of the capture start, List of (Seconds since the start, Direction, Frame bytes))
+#Notes : A record cut short by a killed process ends the list, ValueError if the file is not a capture
+#********************************************************************************************#
+def Merit_ReadCapture(FileName):
+	with open(FileName, "rb") as CaptureFile:
+		Data = CaptureFile.read()
+	if(len(Data) < MERIT_CAPTURE_HEADER.size):
+		raise ValueError("Not a serial capture : " + FileName)
+	Magic, Version, StartWallTime = MERIT_CAPTURE_HEADER.unpack_from(Data, 0)
+	if((Magic != MERIT_CAPTURE_MAGIC) or (Version != MERIT_CAPTURE_VERSION)):
+		raise ValueError("Not a serial capture : " + FileName)
+	RecordList = []
+	Offset = MERIT_CAPTURE_HEADER.size
+	Micros = 0
+	while(Offset + MERIT_CAPTURE_RECORD.size <= len(Data)):
+		Delta, Direction, Length = MERIT_CAPTURE_RECORD.unpack_from(Data, Offset)
+		Offset = Offset + MERIT_CAPTURE_RECORD.size
+		if(Offset + Length > len(Data)):
+			break
+		Micros = Micros + Delta
+		RecordList.append((Micros / 1000000, Direction, Data[Offset : Offset + Length]))
+		Offset = Offset + Length
+	return (StartWallTime, RecordList)
+
+#********************************************************************************************#
+#Description : Entry point of this program, prints a summary or the frames of a capture file
+#********************************************************************************************#
+if __name__=="__main__": #To run as a standalone script
+	Parser = argparse.ArgumentParser(description = "Merit serial capture file")
+	Parser.add_argument("file", help = "Capture file")
+	Parser.add_argument("--frames", action = "store_true", help = "Print every frame in hex")
+	Args = Parser.parse_args()
+
+	StartWallTime, RecordList = Merit_ReadCapture(Args.file)
+	if(Args.frames == True):
+		for Seconds, Direction, Frame in RecordList:
+			print("%.6f %s %s" % (Seconds, MeritFrameDirectionDict[Direction], Frame.hex(" ")))
+	else:
+		print("Start : " + str(datetime.datetime.fromtimestamp(StartWallTime)))
+		print("Seconds : " + str(RecordList[-1][0] if(RecordList) else 0))
+		for Direction, Name in MeritFrameDirectionDict.items():
+			FrameList = [Frame for Seconds, FrameDirection, Frame in RecordList if(FrameDirection == Direction)]
+			print(Name + " : " + str(len(FrameList)) + " frames, " + str(sum(len(Frame) for Frame in FrameList)) + " bytes")
+	sys.exit(0)
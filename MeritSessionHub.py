@@ -0,0 +1,394 @@
+#Filename : MeritSessionHub.py
+#Version  :	1.0.0
+#Description : Several TLC sessions in worker processes of one edge program, sharing the mqtt connection of the parent process
+#Date : Oct 2026
+
+#***********************************************************************************#
+#*************** Import Libraries **************************************************#
+#***********************************************************************************#
+import time
+import logging
+import threading
+import multiprocessing
+from paho.mqtt import client as mqtt_client
+
+#***********************************************************************************#
+#*************** File Constants ****************************************************#
+#***********************************************************************************#
+MERIT_SESSION_DIR					= "./Sessions"		#a session works in MERIT_SESSION_DIR/<WGID>, its log, wagon store, outbox and startup cache
+MERIT_SESSION_START_METHOD			= "spawn"			#a fork would copy the hub threads and the mqtt socket into the session
+MERIT_SESSION_SUPERVISE_INTERVAL	= 3					#seconds between the checks for a stopped session process
+MERIT_SESSION_STOP_TIMEOUT			= 5					#seconds a session gets to close its port, store and outbox
+MERIT_SESSION_LINK_STOP_TIMEOUT		= 1					#seconds loop_stop waits for a callback still running, the link thread is a daemon
+MERIT_SESSION_EARLY_ACK_AGE			= 10				#seconds an acknowledgment that came before its publish is kept
+
+#Link messages. Session to hub on the shared uplink : (SessionIndex, Kind, ...), hub to session on its downlink : (Kind, ...)
+MERIT_LINK_STOP			= 0		#(Kind, ), ends the uplink or downlink thread
+MERIT_LINK_PUBLISH		= 1		#(SessionIndex, Kind, MessageId, Topic, Payload, Qos)
+MERIT_LINK_SUBSCRIBE	= 2		#(SessionIndex, Kind, Topic, Qos)
+MERIT_LINK_CONNECT		= 3		#(Kind, rc)
+MERIT_LINK_DISCONNECT	= 4		#(Kind, rc)
+MERIT_LINK_ACK			= 5		#(Kind, MessageId), broker acknowledgment of a QoS 1/2 publish
+MERIT_LINK_MESSAGE		= 6		#(Kind, Topic, Payload)
+MERIT_LINK_REFUSED		= 7		#(Kind, Topic, Payload), QoS 0 publish the hub client refused, the session keeps it
+
+#***********************************************************************************#
+#******************************* Classes *******************************************#
+#***********************************************************************************#
+#********************************************************************************************#
+#Description : Message of a subscribed topic handed to a session, the fields of paho MQTTMessage it uses
+#********************************************************************************************#
+class MeritSessionMessage:
+	def __init__(self, Topic, Payload, Qos = 0):
+		self.topic = Topic
+		self.payload = Payload
+		self.qos = Qos
+		self.retain = False
+
+#********************************************************************************************#
+#Description : Mqtt client of a session process, forwards to the hub and calls the paho callbacks from the hub events
+#Notes : Only the paho client calls used by TLCWithMqtt.py are provided. A QoS 0 publish is refused while the hub
+#		 link is down so it goes to the outbox, QoS 1/2 publishes are forwarded and kept by the hub client like paho does.
+#		 A QoS 0 publish the hub client refuses after all comes back to on_refused(Topic, Payload).
+#********************************************************************************************#
+class MeritSessionMqttClient:
+	def __init__(self, SessionIndex, Uplink, Downlink):
+		self.m_SessionIndex = SessionIndex
+		self.m_Uplink = Uplink
+		self.m_Downlink = Downlink
+		self.m_Lock = threading.Lock()
+		self.m_MessageId = 0
+		self.m_ConnectedFlag = False
+		self.m_Thread = None
+		self.on_connect = None
+		self.on_disconnect = None
+		self.on_publish = None
+		self.on_message = None
+		self.on_refused = None
+
+	def publish(self, topic, payload = None, qos = 0, retain = False):
+		with self.m_Lock:
+			self.m_MessageId = self.m_MessageId + 1
+			MessageId = self.m_MessageId
+		if(self.m_ConnectedFlag == False):
+			if(qos > 0):
+				self.m_Uplink.put((self.m_SessionIndex, MERIT_LINK_PUBLISH, MessageId, topic, payload, qos))
+			return (mqtt_client.MQTT_ERR_NO_CONN, MessageId)
+		self.m_Uplink.put((self.m_SessionIndex, MERIT_LINK_PUBLISH, MessageId, topic, payload, qos))
+		return (mqtt_client.MQTT_ERR_SUCCESS, MessageId)
+
+	def subscribe(self, topic, qos = 0):
+		self.m_Uplink.put((self.m_SessionIndex, MERIT_LINK_SUBSCRIBE, topic, qos))
+		return (mqtt_client.MQTT_ERR_SUCCESS, 0)
+
+	def is_connected(self):
+		return self.m_ConnectedFlag
+
+	def loop_start(self):
+		self.m_Thread = threading.Thread(target = self.Dispatch, name = "SessionLink", daemon = True)
+		self.m_Thread.start()
+
+	def loop_stop(self):
+		if(self.m_Thread is not None):
+			self.m_Downlink.put((MERIT_LINK_STOP, ))
+			self.m_Thread.join(MERIT_SESSION_LINK_STOP_TIMEOUT)
+			self.m_Thread = None
+
+	def disconnect(self):
+		return mqtt_client.MQTT_ERR_SUCCESS
+
+	#********************************************************************************************#
+	#Description : Thread function calling the client callbacks for the hub events, like the paho network thread
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def Dispatch(self):
+		while(True):
+			Item = self.m_Downlink.get()
+			Kind = Item[0]
+			if(Kind == MERIT_LINK_STOP):
+				break
+			try:
+				if(Kind == MERIT_LINK_ACK):
+					if(self.on_publish is not None):
+						self.on_publish(self, None, Item[1])
+				elif(Kind == MERIT_LINK_MESSAGE):
+					if(self.on_message is not None):
+						self.on_message(self, None, MeritSessionMessage(Item[1], Item[2]))
+				elif(Kind == MERIT_LINK_REFUSED):
+					if(self.on_refused is not None):
+						self.on_refused(Item[1], Item[2])
+				elif(Kind == MERIT_LINK_CONNECT):
+					self.m_ConnectedFlag = (Item[1] == 0)
+					if(self.on_connect is not None):
+						self.on_connect(self, None, {}, Item[1])
+				elif(Kind == MERIT_LINK_DISCONNECT):
+					self.m_ConnectedFlag = False
+					if(self.on_disconnect is not None):
+						self.on_disconnect(self, None, Item[1])
+			except Exception as ex:
+				logging.error("Exception at Session Link Event " + str(Kind) + " : " + str(ex))
+
+#********************************************************************************************#
+#Description : One TLC of the edge program, its WGID, serial port and worker process
+#Notes : The session process runs the whole TLC program with its own port, command queue, weighment state
+#		 and WGID topics, a new downlink is made on every start so a restarted session gets no stale events
+#********************************************************************************************#
+class MeritTLCSession:
+	def __init__(self, SessionIndex, WGID, Port):
+		self.m_SessionIndex = SessionIndex
+		self.m_WGID = WGID
+		self.m_Port = Port
+		self.m_Downlink = None
+		self.m_Process = None
+		self.m_StartCount = 0
+		self.m_PublishCount = 0
+		self.m_MessageCount = 0
+
+	#********************************************************************************************#
+	#Description : Function to start the session process
+	#Arguments : Multiprocessing context, Uplink queue, Session main function, Engine, Further arguments of the session main function
+	#Return : None
+	#********************************************************************************************#
+	def Start(self, Context, Uplink, Target, Engine, TargetArgs = ()):
+		self.m_Downlink = Context.Queue()
+		self.m_Process = Context.Process(target = Target, args = (self.m_SessionIndex, self.m_WGID, self.m_Port, Engine, Uplink, self.m_Downlink) + tuple(TargetArgs),
+			name = "TLC-" + self.m_WGID, daemon = True)
+		self.m_Process.start()
+		self.m_StartCount = self.m_StartCount + 1
+		logging.info("Session " + self.m_WGID + " Started, Port : " + str(self.m_Port) + ", Pid : " + str(self.m_Process.pid))
+
+	#********************************************************************************************#
+	#Description : Function to stop the session process, SIGTERM lets it close its port, store and outbox
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def Stop(self):
+		if(self.m_Process is None):
+			return
+		self.m_Process.terminate()
+		self.m_Process.join(MERIT_SESSION_STOP_TIMEOUT)
+		if(self.m_Process.is_alive() == True):
+			logging.error("Session " + self.m_WGID + " did not stop, Killed")
+			self.m_Process.kill()
+			self.m_Process.join()
+		logging.info("Session " + self.m_WGID + " Stopped, Exit Code : " + str(self.m_Process.exitcode))
+
+	#********************************************************************************************#
+	#Description : Function to send an event to the session process
+	#Arguments : Link message
+	#Return : None
+	#********************************************************************************************#
+	def Send(self, Item):
+		if(self.m_Downlink is not None):
+			self.m_Downlink.put(Item)
+
+#********************************************************************************************#
+#Description : Owner of the mqtt connection shared by the sessions, routes publishes, acknowledgments and
+#			   subscribed messages between the client and the session processes
+#Notes : The client callbacks run on the paho network thread, the uplink thread is the only one publishing.
+#		 paho may call on_publish before publish returns, such acknowledgments wait in m_EarlyAckDict.
+#********************************************************************************************#
+class MeritSessionHub:
+	def __init__(self, Target, Engine, TargetArgs = ()):
+		self.m_Context = multiprocessing.get_context(MERIT_SESSION_START_METHOD)
+		self.m_Uplink = self.m_Context.Queue()
+		self.m_Target = Target
+		self.m_Engine = Engine
+		self.m_TargetArgs = TargetArgs		#passed to Target after the link queues
+		self.m_SessionList = []
+		self.m_Client = None
+		self.m_ConnectedFlag = False
+		self.m_Lock = threading.Lock()
+		self.m_TopicDict = {}				#Topic : (MeritTLCSession, Qos)
+		self.m_MessageIdDict = {}			#Client message id : (MeritTLCSession, Session message id, Qos)
+		self.m_EarlyAckDict = {}			#Client message id : monotonic time of its on_publish
+		self.m_Thread = None
+
+	#********************************************************************************************#
+	#Description : Function to add a TLC session
+	#Arguments : WGID, Serial port name of the TLC
+	#Return : MeritTLCSession
+	#********************************************************************************************#
+	def AddSession(self, WGID, Port):
+		if(any(Session.m_WGID == WGID for Session in self.m_SessionList)):
+			raise ValueError("Session " + WGID + " added twice")
+		Session = MeritTLCSession(len(self.m_SessionList), WGID, Port)
+		self.m_SessionList.append(Session)
+		return Session
+
+	#********************************************************************************************#
+	#Description : Function to take the callbacks of the mqtt client
+	#Arguments : Mqtt client
+	#Return : None
+	#********************************************************************************************#
+	def Attach(self, Client):
+		self.m_Client = Client
+		Client.on_connect = self.OnConnect
+		Client.on_disconnect = self.OnDisconnect
+		Client.on_publish = self.OnPublish
+		Client.on_message = self.OnMessage
+
+	#********************************************************************************************#
+	#Description : Function to start the uplink thread and the session processes
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def Start(self):
+		self.m_Thread = threading.Thread(target = self.Uplink, name = "SessionHub", daemon = True)
+		self.m_Thread.start()
+		for Session in self.m_SessionList:
+			self.StartSession(Session)
+
+	#********************************************************************************************#
+	#Description : Function to start one session process and tell it the link state
+	#Arguments : MeritTLCSession
+	#Return : None
+	#********************************************************************************************#
+	def StartSession(self, Session):
+		Session.Start(self.m_Context, self.m_Uplink, self.m_Target, self.m_Engine, self.m_TargetArgs)
+		if(self.m_ConnectedFlag == True):
+			Session.Send((MERIT_LINK_CONNECT, 0))
+
+	#********************************************************************************************#
+	#Description : Function to stop the session processes and the uplink thread
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def Stop(self):
+		for Session in self.m_SessionList:
+			Session.Stop()
+		if(self.m_Thread is not None):
+			self.m_Uplink.put((None, MERIT_LINK_STOP))
+			self.m_Thread.join(MERIT_SESSION_STOP_TIMEOUT)
+			self.m_Thread = None
+
+	#********************************************************************************************#
+	#Description : Function to restart the session processes that stopped and forget stale acknowledgments
+	#Arguments : None
+	#Return : None
+	#Notes : Called every MERIT_SESSION_SUPERVISE_INTERVAL by the main loop
+	#********************************************************************************************#
+	def Supervise(self):
+		for Session in self.m_SessionList:
+			if((Session.m_Process is not None) and (Session.m_Process.exitcode is not None)):
+				logging.error("Session " + Session.m_WGID + " Stopped, Exit Code : " + str(Session.m_Process.exitcode) + ", Restarting")
+				self.StartSession(Session)
+		ExpiredTime = time.monotonic() - MERIT_SESSION_EARLY_ACK_AGE
+		with self.m_Lock:
+			for MessageId in [MessageId for MessageId, AckTime in self.m_EarlyAckDict.items() if(AckTime < ExpiredTime)]:
+				del self.m_EarlyAckDict[MessageId]
+
+	#********************************************************************************************#
+	#Description : Thread function publishing and subscribing for the sessions
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def Uplink(self):
+		while(True):
+			Item = self.m_Uplink.get()
+			Kind = Item[1]
+			if(Kind == MERIT_LINK_STOP):
+				break
+			Session = self.m_SessionList[Item[0]]
+			try:
+				if(Kind == MERIT_LINK_PUBLISH):
+					self.Publish(Session, *Item[2 : ])
+				elif(Kind == MERIT_LINK_SUBSCRIBE):
+					with self.m_Lock:
+						self.m_TopicDict[Item[2]] = (Session, Item[3])
+					self.m_Client.subscribe(Item[2], Item[3])
+			except Exception as ex:
+				logging.error("Exception at Session Hub " + Session.m_WGID + " : " + str(ex))
+
+	#********************************************************************************************#
+	#Description : Function to publish for a session and keep the message id for its acknowledgment
+	#Arguments : MeritTLCSession, Session message id, Topic, Payload, Qos
+	#Return : None
+	#Notes : paho keeps a QoS 1/2 publish made while the link is down, a refused QoS 0 publish goes back to the
+	#		 session, which took it as sent when the link raced a disconnect
+	#********************************************************************************************#
+	def Publish(self, Session, SessionMessageId, Topic, Payload, Qos):
+		Result = self.m_Client.publish(Topic, Payload, Qos)
+		Session.m_PublishCount = Session.m_PublishCount + 1
+		if((Result[0] != mqtt_client.MQTT_ERR_SUCCESS) and (Qos == 0)):
+			logging.error("Session " + Session.m_WGID + " : Failed to send to topic " + Topic + ", Status : " + str(Result[0]) + ", Returned To Session")
+			Session.Send((MERIT_LINK_REFUSED, Topic, Payload))
+			return
+		with self.m_Lock:
+			if(self.m_EarlyAckDict.pop(Result[1], None) is None):
+				self.m_MessageIdDict[Result[1]] = (Session, SessionMessageId, Qos)
+				return
+		if(Qos > 0):
+			Session.Send((MERIT_LINK_ACK, SessionMessageId))
+
+	#********************************************************************************************#
+	#Description : Callback of the client for the broker acknowledgment (QoS 1/2) or the publish sent (QoS 0)
+	#Arguments : Mqtt Client, userdata, message id
+	#Return : None
+	#********************************************************************************************#
+	def OnPublish(self, client, userdata, mid):
+		with self.m_Lock:
+			Entry = self.m_MessageIdDict.pop(mid, None)
+			if(Entry is None):
+				self.m_EarlyAckDict[mid] = time.monotonic()
+				return
+		Session, SessionMessageId, Qos = Entry
+		if(Qos > 0):
+			Session.Send((MERIT_LINK_ACK, SessionMessageId))
+
+	#********************************************************************************************#
+	#Description : Callback of the client for the broker connect, subscribes the session topics again
+	#Arguments : Mqtt Client, userdata, flags, rc
+	#Return : None
+	#********************************************************************************************#
+	def OnConnect(self, client, userdata, flags, rc):
+		if(rc != 0):
+			logging.error("Session Hub Failed to connect, return code : " + str(rc))
+			return
+		self.m_ConnectedFlag = True
+		logging.info("Session Hub Connected to MQTT Broker")
+		with self.m_Lock:
+			TopicList = [(Topic, Qos) for Topic, (Session, Qos) in self.m_TopicDict.items()]
+		for Topic, Qos in TopicList:
+			client.subscribe(Topic, Qos)
+		for Session in self.m_SessionList:
+			Session.Send((MERIT_LINK_CONNECT, rc))
+
+	#********************************************************************************************#
+	#Description : Callback of the client for the broker disconnect
+	#Arguments : Mqtt Client, userdata, rc
+	#Return : None
+	#Notes : QoS 0 publishes not sent by now never get their on_publish
+	#********************************************************************************************#
+	def OnDisconnect(self, client, userdata, rc):
+		self.m_ConnectedFlag = False
+		logging.error("Session Hub Link Lost, return code : " + str(rc))
+		with self.m_Lock:
+			for MessageId in [MessageId for MessageId, Entry in self.m_MessageIdDict.items() if(Entry[2] == 0)]:
+				del self.m_MessageIdDict[MessageId]
+		for Session in self.m_SessionList:
+			Session.Send((MERIT_LINK_DISCONNECT, rc))
+
+	#********************************************************************************************#
+	#Description : Callback of the client for a message of a subscribed topic, handed to the session of the topic
+	#Arguments : Mqtt Client, userdata, message
+	#Return : None
+	#********************************************************************************************#
+	def OnMessage(self, client, userdata, msg):
+		with self.m_Lock:
+			Entry = self.m_TopicDict.get(msg.topic)
+		if(Entry is None):
+			logging.error("Session Hub : no session for topic " + str(msg.topic))
+			return
+		Entry[0].m_MessageCount = Entry[0].m_MessageCount + 1
+		Entry[0].Send((MERIT_LINK_MESSAGE, msg.topic, msg.payload))
+
+	#********************************************************************************************#
+	#Description : Function to get the per session counters
+	#Arguments : None
+	#Return : Dict of WGID : counters
+	#********************************************************************************************#
+	def Metrics(self):
+		return {Session.m_WGID : {"Port" : Session.m_Port, "Pid" : Session.m_Process.pid if(Session.m_Process is not None) else None,
+			"Starts" : Session.m_StartCount, "Publishes" : Session.m_PublishCount, "Messages" : Session.m_MessageCount} for Session in self.m_SessionList}
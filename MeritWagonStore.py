@@ -0,0 +1,268 @@
+#Filename : MeritWagonStore.py
+#Version  :	1.0.0
+#Description : Persistent wagon record store on SQLite (WAL), keyed by rake and wagon number
+#Date : Oct 2026
+
+#***********************************************************************************#
+#*************** Import Libraries **************************************************#
+#***********************************************************************************#
+import sys
+import json
+import time
+import queue
+import sqlite3
+import logging
+import argparse
+import datetime
+import threading
+
+#***********************************************************************************#
+#*************** File Constants ****************************************************#
+#***********************************************************************************#
+MERIT_WAGON_STORE_FILE				= "MeritWagonStore.db"
+MERIT_WAGON_STORE_RETENTION_DAYS	= 90		#rakes older than this are deleted
+MERIT_WAGON_STORE_MAX_RAKES			= 5000		#only the newest rakes are kept
+MERIT_WAGON_STORE_BATCH_SIZE		= 64		#records written in one transaction at most
+MERIT_WAGON_STORE_BATCH_WINDOW		= 0.5		#seconds the writer collects records before a transaction
+MERIT_WAGON_STORE_COMPACT_INTERVAL	= 3600		#seconds between two retention runs
+MERIT_WAGON_STORE_JOURNAL_LIMIT		= 4 * 1024 * 1024		#bytes the WAL file is truncated to after a checkpoint
+
+#Store operations queued to the writer thread
+MERIT_STORE_OP_RAKE_START	= 0
+MERIT_STORE_OP_RAKE_END		= 1
+MERIT_STORE_OP_WAGON		= 2
+
+MERIT_WAGON_STORE_SCHEMA = [
+	"CREATE TABLE IF NOT EXISTS Rakes (RakeId INTEGER PRIMARY KEY, WBID TEXT, StartTime TEXT, EndTime TEXT, StartEpoch REAL)",
+	"CREATE INDEX IF NOT EXISTS RakesStartEpoch ON Rakes (StartEpoch)",
+	"CREATE TABLE IF NOT EXISTS Wagons (RakeId INTEGER, WagonNumber INTEGER, Record TEXT, StoreEpoch REAL, PRIMARY KEY (RakeId, WagonNumber)) WITHOUT ROWID",
+]
+
+#***********************************************************************************#
+#******************************* Classes *******************************************#
+#***********************************************************************************#
+#********************************************************************************************#
+#Description : Wagon record store, records are written in batches by its own writer thread
+#Notes : The records of the current rake are also kept in memory so the publisher never waits on the disk,
+#		 older rakes are read from the database
+#********************************************************************************************#
+class MeritWagonStore:
+	def __init__(self, FileName = MERIT_WAGON_STORE_FILE, RetentionDays = MERIT_WAGON_STORE_RETENTION_DAYS, MaxRakes = MERIT_WAGON_STORE_MAX_RAKES):
+		self.m_FileName = FileName
+		self.m_RetentionDays = RetentionDays
+		self.m_MaxRakes = MaxRakes
+		self.m_Queue = queue.Queue()
+		self.m_ReadLock = threading.Lock()
+		self.m_ReadConnection = self.Connect(check_same_thread = False)
+		self.m_RakeLock = threading.Lock()
+		self.m_NextRakeId = (self.m_ReadConnection.execute("SELECT MAX(RakeId) FROM Rakes").fetchone()[0] or 0) + 1
+		self.m_RakeId = None
+		self.m_RakeWagonDict = {}			#WagonNumber : Record of the current rake
+		self.m_WrittenCount = 0
+		self.m_BatchCount = 0
+		self.m_Thread = threading.Thread(target = self.Run, args = (), daemon = True)
+		self.m_Thread.start()
+
+	#********************************************************************************************#
+	#Description : Function to open a connection to the database, the schema is created on first use
+	#Arguments : sqlite3.connect keyword arguments
+	#Return : Connection
+	#********************************************************************************************#
+	def Connect(self, **KeywordArgs):
+		Connection = sqlite3.connect(self.m_FileName, **KeywordArgs)
+		Connection.execute("PRAGMA auto_vacuum = INCREMENTAL")		#only takes effect on a new database
+		Connection.execute("PRAGMA journal_mode = WAL")
+		Connection.execute("PRAGMA synchronous = NORMAL")
+		Connection.execute("PRAGMA journal_size_limit = " + str(MERIT_WAGON_STORE_JOURNAL_LIMIT))
+		for Statement in MERIT_WAGON_STORE_SCHEMA:
+			Connection.execute(Statement)
+		Connection.commit()
+		return Connection
+
+	#********************************************************************************************#
+	#Description : Function to start a new rake
+	#Arguments : Weighbridge id
+	#Return : RakeId
+	#********************************************************************************************#
+	def StartRake(self, WBID):
+		with self.m_RakeLock:
+			RakeId = self.m_NextRakeId
+			self.m_NextRakeId = self.m_NextRakeId + 1
+			self.m_RakeId = RakeId
+			self.m_RakeWagonDict = {}
+		self.m_Queue.put((MERIT_STORE_OP_RAKE_START, RakeId, WBID, str(datetime.datetime.now()), time.time()))
+		return RakeId
+
+	#********************************************************************************************#
+	#Description : Function to mark the end of a rake
+	#Arguments : RakeId
+	#Return : None
+	#********************************************************************************************#
+	def EndRake(self, RakeId):
+		if(RakeId is not None):
+			self.m_Queue.put((MERIT_STORE_OP_RAKE_END, RakeId, str(datetime.datetime.now())))
+
+	#********************************************************************************************#
+	#Description : Function to store a wagon record, returns at once, the record is written by the writer thread
+	#Arguments : RakeId, WagonNumber, Record (json string)
+	#Return : None
+	#********************************************************************************************#
+	def PutWagon(self, RakeId, WagonNumber, Record):
+		with self.m_RakeLock:
+			if(RakeId == self.m_RakeId):
+				self.m_RakeWagonDict[WagonNumber] = Record
+		self.m_Queue.put((MERIT_STORE_OP_WAGON, RakeId, WagonNumber, Record, time.time()))
+
+	#********************************************************************************************#
+	#Description : Function to get a wagon record
+	#Arguments : RakeId, WagonNumber
+	#Return : Record (json string), None if not stored
+	#********************************************************************************************#
+	def GetWagon(self, RakeId, WagonNumber):
+		with self.m_RakeLock:
+			if(RakeId == self.m_RakeId):
+				return self.m_RakeWagonDict.get(WagonNumber)
+		with self.m_ReadLock:
+			Row = self.m_ReadConnection.execute("SELECT Record FROM Wagons WHERE RakeId = ? AND WagonNumber = ?", (RakeId, WagonNumber)).fetchone()
+		if(Row is None):
+			return None
+		return Row[0]
+
+	#********************************************************************************************#
+	#Description : Function to get the number of wagons stored for the current rake
+	#Arguments : None
+	#Return : Wagon count
+	#********************************************************************************************#
+	def RakeWagonCount(self):
+		with self.m_RakeLock:
+			return len(self.m_RakeWagonDict)
+
+	#********************************************************************************************#
+	#Description : Function to get all wagon records of a rake from the database
+	#Arguments : RakeId
+	#Return : List of (WagonNumber, Record) in wagon order
+	#********************************************************************************************#
+	def GetRakeWagons(self, RakeId):
+		with self.m_ReadLock:
+			return self.m_ReadConnection.execute("SELECT WagonNumber, Record FROM Wagons WHERE RakeId = ? ORDER BY WagonNumber", (RakeId, )).fetchall()
+
+	#********************************************************************************************#
+	#Description : Function to get the wagon records of a rake, the current rake from memory
+	#Arguments : RakeId
+	#Return : List of (WagonNumber, Record) in wagon order
+	#********************************************************************************************#
+	def GetRakeRecords(self, RakeId):
+		with self.m_RakeLock:
+			if(RakeId == self.m_RakeId):
+				return sorted(self.m_RakeWagonDict.items())
+		return self.GetRakeWagons(RakeId)
+
+	#********************************************************************************************#
+	#Description : Function to list the newest rakes in the database
+	#Arguments : Maximum number of rakes
+	#Return : List of (RakeId, WBID, StartTime, EndTime, WagonCount), newest first
+	#********************************************************************************************#
+	def ListRakes(self, Limit = 20):
+		with self.m_ReadLock:
+			return self.m_ReadConnection.execute("SELECT Rakes.RakeId, WBID, StartTime, EndTime, (SELECT COUNT(*) FROM Wagons WHERE Wagons.RakeId = Rakes.RakeId) " +
+				"FROM Rakes ORDER BY RakeId DESC LIMIT ?", (Limit, )).fetchall()
+
+	#********************************************************************************************#
+	#Description : Writer thread, collects queued operations for a batch window and writes them in one transaction
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def Run(self):
+		Connection = self.Connect()
+		self.Compact(Connection)
+		NextCompactTime = time.monotonic() + MERIT_WAGON_STORE_COMPACT_INTERVAL
+		StopFlag = False
+		while(StopFlag == False):
+			try:
+				Operation = self.m_Queue.get(timeout = max(0, NextCompactTime - time.monotonic()))
+			except queue.Empty:
+				Operation = None
+			Batch = []
+			BatchEndTime = time.monotonic() + MERIT_WAGON_STORE_BATCH_WINDOW
+			while(Operation is not None):
+				if(Operation == ()):
+					StopFlag = True
+					break
+				Batch.append(Operation)
+				if(len(Batch) >= MERIT_WAGON_STORE_BATCH_SIZE):
+					break
+				try:
+					Operation = self.m_Queue.get(timeout = max(0, BatchEndTime - time.monotonic()))
+				except queue.Empty:
+					Operation = None
+			if(Batch):
+				self.WriteBatch(Connection, Batch)
+			if(time.monotonic() >= NextCompactTime):
+				self.Compact(Connection)
+				NextCompactTime = time.monotonic() + MERIT_WAGON_STORE_COMPACT_INTERVAL
+		Connection.close()
+
+	#********************************************************************************************#
+	#Description : Function to write a batch of operations in one transaction
+	#Arguments : Writer connection, Operation list
+	#Return : None
+	#********************************************************************************************#
+	def WriteBatch(self, Connection, Batch):
+		try:
+			with Connection:
+				Connection.executemany("INSERT OR REPLACE INTO Rakes (RakeId, WBID, StartTime, EndTime, StartEpoch) VALUES (?, ?, ?, NULL, ?)",
+					[Operation[1 : ] for Operation in Batch if(Operation[0] == MERIT_STORE_OP_RAKE_START)])
+				Connection.executemany("INSERT OR REPLACE INTO Wagons (RakeId, WagonNumber, Record, StoreEpoch) VALUES (?, ?, ?, ?)",
+					[Operation[1 : ] for Operation in Batch if(Operation[0] == MERIT_STORE_OP_WAGON)])
+				Connection.executemany("UPDATE Rakes SET EndTime = ? WHERE RakeId = ?",
+					[(Operation[2], Operation[1]) for Operation in Batch if(Operation[0] == MERIT_STORE_OP_RAKE_END)])
+			self.m_WrittenCount = self.m_WrittenCount + len(Batch)
+			self.m_BatchCount = self.m_BatchCount + 1
+		except sqlite3.Error as ex:
+			logging.error("Wagon Store Write Failed : " + str(ex))
+
+	#********************************************************************************************#
+	#Description : Function to delete the rakes beyond the retention limits and give the space back
+	#Arguments : Writer connection
+	#Return : None
+	#********************************************************************************************#
+	def Compact(self, Connection):
+		try:
+			with Connection:
+				Connection.execute("DELETE FROM Rakes WHERE StartEpoch < ?", (time.time() - (self.m_RetentionDays * 86400), ))
+				Connection.execute("DELETE FROM Rakes WHERE RakeId NOT IN (SELECT RakeId FROM Rakes ORDER BY RakeId DESC LIMIT ?)", (self.m_MaxRakes, ))
+				Connection.execute("DELETE FROM Wagons WHERE RakeId NOT IN (SELECT RakeId FROM Rakes)")
+			Connection.execute("PRAGMA incremental_vacuum")
+			Connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+		except sqlite3.Error as ex:
+			logging.error("Wagon Store Compaction Failed : " + str(ex))
+
+	#********************************************************************************************#
+	#Description : Function to write the queued records and stop the writer thread
+	#Arguments : Timeout in seconds
+	#Return : True if the writer stopped
+	#********************************************************************************************#
+	def Close(self, Timeout = 5):
+		self.m_Queue.put(())
+		self.m_Thread.join(Timeout)
+		return (self.m_Thread.is_alive() == False)
+
+#********************************************************************************************#
+#Description : Entry point of this program, prints the stored rakes or the wagons of one rake
+#********************************************************************************************#
+if __name__=="__main__": #To run as a standalone script
+	Parser = argparse.ArgumentParser(description = "Merit wagon record store")
+	Parser.add_argument("--file", default = MERIT_WAGON_STORE_FILE, help = "Store database file")
+	Parser.add_argument("--rake", type = int, help = "Print the wagon records of this rake")
+	Parser.add_argument("--limit", type = int, default = 20, help = "Number of rakes to list")
+	Args = Parser.parse_args()
+
+	Store = MeritWagonStore(Args.file)
+	if(Args.rake is not None):
+		for WagonNumber, Record in Store.GetRakeWagons(Args.rake):
+			print(Record)
+	else:
+		for Rake in Store.ListRakes(Args.limit):
+			print(json.dumps(dict(zip(["RakeId", "WBID", "StartTime", "EndTime", "Wagons"], Rake))))
+	Store.Close()
+	sys.exit(0)
@@ -0,0 +1,974 @@
+#Filename : TLCBenchmark.py
+#Version  :	1.0.0
+#Description : End to end benchmark of TLCWithMqtt.py against the TLC emulator and a local broker stand-in
+#Date : Oct 2026
+
+#***********************************************************************************#
+#*************** Import Libraries **************************************************#
+#***********************************************************************************#
+import os
+import sys
+import json
+import time
+import zlib
+import asyncio
+import argparse
+import threading
+import tracemalloc
+import serial
+from paho.mqtt import client as mqtt_client
+import numpy as np
+import datetime
+import TLCWithMqtt
+from MeritPayloadCodec import *
+from MeritSessionHub import MeritSessionHub, MeritSessionMessage
+from MeritLogging import Merit_FlushLogging
+from TLCEmulator import *
+
+#***********************************************************************************#
+#*************** File Constants ****************************************************#
+#***********************************************************************************#
+BENCH_RAKE_TIMEOUT_MARGIN	= 30.0		#Seconds allowed after the last vehicle before the rake is failed
+BENCH_POLL_DELAY			= 0.001
+BENCH_ACK_TIMEOUT			= 5.0		#Seconds allowed for the broker acknowledgments after the last wagon is published
+BENCH_CRC_CHUNK_SIZE		= 16		#Bytes per serial read when checksumming incrementally
+BENCH_SESSION_START_TIMEOUT	= 30.0		#Seconds allowed for the session processes to subscribe and open their TLC port
+BENCH_SESSION_SETTLE_TIME	= 1.0		#Seconds after the sessions are up before the rakes start
+BENCH_SESSION_WGID			= "BENCH%02d"
+
+#Fields of a consumer that only needs the wagon result, for the projected encodings
+BenchProjectedFieldList = ["WagonSerialNumber", "WagonType", "WagonWeight", "WagonSpeed", "Axle1Weight", "Axle2Weight", "Axle3Weight", "Axle4Weight", "WE", "EndTime"]
+#Encodings compared by the encode benchmark, Name : (Encoding, Field names, zlib flag)
+BenchEncodingDict = {
+	"Json"				:	(MERIT_ENCODING_JSON, None, False),
+	"JsonZlib"			:	(MERIT_ENCODING_JSON, None, True),
+	"JsonProjected"		:	(MERIT_ENCODING_JSON, BenchProjectedFieldList, False),
+	"Binary"			:	(MERIT_ENCODING_BINARY, None, False),
+	"BinaryZlib"		:	(MERIT_ENCODING_BINARY, None, True),
+	"BinaryProjected"	:	(MERIT_ENCODING_BINARY, BenchProjectedFieldList, False),
+}
+
+m_BenchPublisherThread = None		#wagon publisher thread of TLCWithMqtt.py, the event loop thread in the asyncio engine
+m_BenchEngine = TLCWithMqtt.MERIT_ENGINE_THREADED
+m_BenchEngineThread = None			#thread running the asyncio engine
+m_BenchMonitorThread = None			#thread running the monitor loop of the threaded engine, like __main__ does
+m_BenchMonitorFlag = False
+
+#***********************************************************************************#
+#******************************* Classes *******************************************#
+#***********************************************************************************#
+#********************************************************************************************#
+#Description : Local MQTT broker stand-in, records every publish with a monotonic timestamp
+#Notes : Only the paho client calls used by TLCWithMqtt.py are provided
+#********************************************************************************************#
+class MeritBenchBroker:
+	def __init__(self, Rtt = 0.02):
+		self.m_Lock = threading.Lock()
+		self.m_MessageId = 0
+		self.m_PublishList = []
+		self.m_PendingList = []			#QoS 1/2 publishes kept while the link is down, like paho does
+		self.m_ConnectedFlag = True
+		self.m_SubscribeCount = 0
+		self.m_Rtt = Rtt				#seconds until the PUBACK of a QoS 1/2 publish
+		self.on_publish = None
+
+	def publish(self, topic, payload = None, qos = 0, retain = False):
+		with self.m_Lock:
+			self.m_MessageId = self.m_MessageId + 1
+			if(self.m_ConnectedFlag == False):
+				if(qos > 0):
+					self.m_PendingList.append((self.m_MessageId, topic, payload, qos))
+				return (mqtt_client.MQTT_ERR_NO_CONN, self.m_MessageId)
+			self.Deliver(self.m_MessageId, topic, payload, qos)
+			return (mqtt_client.MQTT_ERR_SUCCESS, self.m_MessageId)
+
+	#********************************************************************************************#
+	#Description : Function to record a publish and call on_publish from a timer like the paho network thread
+	#Arguments : Message id, topic, payload, qos
+	#Return : None
+	#Notes : Called with m_Lock held
+	#********************************************************************************************#
+	def Deliver(self, MessageId, Topic, Payload, Qos):
+		self.m_PublishList.append((time.monotonic(), Topic, Payload))
+		if(self.on_publish is not None):
+			threading.Timer(self.m_Rtt if(Qos > 0) else 0, self.on_publish, (self, None, MessageId)).start()
+
+	def subscribe(self, topic, qos = 0):
+		self.m_SubscribeCount = self.m_SubscribeCount + 1
+		return (mqtt_client.MQTT_ERR_SUCCESS, 0)
+
+	def reconnect(self):
+		return mqtt_client.MQTT_ERR_SUCCESS
+
+	def is_connected(self):
+		return self.m_ConnectedFlag
+
+	#********************************************************************************************#
+	#Description : Function to drop or restore the link, the edge code callbacks are called like the paho network loop does
+	#Arguments : Connected flag
+	#Return : None
+	#********************************************************************************************#
+	def SetConnected(self, ConnectedFlag):
+		with self.m_Lock:
+			self.m_ConnectedFlag = ConnectedFlag
+			if(ConnectedFlag == True):
+				for MessageId, Topic, Payload, Qos in self.m_PendingList:
+					self.Deliver(MessageId, Topic, Payload, Qos)
+				self.m_PendingList = []
+		if(ConnectedFlag == True):
+			TLCWithMqtt.Merit_OnConnect(self, None, None, 0)
+		else:
+			TLCWithMqtt.Merit_OnDisConnect(self, None, mqtt_client.MQTT_ERR_CONN_LOST)
+
+	#********************************************************************************************#
+	#Description : Function to get the publishes recorded after the given monotonic time
+	#Arguments : Start time, topic (None for all topics)
+	#Return : List of (time, topic, payload)
+	#********************************************************************************************#
+	def Published(self, StartTime, Topic = None):
+		with self.m_Lock:
+			return [Entry for Entry in self.m_PublishList if((Entry[0] >= StartTime) and ((Topic is None) or (Entry[1] == Topic)))]
+
+#***********************************************************************************#
+#******************************* Functions *****************************************#
+#***********************************************************************************#
+#********************************************************************************************#
+#Description : Function to connect TLCWithMqtt.py to the emulator and the broker stand-in
+#Arguments : Emulator slave port name, Broker stand-in, Engine (MERIT_ENGINE_THREADED or MERIT_ENGINE_ASYNCIO)
+#Return : None
+#Notes : The engine runs on its own threads, the benchmark thread drives Init and Terminate like the mqtt commands do
+#		 and its own CPU time is not counted
+#********************************************************************************************#
+def Merit_BenchAttach(SlaveName, Broker, Engine = TLCWithMqtt.MERIT_ENGINE_THREADED):
+	TLCWithMqtt.Merit_GetWBID()
+	TLCWithMqtt.Merit_OpenWagonStore()
+	TLCWithMqtt.Merit_OpenMqttOutbox()
+	TLCWithMqtt.m_TLCMqttClient = Broker
+	Broker.on_publish = TLCWithMqtt.Merit_OnPublish
+	TLCWithMqtt.MqttConnectFlag = True
+	TLCWithMqtt.Merit_MqttSubscribeTopics()
+	TLCWithMqtt.m_TLCSerialPort = serial.Serial(
+		port = SlaveName, baudrate = MERIT_SERIAL_BAUD_RATE, bytesize = MERIT_SERIAL_DATABITS, parity = MERIT_SERIAL_PARITY,
+		stopbits = MERIT_SERIAL_STOPBITS, timeout = MERIT_SERIAL_TIMEOUT, interCharTimeout = MERIT_SERIAL_INTER_CHAR_TIMEOUT)
+	global m_BenchPublisherThread
+	global m_BenchEngine
+	global m_BenchEngineThread
+	global m_BenchMonitorThread
+	global m_BenchMonitorFlag
+	m_BenchEngine = Engine
+	if(Engine == TLCWithMqtt.MERIT_ENGINE_ASYNCIO):
+		m_BenchEngineThread = threading.Thread(target = asyncio.run, args = (TLCWithMqtt.Merit_AsyncEngine(False), ), daemon = True)
+		m_BenchEngineThread.start()
+		while((TLCWithMqtt.m_AsyncSerial is None) or (TLCWithMqtt.m_AsyncSerial.m_Port is None)):
+			time.sleep(BENCH_POLL_DELAY)
+		m_BenchPublisherThread = m_BenchEngineThread
+		return
+	TLCWithMqtt.Merit_StartSerialWriter()
+	m_BenchPublisherThread = threading.Thread(target = TLCWithMqtt.Merit_MqttPublishWagonDetails, args = (), daemon = True)
+	m_BenchPublisherThread.start()
+	m_BenchMonitorFlag = True
+	m_BenchMonitorThread = threading.Thread(target = Merit_BenchMonitorLoop, args = (), daemon = True)
+	m_BenchMonitorThread.start()
+
+#********************************************************************************************#
+#Description : Thread function running the TLC monitor of the threaded engine until detached
+#Arguments : None
+#Return : None
+#********************************************************************************************#
+def Merit_BenchMonitorLoop():
+	while(m_BenchMonitorFlag == True):
+		TLCWithMqtt.Merit_TLCMonitor()
+
+#********************************************************************************************#
+#Description : Function to stop the serial writer or the asyncio engine
+#Arguments : None
+#Return : True if it stopped within MERIT_WRITER_STOP_TIMEOUT
+#********************************************************************************************#
+def Merit_BenchDetach():
+	if(m_BenchEngine == TLCWithMqtt.MERIT_ENGINE_ASYNCIO):
+		TLCWithMqtt.Merit_AsyncStop()
+		m_BenchEngineThread.join(TLCWithMqtt.MERIT_WRITER_STOP_TIMEOUT)
+		return (m_BenchEngineThread.is_alive() == False)
+	global m_BenchMonitorFlag
+	m_BenchMonitorFlag = False
+	TLCWithMqtt.m_TLCPollScheduler.Wake()
+	m_BenchMonitorThread.join(TLCWithMqtt.MERIT_WRITER_STOP_TIMEOUT)
+	return TLCWithMqtt.Merit_StopSerialWriter()
+
+#********************************************************************************************#
+#Description : Function to get the CPU time used so far by a thread
+#Arguments : Thread
+#Return : CPU seconds, 0 if the thread is not running
+#********************************************************************************************#
+def Merit_BenchThreadCpuTime(Thread):
+	if((Thread is None) or (Thread.ident is None)):
+		return 0.0
+	return time.clock_gettime(time.pthread_getcpuclockid(Thread.ident))
+
+#********************************************************************************************#
+#Description : Function to get the CPU time used so far by the serial writer thread, the event loop thread in the asyncio engine
+#Arguments : None
+#Return : CPU seconds, 0 if the writer is not running
+#********************************************************************************************#
+def Merit_BenchWriterCpuTime():
+	if(m_BenchEngine == TLCWithMqtt.MERIT_ENGINE_ASYNCIO):
+		return Merit_BenchThreadCpuTime(m_BenchEngineThread)
+	return Merit_BenchThreadCpuTime(TLCWithMqtt.m_TLCWriterThread)
+
+#********************************************************************************************#
+#Description : Function to get the wagon number the edge code publishes for each vehicle
+#Arguments : Rake script
+#Return : Dict of wagon number to vehicle serial number (locos are not published)
+#********************************************************************************************#
+def Merit_BenchWagonSerialDict(Rake):
+	WagonSerialDict = {}
+	LocoCount = 0
+	for Index, Vehicle in enumerate(Rake["Vehicles"]):
+		if((Vehicle["Type"] == THREE_AXLE_LOCO) or (Vehicle["Type"] == FOUR_AXLE_LOCO)):
+			LocoCount = LocoCount + 1
+		else:
+			WagonSerialDict[(Index + 1) - LocoCount] = Index + 1
+	return WagonSerialDict
+
+#********************************************************************************************#
+#Description : Function to get the size of the log file once the queued records are written
+#Arguments : None
+#Return : Bytes, 0 if there is no log file yet
+#********************************************************************************************#
+def Merit_BenchLogSize():
+	Merit_FlushLogging()
+	try:
+		return os.path.getsize(TLCWithMqtt.LOG_FILE_NAME)
+	except OSError:
+		return 0
+
+#********************************************************************************************#
+#Description : Function to run one scripted rake through the edge code
+#Arguments : Emulator, Broker stand-in, Rake script, Broker outage (start, duration) in seconds after the rake start or None
+#Return : Result dictionary
+#********************************************************************************************#
+def Merit_BenchRunRake(Emulator, Broker, Rake, Outage = None):
+	WagonSerialDict = Merit_BenchWagonSerialDict(Rake)
+	Timeout = Rake["StartDelay"] + (len(Rake["Vehicles"]) * Rake["VehicleInterval"]) + BENCH_RAKE_TIMEOUT_MARGIN
+	Emulator.Reset()
+	StartTime = time.monotonic()
+	CpuStartTime = time.process_time()
+	BenchCpuStartTime = time.thread_time()
+	EmulatorCpuStartTime = Emulator.m_ThreadCpuTime
+	WriterCpuStartTime = Merit_BenchWriterCpuTime()
+	PublisherCpuStartTime = Merit_BenchThreadCpuTime(m_BenchPublisherThread)
+	MergedStartCount = TLCWithMqtt.m_TLCSerialCommandWriteQueue.m_MergedCount
+	ExpiredStartCount = TLCWithMqtt.m_TLCSerialCommandWriteQueue.m_ExpiredCount
+	OutboxStartDict = TLCWithMqtt.m_MqttOutbox.Metrics()
+	MqttStartDict = TLCWithMqtt.m_MqttInFlight.Metrics()
+	TLCWithMqtt.m_TLCPollScheduler.m_LatenessList.clear()
+	SubscribeStartCount = Broker.m_SubscribeCount
+	LogStartSize = Merit_BenchLogSize()
+	if(Outage is not None):
+		Timeout = Timeout + Outage[1]
+
+	TLCWithMqtt.m_AXLETOELIMINATE = 0
+	TLCWithMqtt.Merit_Init()
+	Emulator.StartRake()
+	PublishTimeDict = {}
+	while((len(PublishTimeDict) < len(WagonSerialDict)) and ((time.monotonic() - StartTime) < Timeout)):
+		if(Outage is not None):
+			OutageFlag = (Outage[0] <= (time.monotonic() - StartTime) < (Outage[0] + Outage[1]))
+			if(OutageFlag == Broker.m_ConnectedFlag):
+				Broker.SetConnected(not OutageFlag)
+		for PublishTime, Topic, Payload in Broker.Published(StartTime, TLCWithMqtt.m_MqttWeighmentPostTopic):
+			WagonDict = json.loads(Payload)
+			WagonNumber = WagonDict.get("WagonSerialNumber")
+			if((WagonDict.get("WE") == True) and (WagonNumber in WagonSerialDict) and (WagonNumber not in PublishTimeDict)):
+				PublishTimeDict[WagonNumber] = PublishTime
+		time.sleep(BENCH_POLL_DELAY)
+	AckWaitTime = time.monotonic()
+	while((TLCWithMqtt.m_MqttPostAckedWagonNumber <= (TLCWithMqtt.m_WagonCount - TLCWithMqtt.m_LocoCount)) and ((time.monotonic() - AckWaitTime) < BENCH_ACK_TIMEOUT)):
+		time.sleep(BENCH_POLL_DELAY)
+	AckedWagonCount = TLCWithMqtt.m_MqttPostAckedWagonNumber - 1
+
+	TLCWithMqtt.Merit_Terminate()
+	CpuTime = (time.process_time() - CpuStartTime) - (Emulator.m_ThreadCpuTime - EmulatorCpuStartTime) - (time.thread_time() - BenchCpuStartTime)
+	WriterCpuTime = Merit_BenchWriterCpuTime() - WriterCpuStartTime
+	PublisherCpuTime = Merit_BenchThreadCpuTime(m_BenchPublisherThread) - PublisherCpuStartTime
+	LatencyList = []
+	for WagonNumber, PublishTime in PublishTimeDict.items():
+		DoneTime = Emulator.VehicleDoneTime(WagonSerialDict[WagonNumber])
+		if(DoneTime is not None):
+			LatencyList.append(PublishTime - DoneTime)
+	RoundTrips = sum(Emulator.m_RequestCountDict.values())
+	LatenessList = list(TLCWithMqtt.m_TLCPollScheduler.m_LatenessList)
+	Result = {}
+	Result["Engine"] = m_BenchEngine
+	Result["RakeId"] = TLCWithMqtt.m_RakeId
+	Result["Vehicles"] = len(Rake["Vehicles"])
+	Result["WagonsExpected"] = len(WagonSerialDict)
+	Result["WagonsPublished"] = len(PublishTimeDict)
+	Result["RakeTime"] = round(time.monotonic() - StartTime, 3)
+	Result["CpuTimePerRake"] = round(CpuTime, 4)
+	Result["WriterCpuTimePerRake"] = round(WriterCpuTime, 4)
+	Result["PublisherCpuTimePerRake"] = round(PublisherCpuTime, 4)
+	Result["RoundTripsPerWagon"] = round(RoundTrips / max(1, len(Rake["Vehicles"])), 2)
+	Result["RequestsPerCommand"] = {hex(Command) : Count for Command, Count in sorted(Emulator.m_RequestCountDict.items())}
+	Result["MergedCommands"] = TLCWithMqtt.m_TLCSerialCommandWriteQueue.m_MergedCount - MergedStartCount
+	Result["ExpiredCommands"] = TLCWithMqtt.m_TLCSerialCommandWriteQueue.m_ExpiredCount - ExpiredStartCount
+	Result["BadFrames"] = Emulator.m_BadFrameCount
+	Result["LogBytesPerRake"] = Merit_BenchLogSize() - LogStartSize
+	AxleWeightsList = Broker.Published(StartTime, TLCWithMqtt.m_MqttAxleWeightsTopic)
+	if(AxleWeightsList):
+		RakeDict = json.loads(AxleWeightsList[-1][2])
+		ExpectedWeightList = [round(sum(Rake["Vehicles"][SerialNumber - 1]["AxleWeights"]), 2) for SerialNumber in RakeDict["VehicleSerialNumber"]]
+		Result["BulkAxles"] = RakeDict["AxleCount"]
+		Result["BulkVehicleWeightError"] = round(max(abs(Weight - Expected) for Weight, Expected in zip(RakeDict["VehicleWeight"], ExpectedWeightList)), 3)
+	Result["Publishes"] = len(Broker.Published(StartTime))
+	Result["WeighmentTopicBytes"] = sum(len(Payload) for PublishTime, Topic, Payload in Broker.Published(StartTime, TLCWithMqtt.m_MqttWeighmentPostTopic))
+	if(TLCWithMqtt.m_RakeBatchPublishFlag == True):
+		BatchList = Broker.Published(StartTime, TLCWithMqtt.m_MqttRakeBatchTopic)
+		BatchDictList = [json.loads(zlib.decompress(Payload) if(isinstance(Payload, bytes)) else Payload) for PublishTime, Topic, Payload in BatchList]
+		ReplayTime = time.monotonic()
+		TLCWithMqtt.Merit_RakeBatchPublish(TLCWithMqtt.m_RakeId, 1, None, True)
+		ReplayTime = time.monotonic() - ReplayTime
+		Result["RakeBatch"] = {"Messages" : len(BatchList), "Wagons" : sum(BatchDict["WagonCount"] for BatchDict in BatchDictList),
+			"Bytes" : sum(len(Payload) for PublishTime, Topic, Payload in BatchList),
+			"JsonBytes" : sum(len(json.dumps(BatchDict, separators = (",", ":"))) for BatchDict in BatchDictList),
+			"Complete" : any(BatchDict["Complete"] for BatchDict in BatchDictList), "ReplayMs" : round(ReplayTime * 1000, 1)}
+	if(Outage is not None):
+		OutboxDict = TLCWithMqtt.m_MqttOutbox.Metrics()
+		Result["Outbox"] = {"Queued" : OutboxDict["Queued"] - OutboxStartDict["Queued"], "Drained" : OutboxDict["Drained"] - OutboxStartDict["Drained"],
+			"Dropped" : OutboxDict["Dropped"] - OutboxStartDict["Dropped"], "Backlog" : OutboxDict["Backlog"], "DrainRate" : OutboxDict["DrainRate"],
+			"Resubscribes" : Broker.m_SubscribeCount - SubscribeStartCount}
+	MqttDict = TLCWithMqtt.m_MqttInFlight.Metrics()
+	Result["Mqtt"] = {"WeighmentQos" : TLCWithMqtt.m_TopicQosDict.get(TLCWithMqtt.m_MqttWeighmentPostTopic, TLCWithMqtt.MERIT_MQTT_DEFAULT_QOS),
+		"AckedWagons" : AckedWagonCount, "Acked" : MqttDict["Acked"] - MqttStartDict["Acked"], "Expired" : MqttDict["Expired"] - MqttStartDict["Expired"],
+		"MaxInFlight" : MqttDict["MaxInFlight"], "AckRate" : MqttDict["AckRate"], "RttMs" : MqttDict.get("RttMs")}
+	if(LatencyList):
+		LatencyArray = np.array(LatencyList) * 1000
+		Result["AxleToPublishLatencyMs"] = {"Mean" : round(float(LatencyArray.mean()), 1), "P50" : round(float(np.percentile(LatencyArray, 50)), 1),
+			"P95" : round(float(np.percentile(LatencyArray, 95)), 1), "Max" : round(float(LatencyArray.max()), 1), "Jitter" : round(float(LatencyArray.std()), 1)}
+	if(LatenessList):
+		LatenessArray = np.array(LatenessList) * 1000
+		Result["PollLatenessMs"] = {"Mean" : round(float(LatenessArray.mean()), 2), "P95" : round(float(np.percentile(LatenessArray, 95)), 2),
+			"Max" : round(float(LatenessArray.max()), 2), "Jitter" : round(float(LatenessArray.std()), 2)}
+	return Result
+
+#********************************************************************************************#
+#Description : Function to run the end to end rake benchmark
+#Arguments : Parsed command line arguments
+#Return : List of per rake results
+#********************************************************************************************#
+def Merit_BenchRake(Args):
+	if(Args.rake):
+		Rake = Merit_EmulatorLoadRake(Args.rake)
+	else:
+		Rake = Merit_EmulatorDefaultRake(Args.locos, Args.wagons, Args.interval)
+	Emulator = MeritTLCEmulator(Rake, SimulateBaudRate = not Args.no_baud)
+	TLCWithMqtt.Merit_SetBulkAxleRead(Args.bulk)
+	if(Args.batch is not None):
+		TLCWithMqtt.m_RakeBatchPublishFlag = True
+		TLCWithMqtt.m_RakeBatchSize = Args.batch
+		TLCWithMqtt.m_RakeBatchCompressFlag = not Args.no_compress
+	if(Args.qos is not None):
+		TLCWithMqtt.MeritTopicQosConfigDict[TLCWithMqtt.MERIT_WEIGHMENT_TOPIC_NAME] = Args.qos
+	Broker = MeritBenchBroker(Args.rtt / 1000)
+	if(Args.capture is not None):
+		TLCWithMqtt.Merit_StartSerialCapture(Args.capture)
+	Merit_BenchAttach(Emulator.Start(), Broker, Args.engine)
+	ResultList = []
+	for RakeNumber in range(Args.rakes):
+		ResultList.append(Merit_BenchRunRake(Emulator, Broker, Rake, Args.outage))
+	Merit_BenchDetach()
+	TLCWithMqtt.Merit_StopSerialCapture()
+	TLCWithMqtt.m_WagonStore.Close()
+	TLCWithMqtt.m_MqttOutbox.Close()
+	return ResultList
+
+#********************************************************************************************#
+#Description : Function to measure serial and broker traffic of an initiated TLC with no rake on the weighbridge
+#Arguments : Parsed command line arguments
+#Return : Result dictionary
+#Notes : The monitor runs MERIT_POLL_ACTIVE_HOLD seconds first so the scheduler settles to its heartbeat
+#********************************************************************************************#
+def Merit_BenchIdle(Args):
+	Emulator = MeritTLCEmulator(Merit_EmulatorDefaultRake(1, 1), SimulateBaudRate = True)
+	Broker = MeritBenchBroker()
+	Merit_BenchAttach(Emulator.Start(), Broker, Args.engine)
+	TLCWithMqtt.Merit_Init()
+	SettleTime = time.monotonic() + TLCWithMqtt.MERIT_POLL_ACTIVE_HOLD + 1
+	time.sleep(SettleTime - time.monotonic())
+	Emulator.Reset()
+	StartTime = time.monotonic()
+	CpuStartTime = time.process_time()
+	EmulatorCpuStartTime = Emulator.m_ThreadCpuTime
+	WriterCpuStartTime = Merit_BenchWriterCpuTime()
+	PublisherCpuStartTime = Merit_BenchThreadCpuTime(m_BenchPublisherThread)
+	BenchCpuStartTime = time.thread_time()
+	while((time.monotonic() - StartTime) < Args.seconds):
+		time.sleep(BENCH_POLL_DELAY)
+	Elapsed = time.monotonic() - StartTime
+	CpuTime = (time.process_time() - CpuStartTime) - (Emulator.m_ThreadCpuTime - EmulatorCpuStartTime) - (time.thread_time() - BenchCpuStartTime)
+	WriterCpuTime = Merit_BenchWriterCpuTime() - WriterCpuStartTime
+	PublisherCpuTime = Merit_BenchThreadCpuTime(m_BenchPublisherThread) - PublisherCpuStartTime
+	PublishCountDict = {}
+	for PublishTime, Topic, Payload in Broker.Published(StartTime):
+		PublishCountDict[Topic] = PublishCountDict.get(Topic, 0) + 1
+	TLCWithMqtt.Merit_Terminate()
+	StopTime = time.monotonic()
+	WriterStoppedFlag = Merit_BenchDetach()
+	StopTime = time.monotonic() - StopTime
+	TLCWithMqtt.m_WagonStore.Close()
+	TLCWithMqtt.m_MqttOutbox.Close()
+	Result = {}
+	Result["Engine"] = m_BenchEngine
+	Result["Seconds"] = round(Elapsed, 3)
+	Result["RequestsPerSecond"] = round(sum(Emulator.m_RequestCountDict.values()) / Elapsed, 2)
+	Result["PublishesPerSecond"] = round(sum(PublishCountDict.values()) / Elapsed, 2)
+	Result["PublishesPerTopic"] = PublishCountDict
+	Result["CpuPercent"] = round(100 * CpuTime / Elapsed, 2)
+	Result["WriterCpuPercent"] = round(100 * WriterCpuTime / Elapsed, 2)
+	Result["PublisherCpuPercent"] = round(100 * PublisherCpuTime / Elapsed, 2)
+	Result["WriterStopMs"] = round(StopTime * 1000, 1) if(WriterStoppedFlag == True) else None
+	return Result
+
+#********************************************************************************************#
+#Description : Function to get the CPU time used so far by a process
+#Arguments : Process id
+#Return : CPU seconds (user and system), 0 if the process is gone
+#********************************************************************************************#
+def Merit_BenchProcessCpuTime(Pid):
+	try:
+		with open("/proc/" + str(Pid) + "/stat", "r") as StatFile:
+			FieldList = StatFile.read().rsplit(")", 1)[1].split()
+	except OSError:
+		return 0.0
+	return (int(FieldList[11]) + int(FieldList[12])) / os.sysconf("SC_CLK_TCK")		#utime and stime after the state field
+
+#********************************************************************************************#
+#Description : Function to run the same rake on several emulated TLCs at once, one session process each behind one hub
+#Arguments : Number of TLCs, Parsed command line arguments
+#Return : Result dictionary
+#Notes : The hub uses the broker stand-in as its client, the Initiate and Terminate commands are handed to it
+#		 like messages of the broker
+#********************************************************************************************#
+def Merit_BenchSessionRun(SessionCount, Args):
+	Rake = Merit_EmulatorDefaultRake(Args.locos, Args.wagons, Args.interval)
+	WagonSerialDict = Merit_BenchWagonSerialDict(Rake)
+	EmulatorList = [MeritTLCEmulator(Rake, SimulateBaudRate = True) for Index in range(SessionCount)]
+	Broker = MeritBenchBroker(Args.rtt / 1000)
+	Hub = MeritSessionHub(TLCWithMqtt.Merit_SessionMain, Args.engine)
+	for Index, Emulator in enumerate(EmulatorList):
+		Hub.AddSession(BENCH_SESSION_WGID % (Index + 1), Emulator.Start())
+	Hub.Attach(Broker)
+	Hub.Start()
+	Hub.OnConnect(Broker, None, None, 0)
+	CommandTopicList = ["/Merit/" + Session.m_WGID + "/COMMAND/" for Session in Hub.m_SessionList]
+	WeighmentTopicList = ["/Merit/" + Session.m_WGID + "/Weighment/" for Session in Hub.m_SessionList]
+	StartTime = time.monotonic()
+	while(((time.monotonic() - StartTime) < BENCH_SESSION_START_TIMEOUT) and
+		((any(Topic not in Hub.m_TopicDict for Topic in CommandTopicList)) or (any(len(Emulator.m_RequestCountDict) == 0 for Emulator in EmulatorList)))):
+		time.sleep(BENCH_POLL_DELAY)
+	StartupTime = time.monotonic() - StartTime
+	time.sleep(BENCH_SESSION_SETTLE_TIME)
+
+	Timeout = Rake["StartDelay"] + (len(Rake["Vehicles"]) * Rake["VehicleInterval"]) + BENCH_RAKE_TIMEOUT_MARGIN
+	PidList = [Session.m_Process.pid for Session in Hub.m_SessionList]
+	SessionCpuStartList = [Merit_BenchProcessCpuTime(Pid) for Pid in PidList]
+	HubCpuStartTime = Merit_BenchThreadCpuTime(Hub.m_Thread)
+	for Emulator in EmulatorList:
+		Emulator.Reset()
+	StartTime = time.monotonic()
+	for Topic, Emulator in zip(CommandTopicList, EmulatorList):
+		Hub.OnMessage(Broker, None, MeritSessionMessage(Topic, TLCWithMqtt.m_MqttInitiate.encode()))
+		Emulator.StartRake()
+	PublishTimeDictList = [{} for Index in range(SessionCount)]
+	while((sum(len(PublishTimeDict) for PublishTimeDict in PublishTimeDictList) < (SessionCount * len(WagonSerialDict))) and ((time.monotonic() - StartTime) < Timeout)):
+		for Topic, PublishTimeDict in zip(WeighmentTopicList, PublishTimeDictList):
+			for PublishTime, Topic, Payload in Broker.Published(StartTime, Topic):
+				WagonDict = json.loads(Payload)
+				WagonNumber = WagonDict.get("WagonSerialNumber")
+				if((WagonDict.get("WE") == True) and (WagonNumber in WagonSerialDict) and (WagonNumber not in PublishTimeDict)):
+					PublishTimeDict[WagonNumber] = PublishTime
+		time.sleep(BENCH_POLL_DELAY)
+	RakeTime = time.monotonic() - StartTime
+	SessionCpuList = [Merit_BenchProcessCpuTime(Pid) - CpuStartTime for Pid, CpuStartTime in zip(PidList, SessionCpuStartList)]
+	HubCpuTime = Merit_BenchThreadCpuTime(Hub.m_Thread) - HubCpuStartTime
+	PublishCount = len(Broker.Published(StartTime))
+	TerminateTime = time.monotonic()
+	for Topic in CommandTopicList:
+		Hub.OnMessage(Broker, None, MeritSessionMessage(Topic, TLCWithMqtt.m_MqttTerminate.encode()))
+	LinkMetricsTopicList = ["/Merit/" + Session.m_WGID + "/LinkMetrics/" for Session in Hub.m_SessionList]
+	while((any(len(Broker.Published(TerminateTime, Topic)) == 0 for Topic in LinkMetricsTopicList)) and ((time.monotonic() - TerminateTime) < BENCH_ACK_TIMEOUT)):
+		time.sleep(BENCH_POLL_DELAY)		#published at the end of Terminate
+	Hub.Stop()
+	Result = {}
+	Result["ExitCodes"] = [Session.m_Process.exitcode for Session in Hub.m_SessionList]
+	for Emulator in EmulatorList:
+		Emulator.Stop()
+
+	LatencyList = []
+	LastPublishTime = StartTime
+	for Emulator, PublishTimeDict in zip(EmulatorList, PublishTimeDictList):
+		for WagonNumber, PublishTime in PublishTimeDict.items():
+			DoneTime = Emulator.VehicleDoneTime(WagonSerialDict[WagonNumber])
+			LastPublishTime = max(LastPublishTime, PublishTime)
+			if(DoneTime is not None):
+				LatencyList.append(PublishTime - DoneTime)
+	WagonCount = sum(len(PublishTimeDict) for PublishTimeDict in PublishTimeDictList)
+	Result["Sessions"] = SessionCount
+	Result["Engine"] = Args.engine
+	Result["StartupTime"] = round(StartupTime, 3)
+	Result["WagonsExpected"] = SessionCount * len(WagonSerialDict)
+	Result["WagonsPublished"] = WagonCount
+	Result["RakeTime"] = round(RakeTime, 3)
+	Result["WagonsPerSecond"] = round(WagonCount / max(LastPublishTime - StartTime, BENCH_POLL_DELAY), 2)
+	Result["PublishesPerSecond"] = round(PublishCount / RakeTime, 2)
+	Result["SessionCpuTime"] = round(sum(SessionCpuList), 3)
+	Result["MaxSessionCpuTime"] = round(max(SessionCpuList), 3)
+	Result["HubCpuTime"] = round(HubCpuTime, 4)
+	Result["CpuCount"] = os.cpu_count()
+	if(LatencyList):
+		LatencyArray = np.array(LatencyList) * 1000
+		Result["AxleToPublishLatencyMs"] = {"Mean" : round(float(LatencyArray.mean()), 1), "P95" : round(float(np.percentile(LatencyArray, 95)), 1),
+			"Max" : round(float(LatencyArray.max()), 1), "Jitter" : round(float(LatencyArray.std()), 1)}
+	return Result
+
+#********************************************************************************************#
+#Description : Function to measure the throughput of one edge program as TLCs are added
+#Arguments : Parsed command line arguments
+#Return : List of results, one per TLC count
+#********************************************************************************************#
+def Merit_BenchSessions(Args):
+	return [Merit_BenchSessionRun(SessionCount, Args) for SessionCount in Args.tlcs]
+
+#********************************************************************************************#
+#Description : Function to calculate the checksum the way TLCWithMqtt.py 1.2.4 did, element by element
+#Arguments : Input List
+#Return : CheckSum
+#********************************************************************************************#
+def Merit_BenchLegacyChecksum(InputList):
+	CheckSum = 0 
+	for Element in InputList:
+		CheckSum = TLCWithMqtt.Merit_GetCheckSum(CheckSum, Element)	
+	return CheckSum
+
+#********************************************************************************************#
+#Description : Function to time a function over a list of frames
+#Arguments : Function, FrameList, Repeat count
+#Return : Best time per frame in micro seconds
+#********************************************************************************************#
+def Merit_BenchTimePerFrame(Function, FrameList, Repeat):
+	BestTime = None
+	for Index in range(Repeat):
+		StartTime = time.perf_counter()
+		Function(FrameList)
+		TimeTaken = time.perf_counter() - StartTime
+		if((BestTime is None) or (TimeTaken < BestTime)):
+			BestTime = TimeTaken
+	return round((BestTime / len(FrameList)) * 1000000, 3)
+
+#********************************************************************************************#
+#Description : Function to checksum frames the way they stream in from the serial port
+#Arguments : FrameList
+#Return : List of checksums
+#********************************************************************************************#
+def Merit_BenchIncrementalCrc(FrameList):
+	CheckSumList = []
+	for Frame in FrameList:
+		CheckSum = MeritCrc16()
+		for Index in range(0, len(Frame), BENCH_CRC_CHUNK_SIZE):
+			CheckSum.Update(Frame[Index : Index + BENCH_CRC_CHUNK_SIZE])
+		CheckSumList.append(CheckSum.Value())
+	return CheckSumList
+
+#********************************************************************************************#
+#Description : Function to compare the CRC16 implementations on captured size frames
+#Arguments : Parsed command line arguments
+#Return : Result dictionary
+#********************************************************************************************#
+def Merit_BenchCrc(Args):
+	Generator = np.random.default_rng(0)
+	FrameArray = Generator.integers(0, 256, size = (Args.frames, Args.length), dtype = np.uint8)
+	FrameList = [bytes(Frame) for Frame in FrameArray]
+	IntList = [list(Frame) for Frame in FrameList]
+	Expected = [Merit_BenchLegacyChecksum(Frame) for Frame in IntList]
+	if(([Merit_Crc16(Frame) for Frame in FrameList] != Expected) or (Merit_Crc16Batch(FrameArray).tolist() != Expected)):
+		raise ValueError("CRC16 implementations do not agree")
+	Result = {}
+	Result["Frames"] = Args.frames
+	Result["FrameLength"] = Args.length
+	Result["LegacyPerElementUs"] = Merit_BenchTimePerFrame(lambda Frames : [Merit_BenchLegacyChecksum(Frame) for Frame in Frames], IntList, Args.repeat)
+	Result["Crc16ListUs"] = Merit_BenchTimePerFrame(lambda Frames : [Merit_Crc16(Frame) for Frame in Frames], IntList, Args.repeat)
+	Result["Crc16BytesUs"] = Merit_BenchTimePerFrame(lambda Frames : [Merit_Crc16(Frame) for Frame in Frames], FrameList, Args.repeat)
+	Result["Crc16IncrementalUs"] = Merit_BenchTimePerFrame(Merit_BenchIncrementalCrc, FrameList, Args.repeat)
+	Result["Crc16BatchUs"] = Merit_BenchTimePerFrame(Merit_Crc16Batch, FrameArray, Args.repeat)
+	Result["SpeedupBytes"] = round(Result["LegacyPerElementUs"] / Result["Crc16BytesUs"], 1)
+	Result["SpeedupBatch"] = round(Result["LegacyPerElementUs"] / Result["Crc16BatchUs"], 1)
+	return Result
+
+#********************************************************************************************#
+#Description : Function to add stuff bytes the way TLCWithMqtt.py 1.2.5 did, one list element at a time
+#Arguments : input list
+#Return : List after adding Stuff byte
+#********************************************************************************************#
+def Merit_BenchLegacyAddStuffBytes(InputList):
+	newList = [MERIT_START_BYTE]
+	for index, elem in enumerate(InputList[1:]):
+		if (elem == MERIT_START_BYTE) or (elem == MERIT_ADDITIONAL_BYTE):
+			newList.append(MERIT_ADDITIONAL_BYTE)
+			newList.append(elem)
+		else:
+			newList.append(elem)
+	return newList	
+
+#********************************************************************************************#
+#Description : Function to remove stuff bytes the way TLCWithMqtt.py 1.2.5 did, one list element at a time
+#Arguments : Input List
+#Return : List after removing stuff byte
+#********************************************************************************************#
+def Merit_BenchLegacyRemoveStuffBytes(InputList):
+	newList = []
+	Index = 0
+	while Index < len(InputList):
+		if(Index == len(InputList) - 1):
+			newList.append(InputList[Index])
+			break
+		if (InputList[Index] == MERIT_ADDITIONAL_BYTE):
+			checkItem = InputList[Index + 1]
+			if(checkItem == MERIT_ADDITIONAL_BYTE or checkItem == MERIT_START_BYTE):
+				newList.append(checkItem)
+				Index = Index + 1
+		else:
+			newList.append(InputList[Index])
+		Index = Index + 1
+	return newList
+
+#********************************************************************************************#
+#Description : Function to run one legacy poll cycle, list based encode, double stuffing and list based decode
+#Arguments : Poll command list of (Command, Payload), Response frames as received
+#Return : None
+#********************************************************************************************#
+def Merit_BenchLegacyPollCycle(PollList, ResponseList):
+	for (Command, Payload), Response in zip(PollList, ResponseList):
+		InputWriteCommandList = [MERIT_START_BYTE, MERIT_RTUID_BYTE, len(Payload) + 1, 0x00, Command]
+		InputWriteCommandList = InputWriteCommandList + Payload
+		InputCheckSum = Merit_BenchLegacyChecksum(InputWriteCommandList)
+		InputWriteCommandList.append(InputCheckSum & 0xff)
+		InputWriteCommandList.append(InputCheckSum >> 8)
+		bytes(Merit_BenchLegacyAddStuffBytes(InputWriteCommandList))		#pyserial converts the list on write
+		Merit_BenchLegacyAddStuffBytes(InputWriteCommandList)				#second stuffing for the log line
+		data = bytes(Response)
+		dataAfterDublicateList = Merit_BenchLegacyRemoveStuffBytes(data)
+		LengthOfQuery = (dataAfterDublicateList[MERIT_QUERY_LEN_POSITION] + (dataAfterDublicateList[MERIT_QUERY_LEN_POSITION + 1] << 8)) 
+		Merit_BenchLegacyChecksum(dataAfterDublicateList[ : (LengthOfQuery + MERIT_COMMAND_ID_POSITION)])
+		dataAfterDublicateList[ (MERIT_COMMAND_ID_POSITION ) : (LengthOfQuery + MERIT_COMMAND_ID_POSITION)]
+
+#********************************************************************************************#
+#Description : Function to run one poll cycle through the bytearray codec and the preallocated receive buffer
+#Arguments : Poll command list of (Command, Payload), Response frames as received
+#Return : None
+#********************************************************************************************#
+def Merit_BenchCodecPollCycle(PollList, ResponseList):
+	for (Command, Payload), Response in zip(PollList, ResponseList):
+		Merit_AddStuffBytes(Merit_BuildCommandFrame(Command, Payload, len(Payload)))
+		ReadLength = len(Response)
+		TLCWithMqtt.m_TLCReceiveView[ : ReadLength] = Response		#what readinto does with the received bytes
+		TLCWithMqtt.m_TLCFrameDecoder.Feed(TLCWithMqtt.m_TLCReceiveView[ : ReadLength])
+		ReceiveStatus, Frame = TLCWithMqtt.m_TLCFrameDecoder.GetFrame()
+		LengthOfQuery = (Frame[MERIT_QUERY_LEN_POSITION] + (Frame[MERIT_QUERY_LEN_POSITION + 1] << 8)) 
+		memoryview(Frame)[ (MERIT_COMMAND_ID_POSITION ) : (LengthOfQuery + MERIT_COMMAND_ID_POSITION)]
+
+#********************************************************************************************#
+#Description : Function to run one poll cycle with the command frames taken from the frame cache
+#Arguments : Poll command list of (Command, Payload), Response frames as received
+#Return : None
+#********************************************************************************************#
+def Merit_BenchCachedPollCycle(PollList, ResponseList):
+	for (Command, Payload), Response in zip(PollList, ResponseList):
+		Merit_CommandFrame(Command, Payload, len(Payload))
+		ReadLength = len(Response)
+		TLCWithMqtt.m_TLCReceiveView[ : ReadLength] = Response
+		TLCWithMqtt.m_TLCFrameDecoder.Feed(TLCWithMqtt.m_TLCReceiveView[ : ReadLength])
+		ReceiveStatus, Frame = TLCWithMqtt.m_TLCFrameDecoder.GetFrame()
+		LengthOfQuery = (Frame[MERIT_QUERY_LEN_POSITION] + (Frame[MERIT_QUERY_LEN_POSITION + 1] << 8)) 
+		memoryview(Frame)[ (MERIT_COMMAND_ID_POSITION ) : (LengthOfQuery + MERIT_COMMAND_ID_POSITION)]
+
+#********************************************************************************************#
+#Description : Function to measure memory allocation and time of a poll cycle
+#Arguments : Poll cycle function, Poll command list, Response list, Number of cycles
+#Return : (Peak bytes allocated per cycle, Time per cycle in micro seconds)
+#Notes : CPython has no allocation counter, tracemalloc peak above the cycle start is used instead
+#********************************************************************************************#
+def Merit_BenchPollAllocation(PollCycle, PollList, ResponseList, Cycles):
+	PollCycle(PollList, ResponseList)
+	tracemalloc.start()
+	PeakList = []
+	for Index in range(Cycles):
+		tracemalloc.reset_peak()
+		BaseLine = tracemalloc.get_traced_memory()[0]
+		PollCycle(PollList, ResponseList)
+		PeakList.append(tracemalloc.get_traced_memory()[1] - BaseLine)
+	tracemalloc.stop()
+	StartTime = time.perf_counter()
+	for Index in range(Cycles):
+		PollCycle(PollList, ResponseList)
+	TimeTaken = time.perf_counter() - StartTime
+	return (int(np.mean(PeakList)), round((TimeTaken / Cycles) * 1000000, 1))
+
+#********************************************************************************************#
+#Description : Function to compare memory allocation of the legacy list codec, the bytearray codec and the frame cache per poll cycle
+#Arguments : Parsed command line arguments
+#Return : Result dictionary
+#********************************************************************************************#
+def Merit_BenchAlloc(Args):
+	Emulator = MeritTLCEmulator(Merit_EmulatorDefaultRake(1, 10))
+	PollList = [(MERIT_WAGON_WEIGHT_WRITE_CMD, [0, TEST_WAGON, RESOULUTION_LSB, RESOULUTION_MSB]), (MERIT_DIGITAL_OUTPUT_STATUS_READ_CMD, []), (MERIT_DIGITAL_INPUT_STATUS_READ_CMD, [])]
+	ResponseList = [Emulator.CommandResponse(Command, Payload) for Command, Payload in PollList]
+	Result = {}
+	Result["Cycles"] = Args.cycles
+	Result["LegacyPeakBytesPerCycle"], Result["LegacyUsPerCycle"] = Merit_BenchPollAllocation(Merit_BenchLegacyPollCycle, PollList, ResponseList, Args.cycles)
+	Result["CodecPeakBytesPerCycle"], Result["CodecUsPerCycle"] = Merit_BenchPollAllocation(Merit_BenchCodecPollCycle, PollList, ResponseList, Args.cycles)
+	Result["CachedPeakBytesPerCycle"], Result["CachedUsPerCycle"] = Merit_BenchPollAllocation(Merit_BenchCachedPollCycle, PollList, ResponseList, Args.cycles)
+	return Result
+
+#********************************************************************************************#
+#Description : Function to decode a wagon weigh response the legacy way, byte shifts and NumPy sign conversion
+#Arguments : WagonWeighData list
+#Return : Wagon Weighment Dictionary
+#********************************************************************************************#
+def Merit_BenchLegacyWagonDecode(WagonWeighDataList):
+	Divider = WAGON_DATA_VALUE_DIVIDER * WAGON_DATA_VALUE_DIVIDER
+	WagonDict = {}
+	int(np.array(WagonWeighDataList[COMMAND90RES_WAGON_TYPE]).astype(np.int8))
+	AXLEWeightList = []
+	AXLEWeightList.insert(0, int(np.array((WagonWeighDataList[COMMAND90RES_AXLE1WEIGHT_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLE1WEIGHT_LSB]).astype(np.int16)))
+	AXLEWeightList.insert(1, int(np.array((WagonWeighDataList[COMMAND90RES_AXLE2WEIGHT_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLE2WEIGHT_LSB]).astype(np.int16)))
+	AXLEWeightList.insert(2, int(np.array((WagonWeighDataList[COMMAND90RES_AXLE3WEIGHT_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLE3WEIGHT_LSB]).astype(np.int16)))
+	AXLEWeightList.insert(3, int(np.array((WagonWeighDataList[COMMAND90RES_AXLE4WEIGHT_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLE4WEIGHT_LSB]).astype(np.int16)))
+	WagonType = int(np.array(WagonWeighDataList[COMMAND90RES_WAGON_TYPE]).astype(np.int8))
+	WagonDict["WagonSerialNumber"] = WagonWeighDataList[COMMAND90RES_WAGON_SERIAL_NUMBER]
+	WagonDict["WagonType"] = WagonType
+	WagonDict["WagonWeight"] = ((WagonWeighDataList[COMMAND90RES_WAGON_WEIGHT_MSB] << 16) + (WagonWeighDataList[COMMAND90RES_WAGON_WEIGHT_MID] << 8) + WagonWeighDataList[COMMAND90RES_WAGON_WEIGHT_LSB]) / Divider
+	WagonDict["WagonSpeed"] = ((WagonWeighDataList[COMMAND90RES_WAGON_SPEED_MSB] << 8) + WagonWeighDataList[COMMAND90RES_WAGON_SPEED_LSB]) / WAGON_DATA_VALUE_DIVIDER
+	WagonDict["Axle1Weight"] = ((WagonWeighDataList[COMMAND90RES_AXLE1WEIGHT_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLE1WEIGHT_LSB]) / Divider
+	WagonDict["Axle2Weight"] = ((WagonWeighDataList[COMMAND90RES_AXLE2WEIGHT_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLE2WEIGHT_LSB]) / Divider
+	WagonDict["Axle3Weight"] = ((WagonWeighDataList[COMMAND90RES_AXLE3WEIGHT_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLE3WEIGHT_LSB]) / Divider
+	WagonDict["Axle4Weight"] = ((WagonWeighDataList[COMMAND90RES_AXLE4WEIGHT_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLE4WEIGHT_LSB]) / Divider
+	SignOfWeight = chr(WagonWeighDataList[COMMAND90RES_SIGN_OF_WEIGHT])
+	Weight = (WagonWeighDataList[COMMAND90RES_WEIGHT_MSB] << 16) + (WagonWeighDataList[COMMAND90RES_WEIGHT_MID] << 8) + WagonWeighDataList[COMMAND90RES_WEIGHT_LSB]
+	WagonDict["SignOfWeight"] = SignOfWeight
+	WagonDict["Weight"] = Weight
+	if(SignOfWeight == "+"):
+		WagonDict["Weight"] = Weight / Divider
+	elif(SignOfWeight == "-"):
+		WagonDict["Weight"] = (NEGATIVE_WEIGHT_OFFSET - Weight) / Divider
+	WagonDict["Message"] = WagonWeighCommandDict[COMMAND90RES_MESSAGE][WagonWeighDataList[COMMAND90RES_MESSAGE]]
+	WagonDict["Direction"] = WagonWeighDataList[COMMAND90RES_DIRECTION]
+	WagonDict["WagonsWeighed"] = WagonWeighDataList[COMMAND90RES_WAGONS_WEIGHED]
+	WagonDict["LastAxle"] = (WagonWeighDataList[COMMAND90RES_LASTAXLE_MSB] << 8) + WagonWeighDataList[COMMAND90RES_LASTAXLE_LSB]
+	WagonDict["SpeedTLPair1"] = ((WagonWeighDataList[COMMAND90RES_SPEED_TLPAIR1_MSB] << 8) + WagonWeighDataList[COMMAND90RES_SPEED_TLPAIR1_LSB]) / WAGON_DATA_VALUE_DIVIDER
+	WagonDict["SpeedTLPair2"] = ((WagonWeighDataList[COMMAND90RES_SPEED_TLPAIR2_MSB] << 8) + WagonWeighDataList[COMMAND90RES_SPEED_TLPAIR2_LSB]) / WAGON_DATA_VALUE_DIVIDER
+	WagonDict["SpeedFromWeigh"] = ((WagonWeighDataList[COMMAND90RES_SPEED_FROM_WEIGH_MSB] << 8) + WagonWeighDataList[COMMAND90RES_SPEED_FROM_WEIGH_LSB]) / WAGON_DATA_VALUE_DIVIDER
+	WagonDict["AxleCountPair1"] = (WagonWeighDataList[COMMAND90RES_AXLECOUNT_PAIR1_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLECOUNT_PAIR1_LSB]
+	WagonDict["AxleCountPair2"] = (WagonWeighDataList[COMMAND90RES_AXLECOUNT_PAIR2_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLECOUNT_PAIR2_LSB]
+	WagonDict["AxleCountPair3"] = (WagonWeighDataList[COMMAND90RES_AXLECOUNT_PAIR3_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLECOUNT_PAIR3_LSB]
+	WagonDict["AxleCountPair4"] = (WagonWeighDataList[COMMAND90RES_AXLECOUNT_PAIR4_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLECOUNT_PAIR4_LSB]
+	WagonDict["AxleWeight"] = (WagonWeighDataList[COMMAND90RES_AXLE_WEIGHED_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLE_WEIGHED_LSB]
+	WagonDict["AxleIgnore"] = (WagonWeighDataList[COMMAND90RES_AXLE_INGNORED_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLE_INGNORED_LSB]
+	WagonDict["WE"] = False
+	return WagonDict
+
+#********************************************************************************************#
+#Description : Function to decode a wagon weigh response through the compiled decoder
+#Arguments : WagonWeighData (bytes or memoryview)
+#Return : Wagon Weighment Dictionary
+#********************************************************************************************#
+def Merit_BenchCompiledWagonDecode(WagonWeighDataList):
+	Response = MeritResponseDecoderDict[MERIT_WAGON_WEIGHT_WRITE_CMD].Decode(WagonWeighDataList)
+	[Response.Axle1Weight, Response.Axle2Weight, Response.Axle3Weight, Response.Axle4Weight]
+	return TLCWithMqtt.Merit_WagonWeightDataParse(Response)
+
+#********************************************************************************************#
+#Description : Function to compare per frame decode cost of the legacy parsers and the compiled decoders
+#Arguments : Parsed command line arguments
+#Return : Result dictionary
+#********************************************************************************************#
+def Merit_BenchDecode(Args):
+	Emulator = MeritTLCEmulator(Merit_EmulatorDefaultRake(1, 10))
+	Decoder = MeritResponseDecoderDict[MERIT_WAGON_WEIGHT_WRITE_CMD]
+	FrameList = []
+	for SerialNumber in range(1, 12):
+		Frame = Merit_RemoveStuffBytes(Emulator.CommandResponse(MERIT_WAGON_WEIGHT_WRITE_CMD, [SerialNumber, TEST_WAGON, RESOULUTION_LSB, RESOULUTION_MSB]))
+		FrameList.append(Frame[MERIT_COMMAND_ID_POSITION : MERIT_COMMAND_ID_POSITION + WAGON_PAYLOAD_LENGTH])
+	FrameList = (FrameList * (Args.frames // len(FrameList) + 1))[ : Args.frames]
+	ListFrameList = [list(Frame) for Frame in FrameList]
+	Result = {}
+	Result["Frames"] = Args.frames
+	Result["LegacyUs"] = Merit_BenchTimePerFrame(lambda Frames : [Merit_BenchLegacyWagonDecode(Frame) for Frame in Frames], ListFrameList, Args.repeat)
+	Result["CompiledUs"] = Merit_BenchTimePerFrame(lambda Frames : [Merit_BenchCompiledWagonDecode(Frame) for Frame in Frames], FrameList, Args.repeat)
+	Result["RecordOnlyUs"] = Merit_BenchTimePerFrame(lambda Frames : [Decoder.Decode(Frame) for Frame in Frames], FrameList, Args.repeat)
+	Result["Speedup"] = round(Result["LegacyUs"] / Result["CompiledUs"], 1)
+	return Result
+
+#********************************************************************************************#
+#Description : Function to compare payload size and encode cost of the weighment topic encodings
+#Arguments : Parsed command line arguments
+#Return : Result dictionary
+#Notes : The input is the wagon record JSON string as the wagon store keeps it
+#********************************************************************************************#
+def Merit_BenchEncode(Args):
+	Emulator = MeritTLCEmulator(Merit_EmulatorDefaultRake(1, 10))
+	RecordList = []
+	for SerialNumber in range(2, 12):
+		Frame = Merit_RemoveStuffBytes(Emulator.CommandResponse(MERIT_WAGON_WEIGHT_WRITE_CMD, [SerialNumber, TEST_WAGON, RESOULUTION_LSB, RESOULUTION_MSB]))
+		WagonDict = Merit_BenchCompiledWagonDecode(Frame[MERIT_COMMAND_ID_POSITION : MERIT_COMMAND_ID_POSITION + WAGON_PAYLOAD_LENGTH])
+		WagonDict["StartTime"] = str(datetime.datetime.now())
+		WagonDict["EndTime"] = str(datetime.datetime.now())
+		WagonDict["WE"] = True
+		RecordList.append(json.dumps(WagonDict))
+	RecordList = (RecordList * (Args.frames // len(RecordList) + 1))[ : Args.frames]
+	SchemaDict = TLCWithMqtt.MeritPayloadSchemaDict
+	Result = {"Messages" : Args.frames}
+	for Name, (Encoding, FieldNameList, CompressFlag) in BenchEncodingDict.items():
+		Encoder = MeritPayloadEncoder(Encoding, SchemaDict[TLCWithMqtt.MERIT_WAGON_PAYLOAD_SCHEMA_ID], FieldNameList, CompressFlag)
+		PayloadList = [Encoder.Encode(Record) for Record in RecordList]
+		RoundTripFlag = True
+		for Record, Payload in zip(RecordList, PayloadList):
+			RecordDict = json.loads(Record)
+			if(FieldNameList is not None):
+				RecordDict = {Key : Value for Key, Value in RecordDict.items() if(Key in FieldNameList)}
+			RoundTripFlag = RoundTripFlag and (Merit_DecodePayload(Payload, SchemaDict) == RecordDict)
+		Result[Name] = {"BytesPerMessage" : round(sum(len(Payload) for Payload in PayloadList) / len(PayloadList), 1),
+			"EncodeUs" : Merit_BenchTimePerFrame(lambda Records : [Encoder.Encode(Record) for Record in Records], RecordList, Args.repeat),
+			"DecodeUs" : Merit_BenchTimePerFrame(lambda Payloads : [Merit_DecodePayload(Payload, SchemaDict) for Payload in Payloads], PayloadList, Args.repeat),
+			"RoundTrip" : RoundTripFlag}
+	return Result
+
+#********************************************************************************************#
+#Description : Function to find the TLC the way TLCWithMqtt.py 1.2.4 did, one port after another with readline
+#Arguments : List of port names
+#Return : Port name, empty if not found
+#********************************************************************************************#
+def Merit_BenchLegacyFindPort(PortNameList):
+	for PortName in PortNameList:
+		LegacyPort = serial.Serial(
+			port = PortName, baudrate = MERIT_SERIAL_BAUD_RATE, bytesize = MERIT_SERIAL_DATABITS, parity = MERIT_SERIAL_PARITY,
+			stopbits = MERIT_SERIAL_STOPBITS, timeout = MERIT_SERIAL_TIMEOUT, interCharTimeout = MERIT_SERIAL_INTER_CHAR_TIMEOUT)
+		LegacyPort.write(MERIT_TLC_FWVER_LIST)
+		data = LegacyPort.readline()
+		LegacyPort.close()
+		if(data):
+			return PortName
+	return ""
+
+#********************************************************************************************#
+#Description : Function to time a port discovery function
+#Arguments : Discovery function returning the port name, Port name list, Expected port name
+#Return : Time taken in milli seconds
+#********************************************************************************************#
+def Merit_BenchDiscoveryTime(Discovery, PortNameList, ExpectedPort):
+	StartTime = time.perf_counter()
+	PortName = Discovery(PortNameList)
+	TimeTaken = time.perf_counter() - StartTime
+	if(PortName != ExpectedPort):
+		raise ValueError("Discovery found " + str(PortName) + " instead of " + ExpectedPort)
+	return round(TimeTaken * 1000, 1)
+
+#********************************************************************************************#
+#Description : Function to find the TLC through the parallel frame aware probe and release the port
+#Arguments : List of port names
+#Return : Port name, empty if not found
+#********************************************************************************************#
+def Merit_BenchParallelFindPort(PortNameList):
+	ProbePort, PortName, Frame = Merit_ProbeTLCPorts(PortNameList)
+	if(ProbePort is not None):
+		ProbePort.close()
+	return PortName
+
+#********************************************************************************************#
+#Description : Function to compare sequential readline discovery with the parallel frame aware probe
+#Arguments : Parsed command line arguments
+#Return : Result dictionary
+#Notes : Silent ports are pseudo terminals nobody answers on, the emulator is the last port
+#********************************************************************************************#
+def Merit_BenchDiscover(Args):
+	Emulator = MeritTLCEmulator(Merit_EmulatorDefaultRake(1, 10))
+	EmulatorPort = Emulator.Start()
+	SilentList = [os.openpty() for Index in range(Args.ports)]
+	PortNameList = [os.ttyname(Slave) for Master, Slave in SilentList] + [EmulatorPort]
+	Result = {}
+	Result["SilentPorts"] = Args.ports
+	Result["LegacySequentialMs"] = Merit_BenchDiscoveryTime(Merit_BenchLegacyFindPort, PortNameList, EmulatorPort)
+	Result["ParallelProbeMs"] = Merit_BenchDiscoveryTime(Merit_BenchParallelFindPort, PortNameList, EmulatorPort)
+	Result["LastKnownPortMs"] = Merit_BenchDiscoveryTime(Merit_BenchParallelFindPort, [EmulatorPort], EmulatorPort)
+	for Master, Slave in SilentList:
+		os.close(Master)
+		os.close(Slave)
+	Emulator.Stop()
+	return Result
+
+#********************************************************************************************#
+#Description : Entry point of this program
+#Notes : Run from a scratch directory, TLCWithMqtt.py logs into ./MeritLogs.log
+#********************************************************************************************#
+if __name__=="__main__": #To run as a standalone script
+	Parser = argparse.ArgumentParser(description = "Merit edge software benchmark")
+	SubParsers = Parser.add_subparsers(dest = "bench", required = True)
+	RakeParser = SubParsers.add_parser("rake", help = "End to end rake against the TLC emulator")
+	RakeParser.add_argument("--rake", help = "Rake script json file")
+	RakeParser.add_argument("--locos", type = int, default = 1, help = "Locos in the default rake")
+	RakeParser.add_argument("--wagons", type = int, default = 10, help = "Wagons in the default rake")
+	RakeParser.add_argument("--interval", type = float, default = EMULATOR_DEFAULT_INTERVAL, help = "Seconds between vehicles")
+	RakeParser.add_argument("--rakes", type = int, default = 1, help = "Number of rakes to run")
+	RakeParser.add_argument("--no-baud", action = "store_true", help = "Do not simulate the 19200 baud transmission time")
+	RakeParser.add_argument("--bulk", action = "store_true", help = "Read the rake in bulk with the 0x82-0x8B axle range commands")
+	RakeParser.add_argument("--batch", type = int, help = "Also publish rake batches of this many wagons, 0 for the whole rake")
+	RakeParser.add_argument("--no-compress", action = "store_true", help = "Do not compress the rake batches")
+	RakeParser.add_argument("--outage", type = float, nargs = 2, metavar = ("START", "SECONDS"), help = "Drop the broker link START seconds into the rake for SECONDS")
+	RakeParser.add_argument("--qos", type = int, choices = (0, 1, 2), help = "QoS of the Weighment topic instead of MeritTopicQosConfigDict")
+	RakeParser.add_argument("--rtt", type = float, default = 20, help = "Broker round trip time in ms until a QoS 1/2 publish is acknowledged")
+	RakeParser.add_argument("--engine", choices = (TLCWithMqtt.MERIT_ENGINE_THREADED, TLCWithMqtt.MERIT_ENGINE_ASYNCIO), default = TLCWithMqtt.MERIT_ENGINE_THREADED, help = "Engine of the edge code")
+	RakeParser.add_argument("--capture", metavar = "FILE", help = "Write the serial frames of the rakes to a capture file for TLCReplay.py")
+	CrcParser = SubParsers.add_parser("crc", help = "CRC16 implementations")
+	CrcParser.add_argument("--frames", type = int, default = 5000, help = "Number of frames")
+	CrcParser.add_argument("--length", type = int, default = WAGON_PAYLOAD_LENGTH + 6, help = "Bytes per frame")
+	CrcParser.add_argument("--repeat", type = int, default = 5, help = "Repeat count, best time is reported")
+	AllocParser = SubParsers.add_parser("alloc", help = "Memory allocation of the frame codec per poll cycle")
+	AllocParser.add_argument("--cycles", type = int, default = 2000, help = "Number of poll cycles")
+	DecodeParser = SubParsers.add_parser("decode", help = "Per frame decode cost of the wagon weigh response")
+	DecodeParser.add_argument("--frames", type = int, default = 5000, help = "Number of frames")
+	DecodeParser.add_argument("--repeat", type = int, default = 5, help = "Repeat count, best time is reported")
+	DiscoverParser = SubParsers.add_parser("discover", help = "TLC port discovery time")
+	DiscoverParser.add_argument("--ports", type = int, default = 4, help = "Silent ports probed besides the TLC")
+	IdleParser = SubParsers.add_parser("idle", help = "Serial and broker traffic of an initiated TLC with no rake")
+	IdleParser.add_argument("--seconds", type = float, default = 30, help = "Measurement time after the scheduler settled")
+	IdleParser.add_argument("--engine", choices = (TLCWithMqtt.MERIT_ENGINE_THREADED, TLCWithMqtt.MERIT_ENGINE_ASYNCIO), default = TLCWithMqtt.MERIT_ENGINE_THREADED, help = "Engine of the edge code")
+	SessionsParser = SubParsers.add_parser("sessions", help = "Throughput of one edge program as TLC sessions are added")
+	SessionsParser.add_argument("--tlcs", type = int, nargs = "+", default = [1, 2, 4], help = "TLC counts to run")
+	SessionsParser.add_argument("--locos", type = int, default = 1, help = "Locos in the rake of every TLC")
+	SessionsParser.add_argument("--wagons", type = int, default = 20, help = "Wagons in the rake of every TLC")
+	SessionsParser.add_argument("--interval", type = float, default = 0.2, help = "Seconds between vehicles")
+	SessionsParser.add_argument("--rtt", type = float, default = 20, help = "Broker round trip time in ms until a QoS 1/2 publish is acknowledged")
+	SessionsParser.add_argument("--engine", choices = (TLCWithMqtt.MERIT_ENGINE_THREADED, TLCWithMqtt.MERIT_ENGINE_ASYNCIO), default = TLCWithMqtt.MERIT_ENGINE_THREADED, help = "Engine of the sessions")
+	EncodeParser = SubParsers.add_parser("encode", help = "Payload size and encode cost of the weighment topic encodings")
+	EncodeParser.add_argument("--frames", type = int, default = 5000, help = "Number of wagon records")
+	EncodeParser.add_argument("--repeat", type = int, default = 5, help = "Repeat count, best time is reported")
+	Args = Parser.parse_args()
+
+	if(Args.bench == "rake"):
+		ResultList = Merit_BenchRake(Args)
+	elif(Args.bench == "crc"):
+		ResultList = [Merit_BenchCrc(Args)]
+	elif(Args.bench == "alloc"):
+		ResultList = [Merit_BenchAlloc(Args)]
+	elif(Args.bench == "decode"):
+		ResultList = [Merit_BenchDecode(Args)]
+	elif(Args.bench == "discover"):
+		ResultList = [Merit_BenchDiscover(Args)]
+	elif(Args.bench == "idle"):
+		ResultList = [Merit_BenchIdle(Args)]
+	elif(Args.bench == "encode"):
+		ResultList = [Merit_BenchEncode(Args)]
+	elif(Args.bench == "sessions"):
+		ResultList = Merit_BenchSessions(Args)
+	for Result in ResultList:
+		print(json.dumps(Result, indent = 4))
+	sys.exit(0)
@@ -0,0 +1,405 @@
+#Filename : TLCEmulator.py
+#Version  :	1.0.0
+#Description : Software Track Logic Controller(TLC) emulator over a Linux pseudo terminal
+#Date : Oct 2026
+
+#***********************************************************************************#
+#*************** Import Libraries **************************************************#
+#***********************************************************************************#
+import os
+import sys
+import tty
+import json
+import time
+import select
+import argparse
+import threading
+from TLCWithMqtt import *
+
+#***********************************************************************************#
+#*************** File Constants ****************************************************#
+#***********************************************************************************#
+EMULATOR_SELECT_TIMEOUT			= 0.05
+EMULATOR_READ_CHUNK_SIZE		= 256
+EMULATOR_BITS_PER_BYTE			= 10		#Start bit + 8 data bits + Stop bit
+EMULATOR_DEFAULT_INTERVAL		= 0.5		#Seconds between two vehicles leaving the weighbridge
+EMULATOR_DEFAULT_START_DELAY	= 1.0		#Seconds between Init command and the first axle
+EMULATOR_AXLE_NOT_WEIGHED		= -3		#AxleWeightDict : WeighingToBeDone
+EMULATOR_WEIGHT_SCALE			= WAGON_DATA_VALUE_DIVIDER * WAGON_DATA_VALUE_DIVIDER
+EMULATOR_FIRMWARE_VERSION		= "MERIT TLC V 2.1.0"
+EMULATOR_FIRMWARE_RELEASEDATE	= "12-Jan-2023"
+
+#Wagon weigh messages used by the emulator
+EMULATOR_MESSAGE_SYSTEMREADY	= 1
+EMULATOR_MESSAGE_WEIGHING		= 7
+
+#Default vehicles of a scripted rake
+EMULATOR_DEFAULT_LOCO = {"Type" : FOUR_AXLE_LOCO, "AxleWeights" : [22.5, 22.5, 22.5, 22.5], "Speed" : 12.0}
+EMULATOR_DEFAULT_WAGON = {"Type" : FOUR_AXLE_WAGON, "AxleWeights" : [20.4, 20.6, 20.2, 20.8], "Speed" : 12.0}
+
+#***********************************************************************************#
+#******************************* Functions *****************************************#
+#***********************************************************************************#
+#********************************************************************************************#
+#Description : Function to build a rake script with locos at the front followed by wagons
+#Arguments : LocoCount, WagonCount, Interval between vehicles in seconds
+#Return : Rake script dictionary
+#********************************************************************************************#
+def Merit_EmulatorDefaultRake(LocoCount, WagonCount, Interval = EMULATOR_DEFAULT_INTERVAL):
+	Vehicles = []
+	for Index in range(LocoCount):
+		Vehicles.append(dict(EMULATOR_DEFAULT_LOCO))
+	for Index in range(WagonCount):
+		Wagon = dict(EMULATOR_DEFAULT_WAGON)
+		#Vary the axle weights a little so that every wagon record is different
+		Wagon["AxleWeights"] = [Weight + ((Index % 7) / 10) for Weight in EMULATOR_DEFAULT_WAGON["AxleWeights"]]
+		Vehicles.append(Wagon)
+	return {"VehicleInterval" : Interval, "StartDelay" : EMULATOR_DEFAULT_START_DELAY, "Vehicles" : Vehicles}
+
+#********************************************************************************************#
+#Description : Function to load a rake script from a json file
+#Arguments : FileName
+#Return : Rake script dictionary
+#********************************************************************************************#
+def Merit_EmulatorLoadRake(FileName):
+	with open(FileName, "r") as RakeFile:
+		Rake = json.load(RakeFile)
+	Rake.setdefault("VehicleInterval", EMULATOR_DEFAULT_INTERVAL)
+	Rake.setdefault("StartDelay", EMULATOR_DEFAULT_START_DELAY)
+	return Rake
+
+#********************************************************************************************#
+#Description : Function to build a stuffed TLC response frame
+#Arguments : Command, Payload (list of ints or bytes)
+#Return : Frame bytes as sent on the wire
+#********************************************************************************************#
+def Merit_EmulatorBuildFrame(Command, Payload):
+	return Merit_AddStuffBytes(Merit_BuildCommandFrame(Command, Payload, len(Payload)))
+
+#********************************************************************************************#
+#Description : Function to put a 16 bit value into a command response list (LSB first)
+#Arguments : DataList, LSB Position, Value
+#Return : None
+#********************************************************************************************#
+def Merit_EmulatorPut16(DataList, Position, Value):
+	Value = int(Value) & 0xffff
+	DataList[Position] = Value & 0xff
+	DataList[Position + 1] = Value >> 8
+
+#********************************************************************************************#
+#Description : Function to put a 24 bit value into a command response list (LSB, MID, MSB)
+#Arguments : DataList, LSB Position, Value
+#Return : None
+#********************************************************************************************#
+def Merit_EmulatorPut24(DataList, Position, Value):
+	Value = int(Value) & 0xffffff
+	DataList[Position] = Value & 0xff
+	DataList[Position + 1] = (Value >> 8) & 0xff
+	DataList[Position + 2] = Value >> 16
+
+#***********************************************************************************#
+#******************************* Classes *******************************************#
+#***********************************************************************************#
+#********************************************************************************************#
+#Description : TLC emulator serving the TLC serial protocol on the master side of a pty
+#Notes : The slave side path returned by Start() is opened by the edge code like a RS232 port
+#********************************************************************************************#
+class MeritTLCEmulator:
+	def __init__(self, Rake, SimulateBaudRate = True):
+		self.m_Rake = Rake
+		self.m_Vehicles = Rake["Vehicles"]
+		self.m_SimulateBaudRate = SimulateBaudRate
+		self.m_MasterFd = -1
+		self.m_SlaveFd = -1
+		self.m_SlaveName = ""
+		self.m_Thread = None
+		self.m_RunFlag = False
+		self.m_Lock = threading.Lock()
+		self.m_RxDecoder = MeritFrameDecoder()
+		self.m_InitFlag = False
+		self.m_RakeStartTime = None
+		self.m_OutputStatus = 0
+		self.m_ThreadCpuTime = 0.0
+		self.Reset()
+
+	#********************************************************************************************#
+	#Description : Function to reset the request counters and the vehicle completion times
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def Reset(self):
+		with self.m_Lock:
+			self.m_RequestCountDict = {}
+			self.m_BadFrameCount = 0
+			self.m_VehicleDoneTimeList = [None] * len(self.m_Vehicles)
+
+	#********************************************************************************************#
+	#Description : Function to open the pty and start the emulator thread
+	#Arguments : None
+	#Return : Slave port name to be opened by the edge code
+	#********************************************************************************************#
+	def Start(self):
+		self.m_MasterFd, self.m_SlaveFd = os.openpty()
+		tty.setraw(self.m_SlaveFd)
+		self.m_SlaveName = os.ttyname(self.m_SlaveFd)
+		self.m_RunFlag = True
+		self.m_Thread = threading.Thread(target = self.Run, args = (), daemon = True)
+		self.m_Thread.start()
+		return self.m_SlaveName
+
+	#********************************************************************************************#
+	#Description : Function to stop the emulator thread and close the pty
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def Stop(self):
+		self.m_RunFlag = False
+		if(self.m_Thread is not None):
+			self.m_Thread.join()
+		os.close(self.m_MasterFd)
+		os.close(self.m_SlaveFd)
+
+	#********************************************************************************************#
+	#Description : Function to start the scripted rake, first axle arrives after StartDelay
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def StartRake(self):
+		with self.m_Lock:
+			self.m_VehicleDoneTimeList = [None] * len(self.m_Vehicles)
+			self.m_RakeStartTime = time.monotonic() + self.m_Rake["StartDelay"]
+
+	#********************************************************************************************#
+	#Description : Function to get the monotonic time at which the vehicle left the weighbridge
+	#Arguments : Vehicle serial number (1 based, locos included)
+	#Return : Monotonic time or None if not yet weighed
+	#********************************************************************************************#
+	def VehicleDoneTime(self, SerialNumber):
+		return self.m_VehicleDoneTimeList[SerialNumber - 1]
+
+	#********************************************************************************************#
+	#Description : Function to get the number of vehicles weighed so far in the scripted rake
+	#Arguments : None
+	#Return : Weighed vehicle count
+	#********************************************************************************************#
+	def VehiclesWeighed(self):
+		if((self.m_RakeStartTime is None) or (self.m_InitFlag == False)):
+			return 0
+		Now = time.monotonic()
+		Count = int((Now - self.m_RakeStartTime) / self.m_Rake["VehicleInterval"])
+		Count = max(0, min(Count, len(self.m_Vehicles)))
+		for Index in range(Count):
+			if(self.m_VehicleDoneTimeList[Index] is None):
+				self.m_VehicleDoneTimeList[Index] = self.m_RakeStartTime + ((Index + 1) * self.m_Rake["VehicleInterval"])
+		return Count
+
+	#********************************************************************************************#
+	#Description : Emulator thread, reads the requests from the pty and writes the responses
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def Run(self):
+		CpuStartTime = time.thread_time()
+		while(self.m_RunFlag):
+			ReadyList, _, _ = select.select([self.m_MasterFd], [], [], EMULATOR_SELECT_TIMEOUT)
+			if(ReadyList):
+				try:
+					data = os.read(self.m_MasterFd, EMULATOR_READ_CHUNK_SIZE)
+				except OSError:
+					continue
+				self.m_RxDecoder.Feed(data)
+				FrameEntry = self.m_RxDecoder.GetFrame()
+				while(FrameEntry is not None):
+					self.HandleFrame(FrameEntry[0], FrameEntry[1])
+					FrameEntry = self.m_RxDecoder.GetFrame()
+			self.m_ThreadCpuTime = time.thread_time() - CpuStartTime
+
+	#********************************************************************************************#
+	#Description : Function to handle a decoded request frame and write the response
+	#Arguments : ReceiveStatus from the frame decoder, Unstuffed request frame list
+	#Return : None
+	#********************************************************************************************#
+	def HandleFrame(self, ReceiveStatus, Frame):
+		LengthOfQuery = Frame[MERIT_QUERY_LEN_POSITION] + (Frame[MERIT_QUERY_LEN_POSITION + 1] << 8)
+		if(ReceiveStatus != MERIT_READ_SUCCESS):
+			with self.m_Lock:
+				self.m_BadFrameCount = self.m_BadFrameCount + 1
+			return
+		Command = Frame[MERIT_COMMAND_ID_POSITION]
+		Payload = Frame[(MERIT_COMMAND_ID_POSITION + 1) : (MERIT_COMMAND_ID_POSITION + LengthOfQuery)]
+		with self.m_Lock:
+			self.m_RequestCountDict[Command] = self.m_RequestCountDict.get(Command, 0) + 1
+		Response = self.CommandResponse(Command, Payload)
+		if(Response is None):
+			return
+		if(self.m_SimulateBaudRate == True):
+			time.sleep((len(Response) * EMULATOR_BITS_PER_BYTE) / MERIT_SERIAL_BAUD_RATE)
+		os.write(self.m_MasterFd, Response)
+
+	#********************************************************************************************#
+	#Description : Function to build the response for the given command
+	#Arguments : Command, Request Payload list
+	#Return : Response frame bytes, None for unknown commands (edge code sees a read timeout)
+	#********************************************************************************************#
+	def CommandResponse(self, Command, Payload):
+		if(Command == MERIT_WAGON_WEIGHT_WRITE_CMD):
+			return Merit_EmulatorBuildFrame(Command, self.WeighmentPayload(Payload[SERIAL_NUMBER_OF_WAGON]))
+		if(Command == MERIT_DIGITAL_OUTPUT_STATUS_READ_CMD):
+			return Merit_EmulatorBuildFrame(Command, self.StatusPayload(self.m_OutputStatus))
+		if(Command == MERIT_DIGITAL_INPUT_STATUS_READ_CMD):
+			return Merit_EmulatorBuildFrame(Command, self.StatusPayload(self.InputStatus()))
+		if(Command == MERIT_VERSION_OF_CODE_READ_CMD):
+			return Merit_EmulatorBuildFrame(Command, list(EMULATOR_FIRMWARE_VERSION.encode()))
+		if(Command == MERIT_CODE_RELAESE_DATE_READ_CMD):
+			return Merit_EmulatorBuildFrame(Command, list(EMULATOR_FIRMWARE_RELEASEDATE.encode()))
+		if(Command == MERIT_INIT_AND_AXLE_ELIMINATE_WRITE_CMD):
+			self.m_InitFlag = True
+			self.m_OutputStatus = (1 << COMMAND4RES_SYSTEM_READY) | (1 << COMMAND4RES_SYSTEM_READY_LAMP)
+			return Merit_EmulatorBuildFrame(Command, [])
+		if(Command == MERIT_TERMINATE_WRITE_CMD):
+			self.m_InitFlag = False
+			self.m_RakeStartTime = None
+			self.m_OutputStatus = 0
+			return Merit_EmulatorBuildFrame(Command, [])
+		if(Command == MERIT_OUTPUT_STATUS_WRITE_CMD):
+			if((Payload[1] == MERIT_STATUS_HIGH_PULSE) or (Payload[1] == MERIT_STATUS_HIGH_PERMANENT)):
+				self.m_OutputStatus = self.m_OutputStatus | (1 << (Payload[0] - 1))
+			else:
+				self.m_OutputStatus = self.m_OutputStatus & ~(1 << (Payload[0] - 1))
+			return Merit_EmulatorBuildFrame(Command, [])
+		if(Command == MERIT_OUTPUT_STATUS_RESET_WRITE_CMD):
+			self.m_OutputStatus = 0
+			return Merit_EmulatorBuildFrame(Command, [])
+		if(Command == MERIT_SCOREBOARD_AVAIL_WRITE_CMD):
+			return Merit_EmulatorBuildFrame(Command, [])
+		if(Command in MeritAxleRangeCommandList):
+			return Merit_EmulatorBuildFrame(Command, self.AxleRangePayload(MeritAxleRangeCommandList.index(Command)))
+		return None
+
+	#********************************************************************************************#
+	#Description : Function to build the current/actual status payload of Command 0x04/0x0A
+	#Arguments : Status bits
+	#Return : Payload list
+	#********************************************************************************************#
+	def StatusPayload(self, Status):
+		DataList = [0] * (ACTUAL_OUTPUT_STATUS_MSB + 1)
+		Merit_EmulatorPut16(DataList, CURRENT_OUTPUT_STATUS_LSB, Status)
+		Merit_EmulatorPut16(DataList, ACTUAL_OUTPUT_STATUS_LSB, Status)
+		return DataList[1 : ]
+
+	#********************************************************************************************#
+	#Description : Function to get the input status bits for the current rake position
+	#Arguments : None
+	#Return : Input status bits
+	#********************************************************************************************#
+	def InputStatus(self):
+		Weighed = self.VehiclesWeighed()
+		if((self.m_RakeStartTime is None) or (time.monotonic() < self.m_RakeStartTime)):
+			return 0
+		if(Weighed < len(self.m_Vehicles)):
+			#Rake on the weighbridge, axle sensors and track switches are toggling
+			InputStatus = (1 << COMMAND10RES_START_WEIGH) | (1 << COMMAND10RES_AOS_IN_DIR_5A) | (1 << COMMAND10RES_AOS_IN_DIR_5B)
+			if(Weighed % 2):
+				InputStatus = InputStatus | (1 << COMMAND10RES_TRACKSWITCH_1A) | (1 << COMMAND10RES_TRACKSWITCH_2A)
+			else:
+				InputStatus = InputStatus | (1 << COMMAND10RES_TRACKSWITCH_1B) | (1 << COMMAND10RES_TRACKSWITCH_2B)
+			return InputStatus
+		return (1 << COMMAND10RES_END_WEIGH)
+
+	#********************************************************************************************#
+	#Description : Function to build the Command 0x82-0x8B axle range response payload
+	#Arguments : Range index (0 for axles 1 to 50)
+	#Return : Payload list, a vehicle serial number and a 16 bit weight per weighed axle of the range
+	#********************************************************************************************#
+	def AxleRangePayload(self, RangeIndex):
+		DataList = []
+		for SerialNumber, Vehicle in enumerate(self.m_Vehicles[ : self.VehiclesWeighed()], 1):
+			for Weight in Vehicle["AxleWeights"]:
+				DataList.append(SerialNumber & 0xff)
+				DataList.extend([0, 0])
+				Merit_EmulatorPut16(DataList, len(DataList) - 2, round(Weight * EMULATOR_WEIGHT_SCALE))
+		RecordSize = MeritAxleRecordDtype.itemsize
+		return DataList[(RangeIndex * MERIT_AXLES_PER_RANGE_CMD * RecordSize) : ((RangeIndex + 1) * MERIT_AXLES_PER_RANGE_CMD * RecordSize)]
+
+	#********************************************************************************************#
+	#Description : Function to build the Command 0x5A response payload
+	#Arguments : Requested wagon serial number (0 for the live weight status)
+	#Return : Payload list
+	#********************************************************************************************#
+	def WeighmentPayload(self, SerialNumber):
+		DataList = [0] * WAGON_PAYLOAD_LENGTH
+		DataList[COMMAND90RES_COMMAND_POSITION] = MERIT_WAGON_WEIGHT_WRITE_CMD
+		Weighed = self.VehiclesWeighed()
+		AxleCount = sum(len(Vehicle["AxleWeights"]) for Vehicle in self.m_Vehicles[ : Weighed])
+		LiveWeight = 0
+		Message = EMULATOR_MESSAGE_SYSTEMREADY
+		if(self.m_RakeStartTime is not None) and (time.monotonic() >= self.m_RakeStartTime):
+			Message = EMULATOR_MESSAGE_WEIGHING
+			if(Weighed < len(self.m_Vehicles)):
+				LiveWeight = sum(self.m_Vehicles[Weighed]["AxleWeights"]) * EMULATOR_WEIGHT_SCALE
+			else:
+				Message = COMMAND90RES_MESSAGE_WEIGHINGOVER
+		DataList[COMMAND90RES_SIGN_OF_WEIGHT] = ord("+")
+		Merit_EmulatorPut24(DataList, COMMAND90RES_WEIGHT_LSB, LiveWeight)
+		DataList[COMMAND90RES_DIRECTION] = 1
+		DataList[COMMAND90RES_MESSAGE] = Message
+		DataList[COMMAND90RES_WAGONS_WEIGHED] = min(Weighed, 0xff)
+		Merit_EmulatorPut16(DataList, COMMAND90RES_LASTAXLE_LSB, AxleCount)
+		Merit_EmulatorPut16(DataList, COMMAND90RES_AXLECOUNT_PAIR1_LSB, AxleCount)
+		Merit_EmulatorPut16(DataList, COMMAND90RES_AXLECOUNT_PAIR2_LSB, AxleCount)
+		Merit_EmulatorPut16(DataList, COMMAND90RES_AXLE_WEIGHED_LSB, AxleCount)
+		if((SerialNumber > 0) and (SerialNumber <= len(self.m_Vehicles))):
+			Vehicle = self.m_Vehicles[SerialNumber - 1]
+			AxleWeightList = [Weight * EMULATOR_WEIGHT_SCALE for Weight in Vehicle["AxleWeights"]]
+			if(SerialNumber > Weighed):
+				AxleWeightList = [EMULATOR_AXLE_NOT_WEIGHED] * len(AxleWeightList)
+			AxleWeightList = (AxleWeightList + [0, 0, 0, 0])[ : 4]
+			Speed = Vehicle.get("Speed", 0) * WAGON_DATA_VALUE_DIVIDER
+			DataList[COMMAND90RES_WAGON_SERIAL_NUMBER] = SerialNumber
+			DataList[COMMAND90RES_WAGON_TYPE] = Vehicle["Type"] & 0xff
+			Merit_EmulatorPut24(DataList, COMMAND90RES_WAGON_WEIGHT_LSB, max(0, sum(AxleWeightList)))
+			Merit_EmulatorPut16(DataList, COMMAND90RES_AXLE1WEIGHT_LSB, round(AxleWeightList[0]))
+			Merit_EmulatorPut16(DataList, COMMAND90RES_AXLE2WEIGHT_LSB, round(AxleWeightList[1]))
+			Merit_EmulatorPut16(DataList, COMMAND90RES_AXLE3WEIGHT_LSB, round(AxleWeightList[2]))
+			Merit_EmulatorPut16(DataList, COMMAND90RES_AXLE4WEIGHT_LSB, round(AxleWeightList[3]))
+			Merit_EmulatorPut16(DataList, COMMAND90RES_WAGON_SPEED_LSB, Speed)
+			Merit_EmulatorPut16(DataList, COMMAND90RES_SPEED_FROM_WEIGH_LSB, Speed)
+		return DataList[1 : ]
+
+#********************************************************************************************#
+#Description : Entry point of this program
+#Notes : Runs the emulator standalone, point the edge code at the printed port name
+#********************************************************************************************#
+if __name__=="__main__": #To run as a standalone script
+	Parser = argparse.ArgumentParser(description = "Merit TLC emulator over a pseudo terminal")
+	Parser.add_argument("--rake", help = "Rake script json file")
+	Parser.add_argument("--locos", type = int, default = 1, help = "Locos in the default rake")
+	Parser.add_argument("--wagons", type = int, default = 20, help = "Wagons in the default rake")
+	Parser.add_argument("--interval", type = float, default = EMULATOR_DEFAULT_INTERVAL, help = "Seconds between vehicles")
+	Parser.add_argument("--link", help = "Symlink to create for the slave port, e.g. /tmp/ttyTLC")
+	Args = Parser.parse_args()
+
+	if(Args.rake):
+		Rake = Merit_EmulatorLoadRake(Args.rake)
+	else:
+		Rake = Merit_EmulatorDefaultRake(Args.locos, Args.wagons, Args.interval)
+	Emulator = MeritTLCEmulator(Rake)
+	SlaveName = Emulator.Start()
+	if(Args.link):
+		if(os.path.islink(Args.link)):
+			os.remove(Args.link)
+		os.symlink(SlaveName, Args.link)
+		SlaveName = Args.link
+	print("TLC emulator running on port : " + SlaveName)
+	try:
+		LastInitFlag = False
+		while(True):
+			#Rake starts rolling as soon as the edge code initiates the weighment
+			if((Emulator.m_InitFlag == True) and (LastInitFlag == False)):
+				Emulator.StartRake()
+				print("Rake started, vehicles : " + str(len(Rake["Vehicles"])))
+			LastInitFlag = Emulator.m_InitFlag
+			time.sleep(0.1)
+	except KeyboardInterrupt:
+		Emulator.Stop()
+		sys.exit(0)
@@ -0,0 +1,281 @@
+#Filename : TLCReplay.py
+#Version  :	1.0.0
+#Description : Offline replay of serial capture files through the frame checks and response parsers of TLCWithMqtt.py
+#Date : Oct 2026
+
+#***********************************************************************************#
+#*************** Import Libraries **************************************************#
+#***********************************************************************************#
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import tempfile
+import datetime
+from paho.mqtt import client as mqtt_client
+import TLCWithMqtt
+from TLCWithMqtt import *
+from MeritLogging import Merit_SetupLogging, Merit_StopLogging
+from MeritSerialCapture import Merit_ReadCapture
+
+#***********************************************************************************#
+#*************** File Constants ****************************************************#
+#***********************************************************************************#
+REPLAY_LOG_FILE			= "MeritReplay.log"
+REPLAY_STORE_FILE		= "MeritReplayStore.db"		#wagon records of the replayed rakes, read them with MeritWagonStore.py --file
+#Start byte followed by stuffed pairs or plain bytes, up to the next unstuffed start byte
+REPLAY_RAW_FRAME_PATTERN	= re.compile(rb"\x7e(?:\x10[\s\S]|[^\x7e\x10])*")
+REPLAY_MIN_FRAME_LENGTH		= MERIT_COMMAND_ID_POSITION + 1 + MERIT_CHECKSUM_LENGTH
+
+#***********************************************************************************#
+#******************************* Classes *******************************************#
+#***********************************************************************************#
+#********************************************************************************************#
+#Description : Mqtt client stand-in of the replay, counts the publishes and acknowledges them after every frame
+#Notes : Only the paho client calls used by the response parsers are provided
+#********************************************************************************************#
+class MeritReplayClient:
+	def __init__(self):
+		self.m_MessageId = 0
+		self.m_PendingList = []
+		self.m_PublishCountDict = {}		#Topic : publishes
+		self.m_PublishBytes = 0
+
+	def publish(self, topic, payload = None, qos = 0, retain = False):
+		self.m_MessageId = self.m_MessageId + 1
+		self.m_PublishCountDict[topic] = self.m_PublishCountDict.get(topic, 0) + 1
+		self.m_PublishBytes = self.m_PublishBytes + len(payload)
+		self.m_PendingList.append(self.m_MessageId)
+		return (mqtt_client.MQTT_ERR_SUCCESS, self.m_MessageId)
+
+	def is_connected(self):
+		return True
+
+	#********************************************************************************************#
+	#Description : Function to acknowledge the publishes made so far, like the broker PUBACKs
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def AckAll(self):
+		for MessageId in self.m_PendingList:
+			TLCWithMqtt.Merit_OnPublish(self, None, MessageId)
+		self.m_PendingList = []
+
+#********************************************************************************************#
+#Description : Replay of one capture, splits the received bytes into frames, checks them like the serial
+#			   read does and hands them to Merit_ResponseFrameParse
+#Notes : The received bytes between two sent frames are the answer to the first of them. Commands queued
+#		 by the parsers are dropped since nothing is sent, the captured frames already hold their answers.
+#********************************************************************************************#
+class MeritReplay:
+	def __init__(self, Client):
+		self.m_Client = Client
+		self.m_FrameCount = 0
+		self.m_BadFrameCount = 0
+		self.m_GarbageBytes = 0
+		self.m_RakeIdList = []
+		self.m_WagonCount = 0
+		self.m_RakeOpenFlag = False
+		self.m_ResponseTimeList = []
+
+	#********************************************************************************************#
+	#Description : Function to replay the records of a capture
+	#Arguments : List of (Seconds, Direction, Frame bytes) from Merit_ReadCapture
+	#Return : None
+	#********************************************************************************************#
+	def Run(self, RecordList):
+		ReceiveList = []
+		ReceiveTime = None
+		SendTime = None
+		SendCommand = None
+		for Seconds, Direction, Frame in RecordList:
+			if(Direction == MERIT_FRAME_TX):
+				self.Answer(ReceiveList, SendCommand, SendTime, ReceiveTime)
+				ReceiveList = []
+				SendTime = Seconds
+				SendCommand = Merit_RemoveStuffBytes(Frame)[MERIT_COMMAND_ID_POSITION] if(len(Frame) > MERIT_COMMAND_ID_POSITION) else None
+			else:
+				ReceiveList.append(Frame)
+				ReceiveTime = Seconds
+		self.Answer(ReceiveList, SendCommand, SendTime, ReceiveTime)
+		if(self.m_RakeOpenFlag == True):
+			self.RakeEnd()			#capture stopped before the Terminate
+
+	#********************************************************************************************#
+	#Description : Function to parse the frames received after one sent frame
+	#Arguments : List of received byte chunks, Command sent, Time it was sent, Time of the last received chunk
+	#Return : None
+	#********************************************************************************************#
+	def Answer(self, ReceiveList, SendCommand, SendTime, ReceiveTime):
+		if(len(ReceiveList) == 0):
+			return
+		Data = b"".join(ReceiveList)
+		End = 0
+		for Match in REPLAY_RAW_FRAME_PATTERN.finditer(Data):
+			self.m_GarbageBytes = self.m_GarbageBytes + Match.start() - End
+			End = Match.end()
+			ReceiveSuccessFlag, Frame = self.CheckFrame(Match.group())
+			Command = Frame[MERIT_COMMAND_ID_POSITION] if(len(Frame) > MERIT_COMMAND_ID_POSITION) else SendCommand
+			if((ReceiveSuccessFlag == MERIT_READ_SUCCESS) and (Command == SendCommand) and (SendTime is not None)):
+				self.m_ResponseTimeList.append(ReceiveTime - SendTime)
+			self.Parse(Command, ReceiveSuccessFlag, Frame)
+		self.m_GarbageBytes = self.m_GarbageBytes + len(Data) - End
+
+	#********************************************************************************************#
+	#Description : Function to remove the stuff bytes of a raw frame and check its length, RTU id and checksum
+	#Arguments : Raw frame bytes from the start byte on
+	#Return : (ReceiveStatus, Unstuffed frame bytes)
+	#Notes : Bytes after the length given in the frame header are dropped
+	#********************************************************************************************#
+	def CheckFrame(self, RawFrame):
+		Frame = Merit_RemoveStuffBytes(RawFrame)
+		if(len(Frame) < REPLAY_MIN_FRAME_LENGTH):
+			return (MERIT_DATALEN_MISMATCH, Frame)
+		LengthOfQuery = Frame[MERIT_QUERY_LEN_POSITION] + (Frame[MERIT_QUERY_LEN_POSITION + 1] << 8)
+		FrameLength = MERIT_COMMAND_ID_POSITION + LengthOfQuery + MERIT_CHECKSUM_LENGTH
+		if(len(Frame) < FrameLength):
+			return (MERIT_DATALEN_MISMATCH, Frame)
+		Frame = Frame[ : FrameLength]
+		if(Frame[MERIT_RTU_ID_POSITION] != MERIT_RTUID_BYTE):
+			return (MERIT_RTUID_MISMATCH, Frame)
+		if(Merit_ChecksumForList(Frame[ : -MERIT_CHECKSUM_LENGTH]) != (Frame[-2] | (Frame[-1] << 8))):
+			return (MERIT_CHECKSUM_MISMATCH, Frame)
+		return (MERIT_READ_SUCCESS, Frame)
+
+	#********************************************************************************************#
+	#Description : Function to run one checked frame through the response parsers
+	#Arguments : Command, Receive status, Unstuffed frame bytes
+	#Return : None
+	#Notes : The Init and Terminate responses open and close the rake like Merit_Init and Merit_Terminate do,
+	#		 a capture started during a rake gets a rake opened at its first weigh response
+	#********************************************************************************************#
+	def Parse(self, Command, ReceiveSuccessFlag, Frame):
+		self.m_FrameCount = self.m_FrameCount + 1
+		if(ReceiveSuccessFlag != MERIT_READ_SUCCESS):
+			self.m_BadFrameCount = self.m_BadFrameCount + 1
+		elif((Command == MERIT_INIT_AND_AXLE_ELIMINATE_WRITE_CMD) or ((Command == MERIT_WAGON_WEIGHT_WRITE_CMD) and (self.m_RakeOpenFlag == False))):
+			if(self.m_RakeOpenFlag == True):
+				self.RakeEnd()
+			Merit_RakeStart()
+			self.m_RakeIdList.append(TLCWithMqtt.m_RakeId)
+			self.m_RakeOpenFlag = True
+		TLCWithMqtt.Merit_ResponseFrameParse(Command, ReceiveSuccessFlag, Frame, datetime.datetime.now())
+		self.PublishWagons()
+		if((ReceiveSuccessFlag == MERIT_READ_SUCCESS) and (Command == MERIT_TERMINATE_WRITE_CMD) and (self.m_RakeOpenFlag == True)):
+			self.RakeEnd()
+		Merit_DropQueuedCommands()
+		self.m_Client.AckAll()
+
+	#********************************************************************************************#
+	#Description : Function to publish the stored wagons of the rake like the wagon publisher thread does
+	#Arguments : None
+	#Return : None
+	#Notes : Stops at a wagon the client refused, the publishes are acknowledged after every frame
+	#********************************************************************************************#
+	def PublishWagons(self):
+		while(True):
+			with TLCWithMqtt.m_WagonPublishCondition:
+				NextWagon = Merit_NextWagonToPublish()
+			if((NextWagon[0] is None) or (Merit_PublishWagon(*NextWagon) != 0)):
+				break
+
+	#********************************************************************************************#
+	#Description : Function to close the replayed rake
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def RakeEnd(self):
+		self.m_WagonCount = self.m_WagonCount + TLCWithMqtt.m_WagonStore.RakeWagonCount()
+		Merit_RakeEnd()
+		self.m_RakeOpenFlag = False
+
+#***********************************************************************************#
+#******************************* Functions *****************************************#
+#***********************************************************************************#
+#********************************************************************************************#
+#Description : Function to replay a capture file, best of Repeat runs
+#Arguments : Capture file name, Repeat count
+#Return : Result dictionary
+#Notes : Only the first run writes to the wagon store, the repeats go to a throwaway store so the rakes
+#		 are not stored again. The counts are the ones of the first run.
+#********************************************************************************************#
+def Merit_ReplayCapture(FileName, Repeat):
+	StartWallTime, RecordList = Merit_ReadCapture(FileName)
+	BestTime = None
+	ReplayList = []
+	ClientList = []
+	WagonStore = TLCWithMqtt.m_WagonStore
+	RepeatDir = tempfile.TemporaryDirectory()
+	for RepeatIndex in range(Repeat):
+		if(RepeatIndex == 1):
+			TLCWithMqtt.Merit_OpenWagonStore(os.path.join(RepeatDir.name, REPLAY_STORE_FILE))
+		Client = MeritReplayClient()
+		TLCWithMqtt.m_TLCMqttClient = Client
+		Replay = MeritReplay(Client)
+		StartTime = time.perf_counter()
+		CpuStartTime = time.process_time()
+		Replay.Run(RecordList)
+		Elapsed = time.perf_counter() - StartTime
+		if((BestTime is None) or (Elapsed < BestTime)):
+			BestTime = Elapsed
+			CpuTime = time.process_time() - CpuStartTime
+		ReplayList.append(Replay)
+		ClientList.append(Client)
+	if(TLCWithMqtt.m_WagonStore is not WagonStore):
+		TLCWithMqtt.m_WagonStore.Close()
+		TLCWithMqtt.m_WagonStore = WagonStore
+	RepeatDir.cleanup()
+	Replay = ReplayList[0]
+	Client = ClientList[0]
+	ResponseTimeList = Replay.m_ResponseTimeList
+	Result = {}
+	Result["Capture"] = FileName
+	Result["Start"] = str(datetime.datetime.fromtimestamp(StartWallTime))
+	Result["CaptureSeconds"] = round(RecordList[-1][0], 3) if(RecordList) else 0
+	Result["Records"] = len(RecordList)
+	Result["Frames"] = Replay.m_FrameCount
+	Result["BadFrames"] = Replay.m_BadFrameCount
+	Result["GarbageBytes"] = Replay.m_GarbageBytes
+	Result["RakeIds"] = Replay.m_RakeIdList
+	Result["Wagons"] = Replay.m_WagonCount
+	Result["Publishes"] = Client.m_PublishCountDict
+	Result["PublishBytes"] = Client.m_PublishBytes
+	Result["ResponseMs"] = {
+		"Mean" : round(1000 * sum(ResponseTimeList) / len(ResponseTimeList), 2) if(ResponseTimeList) else None,
+		"Max" : round(1000 * max(ResponseTimeList), 2) if(ResponseTimeList) else None,
+	}
+	Result["ReplaySeconds"] = round(BestTime, 4)
+	Result["ReplayCpuSeconds"] = round(CpuTime, 4)
+	Result["FramesPerSecond"] = round(Replay.m_FrameCount / BestTime, 1) if(BestTime > 0) else None
+	return Result
+
+#********************************************************************************************#
+#Description : Entry point of this program
+#Notes : Logs into ./MeritReplay.log, the replayed wagon records go to the --store database
+#********************************************************************************************#
+if __name__=="__main__": #To run as a standalone script
+	Parser = argparse.ArgumentParser(description = "Replay serial capture files through the TLC response parsers")
+	Parser.add_argument("capture", nargs = "+", help = "Capture files written with --capture")
+	Parser.add_argument("--repeat", type = int, default = 1, help = "Repeat count per capture, best time is reported")
+	Parser.add_argument("--wgid", default = MERIT_DEFAULT_WGID, help = "Weighbridge id of the replayed rakes and topics")
+	Parser.add_argument("--store", default = REPLAY_STORE_FILE, help = "Wagon store database of the replayed rakes")
+	Parser.add_argument("--bulk", action = "store_true", help = "Parse like the edge code run with the bulk axle read")
+	Args = Parser.parse_args()
+
+	Merit_SetupLogging(REPLAY_LOG_FILE)
+	TLCWithMqtt.Merit_GetWBID(Args.wgid)
+	TLCWithMqtt.Merit_OpenWagonStore(Args.store)
+	OutboxDir = tempfile.TemporaryDirectory()			#nothing is left in the outbox, every publish is acknowledged
+	TLCWithMqtt.Merit_OpenMqttOutbox(os.path.join(OutboxDir.name, MERIT_OUTBOX_FILE))
+	TLCWithMqtt.MqttConnectFlag = True
+	TLCWithMqtt.Merit_SetBulkAxleRead(Args.bulk)
+	ResultList = [Merit_ReplayCapture(FileName, Args.repeat) for FileName in Args.capture]
+	TLCWithMqtt.m_WagonStore.Close()
+	TLCWithMqtt.m_MqttOutbox.Close()
+	OutboxDir.cleanup()
+	Merit_StopLogging()
+	for Result in ResultList:
+		print(json.dumps(Result, indent = 4))
+	sys.exit(0)
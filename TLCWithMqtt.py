@@ -1,5 +1,5 @@
 #Filename : TLCWithMqtt.py
-#Version  :	1.2.3
+#Version  :	1.4.8
 #Description : Python Program to control Track Logic Controller(RS232) using Mqtt 
 #Date : Dec 2022
 #Author : Meimurugan Krishna
@@ -10,9 +10,11 @@
 import serial
 from serial.tools import list_ports
 import time
-import numpy as np
 from datetime import datetime
-from queue import PriorityQueue
+from queue import PriorityQueue, Empty
+import heapq
+import itertools
+from concurrent.futures import Future, CancelledError, ThreadPoolExecutor
 import threading
 from threading import Thread
 from paho.mqtt import client as mqtt_client
@@ -21,6 +23,23 @@ import logging
 import requests
 import datetime
 import socket
+import os
+import re
+import zlib
+import asyncio
+import argparse
+import collections
+import signal
+import numpy as np
+from MeritCrc16 import *
+from MeritProtocol import *
+from MeritWagonStore import MeritWagonStore, MERIT_WAGON_STORE_FILE
+from MeritMqttOutbox import MeritMqttOutbox, MeritMqttInFlightWindow, MERIT_OUTBOX_FILE
+from MeritPayloadCodec import *
+from MeritAsyncIO import MeritAsyncWake, MeritAsyncSerialTransport, MeritAsyncMqttLoop, Merit_AsyncHttpPostJson
+from MeritLogging import Merit_SetupLogging, Merit_StopLogging, MeritFrameRing, MERIT_FRAME_TX, MERIT_FRAME_RX
+from MeritSerialCapture import MeritSerialCapture, MERIT_CAPTURE_FILE_NAME
+from MeritSessionHub import MeritSessionHub, MeritSessionMqttClient, MERIT_SESSION_DIR, MERIT_SESSION_SUPERVISE_INTERVAL
 
 #***********************************************************************************#
 #*************** File Constants ****************************************************#
@@ -32,7 +51,7 @@ MERIT_SERIAL_DATABITS				= 8
 MERIT_SERIAL_STOPBITS				= 1
 MERIT_SERIAL_TIMEOUT				= 0.5
 MERIT_SERIAL_INTER_CHAR_TIMEOUT		= 0.05
-MERIT_SERIAL_MAX_BYTES_TO_RECEIVE	= 150
+MERIT_SERIAL_MAX_BYTES_TO_RECEIVE	= 256		#largest frame is the 0x82-0x8B axle range response
 MERIT_QUERY_DELAY					= 0.001
 MERIT_DEFAULT_QUERY_DELAY   = 0.25
 
@@ -47,6 +66,15 @@ MERIT_START_BYTE 					= 0x7E
 MERIT_RTUID_BYTE 					= 0x01
 MERIT_LENGTH_OF_QUERY_LENGTH		= 0x02
 MERIT_ADDITIONAL_BYTE				= 0x10
+MERIT_CHECKSUM_LENGTH				= 0x02
+
+#STUFFING, 0x10 and 0x7E after the header are sent as 0x10 0x10 and 0x10 0x7E
+MERIT_STUFFED_ADDITIONAL_BYTES		= bytes([MERIT_ADDITIONAL_BYTE, MERIT_ADDITIONAL_BYTE])
+MERIT_STUFFED_START_BYTES			= bytes([MERIT_ADDITIONAL_BYTE, MERIT_START_BYTE])
+MERIT_START_BYTES					= bytes([MERIT_START_BYTE])
+MERIT_ADDITIONAL_BYTES				= bytes([MERIT_ADDITIONAL_BYTE])
+#0x10 followed by 0x10/0x7E keeps the second byte, 0x10 followed by anything else is dropped
+MERIT_UNSTUFF_PATTERN				= re.compile(rb"\x10([\x10\x7e])|\x10(?=[^\x10\x7e])")
 
 #READ COMMANDS
 MERIT_DIGITAL_OUTPUT_STATUS_READ_CMD	= 0x04
@@ -74,26 +102,6 @@ MERIT_INPUT_STATUS_WRITE_CMD			= 0x1F
 MERIT_TERMINATE_WRITE_CMD				= 0x5B
 MERIT_INIT_AND_AXLE_ELIMINATE_WRITE_CMD	= 0x5D
 
-#CRC16 Table
-CRC16_TABLE = [
-	0x00000, 0x01189, 0x02312, 0x0329B, 0x04624, 0x057AD, 0x06536, 0x074BF, 0x08C48, 0x09DC1, 0x0AF5A, 0x0BED3, 0x0CA6C, 0x0DBE5, 0x0E97E, 0x0F8F7,
-	0x01081, 0x00108, 0x03393, 0x0221A, 0x056A5, 0x0472C, 0x075B7, 0x0643E, 0x09CC9, 0x08D40, 0x0BFDB, 0x0AE52, 0x0DAED, 0x0CB64, 0x0F9FF, 0x0E876,
-	0x02102, 0x0308B, 0x00210, 0x01399, 0x06726, 0x076AF, 0x04434, 0x055BD, 0x0AD4A, 0x0BCC3, 0x08E58, 0x09FD1, 0x0EB6E, 0x0FAE7, 0x0C87C, 0x0D9F5, 
-	0x03183, 0x0200A, 0x01291, 0x00318, 0x077A7, 0x0662E, 0x054B5, 0x0453C, 0x0BDCB, 0x0AC42, 0x09ED9, 0x08F50, 0x0FBEF, 0x0EA66, 0x0D8FD, 0x0C974,
-	0x04204, 0x0538D, 0x06116, 0x0709F, 0x00420, 0x015A9, 0x02732, 0x036BB, 0x0CE4C, 0x0DFC5, 0x0ED5E, 0x0FCD7, 0x08868, 0x099E1, 0x0AB7A, 0x0BAF3, 
-	0x05285, 0x0430C, 0x07197, 0x0601E, 0x014A1, 0x00528, 0x037B3, 0x0263A, 0x0DECD, 0x0CF44, 0x0FDDF, 0x0EC56, 0x098E9, 0x08960, 0x0BBFB, 0x0AA72, 
-	0x06306, 0x0728F, 0x04014, 0x0519D, 0x02522, 0x034AB, 0x00630, 0x017B9, 0x0EF4E, 0x0FEC7, 0x0CC5C, 0x0DDD5, 0x0A96A, 0x0B8E3, 0x08A78, 0x09BF1,
-	0x07387, 0x0620E, 0x05095, 0x0411C, 0x035A3, 0x0242A, 0x016B1, 0x00738, 0x0FFCF, 0x0EE46, 0x0DCDD, 0x0CD54, 0x0B9EB, 0x0A862, 0x09AF9, 0x08B70, 
-	0x08408, 0x09581, 0x0A71A, 0x0B693, 0x0C22C, 0x0D3A5, 0x0E13E, 0x0F0B7, 0x00840, 0x019C9, 0x02B52, 0x03ADB, 0x04E64, 0x05FED, 0x06D76, 0x07CFF, 
-	0x09489, 0x08500, 0x0B79B, 0x0A612, 0x0D2AD, 0x0C324, 0x0F1BF, 0x0E036, 0x018C1, 0x00948, 0x03BD3, 0x02A5A, 0x05EE5, 0x04F6C, 0x07DF7, 0x06C7E,
-	0x0A50A, 0x0B483, 0x08618, 0x09791, 0x0E32E, 0x0F2A7, 0x0C03C, 0x0D1B5, 0x02942, 0x038CB, 0x00A50, 0x01BD9, 0x06F66, 0x07EEF, 0x04C74, 0x05DFD, 
-	0x0B58B, 0x0A402, 0x09699, 0x08710, 0x0F3AF, 0x0E226, 0x0D0BD, 0x0C134, 0x039C3, 0x0284A, 0x01AD1, 0x00B58, 0x07FE7, 0x06E6E, 0x05CF5, 0x04D7C, 
-	0x0C60C, 0x0D785, 0x0E51E, 0x0F497, 0x08028, 0x091A1, 0x0A33A, 0x0B2B3, 0x04A44, 0x05BCD, 0x06956, 0x078DF, 0x00C60, 0x01DE9, 0x02F72, 0x03EFB, 
-	0x0D68D, 0x0C704, 0x0F59F, 0x0E416, 0x090A9, 0x08120, 0x0B3BB, 0x0A232, 0x05AC5, 0x04B4C, 0x079D7, 0x0685E, 0x01CE1, 0x00D68, 0x03FF3, 0x02E7A, 
-	0x0E70E, 0X0F687, 0x0C41C, 0x0D595, 0x0A12A, 0X0B0A3, 0x08238, 0x093B1, 0x06B46, 0x07ACF, 0x04854, 0x059DD, 0x02D62, 0x03CEB, 0x00E70, 0x01FF9, 
-	0x0F78F, 0x0E606, 0x0D49D, 0x0C514, 0x0B1AB, 0x0A022, 0x092B9, 0x08330, 0x07BC7, 0x06A4E, 0x058D5, 0x0495C, 0x03DE3, 0x02C6A, 0x01EF1, 0x00F78
-]
-
 #Command 90 Byte Position Description
 COMMAND90RES_COMMAND_POSITION		=	0
 COMMAND90RES_SIGN_OF_WEIGHT			=	1
@@ -363,10 +371,12 @@ WAGON_EMPTY_SCAN_LENGTH				=	30
 
 WAGON_DATA_PRIORITY					=	1
 WAGON_EMPTY_SCAN_PRIORITY			=	2
+MERIT_WRITER_STOP_PRIORITY			=	0		#stop request is served before any queued command
 
 #command list 
 MERIT_TLC_FWVER_LIST = [0x7E,0x01,0x01,0x00,0x50,0xa9,0x60]
 MERIT_TLC_FWVER_RELEASEDATE_LIST = [0x7E,0x01,0x01,0x00,0x51,0x20,0x71]
+MERIT_COMMAND_FRAME_CACHE_SIZE = 1024		#wagon numbers go into the 0x5A payload, bound the cache for very long rakes
 
 MERIT_STATUS_PAYLOAD_SIZE	   = 2
 MERIT_STATUS_HIGH_PERMANENT	 = 0x10
@@ -375,21 +385,716 @@ MERIT_STATUS_LOW_PERMANENT	  = 0x20
 MERIT_STATUS_LOW_PULSE		  = 0x80
 NEGATIVE_WEIGHT_OFFSET	   = 16777216
 MAX_RETRY_COUNT = 10
+MERIT_STARTUP_CACHE_FILE = "MeritStartupCache.json"		#last TLC port and firmware identity, lets a restart skip the slow steps
+MERIT_STARTUP_POLL_DELAY = 0.05
+MERIT_VERSION_POST_RETRY_DELAY = 5
+MERIT_FIRMWARE_QUERY_TIMEOUT = 1
+MERIT_PORT_PROBE_READ_TIMEOUT = 0.01
+MERIT_TRANSACTION_QUEUE_TIMEOUT = 5		#time a caller waits for its command to reach the serial port
+MERIT_MQTT_COMMAND_WORKERS = 1			#mqtt commands run in order on one worker off the paho network thread, they wait for TLC replies
+MERIT_WRITER_STOP_TIMEOUT = 3			#time given to the serial writer to finish its transaction on shutdown
+MERIT_POLL_TIME_TO_LIVE = 1				#seconds a status or weight poll may wait in the queue, a later poll asks again
+
+#Engine selected at startup with --engine : threads (paho network thread, serial writer, wagon publisher and the
+#monitor loop) or one asyncio event loop running the serial port, the mqtt socket and the HTTP version post
+MERIT_ENGINE_THREADED = "threaded"
+MERIT_ENGINE_ASYNCIO = "asyncio"
+MERIT_ENGINE_DEFAULT = MERIT_ENGINE_THREADED
+MERIT_ASYNC_COMMAND_WORKERS = 1			#mqtt commands run in order on one worker, they wait for TLC replies
+
+#WGID of the weighbridge when --wgid is not given, every topic is /Merit/<WGID>/...
+#With --session WGID=PORT (repeated) each TLC runs in its own process and the parent holds the one mqtt connection
+MERIT_DEFAULT_WGID = "MBMAGH01"
+
+#Transaction policy, Command : (reply timeout per attempt in seconds, retries after the first attempt)
+#Polls are retried once since the next cycle asks again, writes that change the TLC state are retried more
+MERIT_DEFAULT_COMMAND_POLICY = (MERIT_SERIAL_TIMEOUT, 1)
+MeritCommandPolicyDict = {
+	MERIT_WAGON_WEIGHT_WRITE_CMD			:	(MERIT_SERIAL_TIMEOUT, 1),
+	MERIT_DIGITAL_OUTPUT_STATUS_READ_CMD	:	(MERIT_SERIAL_TIMEOUT, 1),
+	MERIT_DIGITAL_INPUT_STATUS_READ_CMD		:	(MERIT_SERIAL_TIMEOUT, 1),
+	MERIT_VERSION_OF_CODE_READ_CMD			:	(MERIT_SERIAL_TIMEOUT, 2),
+	MERIT_CODE_RELAESE_DATE_READ_CMD		:	(MERIT_SERIAL_TIMEOUT, 2),
+	MERIT_INIT_AND_AXLE_ELIMINATE_WRITE_CMD	:	(MERIT_SERIAL_TIMEOUT, 3),
+	MERIT_TERMINATE_WRITE_CMD				:	(MERIT_SERIAL_TIMEOUT, 3),
+	MERIT_OUTPUT_STATUS_WRITE_CMD			:	(MERIT_SERIAL_TIMEOUT, 3),
+	MERIT_OUTPUT_STATUS_RESET_WRITE_CMD		:	(MERIT_SERIAL_TIMEOUT, 3),
+	MERIT_SCOREBOARD_AVAIL_WRITE_CMD		:	(2 * MERIT_SERIAL_TIMEOUT, 3),
+}
+
+#Bulk axle readout, Commands 0x82-0x8B return the axles of the rake in ranges of 50
+#Response payload after the command id, per axle : vehicle serial number (U8) and axle weight (S16, LSB first,
+#same scale and negative codes as the Command 0x5A axle weights), axles in the order they crossed the weighbridge
+MeritAxleRangeCommandList = [MERIT_AXLE_1TO50_WEIGHT_READ_CMD, MERIT_AXLE_51TO100_WEIGHT_READ_CMD, MERIT_AXLE_101TO150_WEIGHT_READ_CMD,
+	MERIT_AXLE_151TO200_WEIGHT_READ_CMD, MERIT_AXLE_201TO250_WEIGHT_READ_CMD, MERIT_AXLE_251TO300_WEIGHT_READ_CMD, MERIT_AXLE_301TO350_WEIGHT_READ_CMD,
+	MERIT_AXLE_351TO400_WEIGHT_READ_CMD, MERIT_AXLE_401TO450_WEIGHT_READ_CMD, MERIT_AXLE_451TO500_WEIGHT_READ_CMD]
+MERIT_AXLES_PER_RANGE_CMD = 50
+MeritAxleRecordDtype = np.dtype([("Vehicle", "u1"), ("Weight", "<i2")])
+MERIT_BULK_AXLE_READ = False			#True : wagons are read in bulk at WeighingOver instead of one 0x5A request per wagon, not validated on a TLC yet
+MERIT_BULK_WAGON_POLL_PERIOD = 0.5		#0x5A poll period during a bulk read rake, the poll only follows the rake and finds the leading locos
+
+#Rake batch publish, wagon records are also published as batches with a rake summary on /Merit/<WB>/RakeBatch/
+#The per wagon Weighment topic is published as before. A batch payload is JSON, or zlib compressed JSON
+#(first byte 0x78 instead of '{') when compression is on.
+MERIT_RAKE_BATCH_PUBLISH = False		#True : publish rake batches
+MERIT_RAKE_BATCH_SIZE = 0				#wagons per batch, 0 : the whole rake in one batch at Terminate
+MERIT_RAKE_BATCH_COMPRESS = True		#zlib compress the batch payload
+MERIT_RAKE_BATCH_COMPRESS_LEVEL = 6
+
+#Payload encodings of the weighment topics, Topic name : (Encoding, Field names to project on or None for all, zlib flag)
+#JSON consumers keep working, a binary or compressed payload starts with 0xB1, 0xB2 or 0x78 instead of '{' (MeritPayloadCodec.py)
+#A consumer changes the encoding of a topic on /Merit/<WB>/Encoding/ with
+#{"Topic" : "Weighment", "Encoding" : "binary", "Compress" : false, "Fields" : ["WagonSerialNumber", "WagonWeight"]}
+MERIT_WEIGHMENT_TOPIC_NAME = "Weighment"
+MERIT_WEIGHT_STATUS_TOPIC_NAME = "WeightStatus"
+MeritTopicEncodingConfigDict = {
+	MERIT_WEIGHMENT_TOPIC_NAME		:	(MERIT_ENCODING_JSON, None, False),
+	MERIT_WEIGHT_STATUS_TOPIC_NAME	:	(MERIT_ENCODING_JSON, None, False),
+}
+
+#Mqtt QoS per topic name, other topics are published at MERIT_MQTT_DEFAULT_QOS
+#QoS 1/2 publishes wait in an in-flight window for the broker acknowledgment (paho on_publish), the wagon
+#publish cursor only moves past a wagon once it is acknowledged and a wagon not acknowledged in time is sent again
+MERIT_RAKE_BATCH_TOPIC_NAME = "RakeBatch"
+MERIT_AXLE_WEIGHTS_TOPIC_NAME = "AxleWeights"
+MERIT_MQTT_DEFAULT_QOS = 0
+MeritTopicQosConfigDict = {
+	MERIT_WEIGHMENT_TOPIC_NAME		:	1,
+	MERIT_RAKE_BATCH_TOPIC_NAME		:	1,
+	MERIT_AXLE_WEIGHTS_TOPIC_NAME	:	1,
+}
+MERIT_MQTT_INFLIGHT_WINDOW = 20			#QoS 1/2 publishes waiting for an acknowledgment at most
+MERIT_MQTT_ACK_TIMEOUT = 30				#seconds before an unacknowledged publish is given up, wagons are then sent again
+MERIT_MQTT_ACK_CHECK_INTERVAL = 1		#seconds between two acknowledgment timeout checks while publishes are in flight
+
+#Binary layout of the wagon weighment dictionary, (Name, Type, Scale or value list), values are sent as round(Value * Scale)
+MERIT_WAGON_PAYLOAD_SCHEMA_ID = 1
+MeritWagonPayloadFieldList = [
+	("WagonSerialNumber",	MERIT_FIELD_U16,	1),
+	("WagonType",			MERIT_FIELD_U8,		1),
+	("WagonWeight",			MERIT_PAYLOAD_S32,	100),
+	("WagonSpeed",			MERIT_FIELD_U16,	10),
+	("Axle1Weight",			MERIT_FIELD_U16,	100),
+	("Axle2Weight",			MERIT_FIELD_U16,	100),
+	("Axle3Weight",			MERIT_FIELD_U16,	100),
+	("Axle4Weight",			MERIT_FIELD_U16,	100),
+	("SignOfWeight",		MERIT_PAYLOAD_CHAR,	1),
+	("Weight",				MERIT_PAYLOAD_S32,	100),
+	("Message",				MERIT_PAYLOAD_ENUM,	list(WagonWeighMessageDict.values())),
+	("Direction",			MERIT_FIELD_U8,		1),
+	("WagonsWeighed",		MERIT_FIELD_U16,	1),
+	("LastAxle",			MERIT_FIELD_U16,	1),
+	("SpeedTLPair1",		MERIT_FIELD_U16,	10),
+	("SpeedTLPair2",		MERIT_FIELD_U16,	10),
+	("SpeedFromWeigh",		MERIT_FIELD_U16,	10),
+	("AxleCountPair1",		MERIT_FIELD_U16,	1),
+	("AxleCountPair2",		MERIT_FIELD_U16,	1),
+	("AxleCountPair3",		MERIT_FIELD_U16,	1),
+	("AxleCountPair4",		MERIT_FIELD_U16,	1),
+	("AxleWeight",			MERIT_FIELD_U16,	1),
+	("AxleIgnore",			MERIT_FIELD_U16,	1),
+	("WE",					MERIT_PAYLOAD_BOOL,	1),
+	("StartTime",			MERIT_PAYLOAD_TIME,	1),
+	("EndTime",				MERIT_PAYLOAD_TIME,	1),
+]
+
+#Read commands an identical pending request can be merged with, writes are always sent on their own
+MeritMergeableCommandList = [MERIT_WAGON_WEIGHT_WRITE_CMD, MERIT_DIGITAL_OUTPUT_STATUS_READ_CMD, MERIT_DIGITAL_INPUT_STATUS_READ_CMD,
+	MERIT_VERSION_OF_CODE_READ_CMD, MERIT_CODE_RELAESE_DATE_READ_CMD] + MeritAxleRangeCommandList
+
+#Poll periods, Command : (period while a rake is on the weighbridge, heartbeat period while idle) in seconds
+MeritPollPeriodDict = {
+	MERIT_WAGON_WEIGHT_WRITE_CMD			:	(0.05, 2),
+	MERIT_DIGITAL_INPUT_STATUS_READ_CMD		:	(0.1, 1),
+	MERIT_DIGITAL_OUTPUT_STATUS_READ_CMD	:	(0.5, 5),
+}
+MeritBulkPollPeriodDict = dict(MeritPollPeriodDict)
+MeritBulkPollPeriodDict[MERIT_WAGON_WEIGHT_WRITE_CMD] = (MERIT_BULK_WAGON_POLL_PERIOD, MeritPollPeriodDict[MERIT_WAGON_WEIGHT_WRITE_CMD][1])
+MeritPollPayloadDict = {
+	MERIT_WAGON_WEIGHT_WRITE_CMD			:	([0,TEST_WAGON,RESOULUTION_LSB,RESOULUTION_MSB], WAGON_WEIGH_COMMAND_PAYLOAD_SIZE),
+}
+MeritMonitorPollList = [MERIT_WAGON_WEIGHT_WRITE_CMD, MERIT_DIGITAL_OUTPUT_STATUS_READ_CMD, MERIT_DIGITAL_INPUT_STATUS_READ_CMD]		#poll order during weighment
+MeritStatusPollList = [MERIT_DIGITAL_OUTPUT_STATUS_READ_CMD, MERIT_DIGITAL_INPUT_STATUS_READ_CMD, MERIT_WAGON_WEIGHT_WRITE_CMD]		#poll order of the status mode
+MERIT_POLL_ACTIVE_HOLD = 5			#seconds the fast periods are kept after the last sign of a rake
+MERIT_POLL_IDLE_WAIT = 1			#longest monitor sleep while nothing is polled
+MERIT_POLL_LATENESS_SAMPLES = 500	#poll start delays after the due time kept for the jitter statistics
+
+#Input bits that show a rake on the weighbridge while they are set
+MERIT_RAKE_PRESENT_INPUT_MASK = ((1 << COMMAND10RES_START_WEIGH) | (1 << COMMAND10RES_AOS_IN_DIR_5A) | (1 << COMMAND10RES_AOS_IN_DIR_5B) |
+	(1 << COMMAND10RES_AOS_OUT_DIR_6A) | (1 << COMMAND10RES_AOS_OUT_DIR_6B) | (1 << COMMAND10RES_TRACKSWITCH_1A) | (1 << COMMAND10RES_TRACKSWITCH_1B) |
+	(1 << COMMAND10RES_TRACKSWITCH_2A) | (1 << COMMAND10RES_TRACKSWITCH_2B) | (1 << COMMAND10RES_TRACKSWITCH_3A) | (1 << COMMAND10RES_TRACKSWITCH_3B) |
+	(1 << COMMAND10RES_TRACKSWITCH_4A) | (1 << COMMAND10RES_TRACKSWITCH_4B))
+#Input bits whose change is a rake event, EndWeigh stays set after the rake so only its edge counts
+MERIT_RAKE_EVENT_INPUT_MASK = MERIT_RAKE_PRESENT_INPUT_MASK | (1 << COMMAND10RES_END_WEIGH)
+
+#Publish policies of the polled status messages, Name : (MinInterval, KeyframeInterval, {Key : Deadband})
+#A message goes out when a key changed (numeric keys with a deadband by more than the deadband) and
+#MinInterval seconds passed since the last publish, unchanged messages are repeated every KeyframeInterval
+MERIT_INPUT_STATUS_POLICY = "InputStatus"
+MERIT_OUTPUT_STATUS_POLICY = "OutputStatus"
+MERIT_WEIGHT_STATUS_POLICY = "WeightStatus"
+MERIT_CONTINUOUS_WEIGHMENT_POLICY = "ContinuousWeighment"
+MeritPublishPolicyConfigDict = {
+	MERIT_INPUT_STATUS_POLICY			:	(0, 30, {}),
+	MERIT_OUTPUT_STATUS_POLICY			:	(0, 30, {}),
+	MERIT_WEIGHT_STATUS_POLICY			:	(0.5, 30, {"Weight" : 0.05}),
+	MERIT_CONTINUOUS_WEIGHMENT_POLICY	:	(0.5, 30, {"Weight" : 0.05, "SpeedTLPair1" : 0.5, "SpeedTLPair2" : 0.5, "SpeedFromWeigh" : 0.5}),
+}
+
+#Response layouts (Offset, FieldName, FieldType), offsets are from the command id of the payload
+WagonWeighResponseLayout = [
+	(COMMAND90RES_COMMAND_POSITION,		"CommandId",			MERIT_FIELD_U8),
+	(COMMAND90RES_SIGN_OF_WEIGHT,		"SignOfWeight",			MERIT_FIELD_U8),
+	(COMMAND90RES_WEIGHT_LSB,			"Weight",				MERIT_FIELD_U24),
+	(COMMAND90RES_DIRECTION,			"Direction",			MERIT_FIELD_U8),
+	(COMMAND90RES_MESSAGE,				"Message",				MERIT_FIELD_U8),
+	(COMMAND90RES_WAGONS_WEIGHED,		"WagonsWeighed",		MERIT_FIELD_U8),	#8,9 Ignore
+	(COMMAND90RES_LASTAXLE_LSB,			"LastAxle",				MERIT_FIELD_U16),
+	(COMMAND90RES_SPEED_TLPAIR1_LSB,	"SpeedTLPair1",			MERIT_FIELD_U16),
+	(COMMAND90RES_SPEED_TLPAIR2_LSB,	"SpeedTLPair2",			MERIT_FIELD_U16),
+	(COMMAND90RES_SPEED_FROM_WEIGH_LSB,	"SpeedFromWeigh",		MERIT_FIELD_U16),
+	(COMMAND90RES_AXLECOUNT_PAIR1_LSB,	"AxleCountPair1",		MERIT_FIELD_U16),
+	(COMMAND90RES_AXLECOUNT_PAIR2_LSB,	"AxleCountPair2",		MERIT_FIELD_U16),
+	(COMMAND90RES_AXLECOUNT_PAIR3_LSB,	"AxleCountPair3",		MERIT_FIELD_U16),
+	(COMMAND90RES_AXLECOUNT_PAIR4_LSB,	"AxleCountPair4",		MERIT_FIELD_U16),
+	(COMMAND90RES_AXLE_WEIGHED_LSB,		"AxleWeight",			MERIT_FIELD_U16),
+	(COMMAND90RES_AXLE_INGNORED_LSB,	"AxleIgnore",			MERIT_FIELD_U16),
+	(COMMAND90RES_WAGON_SERIAL_NUMBER,	"WagonSerialNumber",	MERIT_FIELD_U8),
+	(COMMAND90RES_WAGON_TYPE,			"WagonType",			MERIT_FIELD_S8),
+	(COMMAND90RES_WAGON_WEIGHT_LSB,		"WagonWeight",			MERIT_FIELD_U24),
+	(COMMAND90RES_AXLE1WEIGHT_LSB,		"Axle1Weight",			MERIT_FIELD_S16),	#-3, -4 : AxleWeightDict status
+	(COMMAND90RES_AXLE2WEIGHT_LSB,		"Axle2Weight",			MERIT_FIELD_S16),
+	(COMMAND90RES_AXLE3WEIGHT_LSB,		"Axle3Weight",			MERIT_FIELD_S16),
+	(COMMAND90RES_AXLE4WEIGHT_LSB,		"Axle4Weight",			MERIT_FIELD_S16),
+	(COMMAND90RES_WAGON_SPEED_LSB,		"WagonSpeed",			MERIT_FIELD_U16),
+]
+
+OutputStatusResponseLayout = [
+	(COMMAND90RES_COMMAND_POSITION,		"CommandId",			MERIT_FIELD_U8),
+	(CURRENT_OUTPUT_STATUS_LSB,			"CurrentStatus",		MERIT_FIELD_U16),
+	(ACTUAL_OUTPUT_STATUS_LSB,			"ActualStatus",			MERIT_FIELD_U16),
+]
+
+InputStatusResponseLayout = [
+	(COMMAND90RES_COMMAND_POSITION,		"CommandId",			MERIT_FIELD_U8),
+	(CURRENT_INPUT_STATUS_LSB,			"CurrentStatus",		MERIT_FIELD_U16),
+	(ACTUAL_INPUT_STATUS_LSB,			"ActualStatus",			MERIT_FIELD_U16),
+]
+
+TextResponseLayout = [
+	(COMMAND90RES_COMMAND_POSITION,		"CommandId",			MERIT_FIELD_U8),
+	(1,									"Text",					MERIT_FIELD_TEXT),
+]
+
+#Decoders compiled once at startup, keyed by command
+MeritResponseDecoderDict = {
+	MERIT_WAGON_WEIGHT_WRITE_CMD			:	MeritResponseDecoder("WagonWeighResponse", WagonWeighResponseLayout),
+	MERIT_DIGITAL_OUTPUT_STATUS_READ_CMD	:	MeritResponseDecoder("OutputStatusResponse", OutputStatusResponseLayout),
+	MERIT_DIGITAL_INPUT_STATUS_READ_CMD		:	MeritResponseDecoder("InputStatusResponse", InputStatusResponseLayout),
+	MERIT_VERSION_OF_CODE_READ_CMD			:	MeritResponseDecoder("TextResponse", TextResponseLayout),
+	MERIT_CODE_RELAESE_DATE_READ_CMD		:	MeritResponseDecoder("TextResponse", TextResponseLayout),
+}
+
+#***********************************************************************************#
+#******************************* Classes *******************************************#
+#***********************************************************************************#
+#********************************************************************************************#
+#Description : Condition that also calls m_WakeCallback on notify_all, wakes a waiter that is not a thread
+#********************************************************************************************#
+class MeritWakeCondition(threading.Condition):
+	def __init__(self):
+		threading.Condition.__init__(self)
+		self.m_WakeCallback = None
+
+	def notify_all(self):
+		threading.Condition.notify_all(self)
+		if(self.m_WakeCallback is not None):
+			self.m_WakeCallback()
+
+#********************************************************************************************#
+#Description : Error a failed TLC transaction is resolved with
+#********************************************************************************************#
+class MeritTransactionError(Exception):
+	def __init__(self, Command, ReceiveStatus):
+		Exception.__init__(self, "Command " + str(Command) + " failed : " + str(MeritSerialRecvErrorDict.get(ReceiveStatus, ReceiveStatus)))
+		self.m_Command = Command
+		self.m_ReceiveStatus = ReceiveStatus
+
+#********************************************************************************************#
+#Description : One TLC command on its way through the write queue, a future resolved with the response
+#Notes : The result is the decoded response record for commands in MeritResponseDecoderDict and the
+#		 payload bytes for the others, a failed command raises MeritTransactionError from result()
+#********************************************************************************************#
+class MeritTransaction(Future):
+	def __init__(self, Command, Frame, Priority, TimeToLive = None):
+		Future.__init__(self)
+		self.m_Command = Command
+		self.m_Frame = Frame
+		self.m_Priority = Priority
+		self.m_Timeout, self.m_RetryCount = MeritCommandPolicyDict.get(Command, MERIT_DEFAULT_COMMAND_POLICY)
+		self.m_SubmitTime = time.monotonic()
+		self.m_ExpiryTime = None			#None never expires
+		if(TimeToLive is not None):
+			self.m_ExpiryTime = self.m_SubmitTime + TimeToLive
+
+	#********************************************************************************************#
+	#Description : Function to check if the transaction waited in the queue longer than its time to live
+	#Arguments : None
+	#Return : True if expired
+	#********************************************************************************************#
+	def Expired(self):
+		return ((self.m_ExpiryTime is not None) and (time.monotonic() >= self.m_ExpiryTime))
+
+	#********************************************************************************************#
+	#Description : Function to keep the transaction alive for a merged request
+	#Arguments : Transaction merged into this one
+	#Return : None
+	#********************************************************************************************#
+	def Extend(self, Transaction):
+		if((self.m_ExpiryTime is None) or (Transaction.m_ExpiryTime is None)):
+			self.m_ExpiryTime = None
+		else:
+			self.m_ExpiryTime = max(self.m_ExpiryTime, Transaction.m_ExpiryTime)
+
+	#********************************************************************************************#
+	#Description : Function to wait for the transaction to complete
+	#Arguments : None
+	#Return : Response, None if the command failed, was dropped from the queue or did not complete in time
+	#********************************************************************************************#
+	def Wait(self):
+		try:
+			return self.result(MERIT_TRANSACTION_QUEUE_TIMEOUT + ((self.m_RetryCount + 1) * self.m_Timeout))
+		except CancelledError:
+			logging.info("Command " + str(self.m_Command) + " dropped from queue")
+		except Exception as ex:
+			logging.error("Command " + str(self.m_Command) + " : " + str(ex))
+		return None
+
+#********************************************************************************************#
+#Description : Poll scheduler of the TLC monitor, every command has its own next due time
+#Notes : Commands are polled at their fast period while a rake is on the weighbridge (input bits or
+#		 a WagonsWeighed change) and for MERIT_POLL_ACTIVE_HOLD seconds after, at the heartbeat otherwise
+#********************************************************************************************#
+class MeritPollScheduler:
+	def __init__(self, PeriodDict):
+		self.m_PeriodDict = PeriodDict
+		self.m_DueTimeDict = {}
+		self.m_LastActivityTime = None
+		self.m_InputStatus = 0
+		self.m_WagonsWeighed = None
+		self.m_Lock = threading.Lock()
+		self.m_WakeEvent = threading.Event()
+		self.m_WakeCallback = None			#also called on Wake, set by the asyncio engine
+		self.m_LatenessList = collections.deque(maxlen = MERIT_POLL_LATENESS_SAMPLES)
+
+	#********************************************************************************************#
+	#Description : Function to wake the monitor
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def Wake(self):
+		self.m_WakeEvent.set()
+		if(self.m_WakeCallback is not None):
+			self.m_WakeCallback()
+
+	#********************************************************************************************#
+	#Description : Function to check if a rake was seen within the hold time
+	#Arguments : None
+	#Return : True if the fast periods apply
+	#********************************************************************************************#
+	def IsActive(self):
+		return ((self.m_LastActivityTime is not None) and ((time.monotonic() - self.m_LastActivityTime) < MERIT_POLL_ACTIVE_HOLD))
+
+	#********************************************************************************************#
+	#Description : Function to get the current period of a command
+	#Arguments : Command
+	#Return : Period in seconds
+	#********************************************************************************************#
+	def Period(self, Command):
+		ActivePeriod, IdlePeriod = self.m_PeriodDict[Command]
+		if(self.IsActive() == True):
+			return ActivePeriod
+		return IdlePeriod
+
+	#********************************************************************************************#
+	#Description : Function to switch to the fast periods, commands due later than their fast period are pulled in
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def MarkActivity(self):
+		with self.m_Lock:
+			Now = time.monotonic()
+			WakeFlag = (self.IsActive() == False)
+			self.m_LastActivityTime = Now
+			for Command, DueTime in self.m_DueTimeDict.items():
+				self.m_DueTimeDict[Command] = min(DueTime, Now + self.m_PeriodDict[Command][0])
+		if(WakeFlag == True):
+			self.Wake()
+
+	#********************************************************************************************#
+	#Description : Function to change the poll periods, the next due times are kept
+	#Arguments : Period dictionary, Command : (active period, idle period)
+	#Return : None
+	#********************************************************************************************#
+	def SetPeriods(self, PeriodDict):
+		with self.m_Lock:
+			self.m_PeriodDict = PeriodDict
+
+	#********************************************************************************************#
+	#Description : Function to make every command due now and wake the monitor
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def Restart(self):
+		with self.m_Lock:
+			self.m_DueTimeDict = {}
+		self.Wake()
+
+	#********************************************************************************************#
+	#Description : Function to feed the decoded input status bits
+	#Arguments : Actual input status
+	#Return : None
+	#********************************************************************************************#
+	def InputStatus(self, Status):
+		ChangedBits = (Status ^ self.m_InputStatus) & MERIT_RAKE_EVENT_INPUT_MASK
+		self.m_InputStatus = Status
+		if((Status & MERIT_RAKE_PRESENT_INPUT_MASK) or ChangedBits):
+			self.MarkActivity()
+
+	#********************************************************************************************#
+	#Description : Function to feed the wagons weighed count of the weighment response
+	#Arguments : WagonsWeighed
+	#Return : None
+	#********************************************************************************************#
+	def WagonsWeighed(self, Count):
+		if((self.m_WagonsWeighed is not None) and (Count != self.m_WagonsWeighed)):
+			self.MarkActivity()
+		self.m_WagonsWeighed = Count
+
+	#********************************************************************************************#
+	#Description : Function to get the commands of the list that are due
+	#Arguments : Poll command list
+	#Return : List of due commands in the order of the poll list
+	#********************************************************************************************#
+	def DueCommands(self, PollList):
+		Now = time.monotonic()
+		with self.m_Lock:
+			DueTimeList = [(Command, self.m_DueTimeDict.get(Command, 0)) for Command in PollList]
+		DueList = [Command for Command, DueTime in DueTimeList if(DueTime <= Now)]
+		self.m_LatenessList.extend(Now - DueTime for Command, DueTime in DueTimeList if(0 < DueTime <= Now))
+		return DueList
+
+	#********************************************************************************************#
+	#Description : Function to schedule the next poll of a command
+	#Arguments : Command, Poll start time
+	#Return : None
+	#********************************************************************************************#
+	def Polled(self, Command, PollTime):
+		with self.m_Lock:
+			self.m_DueTimeDict[Command] = PollTime + self.Period(Command)
+
+	#********************************************************************************************#
+	#Description : Function to sleep until the next command of the list is due or the monitor is woken
+	#Arguments : Poll command list
+	#Return : None
+	#********************************************************************************************#
+	def WaitNextDue(self, PollList):
+		WaitTime = self.NextWaitTime(PollList)
+		if(WaitTime > 0):
+			self.m_WakeEvent.wait(WaitTime)
+		self.m_WakeEvent.clear()
+
+	#********************************************************************************************#
+	#Description : Function to get the time until the next command of the list is due
+	#Arguments : Poll command list
+	#Return : Seconds, 0 or less if one is due
+	#********************************************************************************************#
+	def NextWaitTime(self, PollList):
+		with self.m_Lock:
+			DueTimeList = [self.m_DueTimeDict.get(Command, 0) for Command in PollList]
+		if(DueTimeList):
+			return min(DueTimeList) - time.monotonic()
+		return MERIT_POLL_IDLE_WAIT
+
+#********************************************************************************************#
+#Description : Publish policy of one polled message, decides if a message is worth sending
+#Notes : Changes are measured against the last published message so a slow drift still goes out
+#********************************************************************************************#
+class MeritPublishPolicy:
+	def __init__(self, Name, MinInterval, KeyframeInterval, DeadbandDict):
+		self.m_Name = Name
+		self.m_MinInterval = MinInterval
+		self.m_KeyframeInterval = KeyframeInterval
+		self.m_DeadbandDict = DeadbandDict
+		self.m_PublishedDict = None
+		self.m_PublishTime = 0
+		self.m_SuppressedCount = 0
+
+	#********************************************************************************************#
+	#Description : Function to check if the message differs from the last published one
+	#Arguments : Message dictionary
+	#Return : True if a key changed beyond its deadband
+	#********************************************************************************************#
+	def Changed(self, MessageDict):
+		if(MessageDict.keys() != self.m_PublishedDict.keys()):
+			return True
+		for Key, Value in MessageDict.items():
+			PublishedValue = self.m_PublishedDict[Key]
+			if(Value == PublishedValue):
+				continue
+			Deadband = self.m_DeadbandDict.get(Key)
+			if((Deadband is None) or (not isinstance(Value, (int, float))) or (not isinstance(PublishedValue, (int, float)))):
+				return True
+			if(abs(Value - PublishedValue) > Deadband):
+				return True
+		return False
+
+	#********************************************************************************************#
+	#Description : Function to decide if the message is published
+	#Arguments : Message dictionary
+	#Return : True to publish
+	#********************************************************************************************#
+	def Check(self, MessageDict):
+		if(self.m_PublishedDict is None):
+			return True
+		Elapsed = time.monotonic() - self.m_PublishTime
+		if(Elapsed >= self.m_KeyframeInterval):
+			return True
+		if((Elapsed >= self.m_MinInterval) and (self.Changed(MessageDict) == True)):
+			return True
+		self.m_SuppressedCount = self.m_SuppressedCount + 1
+		return False
+
+	#********************************************************************************************#
+	#Description : Function to record a published message
+	#Arguments : Message dictionary
+	#Return : None
+	#********************************************************************************************#
+	def Published(self, MessageDict):
+		self.m_PublishedDict = dict(MessageDict)
+		self.m_PublishTime = time.monotonic()
+
+	#********************************************************************************************#
+	#Description : Function to forget the last published message, the next message goes out as a keyframe
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def Reset(self):
+		self.m_PublishedDict = None
+
+#********************************************************************************************#
+#Description : TLC command queue, a command identical to a pending one shares its transaction
+#Notes : Entries are (Priority, Sequence, [time, stuffed frame, command, transaction]), the sequence
+#		 number keeps commands of one priority in FIFO order. Identical means the same stuffed frame of a
+#		 MeritMergeableCommandList command, a pending command of lower priority is moved up to the
+#		 priority of the new one
+#********************************************************************************************#
+class MeritCommandQueue(PriorityQueue):
+	def __init__(self):
+		PriorityQueue.__init__(self, maxsize = 0)
+		self.m_Sequence = itertools.count()
+		self.m_MergedCount = 0			#serial transactions saved by merging
+		self.m_ExpiredCount = 0			#commands dropped after their time to live
+		self.m_WakeCallback = None		#called after a put, set by the asyncio engine
+
+	#********************************************************************************************#
+	#Description : Function to queue a transaction or merge it with an identical pending one
+	#Arguments : Priority, Queue entry
+	#Return : Transaction that will carry the response, the pending one if merged
+	#********************************************************************************************#
+	def PutOrMerge(self, Priority, Entry):
+		with self.not_empty:
+			for Index, (PendingPriority, PendingSequence, PendingEntry) in enumerate(self.queue if(Entry[2] in MeritMergeableCommandList) else []):
+				PendingTransaction = PendingEntry[3]
+				if((PendingTransaction is None) or (PendingEntry[1] != Entry[1]) or (PendingTransaction.cancelled() == True) or (PendingTransaction.Expired() == True)):
+					continue
+				self.m_MergedCount = self.m_MergedCount + 1
+				PendingTransaction.Extend(Entry[3])
+				if(Priority < PendingPriority):
+					self.queue[Index] = (Priority, PendingSequence, PendingEntry)
+					heapq.heapify(self.queue)
+				return PendingTransaction
+			self._put((Priority, next(self.m_Sequence), Entry))
+			self.unfinished_tasks = self.unfinished_tasks + 1
+			self.not_empty.notify()
+		if(self.m_WakeCallback is not None):
+			self.m_WakeCallback()
+		return Entry[3]
+
+#********************************************************************************************#
+#Description : Incremental TLC frame decoder, consumes bytes as they arrive from the serial port
+#Notes : Removes stuff bytes, uses the length field to find the end of the frame, checks the
+#		 checksum and resyncs on the next 0x7E after garbage or a broken frame
+#********************************************************************************************#
+class MeritFrameDecoder:
+	def __init__(self):
+		self.m_FrameBuffer = bytearray(MERIT_SERIAL_MAX_BYTES_TO_RECEIVE)
+		self.m_FrameView = memoryview(self.m_FrameBuffer)
+		self.m_CheckSum = MeritCrc16()
+		self.m_FrameList = []
+		self.m_GarbageCount = 0
+		self.m_ResyncCount = 0
+		self.Reset()
+
+	#********************************************************************************************#
+	#Description : Function to drop the partially received frame
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def Reset(self):
+		self.m_Length = 0
+		self.m_EscapeFlag = False
+		self.m_StartedFlag = False
+		self.m_FrameLength = 0
+		self.m_CheckSumLength = 0
+		self.m_CheckSum.Reset()
+
+	#********************************************************************************************#
+	#Description : Function to feed the received bytes into the decoder
+	#Arguments : Received bytes (bytes, bytearray or memoryview)
+	#Return : None
+	#Notes : Unstuffed bytes go straight into the preallocated frame buffer, state is kept in
+	#		 locals inside the loop and stored back once per call
+	#********************************************************************************************#
+	def Feed(self, Data):
+		FrameBuffer = self.m_FrameBuffer
+		Length = self.m_Length
+		FrameLength = self.m_FrameLength
+		EscapeFlag = self.m_EscapeFlag
+		StartedFlag = self.m_StartedFlag
+		for Element in Data:
+			if(EscapeFlag == True):
+				#Byte after 0x10 is data, a 0x10 without 0x10/0x7E after it is dropped like Merit_RemoveStuffBytes does
+				EscapeFlag = False
+			elif(Element == MERIT_START_BYTE):
+				if(StartedFlag == True):
+					self.m_ResyncCount = self.m_ResyncCount + 1
+				self.Reset()
+				StartedFlag = True
+				FrameBuffer[0] = Element
+				Length = 1
+				FrameLength = 0
+				continue
+			elif(Element == MERIT_ADDITIONAL_BYTE):
+				EscapeFlag = True
+				continue
+			if(StartedFlag == False):
+				self.m_GarbageCount = self.m_GarbageCount + 1
+				continue
+			FrameBuffer[Length] = Element
+			Length = Length + 1
+			if(Length == MERIT_COMMAND_ID_POSITION):
+				LengthOfQuery = FrameBuffer[MERIT_QUERY_LEN_POSITION] + (FrameBuffer[MERIT_QUERY_LEN_POSITION + 1] << 8)
+				FrameLength = MERIT_COMMAND_ID_POSITION + LengthOfQuery + MERIT_CHECKSUM_LENGTH
+				if((LengthOfQuery == 0) or (FrameLength > MERIT_SERIAL_MAX_BYTES_TO_RECEIVE)):
+					self.m_ResyncCount = self.m_ResyncCount + 1
+					StartedFlag = False
+				self.m_FrameLength = FrameLength
+			elif(Length == FrameLength):
+				self.FrameComplete(Length)
+				StartedFlag = False
+		if(StartedFlag == True):
+			self.m_FrameLength = FrameLength
+			self.UpdateCheckSum(Length)
+		else:
+			self.Reset()
+		self.m_Length = Length
+		self.m_EscapeFlag = EscapeFlag
+		self.m_StartedFlag = StartedFlag
+
+	#********************************************************************************************#
+	#Description : Function to add the bytes received so far to the checksum
+	#Arguments : Length of the frame received so far
+	#Return : None
+	#Notes : The checksum covers the frame up to, not including, the two checksum bytes
+	#********************************************************************************************#
+	def UpdateCheckSum(self, Length):
+		CheckSumLength = Length
+		if(self.m_FrameLength > 0):
+			CheckSumLength = min(Length, self.m_FrameLength - MERIT_CHECKSUM_LENGTH)
+		if(CheckSumLength > self.m_CheckSumLength):
+			self.m_CheckSum.Update(self.m_FrameView[self.m_CheckSumLength : CheckSumLength])
+			self.m_CheckSumLength = CheckSumLength
+
+	#********************************************************************************************#
+	#Description : Function to check the completed frame and queue it for GetFrame
+	#Arguments : Length of the frame
+	#Return : None
+	#********************************************************************************************#
+	def FrameComplete(self, Length):
+		self.UpdateCheckSum(Length)
+		Frame = bytes(self.m_FrameView[ : Length])
+		Givenchecksum = Frame[-2] | (Frame[-1] << 8)
+		if(Frame[MERIT_RTU_ID_POSITION] != MERIT_RTUID_BYTE):
+			self.m_FrameList.append((MERIT_RTUID_MISMATCH, Frame))
+		elif(Givenchecksum != self.m_CheckSum.Value()):
+			self.m_FrameList.append((MERIT_CHECKSUM_MISMATCH, Frame))
+		else:
+			self.m_FrameList.append((MERIT_READ_SUCCESS, Frame))
+		self.Reset()
+
+	#********************************************************************************************#
+	#Description : Function to get the oldest decoded frame
+	#Arguments : None
+	#Return : (ReceiveStatus, Unstuffed frame bytes) or None if no frame is complete
+	#********************************************************************************************#
+	def GetFrame(self):
+		if(self.m_FrameList):
+			return self.m_FrameList.pop(0)
+		return None
+
+	#********************************************************************************************#
+	#Description : Function to drop the partial frame and all decoded frames not yet taken
+	#Arguments : None
+	#Return : None
+	#********************************************************************************************#
+	def Clear(self):
+		self.m_FrameList = []
+		self.Reset()
 
 #***********************************************************************************#
 #*************** File Variables ****************************************************#
 #***********************************************************************************#
 m_TLCSerialPort = None				#Serial Object Handle
-m_TLCSerialCommandWriteQueue = PriorityQueue(maxsize = 0)
+m_TLCFrameDecoder = MeritFrameDecoder()
+m_TLCFrameRing = MeritFrameRing()		#raw frames sent and read, logged on a serial error
+m_SerialCapture = None					#MeritSerialCapture of the frames recorded in m_TLCFrameRing, None when not capturing
+m_TLCPollScheduler = MeritPollScheduler(MeritBulkPollPeriodDict if(MERIT_BULK_AXLE_READ == True) else MeritPollPeriodDict)
+m_PublishPolicyDict = {Name : MeritPublishPolicy(Name, *Config) for Name, Config in MeritPublishPolicyConfigDict.items()}
+MeritPayloadSchemaDict = {MERIT_WAGON_PAYLOAD_SCHEMA_ID : MeritPayloadSchema(MERIT_WAGON_PAYLOAD_SCHEMA_ID, MeritWagonPayloadFieldList)}
+m_TopicEncodingConfigDict = dict(MeritTopicEncodingConfigDict)
+m_TopicEncoderDict = {}				#Topic : MeritPayloadEncoder, topics not in it are sent as JSON
+m_TLCReceiveBuffer = bytearray(MERIT_SERIAL_MAX_BYTES_TO_RECEIVE)		#Serial read buffer, filled with readinto
+m_TLCReceiveView = memoryview(m_TLCReceiveBuffer)
+m_TLCSerialCommandWriteQueue = MeritCommandQueue()
+m_TLCWriterThread = None			#Serial writer thread, blocks on the command queue
+m_TLCWriterStopEvent = threading.Event()
+m_MqttCommandExecutor = ThreadPoolExecutor(MERIT_MQTT_COMMAND_WORKERS)		#worker running the mqtt commands of the threaded engine
+m_AsyncSerial = None				#MeritAsyncSerialTransport of the asyncio engine
+m_AsyncMqttLoop = None				#MeritAsyncMqttLoop of the asyncio engine
+m_AsyncCommandExecutor = None		#worker running the mqtt commands of the asyncio engine
+m_AsyncStopEvent = None				#MeritAsyncWake, stops the asyncio engine
+m_SessionLink = None				#MeritSessionMqttClient of a session process, used instead of a paho client
+m_TLCPinnedPort = ""				#the only port probed for the TLC when set, so sessions never open each other's port
+m_TLCCommandFrameCache = {}			#(Command, Payload bytes) : Stuffed command frame bytes
 m_WeighmentInitFlag = 0
 MqttConnectFlag	= False
+m_MqttConnectEvent = threading.Event()
+m_MqttSubscribedFlag = False			#topics are subscribed again on every reconnect once set
+m_MqttOutbox = None				#MeritMqttOutbox, publishes waiting for the broker
+m_MqttInFlight = MeritMqttInFlightWindow(MERIT_MQTT_INFLIGHT_WINDOW)
+m_TopicQosDict = {}					#Topic : QoS, topics not in it are published at MERIT_MQTT_DEFAULT_QOS
 m_WagonCount			=	0
 m_CurrentWeighmentWagonNumber		=	1
 m_PreviousWeighmentWagonNumber		=	0
 m_MqttPostCurrentWagonNumber	=	0
 m_MqttPostWeighmentInitFlag	=	False
+m_MqttPostAckedWagonNumber = 0			#wagons below it are acknowledged by the broker
+m_WagonAckedSet = set()					#acknowledged wagons above m_MqttPostAckedWagonNumber
+m_WagonPublishCondition = MeritWakeCondition()	#guards m_WagonCount, m_LocoCount, the wagon publish cursors and m_RakeId, notified when they change
 m_TLCMonitorInitFlag = False
-m_MeritWagonDetailsDict = {}
+m_WagonStore = None				#MeritWagonStore, wagon records of the current and the past rakes
+m_RakeId = None					#store id of the current rake
 m_WagonWeightDataParseDict = {}
 m_LocoCount = 0
 m_LocoFlag = False
@@ -401,15 +1106,23 @@ m_AXLETOELIMINATE = 0
 BROKER = '10.60.200.209'
 #BROKER = '65.0.94.47'
 BROKER_PORT = 80
+MERIT_MQTT_RECONNECT_MAX_DELAY = 30		#seconds, the reconnect backoff doubles up to this
 CLIENT_ID = f'python-mqtt-123'
 USERNAME = 'emqx2'
 PASSWORD = 'public2'
-m_HostWGID = 'MBMAGH01'
+m_HostWGID = MERIT_DEFAULT_WGID
 
 m_TLCFirmwareVersion = "" 
 m_TLCFirmwareReleaseDate = ""
-m_TLCPyCodeVersion = "TLC_V1.2.3"
-m_TLCPyCodeReleaseDate = "28th October 2023"
+m_TLCFirmwareVersionReadFlag = False		#True once the version is read from the TLC, not the startup cache
+m_TLCFirmwareReleaseDateReadFlag = False
+m_StartupCacheDict = {}
+m_TLCLastPort = ""						#Last port the TLC answered on, kept across Merit_VariableInit
+m_TLCLastSerialNumber = ""				#USB serial number of the last TLC port, finds the adapter under a new name
+m_ProcessStartTime = time.monotonic()
+m_StartupMetricDict = {}				#Startup stage : seconds since process start
+m_TLCPyCodeVersion = "TLC_V1.4.8"
+m_TLCPyCodeReleaseDate = "18th October 2026"
 m_VersionPostURL = 'http://10.60.200.209:443/version/'
 #m_VersionPostURL = 'http://65.0.94.47:443/version/'
 m_PostSuccessCode = 200
@@ -445,50 +1158,158 @@ m_MqttWeightStatusTopic = "/Merit/MBMAGH01/WeightStatus/"
 m_MqttStatusControlTopic = "/Merit/MBMAGH01/Status/Control/"
 m_MqttMeritScoreBoardAvailablityTopic = "/Merit/MBMAGH01/ScoreBoard/" 
 m_ErrorStatusTopic = "/Merit/MBMAGH01/ErrorStatus/" 
+m_MqttAxleWeightsTopic = "/Merit/MBMAGH01/AxleWeights/"
+m_MqttRakeBatchTopic = "/Merit/MBMAGH01/RakeBatch/"
+m_MqttRakeBatchRequestTopic = "/Merit/MBMAGH01/RakeBatch/sendFrom/"
+m_MqttEncodingControlTopic = "/Merit/MBMAGH01/Encoding/"
+m_MqttLinkMetricsTopic = "/Merit/MBMAGH01/LinkMetrics/"
 
 m_MeritPort = ""
 m_WagonStartTime = ""
+m_BulkAxleReadFlag = MERIT_BULK_AXLE_READ
+m_RakeBatchPublishFlag = MERIT_RAKE_BATCH_PUBLISH
+m_RakeBatchSize = MERIT_RAKE_BATCH_SIZE
+m_RakeBatchCompressFlag = MERIT_RAKE_BATCH_COMPRESS
+m_RakeBatchNextWagon = 1				#first wagon of the current rake not yet published in a batch
+m_RakeBatchLock = threading.Lock()
+m_AxleRangeRequestedFlag = False		#axle range commands of the rake are queued
+m_AxleRangeCount = 0					#axle range responses expected
+m_AxleCount = 0							#axles weighed in the rake
+m_AxleRangeDict = {}					#Command : axle range payload bytes
+m_BulkResponse = None					#WeighingOver response the bulk read started on
+m_BulkRakeDict = None					#Merit_AxleWeightParse result waiting for the loco probe
+m_BulkLocoCount = 0						#locos found at the front of the rake by the bulk read
+m_BulkLocoDoneFlag = False				#leading vehicles probed, m_BulkLocoCount is final
+m_BulkLocoProbeNumber = 1				#leading vehicle the 0x5A poll asks for until the first wagon is found
 LOG_FILE_NAME	=	'./MeritLogs.log'
-logging.basicConfig(filename= LOG_FILE_NAME, format='%(asctime)s - %(message)s', datefmt='%d-%b-%y %H:%M:%S')
+#Records are queued and written by a background thread, the file rotates by size and age (MeritLogging.py)
+Merit_SetupLogging(LOG_FILE_NAME)
 # Creating an object
 m_TLCLogger = logging.getLogger()
-# Setting the threshold of logger to DEBUG
-m_TLCLogger.setLevel(logging.DEBUG)	
 		
 #***********************************************************************************#
 #******************************* Functions *****************************************#
 #***********************************************************************************#
 #********************************************************************************************#	
+#********************************************************************************************#
+#Description : Function to probe one port for the TLC with a firmware version query
+#Arguments : Port name, Event set once any probe has found the TLC
+#Return : (Open serial port, Version response frame) or (None, None), the port is closed on failure
+#Notes : Reads frames instead of readline, so a TLC answers in milliseconds and a silent port
+#		 costs one MERIT_SERIAL_TIMEOUT, shared by all ports probed in parallel
+#********************************************************************************************#
+def Merit_ProbeTLCPort(PortName, FoundEvent):
+	ProbePort = None
+	try:
+		ProbePort = serial.Serial(
+			port = PortName, baudrate = MERIT_SERIAL_BAUD_RATE, bytesize = MERIT_SERIAL_DATABITS, parity = MERIT_SERIAL_PARITY, 
+			stopbits = MERIT_SERIAL_STOPBITS, timeout = MERIT_PORT_PROBE_READ_TIMEOUT, interCharTimeout = MERIT_SERIAL_INTER_CHAR_TIMEOUT)
+		ProbePort.reset_input_buffer()
+		ProbePort.write(Merit_CommandFrame(MERIT_VERSION_OF_CODE_READ_CMD, b"", 0))
+		Decoder = MeritFrameDecoder()
+		Deadline = time.monotonic() + MERIT_SERIAL_TIMEOUT
+		while((time.monotonic() < Deadline) and (not FoundEvent.is_set())):
+			Data = ProbePort.read(max(1, ProbePort.in_waiting))
+			if(Data):
+				Decoder.Feed(Data)
+			FrameEntry = Decoder.GetFrame()
+			while(FrameEntry is not None):
+				ReceiveStatus, Frame = FrameEntry
+				if((ReceiveStatus == MERIT_READ_SUCCESS) and (Frame[MERIT_COMMAND_ID_POSITION] == MERIT_VERSION_OF_CODE_READ_CMD)):
+					ProbePort.timeout = MERIT_SERIAL_TIMEOUT
+					return (ProbePort, Frame)
+				FrameEntry = Decoder.GetFrame()
+		logging.error("No Response from Port : " + str(PortName))
+	except serial.SerialException as e:
+		logging.error(str(e))   
+	except Exception as ex:
+		logging.error(str(ex))
+	if(ProbePort is not None):
+		ProbePort.close()
+	return (None, None)
+
+#********************************************************************************************#
+#Description : Thread function to probe one port and record it if it is the first to answer
+#Arguments : Port name, Found event, Result lock, Result list
+#Return : None
+#********************************************************************************************#
+def Merit_ProbeTLCPortWorker(PortName, FoundEvent, ResultLock, ResultList):
+	ProbePort, Frame = Merit_ProbeTLCPort(PortName, FoundEvent)
+	if(ProbePort is None):
+		return
+	with ResultLock:
+		if(FoundEvent.is_set()):
+			ProbePort.close()		#another port answered first
+			return
+		FoundEvent.set()
+		ResultList.append((ProbePort, PortName, Frame))
+
+#********************************************************************************************#
+#Description : Function to probe ports in parallel and keep the first one the TLC answers on
+#Arguments : List of port names
+#Return : (Open serial port, Port name, Version response frame) or (None, "", None)
+#Notes : Every other port handle is closed before returning
+#********************************************************************************************#
+def Merit_ProbeTLCPorts(PortNameList):
+	FoundEvent = threading.Event()
+	ResultLock = threading.Lock()
+	ResultList = []
+	ProbeThreadList = [threading.Thread(target = Merit_ProbeTLCPortWorker, args = (PortName, FoundEvent, ResultLock, ResultList), daemon = True) for PortName in PortNameList]
+	for ProbeThread in ProbeThreadList:
+		ProbeThread.start()
+	for ProbeThread in ProbeThreadList:
+		ProbeThread.join()
+	if(ResultList):
+		return ResultList[0]
+	return (None, "", None)
+
 #********************************************************************************************#
 #Description : Function to find the TLC Port
-#Arguments : None
+#Arguments : Port to try first (last known TLC port), USB serial number of the last known TLC adapter
 #Return : TLC Portname
+#Notes : The last known port is probed alone first, a USB adapter that came back under a new
+#		 name is found by its serial number, then all remaining ports are probed in parallel.
+#		 Only m_TLCPinnedPort is probed when it is set.
 #********************************************************************************************#
-def Merit_FindTLCPort():
+def Merit_FindTLCPort(PreferredPort = "", PreferredSerialNumber = ""):
 	global m_TLCSerialPort
-	comPortsList = list_ports.comports()
-	portname = ""
-	for comport in comPortsList:
+	global m_TLCLastPort
+	global m_TLCLastSerialNumber
+	StartTime = time.monotonic()
+	if(m_TLCSerialPort is not None):
 		try:
-			m_TLCSerialPort = serial.Serial(
-				port = comport.name, baudrate = MERIT_SERIAL_BAUD_RATE, bytesize = MERIT_SERIAL_DATABITS, parity = MERIT_SERIAL_PARITY, 
-				stopbits = MERIT_SERIAL_STOPBITS, timeout = MERIT_SERIAL_TIMEOUT, interCharTimeout = MERIT_SERIAL_INTER_CHAR_TIMEOUT)
-			result = m_TLCSerialPort.write(MERIT_TLC_FWVER_LIST)
-			data = m_TLCSerialPort.readline()
-			if(data):
-				portname = comport.name
-				logging.info("TLC COM Port Found. Port : " + str(portname))
-				print("TLC COM Port Found. Port : " + str(portname))
-				break
-			else:
-				print("No Response from Port : " + str(comport.name))
-				logging.error("No Response from Port : " + str(comport.name))
-				data = m_TLCSerialPort.close()
-		except serial.SerialException as e:
-			logging.error(str(e))   
+			m_TLCSerialPort.close()		#release the faulted handle before reopening
 		except Exception as ex:
 			logging.error(str(ex))
-			pass	
+		m_TLCSerialPort = None
+	
+	SerialNumberDict = {}
+	for comport in list_ports.comports():
+		SerialNumberDict[comport.device] = comport.serial_number
+	FirstList = []
+	if(PreferredPort != ""):
+		FirstList.append(PreferredPort)
+	if((PreferredSerialNumber != "") and (PreferredSerialNumber is not None)):
+		FirstList = FirstList + [Name for Name, SerialNumber in SerialNumberDict.items() if((SerialNumber == PreferredSerialNumber) and (Name not in FirstList))]
+	RestList = [Name for Name in SerialNumberDict if Name not in FirstList]
+	if(m_TLCPinnedPort != ""):
+		FirstList = [m_TLCPinnedPort]
+		RestList = []
+	
+	ProbePort, portname, Frame = Merit_ProbeTLCPorts(FirstList)
+	if(ProbePort is None):
+		ProbePort, portname, Frame = Merit_ProbeTLCPorts(RestList)
+	if(ProbePort is not None):
+		m_TLCSerialPort = ProbePort
+		m_TLCLastPort = portname
+		m_TLCLastSerialNumber = SerialNumberDict.get(portname) or m_TLCLastSerialNumber
+		m_TLCFrameDecoder.Clear()
+		LengthOfQuery = Frame[MERIT_QUERY_LEN_POSITION] + (Frame[MERIT_QUERY_LEN_POSITION + 1] << 8)
+		Merit_VersionReqParse(memoryview(Frame)[MERIT_COMMAND_ID_POSITION : LengthOfQuery + MERIT_COMMAND_ID_POSITION])
+		logging.info("TLC COM Port Found. Port : " + str(portname) + ", Time : " + str(round(time.monotonic() - StartTime, 3)) + " s")
+		print("TLC COM Port Found. Port : " + str(portname))
+	else:
+		logging.error("TLC not found on " + str(len(FirstList) + len(RestList)) + " ports, Time : " + str(round(time.monotonic() - StartTime, 3)) + " s")
 	return portname
 
 #********************************************************************************************#
@@ -497,18 +1318,58 @@ def Merit_FindTLCPort():
 #Return : None
 #********************************************************************************************#
 def Merit_TLCMonitor():
-	global m_TLCMonitorInitFlag
+	Merit_PollDueCommands(Merit_MonitorPollList(), WAGON_EMPTY_SCAN_PRIORITY)
+
+#********************************************************************************************#
+#Description : function to get the commands the monitor polls in the current mode
+#Arguments : None
+#Return : Poll command list, weighment, status or none
+#********************************************************************************************#
+def Merit_MonitorPollList():
 	global m_TLCStatusFlag
 	if(m_TLCMonitorInitFlag == True):
 		m_TLCStatusFlag = False
-		Merit_WriteCommand(MERIT_WAGON_WEIGHT_WRITE_CMD, [0,TEST_WAGON,RESOULUTION_LSB,RESOULUTION_MSB], WAGON_WEIGH_COMMAND_PAYLOAD_SIZE, WAGON_EMPTY_SCAN_PRIORITY)
-		time.sleep(MERIT_DEFAULT_QUERY_DELAY)
-		Merit_WriteCommand(MERIT_DIGITAL_OUTPUT_STATUS_READ_CMD, [], 0, WAGON_EMPTY_SCAN_PRIORITY)		
-		time.sleep(MERIT_DEFAULT_QUERY_DELAY)
-		Merit_WriteCommand(MERIT_DIGITAL_INPUT_STATUS_READ_CMD, [], 0, WAGON_EMPTY_SCAN_PRIORITY)
-		time.sleep(MERIT_DEFAULT_QUERY_DELAY)
-	else:
-		Merit_Status(WAGON_EMPTY_SCAN_PRIORITY)
+		return MeritMonitorPollList
+	if(m_NoPostFlag == False):
+		return MeritStatusPollList
+	return []
+
+#********************************************************************************************#
+#Description : function to poll the due commands of the list and sleep until the next one is due
+#Arguments : Poll command list, Priority of command
+#Return : None
+#********************************************************************************************#
+def Merit_PollDueCommands(PollList, Priority):
+	global m_TLCPollScheduler
+	for Command in m_TLCPollScheduler.DueCommands(PollList):
+		PollTime = time.monotonic()
+		Payload, Length = Merit_PollPayload(Command)
+		Merit_WriteCommand(Command, Payload, Length, Priority, MERIT_POLL_TIME_TO_LIVE).Wait()
+		m_TLCPollScheduler.Polled(Command, PollTime)
+	m_TLCPollScheduler.WaitNextDue(PollList)
+
+#********************************************************************************************#
+#Description : function to get the payload of a poll command
+#Arguments : Command
+#Return : (Payload, Length)
+#Notes : During a bulk read rake the 0x5A poll asks for the next leading vehicle that is weighed, so the
+#		 locos are found by the poll itself and not by one more request per vehicle
+#********************************************************************************************#
+def Merit_PollPayload(Command):
+	if((Command == MERIT_WAGON_WEIGHT_WRITE_CMD) and (m_BulkAxleReadFlag == True) and (m_BulkLocoDoneFlag == False) and (m_BulkLocoProbeNumber <= m_WagonCount)):
+		return ([m_BulkLocoProbeNumber,TEST_WAGON,RESOULUTION_LSB,RESOULUTION_MSB], WAGON_WEIGH_COMMAND_PAYLOAD_SIZE)
+	return MeritPollPayloadDict.get(Command, ([], 0))
+
+#********************************************************************************************#
+#Description : function to switch the bulk axle read on or off
+#Arguments : True to read the rake in bulk at WeighingOver
+#Return : None
+#********************************************************************************************#
+def Merit_SetBulkAxleRead(Flag):
+	global m_BulkAxleReadFlag
+	
+	m_BulkAxleReadFlag = Flag
+	m_TLCPollScheduler.SetPeriods(MeritBulkPollPeriodDict if(Flag == True) else MeritPollPeriodDict)
 
 #********************************************************************************************#
 #Description : function to initiate variables
@@ -521,11 +1382,12 @@ def Merit_VariableInit():
 	global m_CurrentWeighmentWagonNumber	
 	global m_PreviousWeighmentWagonNumber	
 	global m_MqttPostCurrentWagonNumber
+	global m_MqttPostAckedWagonNumber
+	global m_WagonAckedSet
 	global m_MqttPostWeighmentInitFlag
 	global m_WeighmentInitFlag
 	#global m_TLCMonitorInitFlag
 	#global MqttConnectFlag	= False
-	global m_MeritWagonDetailsDict
 	global m_WagonWeightDataParseDict
 	global m_LocoCount 
 	global m_LocoFlag
@@ -536,17 +1398,29 @@ def Merit_VariableInit():
 	global m_TLCSerialCommandWriteQueue
 	global m_SerialCommErrorFlag
 	global m_TLCStatusControlFlag
+	global m_AxleRangeRequestedFlag
+	global m_AxleRangeCount
+	global m_AxleCount
+	global m_AxleRangeDict
+	global m_BulkResponse
+	global m_BulkRakeDict
+	global m_BulkLocoCount
+	global m_BulkLocoDoneFlag
+	global m_BulkLocoProbeNumber
 	
-	m_TLCSerialCommandWriteQueue.queue.clear()
-	m_WagonCount			=	0
+	Merit_DropQueuedCommands()
+	with m_WagonPublishCondition:
+		m_WagonCount			=	0
+		m_MqttPostCurrentWagonNumber	=	0
+		m_MqttPostAckedWagonNumber = 0
+		m_WagonAckedSet = set()
+		m_LocoCount = 0
+		m_WagonPublishCondition.notify_all()
 	m_CurrentWeighmentWagonNumber		=	1
 	m_PreviousWeighmentWagonNumber		=	0
-	m_MqttPostCurrentWagonNumber	=	0
 	m_MqttPostWeighmentInitFlag	=	False
 	m_WeighmentInitFlag = 0
-	m_MeritWagonDetailsDict = {}
 	m_WagonWeightDataParseDict = {}
-	m_LocoCount = 0
 	m_LocoFlag = False
 	m_TLCStatusFlag = False
 	m_MeritPort = ""
@@ -554,27 +1428,55 @@ def Merit_VariableInit():
 	m_SerialCommFailureCount = 0
 	m_SerialCommErrorFlag = False
 	m_TLCStatusControlFlag = False
+	m_AxleRangeRequestedFlag = False
+	m_AxleRangeCount = 0
+	m_AxleCount = 0
+	m_AxleRangeDict = {}
+	m_BulkResponse = None
+	m_BulkRakeDict = None
+	m_BulkLocoCount = 0
+	m_BulkLocoDoneFlag = False
+	m_BulkLocoProbeNumber = 1
 	
 #********************************************************************************************#
 #Description : function to initiate the TLC Weighment Process
 #Arguments : None
-#Return : None
+#Return : True if the TLC answered the Init and the rake is started
 #********************************************************************************************#	
 def Merit_Init():
 	global m_TLCSerialCommandWriteQueue
+	
+	logging.info(str("******************** QUEUE CLEARED **********************\n"))
+	Merit_DropQueuedCommands()
+	logging.info("MERIT Init Command Send to TLC Controller")
+	if(Merit_WriteCommand(MERIT_INIT_AND_AXLE_ELIMINATE_WRITE_CMD, [m_AXLETOELIMINATE], 1, WAGON_DATA_PRIORITY).Wait() is None):
+		logging.error("Init Not Answered By TLC Controller, Rake Not Started")
+		Merit_Publish(m_TLCMqttClient, m_ErrorStatusTopic, json.dumps({"Error" : "Init Not Answered"}))
+		return False
+	Merit_RakeStart()
+	return True
+
+#********************************************************************************************#
+#Description : function to reset the weighment state and open a new rake once the TLC took the Init command
+#Arguments : None
+#Return : None
+#Notes : Also called by TLCReplay.py when a captured Init response is replayed
+#********************************************************************************************#	
+def Merit_RakeStart():
 	global m_TLCMonitorInitFlag
 	global m_NoPostFlag
+	global m_RakeId
+	global m_RakeBatchNextWagon
 	
-	with m_TLCSerialCommandWriteQueue.mutex:
-		logging.info(str("******************** QUEUE CLEARED **********************\n"))
-		m_TLCSerialCommandWriteQueue.queue.clear()
-	logging.info("MERIT Init Command Send to TLC Controller")
-	time.sleep(MERIT_DEFAULT_QUERY_DELAY)
-	Merit_WriteCommand(MERIT_INIT_AND_AXLE_ELIMINATE_WRITE_CMD, [m_AXLETOELIMINATE], 1, WAGON_DATA_PRIORITY)
-	time.sleep(MERIT_DEFAULT_QUERY_DELAY)
 	Merit_VariableInit()
+	with m_WagonPublishCondition:
+		m_RakeId = m_WagonStore.StartRake(m_HostWGID)
+		m_RakeBatchNextWagon = 1
+	logging.info("Wagon Store Rake Id : " + str(m_RakeId))
 	m_TLCMonitorInitFlag = True
 	m_NoPostFlag = False
+	m_TLCPollScheduler.MarkActivity()			#rake expected, start at the fast periods
+	m_TLCPollScheduler.Restart()
 	
 #********************************************************************************************#
 #Description : function to Terminate the TLC Weighment Process
@@ -586,97 +1488,132 @@ def Merit_Terminate():
 	global m_TLCMonitorInitFlag
 	global m_NoPostFlag
 	
-	with m_TLCSerialCommandWriteQueue.mutex:
-		logging.info(str("******************** QUEUE CLEARED **********************\n"))
-		m_TLCSerialCommandWriteQueue.queue.clear()	
+	logging.info(str("******************** QUEUE CLEARED **********************\n"))
+	Merit_DropQueuedCommands()
 	logging.info("MERIT Terminate Command Send to TLC Controller")
-	time.sleep(MERIT_DEFAULT_QUERY_DELAY)
-	Merit_WriteCommand(MERIT_TERMINATE_WRITE_CMD, [], 0, WAGON_DATA_PRIORITY)
-	time.sleep(MERIT_DEFAULT_QUERY_DELAY)
+	if(Merit_WriteCommand(MERIT_TERMINATE_WRITE_CMD, [], 0, WAGON_DATA_PRIORITY).Wait() is None):
+		logging.error("Terminate Not Answered By TLC Controller, Rake Closed")
+	logging.info("Serial Transactions Saved By Merging : " + str(m_TLCSerialCommandWriteQueue.m_MergedCount) + ", Expired Commands Dropped : " + str(m_TLCSerialCommandWriteQueue.m_ExpiredCount))
+	Merit_RakeEnd()
+
+#********************************************************************************************#
+#Description : function to close the rake and reset the weighment state once the TLC took the Terminate command
+#Arguments : None
+#Return : None
+#Notes : Also called by TLCReplay.py when a captured Terminate response is replayed
+#********************************************************************************************#	
+def Merit_RakeEnd():
+	global m_TLCMonitorInitFlag
+	global m_NoPostFlag
+	
+	Merit_PublishLinkMetrics()
+	m_WagonStore.EndRake(m_RakeId)
+	if(m_RakeBatchPublishFlag == True):
+		Merit_RakeBatchPublishDue(True)		#rest of the rake with the rake complete flag
 	Merit_VariableInit()
 	m_TLCMonitorInitFlag = False
 	m_NoPostFlag = True	
 	
 #********************************************************************************************#
-#Description : Function to write TLC Read command over Serial Port
-#Arguments : Command, Queue Priority
+#Description : Function to build the unstuffed TLC command frame with checksum
+#Arguments : Command, Payload (list of ints or bytes) and length of payload
+#Return : Frame bytes
+#********************************************************************************************#
+def Merit_BuildCommandFrame(Command, Payload, Length):
+	LengthOfQuery = Length + 1	#command + payload
+	CommandFrame = bytearray((MERIT_START_BYTE, MERIT_RTUID_BYTE, LengthOfQuery & 0xff, LengthOfQuery >> 8, Command))
+	CommandFrame.extend(Payload)
+	CheckSum = Merit_Crc16(CommandFrame)
+	CommandFrame.append(CheckSum & 0xff)
+	CommandFrame.append(CheckSum >> 8)
+	return bytes(CommandFrame)
+
+#********************************************************************************************#
+#Description : Function to get the stuffed and checksummed TLC command frame from the frame cache
+#Arguments : Command, Payload (list of ints or bytes) and length of payload
+#Return : Stuffed frame bytes ready to write on the serial port
+#Notes : Frames are built once per (command, payload), the polling commands hit the cache every cycle
+#********************************************************************************************#
+def Merit_CommandFrame(Command, Payload, Length):
+	global m_TLCCommandFrameCache
+	Key = (Command, bytes(Payload[ : Length]))
+	CommandFrame = m_TLCCommandFrameCache.get(Key)
+	if(CommandFrame is None):
+		CommandFrame = Merit_AddStuffBytes(Merit_BuildCommandFrame(Command, Key[1], Length))
+		if(len(m_TLCCommandFrameCache) >= MERIT_COMMAND_FRAME_CACHE_SIZE):
+			m_TLCCommandFrameCache.clear()
+		m_TLCCommandFrameCache[Key] = CommandFrame
+	return CommandFrame
+
+#********************************************************************************************#
+#Description : Function to drop cached command frames when the resolution or axle elimination parameters change
+#Arguments : Command to drop, None drops every cached frame
 #Return : None
+#********************************************************************************************#
+def Merit_InvalidateCommandFrameCache(Command = None):
+	global m_TLCCommandFrameCache
+	if(Command is None):
+		m_TLCCommandFrameCache.clear()
+	else:
+		for Key in [Key for Key in m_TLCCommandFrameCache if Key[0] == Command]:
+			del m_TLCCommandFrameCache[Key]
+	logging.info("Command frame cache invalidated. Command : " + str(Command))
+
+#********************************************************************************************#
+#Description : Function to write TLC Read command over Serial Port
+#Arguments : Command, Queue Priority, Time to live in the queue (None never expires)
+#Return : MeritTransaction
+#Notes : Queue entry is [time, stuffed frame, command, transaction]
 #********************************************************************************************#		
-def Merit_ReadCommand(Command, QueuePriority):
-	global m_TLCSerialCommandWriteQueue
-	ReadSortQueue = []
-	InputReadCommandList = []
-	InputReadCommandList.append(MERIT_START_BYTE)
-	InputReadCommandList.append(MERIT_RTUID_BYTE)
-	InputReadCommandList.append(0x01)
-	InputReadCommandList.append(0x00)
-	InputReadCommandList.append(Command)
-	InputCheckSum = Merit_ChecksumForList(InputReadCommandList)
-	InputReadCommandList.append(InputCheckSum & 0xff)
-	InputReadCommandList.append(InputCheckSum >> 8)
-	ReadSortQueue.append(datetime.datetime.now())
-	ReadSortQueue.append(InputReadCommandList)
-	m_TLCSerialCommandWriteQueue.put((QueuePriority, ReadSortQueue))
+def Merit_ReadCommand(Command, QueuePriority, TimeToLive = None):
+	return Merit_WriteCommand(Command, b"", 0, QueuePriority, TimeToLive)
 
 #********************************************************************************************#
 #Description : Function to write TLC Write command over Serial port 
-#Arguments : Command , Payload and length of payload, Queue Priority
-#Return : None
+#Arguments : Command , Payload and length of payload, Queue Priority, Time to live in the queue (None never expires)
+#Return : MeritTransaction, call Wait() on it to get the response
+#Notes : A command identical to a pending one returns the pending transaction, the TLC is asked once
 #********************************************************************************************#	
-def Merit_WriteCommand(Command, Payload, Length, QueuePriority):
+def Merit_WriteCommand(Command, Payload, Length, QueuePriority, TimeToLive = None):
 	global m_TLCSerialCommandWriteQueue
+	Transaction = MeritTransaction(Command, Merit_CommandFrame(Command, Payload, Length), QueuePriority, TimeToLive)
 	WriteSortQueue = []
-	InputWriteCommandList = []
-	InputWriteCommandList.append(MERIT_START_BYTE)
-	InputWriteCommandList.append(MERIT_RTUID_BYTE)
-	InputWriteCommandList.append(Length + 1)	#command + payload 
-	InputWriteCommandList.append(0x00)
-	InputWriteCommandList.append(Command)
-	InputWriteCommandList = InputWriteCommandList + Payload
-	InputCheckSum = Merit_ChecksumForList(InputWriteCommandList)
-	InputWriteCommandList.append(InputCheckSum & 0xff)
-	InputWriteCommandList.append(InputCheckSum >> 8)
 	WriteSortQueue.append(datetime.datetime.now())
-	WriteSortQueue.append(InputWriteCommandList)
-	m_TLCSerialCommandWriteQueue.put((QueuePriority, WriteSortQueue))	
+	WriteSortQueue.append(Transaction.m_Frame)
+	WriteSortQueue.append(Command)
+	WriteSortQueue.append(Transaction)
+	return m_TLCSerialCommandWriteQueue.PutOrMerge(QueuePriority, WriteSortQueue)
+
+#********************************************************************************************#
+#Description : Function to drop every queued command, their transactions are cancelled
+#Arguments : None
+#Return : None
+#********************************************************************************************#	
+def Merit_DropQueuedCommands():
+	global m_TLCSerialCommandWriteQueue
+	with m_TLCSerialCommandWriteQueue.mutex:
+		for QueuePriority, QueueSequence, QueueEntry in m_TLCSerialCommandWriteQueue.queue:
+			if(QueueEntry[3] is not None):
+				QueueEntry[3].cancel()
+		m_TLCSerialCommandWriteQueue.queue.clear()
 	
 #********************************************************************************************#
-#Description : Function to remove stuff byte(0x10) from the list
-#Arguments : Input List
-#Return : List after removing stuff byte
+#Description : Function to remove stuff byte(0x10) from the frame
+#Arguments : Input frame (bytes, bytearray, memoryview or list of ints)
+#Return : Frame bytes after removing stuff byte
 #********************************************************************************************#
 def Merit_RemoveStuffBytes(InputList):
-	newList = []
-	Index = 0
-
-	while Index < len(InputList):
-		if(Index == len(InputList) - 1):
-			newList.append(InputList[Index])
-			break
-		if (InputList[Index] == MERIT_ADDITIONAL_BYTE):
-			checkItem = InputList[Index + 1]
-			if(checkItem == MERIT_ADDITIONAL_BYTE or checkItem == MERIT_START_BYTE):
-				newList.append(checkItem)
-				Index = Index + 1
-		else:
-			newList.append(InputList[Index])
-		Index = Index + 1
-	return newList
+	return MERIT_UNSTUFF_PATTERN.sub(rb"\1", bytes(InputList))
 
 #********************************************************************************************#
-#Description : Function to add stuff byte (0x10) to the list if there is 0x10 or 0x7E byte
-#Arguments : input list
-#Return :  List after adding Stuff byte
+#Description : Function to add stuff byte (0x10) to the frame if there is 0x10 or 0x7E byte
+#Arguments : Input frame (bytes, bytearray, memoryview or list of ints)
+#Return : Frame bytes after adding Stuff byte
 #********************************************************************************************#
 def Merit_AddStuffBytes(InputList):
-	newList = [MERIT_START_BYTE]
-	for index, elem in enumerate(InputList[1:]):
-		if (elem == MERIT_START_BYTE) or (elem == MERIT_ADDITIONAL_BYTE):
-			newList.append(MERIT_ADDITIONAL_BYTE)
-			newList.append(elem)
-		else:
-			newList.append(elem)
-	return newList	
+	Frame = bytes(InputList)
+	#0x10 is stuffed first so that the 0x10 added in front of 0x7E is not stuffed again
+	return MERIT_START_BYTES + Frame[1 : ].replace(MERIT_ADDITIONAL_BYTES, MERIT_STUFFED_ADDITIONAL_BYTES).replace(MERIT_START_BYTES, MERIT_STUFFED_START_BYTES)
 	
 #********************************************************************************************#
 #Description : Function to calculate checksum for command list checksum and element from crc16 table
@@ -694,10 +1631,7 @@ def Merit_GetCheckSum(Csum, Element):
 #Return : CheckSum for the input list
 #********************************************************************************************#	
 def Merit_ChecksumForList(InputList):
-	CheckSum = 0 
-	for Element in InputList:
-		CheckSum = Merit_GetCheckSum(CheckSum, Element)	
-	return CheckSum
+	return Merit_Crc16(InputList)
 
 #********************************************************************************************#
 #Description : Function to write TLC commands over Serial Port via queue
@@ -705,55 +1639,119 @@ def Merit_ChecksumForList(InputList):
 #Return : None
 #********************************************************************************************#	
 def Merit_SerialWriterQueue():
-	global m_TLCSerialPort
 	global m_TLCSerialCommandWriteQueue
+	global m_TLCWriterStopEvent
+	
+	while(m_TLCWriterStopEvent.is_set() == False):
+		try:
+			data = m_TLCSerialCommandWriteQueue.get()
+			Transaction = data[2][3]
+			if(Transaction is None):
+				break
+			if(Transaction.Expired() == True):
+				m_TLCSerialCommandWriteQueue.m_ExpiredCount = m_TLCSerialCommandWriteQueue.m_ExpiredCount + 1
+				logging.info("Expired Command Dropped : " + str(Transaction.m_Command))
+				Transaction.cancel()
+				continue
+			Merit_RunTransaction(Transaction)
+		except Exception as ex:
+			logging.error(str(ex))
+	logging.info("Serial Writer Stopped")
+		
+#********************************************************************************************#
+#Description : Function to start the serial writer thread
+#Arguments : None
+#Return : Writer thread
+#********************************************************************************************#	
+def Merit_StartSerialWriter():
+	global m_TLCWriterThread
+	global m_TLCWriterStopEvent
+	
+	if((m_TLCWriterThread is not None) and (m_TLCWriterThread.is_alive() == True)):
+		return m_TLCWriterThread
+	m_TLCWriterStopEvent.clear()
+	m_TLCWriterThread = threading.Thread(target = Merit_SerialWriterQueue, args=(), daemon = True)
+	m_TLCWriterThread.start()
+	return m_TLCWriterThread
+
+#********************************************************************************************#
+#Description : Function to stop the serial writer thread, queued commands are cancelled
+#Arguments : None
+#Return : True if the writer stopped within MERIT_WRITER_STOP_TIMEOUT
+#Notes : A transaction already on the wire is completed first
+#********************************************************************************************#	
+def Merit_StopSerialWriter():
+	global m_TLCWriterThread
+	global m_TLCWriterStopEvent
+	global m_TLCSerialCommandWriteQueue
+	
+	if(m_TLCWriterThread is None):
+		return True
+	m_TLCWriterStopEvent.set()
+	Merit_DropQueuedCommands()
+	m_TLCSerialCommandWriteQueue.PutOrMerge(MERIT_WRITER_STOP_PRIORITY, [datetime.datetime.now(), None, None, None])		#wakes the blocked get
+	m_TLCWriterThread.join(MERIT_WRITER_STOP_TIMEOUT)
+	if(m_TLCWriterThread.is_alive() == True):
+		logging.error("Serial Writer did not stop in " + str(MERIT_WRITER_STOP_TIMEOUT) + " s")
+		return False
+	m_TLCWriterThread = None
+	return True
+
+#********************************************************************************************#
+#Description : Function to run one transaction on the serial port with its reply timeout and retries
+#Arguments : MeritTransaction
+#Return : None
+#Notes : Only serial port exceptions count towards the serial communication failure
+#********************************************************************************************#	
+def Merit_RunTransaction(Transaction):
+	global m_TLCSerialPort
 	global m_SerialCommFailureCount
 	global m_SerialCommErrorFlag
 	global m_TLCMqttClient
 	global m_ErrorStatusTopic
 	
-	ErrorMsgDict = {}
-	ErrorMsgDict["ErrorMessage"] = "SerialCommuncationFailed"
+	if(Transaction.set_running_or_notify_cancel() == False):
+		return
+	Command = Transaction.m_Command
+	ReceiveSuccessFlag = MERIT_READ_TIMEOUT
+	for i in range(Transaction.m_RetryCount + 1):
+		try:
+			logging.debug("Command to send : %d", Command)
+			result = m_TLCSerialPort.write(Transaction.m_Frame)
+			m_TLCFrameRing.Record(MERIT_FRAME_TX, Transaction.m_Frame)
+			ReceiveSuccessFlag, Response = Merit_SerialRead100ms(Command, Transaction.m_Timeout)
+			m_SerialCommFailureCount = 0
+			if(ReceiveSuccessFlag == MERIT_READ_SUCCESS):
+				Transaction.set_result(Response)
+				return
+		except serial.SerialException as e:
+			if(Merit_SerialCommFailure(e) == True):
+				Transaction.set_exception(e)
+				time.sleep(1)
+				return
+		except Exception as ex:
+			logging.error(str(ex))
+			Transaction.set_exception(ex)
+			return
+	Transaction.set_exception(MeritTransactionError(Command, ReceiveSuccessFlag))
+
+#********************************************************************************************#
+#Description : Function to count a serial port exception towards the serial communication failure
+#Arguments : Serial exception
+#Return : True once MAX_RETRY_COUNT exceptions in a row marked the port failed
+#********************************************************************************************#	
+def Merit_SerialCommFailure(Error):
+	global m_SerialCommFailureCount
+	global m_SerialCommErrorFlag
 	
-	while(1):
-		while(not m_TLCSerialCommandWriteQueue.empty()):
-			try:
-				m_SerialCommFailureCount = 0
-				data = list(m_TLCSerialCommandWriteQueue.get())
-				InputReadCommandList = data[1][1]
-				Command = InputReadCommandList[MERIT_COMMAND_ID_POSITION]
-				for i in range(MAX_RETRY_COUNT):
-					try:
-						print("Command to send : " + str(Command))
-						logging.info("Command to send : " + str(Command))
-						result = m_TLCSerialPort.write(Merit_AddStuffBytes(InputReadCommandList))
-						#print("Send Bytes From Queue", Merit_AddStuffBytes(InputReadCommandList))
-						logging.info("Serial Command Packet : " + str(Merit_AddStuffBytes(InputReadCommandList)))
-						if(Merit_SerialRead100ms(Command) == False):
-							m_SerialCommFailureCount = m_SerialCommFailureCount + 1;
-							if(m_SerialCommFailureCount >= MAX_RETRY_COUNT):
-								#Merit_Publish(m_TLCMqttClient, m_ErrorStatusTopic, json.dumps(m_WagonWeightDataParseDict))
-								m_TLCMqttClient.publish(m_ErrorStatusTopic, json.dumps(m_WagonWeightDataParseDict))
-								m_SerialCommErrorFlag = True
-								time.sleep(1)
-							else:
-								continue
-						m_SerialCommFailureCount = 0
-						break
-					except serial.SerialException as e:
-						m_SerialCommFailureCount = m_SerialCommFailureCount + 1;
-						logging.error(str(e))
-						if(m_SerialCommFailureCount >= MAX_RETRY_COUNT):
-							m_TLCMqttClient.publish(m_ErrorStatusTopic, json.dumps(m_WagonWeightDataParseDict))
-							m_SerialCommErrorFlag = True
-							time.sleep(1)
-						else:
-							continue
-				
-			except Exception as ex:
-				logging.error(str(ex))
-			time.sleep(0.01)
-		time.sleep(0.001)
+	m_SerialCommFailureCount = m_SerialCommFailureCount + 1;
+	logging.error(str(Error))
+	m_TLCFrameRing.Dump("Serial Port Error : " + str(Error))
+	if(m_SerialCommFailureCount >= MAX_RETRY_COUNT):
+		Merit_Publish(m_TLCMqttClient, m_ErrorStatusTopic, json.dumps(m_WagonWeightDataParseDict))		#before the error flag stops the publishes
+		m_SerialCommErrorFlag = True
+		return True
+	return False
 		
 #********************************************************************************************#
 #Description : Function to get tlc firmware version and Release date over serial port
@@ -762,95 +1760,135 @@ def Merit_SerialWriterQueue():
 #********************************************************************************************#	
 def Merit_SerialWriterVersionRequesAndDate(): 
 	try:
-		Merit_WriteCommand(MERIT_VERSION_OF_CODE_READ_CMD, [], 0, WAGON_DATA_PRIORITY)
-		time.sleep(MERIT_DEFAULT_QUERY_DELAY)
-		Merit_WriteCommand(MERIT_CODE_RELAESE_DATE_READ_CMD, [], 0, WAGON_DATA_PRIORITY)
-		time.sleep(MERIT_DEFAULT_QUERY_DELAY)
+		VersionTransaction = Merit_WriteCommand(MERIT_VERSION_OF_CODE_READ_CMD, [], 0, WAGON_DATA_PRIORITY)
+		ReleaseDateTransaction = Merit_WriteCommand(MERIT_CODE_RELAESE_DATE_READ_CMD, [], 0, WAGON_DATA_PRIORITY)
+		VersionTransaction.Wait()
+		ReleaseDateTransaction.Wait()
 	except Exception as ex:
 		logging.error(str(ex))
 	
 #********************************************************************************************#
-#Description : function to read the serial port for given command 
-#Arguments : Command to read
-#Return : None
-#********************************************************************************************#		
-def Merit_SerialRead100ms(Command):
+#Description : function to read the serial port until a complete frame for given command is decoded
+#Arguments : Command to read, Reply timeout
+#Return : (ReceiveStatus, Unstuffed frame bytes or None)
+#Notes : Returns as soon as the last byte of the frame lands instead of waiting for the timeout,
+#		 frames of other commands left over from an earlier timed out query are skipped
+#********************************************************************************************#
+def Merit_SerialReadFrame(Command, Timeout = MERIT_SERIAL_TIMEOUT):
 	global m_TLCSerialPort
-	LengthOfQuery = 0
-	dataAfterDublicateList = []
+	global m_TLCFrameDecoder
+	global m_TLCReceiveView
 	ReceiveSuccessFlag = MERIT_READ_TIMEOUT
+	Deadline = time.monotonic() + Timeout
+	
+	while(True):
+		ReceiveSuccessFlag, Frame = Merit_TakeFrame(Command, ReceiveSuccessFlag)
+		if(Frame is not None):
+			return (ReceiveSuccessFlag, Frame)
+		if(time.monotonic() >= Deadline):
+			break
+		ReadLength = m_TLCSerialPort.readinto(m_TLCReceiveView[ : min(max(1, m_TLCSerialPort.in_waiting), MERIT_SERIAL_MAX_BYTES_TO_RECEIVE)])
+		if(not ReadLength):
+			break
+		data = m_TLCReceiveView[ : ReadLength]
+		m_TLCFrameRing.Record(MERIT_FRAME_RX, data)
+		m_TLCFrameDecoder.Feed(data)
+	return (ReceiveSuccessFlag, None)
+
+#********************************************************************************************#
+#Description : function to take the decoded frames until one answers the given command
+#Arguments : Command to read, Receive status so far
+#Return : (ReceiveStatus, Unstuffed frame bytes), frame None while no answer is decoded yet
+#Notes : Frames of other commands are skipped, the status then becomes MERIT_COMMAND_MISMATCH
+#********************************************************************************************#
+def Merit_TakeFrame(Command, ReceiveSuccessFlag):
+	FrameEntry = m_TLCFrameDecoder.GetFrame()
+	while(FrameEntry is not None):
+		ReceiveSuccessFlag, Frame = FrameEntry
+		if(ReceiveSuccessFlag != MERIT_READ_SUCCESS):
+			return (ReceiveSuccessFlag, Frame)
+		if(Frame[MERIT_COMMAND_ID_POSITION] == Command):
+			return (MERIT_READ_SUCCESS, Frame)
+		ReceiveSuccessFlag = MERIT_COMMAND_MISMATCH
+		logging.info("Stale Frame Skipped, Command : %d", Frame[MERIT_COMMAND_ID_POSITION])
+		FrameEntry = m_TLCFrameDecoder.GetFrame()
+	return (ReceiveSuccessFlag, None)
+
+#********************************************************************************************#
+#Description : function to read the serial port for given command 
+#Arguments : Command to read, Reply timeout
+#Return : (ReceiveStatus, decoded response record or payload bytes, None if nothing valid was read)
+#Notes : Serial port exceptions are raised to the caller
+#********************************************************************************************#		
+def Merit_SerialRead100ms(Command, Timeout = MERIT_SERIAL_TIMEOUT):
 	StartTime = datetime.datetime.now()
+	try:
+		ReceiveSuccessFlag, Frame = Merit_SerialReadFrame(Command, Timeout)
+	except serial.SerialException as e:
+		logging.error(str(e)) 
+		raise
+	except Exception as ex:
+		logging.error("******************** Exception : , data : " + str(ex) + " *******************************")
+		return (MERIT_READ_TIMEOUT, None)
+	return Merit_ResponseFrameParse(Command, ReceiveSuccessFlag, Frame, StartTime)
+
+#********************************************************************************************#
+#Description : function to decode and parse the response frame of a command
+#Arguments : Command, Receive status, Unstuffed frame bytes, Time the read started
+#Return : (ReceiveStatus, decoded response record or payload bytes, None if nothing valid was read)
+#********************************************************************************************#		
+def Merit_ResponseFrameParse(Command, ReceiveSuccessFlag, dataAfterDublicateList, StartTime):
+	LengthOfQuery = 0
+	Response = None
 	EndTime = 0
-	Status = True
 	
 	try:
-		if(True):
-			try:
-				ReceiveSuccessFlag = MERIT_READ_TIMEOUT
-				data = m_TLCSerialPort.read(MERIT_SERIAL_MAX_BYTES_TO_RECEIVE)
-				EndTime = (datetime.datetime.now() - StartTime).total_seconds()
-				logging.info("******** Time Taken To Read : " + str(EndTime) + " **************")
-					
-				logging.info("Data Read : " + str(list(data)) + "Length : " + str(len(list(data))))
-				if(len(list(data)) > 0):
-					dataAfterDublicateList = Merit_RemoveStuffBytes(data)
-					if(dataAfterDublicateList[MERIT_HEADER_ID_POSITION] == MERIT_START_BYTE):
-						if(dataAfterDublicateList[MERIT_RTU_ID_POSITION] == MERIT_RTUID_BYTE):
-							LengthOfQuery = (dataAfterDublicateList[MERIT_QUERY_LEN_POSITION] + (dataAfterDublicateList[MERIT_QUERY_LEN_POSITION + 1] << 8)) 
-							if(dataAfterDublicateList[MERIT_COMMAND_ID_POSITION] == Command):
-								if(len(dataAfterDublicateList) == (MERIT_COMMAND_ID_POSITION + LengthOfQuery + 2 )):
-									GivenchecksumList = dataAfterDublicateList[(LengthOfQuery + MERIT_COMMAND_ID_POSITION) : ] 
-									Givenchecksum = GivenchecksumList[0] | (GivenchecksumList[1] << 8)
-									DataCheckSum = Merit_ChecksumForList(dataAfterDublicateList[ : (LengthOfQuery + MERIT_COMMAND_ID_POSITION)])
-									if(Givenchecksum == DataCheckSum):
-										listToStr = ' '.join([chr(elem) for elem in dataAfterDublicateList[ (MERIT_COMMAND_ID_POSITION + 1) : (LengthOfQuery + MERIT_COMMAND_ID_POSITION)]])
-										#print("Rec Data in String : ", listToStr)
-										ReceiveSuccessFlag = MERIT_READ_SUCCESS
-										if(Command == MERIT_WAGON_WEIGHT_WRITE_CMD):
-											Merit_WeighmentResponseParse(dataAfterDublicateList[ (MERIT_COMMAND_ID_POSITION ) : (LengthOfQuery + MERIT_COMMAND_ID_POSITION)])
-										if(Command == MERIT_DIGITAL_OUTPUT_STATUS_READ_CMD):
-											Merit_DigitalOutputStatusParse(dataAfterDublicateList[ (MERIT_COMMAND_ID_POSITION ) : (LengthOfQuery + MERIT_COMMAND_ID_POSITION)])
-										if(Command == MERIT_DIGITAL_INPUT_STATUS_READ_CMD):
-											Merit_DigitalInputStatusParse(dataAfterDublicateList[ (MERIT_COMMAND_ID_POSITION ) : (LengthOfQuery + MERIT_COMMAND_ID_POSITION)])
-										if(Command == MERIT_INIT_AND_AXLE_ELIMINATE_WRITE_CMD):
-											logging.info("MERIT TLC INITIATED SUCCESSFULLY")
-										if(Command == MERIT_TERMINATE_WRITE_CMD):
-											logging.info("MERIT TLC TERMINATED SUCCESSFULLY")
-										if(Command == MERIT_VERSION_OF_CODE_READ_CMD):
-											Merit_VersionReqParse(dataAfterDublicateList[ (MERIT_COMMAND_ID_POSITION ) : (LengthOfQuery + MERIT_COMMAND_ID_POSITION)])
-										if(Command == MERIT_CODE_RELAESE_DATE_READ_CMD):
-											Merit_VersionReleaseDataReqParse(dataAfterDublicateList[ (MERIT_COMMAND_ID_POSITION ) : (LengthOfQuery + MERIT_COMMAND_ID_POSITION)])
-										if(Command == MERIT_OUTPUT_STATUS_WRITE_CMD):   
-											logging.info("Output Status Control Command Initiated")
-										if(Command == MERIT_OUTPUT_STATUS_RESET_WRITE_CMD):
-											logging.info("Output Status Reset Command Initiated")
-										if(Command == MERIT_SCOREBOARD_AVAIL_WRITE_CMD):
-											logging.info("Merit ScoreBoard Avail Command Written")	
-									else:
-										ReceiveSuccessFlag = MERIT_CHECKSUM_MISMATCH
-								else:
-									ReceiveSuccessFlag = MERIT_DATALEN_MISMATCH
-							else:
-								ReceiveSuccessFlag = MERIT_COMMAND_MISMATCH
-						else:
-							ReceiveSuccessFlag = MERIT_RTUID_MISMATCH
-					else:
-						ReceiveSuccessFlag = MERIT_HEADER_MISMATCH
-				else:
-					ReceiveSuccessFlag = MERIT_READ_TIMEOUT
-					
-				if(ReceiveSuccessFlag != MERIT_READ_SUCCESS):
-					#Status = False
-					logging.error("******************** Error While Read : " + str(MeritSerialRecvErrorDict[ReceiveSuccessFlag]) + "********************")
-				logging.info(str("**********************************************************\n") + str("\n\n"))	
-			except serial.SerialException as e:
-				logging.error(str(e)) 
-				Status = False
-					#Publish		 
+		try:
+			EndTime = (datetime.datetime.now() - StartTime).total_seconds()
+			logging.debug("Time Taken To Read : %s", EndTime)
+			if(ReceiveSuccessFlag == MERIT_READ_SUCCESS):
+				LengthOfQuery = (dataAfterDublicateList[MERIT_QUERY_LEN_POSITION] + (dataAfterDublicateList[MERIT_QUERY_LEN_POSITION + 1] << 8)) 
+				#Payload is handed to the parsers as a view on the frame, no copy
+				ResponseList = memoryview(dataAfterDublicateList)[ (MERIT_COMMAND_ID_POSITION ) : (LengthOfQuery + MERIT_COMMAND_ID_POSITION)]
+				Response = bytes(ResponseList)
+				if(Command in MeritResponseDecoderDict):
+					Response = MeritResponseDecoderDict[Command].Decode(ResponseList)
+				if(Command == MERIT_WAGON_WEIGHT_WRITE_CMD):
+					Merit_WeighmentResponseParse(ResponseList)
+				if(Command == MERIT_DIGITAL_OUTPUT_STATUS_READ_CMD):
+					Merit_DigitalOutputStatusParse(ResponseList)
+				if(Command == MERIT_DIGITAL_INPUT_STATUS_READ_CMD):
+					Merit_DigitalInputStatusParse(ResponseList)
+				if(Command == MERIT_INIT_AND_AXLE_ELIMINATE_WRITE_CMD):
+					logging.info("MERIT TLC INITIATED SUCCESSFULLY")
+				if(Command == MERIT_TERMINATE_WRITE_CMD):
+					logging.info("MERIT TLC TERMINATED SUCCESSFULLY")
+				if(Command == MERIT_VERSION_OF_CODE_READ_CMD):
+					Merit_VersionReqParse(ResponseList)
+				if(Command == MERIT_CODE_RELAESE_DATE_READ_CMD):
+					Merit_VersionReleaseDataReqParse(ResponseList)
+				if(Command in MeritAxleRangeCommandList):
+					Merit_AxleRangeResponseParse(Command, ResponseList)
+				if(Command == MERIT_OUTPUT_STATUS_WRITE_CMD):   
+					logging.info("Output Status Control Command Initiated")
+				if(Command == MERIT_OUTPUT_STATUS_RESET_WRITE_CMD):
+					logging.info("Output Status Reset Command Initiated")
+				if(Command == MERIT_SCOREBOARD_AVAIL_WRITE_CMD):
+					logging.info("Merit ScoreBoard Avail Command Written")	
+				
+			if(ReceiveSuccessFlag != MERIT_READ_SUCCESS):
+				#Status = False
+				logging.error("******************** Error While Read : " + str(MeritSerialRecvErrorDict[ReceiveSuccessFlag]) + "********************")
+				m_TLCFrameRing.Dump("Command " + str(Command) + " : " + str(MeritSerialRecvErrorDict[ReceiveSuccessFlag]))
+		except serial.SerialException as e:
+			logging.error(str(e)) 
+			raise
+	except serial.SerialException:
+		raise
 	except Exception as ex:
-		logging.error("******************** Exception : , data : " + str(ex) + str(dataAfterDublicateList) + " *******************************")
-		Status = False
-	return Status	
+		logging.error("******************** Exception : , data : " + str(ex) + " *******************************")
+		m_TLCFrameRing.Dump("Command " + str(Command) + " : " + str(ex))
+	return (ReceiveSuccessFlag, Response)	
 		
 #********************************************************************************************#
 #Description : Function to parse the wagon weight command response
@@ -862,11 +1900,11 @@ def Merit_WeighmentResponseParse(WagonWeighDataList):
 	global m_CurrentWeighmentWagonNumber
 	global m_PreviousWeighmentWagonNumber
 	global m_MqttPostCurrentWagonNumber
+	global m_MqttPostAckedWagonNumber
 	global m_WagonCount 
 	global m_MqttPostWeighmentInitFlag
 	global m_LocoCount
 	global m_LocoFlag
-	global m_MeritWagonDetailsDict
 	global UNKNOWN_VEHICLE
 	global m_TLCMqttClient
 	global m_WagonWeightDataParseDict
@@ -879,31 +1917,29 @@ def Merit_WeighmentResponseParse(WagonWeighDataList):
 	DefaultWeightDict = {}
 	
 	try:
+		Response = MeritResponseDecoderDict[MERIT_WAGON_WEIGHT_WRITE_CMD].Decode(WagonWeighDataList)
+		if(Response.WagonsWeighed is not None):
+			m_TLCPollScheduler.WagonsWeighed(Response.WagonsWeighed)
 		if(m_TLCStatusFlag == False):
 			if((m_CurrentWeighmentWagonNumber == m_PreviousWeighmentWagonNumber ) and len(WagonWeighDataList) >= WAGON_PAYLOAD_LENGTH) :
-				WagonSerialNumber = WagonWeighDataList[COMMAND90RES_WAGON_SERIAL_NUMBER]
-				logging.info("Current Wagon to weighment " +  str(m_CurrentWeighmentWagonNumber) + " Received WagonSerialNumber : " + str( WagonSerialNumber))
-				if(not( WagonWeighDataList[COMMAND90RES_MESSAGE] == UNKNOWN_VEHICLE)):
+				WagonSerialNumber = Response.WagonSerialNumber
+				logging.debug("Current Wagon to weighment %d Received WagonSerialNumber : %d", m_CurrentWeighmentWagonNumber, WagonSerialNumber)
+				if(not( Response.Message == UNKNOWN_VEHICLE)):
 					if(WagonSerialNumber == m_CurrentWeighmentWagonNumber):
-						logging.info("Message : ---------------- " + str(WagonWeighDataList[COMMAND90RES_MESSAGE]) + " ----------------------------")
-						int(np.array(WagonWeighDataList[COMMAND90RES_WAGON_TYPE]).astype(np.int8))
-						logging.info("Wagon Response Packet " + str(WagonWeighDataList) )
-						WagonType = int(np.array(WagonWeighDataList[COMMAND90RES_WAGON_TYPE]).astype(np.int8))		 
-						
+						logging.info("Message : %s", Response.Message)
+						WagonType = Response.WagonType
 						
 						if((WagonType == THREE_AXLE_LOCO) or (WagonType == FOUR_AXLE_LOCO)):
-							m_LocoCount = m_LocoCount + 1	
+							with m_WagonPublishCondition:
+								m_LocoCount = m_LocoCount + 1	
 						else:
-							AXLEWeightList.insert(0, int(np.array((WagonWeighDataList[COMMAND90RES_AXLE1WEIGHT_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLE1WEIGHT_LSB]).astype(np.int16)))
-							AXLEWeightList.insert(1, int(np.array((WagonWeighDataList[COMMAND90RES_AXLE2WEIGHT_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLE2WEIGHT_LSB]).astype(np.int16)))
-							AXLEWeightList.insert(2, int(np.array((WagonWeighDataList[COMMAND90RES_AXLE3WEIGHT_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLE3WEIGHT_LSB]).astype(np.int16)))
-							AXLEWeightList.insert(3, int(np.array((WagonWeighDataList[COMMAND90RES_AXLE4WEIGHT_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLE4WEIGHT_LSB]).astype(np.int16)))
+							AXLEWeightList = [Response.Axle1Weight, Response.Axle2Weight, Response.Axle3Weight, Response.Axle4Weight]
 							for i in range(WagonType):
 								if((AXLEWeightList[i] == -3) or (AXLEWeightList[i] == -4)):
 									AxleWeighOverFalg = False
 						
-						logging.info("Current Wagon : " +  str(m_CurrentWeighmentWagonNumber) + ", AXLEWeightList : " + str(AXLEWeightList))
-						m_WagonWeightDataParseDict = Merit_WagonWeightDataParse(WagonWeighDataList)
+						logging.info("Current Wagon : %d, AXLEWeightList : %s", m_CurrentWeighmentWagonNumber, AXLEWeightList)
+						m_WagonWeightDataParseDict = Merit_WagonWeightDataParse(Response)
 						if(AxleWeighOverFalg == True):
 							m_WagonWeightDataParseDict["StartTime"] = m_WagonStartTime
 							m_WagonWeightDataParseDict["EndTime"] = str(datetime.datetime.now())
@@ -911,34 +1947,32 @@ def Merit_WeighmentResponseParse(WagonWeighDataList):
 						if((AxleWeighOverFalg == False) or ((WagonType == THREE_AXLE_LOCO) or (WagonType == FOUR_AXLE_LOCO))):
 							Merit_Publish(m_TLCMqttClient, m_MqttWeighmentPostTopic, json.dumps(m_WagonWeightDataParseDict))
 							#Status
-							Merit_WriteCommand(MERIT_DIGITAL_OUTPUT_STATUS_READ_CMD, [], 0, WAGON_DATA_PRIORITY)		
-							time.sleep(MERIT_QUERY_DELAY)
-							Merit_WriteCommand(MERIT_DIGITAL_INPUT_STATUS_READ_CMD, [], 0, WAGON_DATA_PRIORITY)
-							time.sleep(MERIT_QUERY_DELAY)
+							Merit_WriteCommand(MERIT_DIGITAL_OUTPUT_STATUS_READ_CMD, [], 0, WAGON_DATA_PRIORITY, MERIT_POLL_TIME_TO_LIVE)		
+							Merit_WriteCommand(MERIT_DIGITAL_INPUT_STATUS_READ_CMD, [], 0, WAGON_DATA_PRIORITY, MERIT_POLL_TIME_TO_LIVE)
 						 
 						if(AxleWeighOverFalg == True):
 							m_WeighmentInitFlag = 1
 							if((WagonType != THREE_AXLE_LOCO) and (WagonType != FOUR_AXLE_LOCO)):
-								m_MeritWagonDetailsDict[WagonSerialNumber - m_LocoCount] =  json.dumps(m_WagonWeightDataParseDict)
-								if(m_MqttPostWeighmentInitFlag == False):
-									m_MqttPostWeighmentInitFlag = True
-									m_MqttPostCurrentWagonNumber = WagonSerialNumber - m_LocoCount	
-							logging.info(str("*********\n") + str("Read Done : Serial Number") + str(m_CurrentWeighmentWagonNumber) )
+								with m_WagonPublishCondition:
+									m_WagonStore.PutWagon(m_RakeId, WagonSerialNumber - m_LocoCount, json.dumps(m_WagonWeightDataParseDict))	#queued, written by the store thread
+									if(m_MqttPostWeighmentInitFlag == False):
+										m_MqttPostWeighmentInitFlag = True
+										m_MqttPostCurrentWagonNumber = WagonSerialNumber - m_LocoCount	
+										m_MqttPostAckedWagonNumber = m_MqttPostCurrentWagonNumber
+									m_WagonPublishCondition.notify_all()		#wake the wagon publisher
+							logging.info("Read Done : Serial Number %d", m_CurrentWeighmentWagonNumber)
 							m_CurrentWeighmentWagonNumber = m_CurrentWeighmentWagonNumber + 1
 							m_PreviousWeighmentWagonNumber = m_PreviousWeighmentWagonNumber + 1	
 							#Status
-							Merit_WriteCommand(MERIT_DIGITAL_OUTPUT_STATUS_READ_CMD, [], 0, WAGON_DATA_PRIORITY)		
-							time.sleep(MERIT_QUERY_DELAY)
-							Merit_WriteCommand(MERIT_DIGITAL_INPUT_STATUS_READ_CMD, [], 0, WAGON_DATA_PRIORITY)
-							time.sleep(MERIT_QUERY_DELAY)
-							logging.info(str("*********\n") +  str("Next Read Serial Number") + str(m_CurrentWeighmentWagonNumber) )
+							Merit_WriteCommand(MERIT_DIGITAL_OUTPUT_STATUS_READ_CMD, [], 0, WAGON_DATA_PRIORITY, MERIT_POLL_TIME_TO_LIVE)		
+							Merit_WriteCommand(MERIT_DIGITAL_INPUT_STATUS_READ_CMD, [], 0, WAGON_DATA_PRIORITY, MERIT_POLL_TIME_TO_LIVE)
+							logging.debug("Next Read Serial Number %d", m_CurrentWeighmentWagonNumber)
 						else:
-							time.sleep(MERIT_QUERY_DELAY)
 							Merit_WriteCommand(MERIT_WAGON_WEIGHT_WRITE_CMD, [m_CurrentWeighmentWagonNumber,TEST_WAGON,RESOULUTION_LSB,RESOULUTION_MSB], WAGON_WEIGH_COMMAND_PAYLOAD_SIZE, WAGON_DATA_PRIORITY)
 							return "READ AGAIN"
 				else:
-					logging.info("Message : ---------------- " + str(WagonWeighDataList[COMMAND90RES_MESSAGE]) + " ----------------------------")
-					m_WagonWeightDataParseDict = Merit_WagonWeightDataParse(WagonWeighDataList)
+					logging.info("Message : %s", Response.Message)
+					m_WagonWeightDataParseDict = Merit_WagonWeightDataParse(Response)
 					m_WagonWeightDataParseDict["StartTime"] = m_WagonStartTime
 					m_WagonWeightDataParseDict["EndTime"] = str(datetime.datetime.now())
 					Merit_Publish(m_TLCMqttClient, m_MqttWeighmentPostTopic, json.dumps(m_WagonWeightDataParseDict))
@@ -946,196 +1980,315 @@ def Merit_WeighmentResponseParse(WagonWeighDataList):
 					Merit_WriteCommand(MERIT_WAGON_WEIGHT_WRITE_CMD, [m_CurrentWeighmentWagonNumber,TEST_WAGON,RESOULUTION_LSB,RESOULUTION_MSB], WAGON_WEIGH_COMMAND_PAYLOAD_SIZE, WAGON_DATA_PRIORITY)
 					return "READ AGAIN"
 			
-			m_WagonCount = WagonWeighDataList[COMMAND90RES_WAGONS_WEIGHED]
-			logging.info("WagonCount : " + str(m_WagonCount))
-			if((m_WagonCount > m_PreviousWeighmentWagonNumber) and (m_WeighmentInitFlag == 0) ):
-				with m_TLCSerialCommandWriteQueue.mutex:
-					m_TLCSerialCommandWriteQueue.queue.clear()
-				time.sleep(MERIT_QUERY_DELAY)
+			with m_WagonPublishCondition:
+				if(m_WagonCount != Response.WagonsWeighed):
+					m_WagonCount = Response.WagonsWeighed
+					m_WagonPublishCondition.notify_all()
+			logging.debug("WagonCount : %d", m_WagonCount)
+			if(m_BulkAxleReadFlag == True):
+				if((m_BulkLocoDoneFlag == False) and (len(WagonWeighDataList) >= WAGON_PAYLOAD_LENGTH) and (Response.WagonSerialNumber == m_BulkLocoProbeNumber)):
+					Merit_BulkLocoResponseParse(Response)
+				if(Response.Message == COMMAND90RES_MESSAGE_WEIGHINGOVER):
+					Merit_BulkAxleRead(Response.LastAxle, Response)
+				m_WagonWeightDataParseDict = Merit_ContinuousWeighmentPostData(Response)
+				Merit_PolicyPublish(MERIT_CONTINUOUS_WEIGHMENT_POLICY, m_TLCMqttClient, m_MqttWeighmentPostTopic, m_WagonWeightDataParseDict)
+			elif((m_WagonCount > m_PreviousWeighmentWagonNumber) and (m_WeighmentInitFlag == 0) ):
+				Merit_DropQueuedCommands()
 				m_WagonStartTime = str(datetime.datetime.now())
 				Merit_WriteCommand(MERIT_WAGON_WEIGHT_WRITE_CMD, [m_CurrentWeighmentWagonNumber,TEST_WAGON,RESOULUTION_LSB,RESOULUTION_MSB], WAGON_WEIGH_COMMAND_PAYLOAD_SIZE, WAGON_DATA_PRIORITY)		
 				if(m_PreviousWeighmentWagonNumber == 0):
 					m_PreviousWeighmentWagonNumber = m_PreviousWeighmentWagonNumber + 1		
 			elif((m_WagonCount >= m_CurrentWeighmentWagonNumber) and (m_CurrentWeighmentWagonNumber == m_PreviousWeighmentWagonNumber) ):
-				time.sleep(MERIT_QUERY_DELAY)
 				m_WagonStartTime = str(datetime.datetime.now())
 				Merit_WriteCommand(MERIT_WAGON_WEIGHT_WRITE_CMD, [m_CurrentWeighmentWagonNumber,TEST_WAGON,RESOULUTION_LSB,RESOULUTION_MSB], WAGON_WEIGH_COMMAND_PAYLOAD_SIZE, WAGON_DATA_PRIORITY)
 			else:
-				m_WagonWeightDataParseDict = Merit_ContinuousWeighmentPostData(WagonWeighDataList)
-				Merit_Publish(m_TLCMqttClient, m_MqttWeighmentPostTopic, json.dumps(m_WagonWeightDataParseDict))
+				m_WagonWeightDataParseDict = Merit_ContinuousWeighmentPostData(Response)
+				Merit_PolicyPublish(MERIT_CONTINUOUS_WEIGHMENT_POLICY, m_TLCMqttClient, m_MqttWeighmentPostTopic, m_WagonWeightDataParseDict)
 		else:
-			WagonCount = WagonWeighDataList[COMMAND90RES_WAGONS_WEIGHED]
-			DefaultWeightDict = Merit_DefaultWeightParse(WagonWeighDataList, WagonCount)
-			Merit_Publish(m_TLCMqttClient, m_MqttWeightStatusTopic, json.dumps(DefaultWeightDict))
+			WagonCount = Response.WagonsWeighed
+			DefaultWeightDict = Merit_DefaultWeightParse(Response, WagonCount)
+			Merit_PolicyPublish(MERIT_WEIGHT_STATUS_POLICY, m_TLCMqttClient, m_MqttWeightStatusTopic, DefaultWeightDict)
 			
 	except Exception as ex:
 		logging.error("Exception While weight Rec: " + str(ex))
 
 #********************************************************************************************#
-#Description : Function to parse the Default weight
-#Arguments : WagonWeighData list
-#Return : Wagon Weighment Dictionary
+#Description : Function to queue the axle range commands covering every axle of the rake
+#Arguments : Number of axles weighed, WeighingOver response
+#Return : None
+#Notes : Runs on the serial writer thread, the commands are queued without waiting for them. The leading
+#		 vehicles the 0x5A poll did not reach yet are asked for meanwhile, the axle records do not tell a loco
+#		 from a wagon.
 #********************************************************************************************#
-def Merit_DefaultWeightParse(WagonWeighDataList, WagonCount):
-	WagonDict = {}
-	
-	WagonDict["SignOfWeight"] = ""
-	WagonDict["Weight"] = "WL.Mode"
+def Merit_BulkAxleRead(AxleCount, Response):
+	global m_AxleRangeRequestedFlag
+	global m_AxleRangeCount
+	global m_AxleCount
+	global m_AxleRangeDict
+	global m_BulkResponse
+	global m_BulkRakeDict
+	global m_WagonStartTime
 	
-	if(WagonCount == 0):
-		SignOfWeight = chr(WagonWeighDataList[COMMAND90RES_SIGN_OF_WEIGHT])
-		Weight  = (WagonWeighDataList[COMMAND90RES_WEIGHT_MSB] << 16) + (WagonWeighDataList[COMMAND90RES_WEIGHT_MID] << 8) + WagonWeighDataList[COMMAND90RES_WEIGHT_LSB]
-		WagonDict["SignOfWeight"] = SignOfWeight
-		if(SignOfWeight == "+"):
-			Weight = Weight / (WAGON_DATA_VALUE_DIVIDER * WAGON_DATA_VALUE_DIVIDER)
-			WagonDict["Weight"] = Weight
-		elif(SignOfWeight == "-"):
-			Weight = NEGATIVE_WEIGHT_OFFSET - Weight;
-			Weight = Weight / (WAGON_DATA_VALUE_DIVIDER * WAGON_DATA_VALUE_DIVIDER)
-			WagonDict["Weight"] = Weight	
-		print("Weight On Status Control Page : ", Weight)
-	return WagonDict
+	if((m_AxleRangeRequestedFlag == True) or (AxleCount == 0)):
+		return
+	AxleCount = min(AxleCount, len(MeritAxleRangeCommandList) * MERIT_AXLES_PER_RANGE_CMD)
+	m_AxleRangeRequestedFlag = True
+	m_AxleCount = AxleCount
+	m_AxleRangeCount = -(-AxleCount // MERIT_AXLES_PER_RANGE_CMD)
+	m_AxleRangeDict = {}
+	m_BulkResponse = Response
+	m_BulkRakeDict = None
+	m_WagonStartTime = str(datetime.datetime.now())
+	logging.info("Bulk Axle Read, Axles : " + str(AxleCount) + ", Frames : " + str(m_AxleRangeCount))
+	for Command in MeritAxleRangeCommandList[ : m_AxleRangeCount]:
+		Merit_ReadCommand(Command, WAGON_DATA_PRIORITY).add_done_callback(Merit_AxleRangeDone)
+	if(m_BulkLocoDoneFlag == False):
+		Merit_BulkLocoProbe()
 
 #********************************************************************************************#
-#Description : Function to parse the weighment response details
-#Arguments : WagonWeighData list
-#Return : Weighment Dictionary
+#Description : Function to ask the TLC for the type of the next leading vehicle once the rake is weighed
+#Arguments : None
+#Return : None
+#Notes : The answer is taken by Merit_BulkLocoResponseParse, so a replayed capture finds the locos too
 #********************************************************************************************#
-def Merit_ContinuousWeighmentPostData(WagonWeighDataList):
-	WagonDict = {}
+def Merit_BulkLocoProbe():
+	global m_BulkLocoDoneFlag
+	
+	if(m_BulkLocoProbeNumber > m_WagonCount):
+		m_BulkLocoDoneFlag = True			#every vehicle of the rake is a loco
+		Merit_BulkWagonRecords()
+		return
+	Merit_WriteCommand(MERIT_WAGON_WEIGHT_WRITE_CMD, [m_BulkLocoProbeNumber,TEST_WAGON,RESOULUTION_LSB,RESOULUTION_MSB], WAGON_WEIGH_COMMAND_PAYLOAD_SIZE, WAGON_DATA_PRIORITY).add_done_callback(Merit_BulkLocoDone)
+
+#********************************************************************************************#
+#Description : Done callback of a loco probe, a failed probe lets the next WeighingOver poll start the bulk read again
+#Arguments : MeritTransaction
+#Return : None
+#Notes : A probe dropped from the queue is left alone, a new rake resets the bulk read anyway
+#********************************************************************************************#
+def Merit_BulkLocoDone(Transaction):
+	global m_AxleRangeRequestedFlag
+	if((Transaction.cancelled() == False) and (Transaction.exception() is not None)):
+		m_AxleRangeRequestedFlag = False
+
+#********************************************************************************************#
+#Description : Function to parse the answer for a leading vehicle, the next one is asked for while the vehicles are locos
+#Arguments : Decoded wagon weigh response
+#Return : None
+#Notes : During the rake the next vehicle is left to the 0x5A poll, after WeighingOver it is asked for at once
+#********************************************************************************************#
+def Merit_BulkLocoResponseParse(Response):
+	global m_BulkLocoCount
+	global m_BulkLocoDoneFlag
+	global m_BulkLocoProbeNumber
+	
+	WagonType = Response.WagonType
+	if((WagonType == THREE_AXLE_LOCO) or (WagonType == FOUR_AXLE_LOCO)):
+		m_BulkLocoCount = m_BulkLocoProbeNumber
+		m_BulkLocoProbeNumber = m_BulkLocoProbeNumber + 1
+		if(m_AxleRangeRequestedFlag == True):
+			Merit_BulkLocoProbe()
+		return
+	m_BulkLocoDoneFlag = True
+	Merit_BulkWagonRecords()
+
+#********************************************************************************************#
+#Description : Done callback of an axle range transaction, a failed range lets the next WeighingOver poll ask again
+#Arguments : MeritTransaction
+#Return : None
+#********************************************************************************************#
+def Merit_AxleRangeDone(Transaction):
+	global m_AxleRangeRequestedFlag
+	if((Transaction.cancelled() == True) or (Transaction.exception() is not None)):
+		m_AxleRangeRequestedFlag = False
+
+#********************************************************************************************#
+#Description : Function to collect an axle range response, the rake is decoded once every range arrived
+#Arguments : Command, Axle range response payload
+#Return : None
+#********************************************************************************************#
+def Merit_AxleRangeResponseParse(Command, DataList):
+	global m_AxleRangeDict
+	global m_AxleRangeCount
+	global m_BulkRakeDict
+	global m_TLCMqttClient
+	
+	if((m_AxleRangeCount == 0) or (MeritAxleRangeCommandList.index(Command) >= m_AxleRangeCount)):
+		return
+	m_AxleRangeDict[Command] = bytes(DataList[1 : ])
+	if(len(m_AxleRangeDict) < m_AxleRangeCount):
+		return
+	RakeDict = Merit_AxleWeightParse(b"".join(m_AxleRangeDict[RangeCommand] for RangeCommand in MeritAxleRangeCommandList[ : m_AxleRangeCount]), m_AxleCount)
+	m_AxleRangeCount = 0
+	Merit_Publish(m_TLCMqttClient, m_MqttAxleWeightsTopic, json.dumps(RakeDict))
+	m_BulkRakeDict = RakeDict
+	Merit_BulkWagonRecords()
+
+#********************************************************************************************#
+#Description : Function to store the wagon records of a bulk read once the axle ranges and the loco probe are done
+#Arguments : None
+#Return : None
+#Notes : Locos are skipped by m_LocoCount like the 0x5A path does, the wagons go through the wagon store to the
+#		 publisher. Wagon speed is the rake speed of the WeighingOver response, the axle records carry none.
+#********************************************************************************************#
+def Merit_BulkWagonRecords():
+	global m_BulkRakeDict
+	global m_LocoCount
+	global m_MqttPostWeighmentInitFlag
+	global m_MqttPostCurrentWagonNumber
+	global m_MqttPostAckedWagonNumber
+	
+	if((m_BulkRakeDict is None) or (m_BulkLocoDoneFlag == False)):
+		return
+	RakeDict = m_BulkRakeDict
+	m_BulkRakeDict = None
+	ContinuousDict = Merit_ContinuousWeighmentPostData(m_BulkResponse)
+	VehicleAxleDict = {}
+	for Vehicle, Weight in zip(RakeDict["AxleVehicle"], RakeDict["AxleWeight"]):
+		#Axle weights are published unsigned, the signed value only carries the AxleWeightDict status
+		VehicleAxleDict.setdefault(Vehicle, []).append(Weight if(Weight >= 0) else (int(Weight) & 0xffff) / (WAGON_DATA_VALUE_DIVIDER * WAGON_DATA_VALUE_DIVIDER))
+	WagonRecordList = []
+	for Index, Vehicle in enumerate(RakeDict["VehicleSerialNumber"]):
+		if(Vehicle <= m_BulkLocoCount):
+			continue
+		AxleWeightList = (VehicleAxleDict[Vehicle] + [0, 0, 0, 0])[ : 4]
+		WagonDict = {}
+		WagonDict["WagonSerialNumber"] = Vehicle - m_BulkLocoCount
+		WagonDict["WagonType"] = RakeDict["VehicleAxleCount"][Index]
+		WagonDict["WagonWeight"] = RakeDict["VehicleWeight"][Index]
+		WagonDict["WagonSpeed"] = ContinuousDict["SpeedFromWeigh"]
+		WagonDict["Axle1Weight"] = AxleWeightList[0]
+		WagonDict["Axle2Weight"] = AxleWeightList[1]
+		WagonDict["Axle3Weight"] = AxleWeightList[2]
+		WagonDict["Axle4Weight"] = AxleWeightList[3]
+		WagonDict.update(ContinuousDict)
+		WagonDict["WE"] = RakeDict["VehicleWE"][Index]
+		WagonDict["StartTime"] = m_WagonStartTime
+		WagonDict["EndTime"] = RakeDict["EndTime"]
+		WagonRecordList.append((WagonDict["WagonSerialNumber"], json.dumps(WagonDict)))
+	with m_WagonPublishCondition:
+		m_LocoCount = m_BulkLocoCount
+		for WagonNumber, WagonRecord in WagonRecordList:
+			m_WagonStore.PutWagon(m_RakeId, WagonNumber, WagonRecord)		#queued, written by the store thread
+		if((m_MqttPostWeighmentInitFlag == False) and (len(WagonRecordList) > 0)):
+			m_MqttPostWeighmentInitFlag = True
+			m_MqttPostCurrentWagonNumber = WagonRecordList[0][0]
+			m_MqttPostAckedWagonNumber = m_MqttPostCurrentWagonNumber
+		m_WagonPublishCondition.notify_all()		#wake the wagon publisher
+	logging.info("Bulk Wagon Records : %d, Locos : %d", len(WagonRecordList), m_BulkLocoCount)
+
+#********************************************************************************************#
+#Description : Function to decode the axle records of a rake into per axle and per vehicle weights
+#Arguments : Axle record bytes of all ranges, Number of axles
+#Return : Rake axle weight dictionary
+#Notes : Negative axle weights are TLC codes (AxleWeightDict), they are published as is and left out of the sums
+#********************************************************************************************#
+def Merit_AxleWeightParse(AxleData, AxleCount):
+	RakeDict = {}
+	
+	RecordCount = min(AxleCount, len(AxleData) // MeritAxleRecordDtype.itemsize)
+	AxleArray = np.frombuffer(AxleData, dtype = MeritAxleRecordDtype, count = RecordCount)
+	RawWeight = AxleArray["Weight"].astype(np.float64)
+	ValidArray = RawWeight >= 0
+	AxleWeight = np.where(ValidArray, RawWeight / (WAGON_DATA_VALUE_DIVIDER * WAGON_DATA_VALUE_DIVIDER), RawWeight)
+	VehicleArray, VehicleIndex, VehicleAxleCount = np.unique(AxleArray["Vehicle"], return_inverse = True, return_counts = True)
+	VehicleWeight = np.bincount(VehicleIndex, weights = np.where(ValidArray, AxleWeight, 0), minlength = len(VehicleArray))
+	VehicleInvalidCount = np.bincount(VehicleIndex, weights = ~ValidArray, minlength = len(VehicleArray))
 	
-	SignOfWeight = chr(WagonWeighDataList[COMMAND90RES_SIGN_OF_WEIGHT])
-	Weight  = (WagonWeighDataList[COMMAND90RES_WEIGHT_MSB] << 16) + (WagonWeighDataList[COMMAND90RES_WEIGHT_MID] << 8) + WagonWeighDataList[COMMAND90RES_WEIGHT_LSB]
-	LastAxle = (WagonWeighDataList[COMMAND90RES_LASTAXLE_MSB] << 8) + WagonWeighDataList[COMMAND90RES_LASTAXLE_LSB]
-	SpeedTLPair1 = (WagonWeighDataList[COMMAND90RES_SPEED_TLPAIR1_MSB] << 8) + WagonWeighDataList[COMMAND90RES_SPEED_TLPAIR1_LSB]
-	SpeedTLPair1 = SpeedTLPair1 / WAGON_DATA_VALUE_DIVIDER
-	SpeedTLPair2 = (WagonWeighDataList[COMMAND90RES_SPEED_TLPAIR2_MSB] << 8) + WagonWeighDataList[COMMAND90RES_SPEED_TLPAIR2_LSB]
-	SpeedTLPair2 = SpeedTLPair2 / WAGON_DATA_VALUE_DIVIDER
-	SpeedFromWeigh = (WagonWeighDataList[COMMAND90RES_SPEED_FROM_WEIGH_MSB] << 8)+ WagonWeighDataList[COMMAND90RES_SPEED_FROM_WEIGH_LSB]
-	SpeedFromWeigh = SpeedFromWeigh / WAGON_DATA_VALUE_DIVIDER
-	AxleCountPair1 = (WagonWeighDataList[COMMAND90RES_AXLECOUNT_PAIR1_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLECOUNT_PAIR1_LSB]
-	AxleCountPair2 = (WagonWeighDataList[COMMAND90RES_AXLECOUNT_PAIR2_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLECOUNT_PAIR2_LSB]
-	AxleCountPair3 = (WagonWeighDataList[COMMAND90RES_AXLECOUNT_PAIR3_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLECOUNT_PAIR3_LSB]
-	AxleCountPair4 = (WagonWeighDataList[COMMAND90RES_AXLECOUNT_PAIR4_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLECOUNT_PAIR4_LSB]
-	AxleWeight	   = (WagonWeighDataList[COMMAND90RES_AXLE_WEIGHED_MSB] << 8) +WagonWeighDataList[ COMMAND90RES_AXLE_WEIGHED_LSB]
-	AxleIgnore 	   = (WagonWeighDataList[COMMAND90RES_AXLE_INGNORED_MSB] << 8) +WagonWeighDataList[ COMMAND90RES_AXLE_INGNORED_LSB]
-	WagonDict["SignOfWeight"] = SignOfWeight
-	WagonDict["Weight"] = Weight
+	RakeDict["AxleCount"] = int(RecordCount)
+	RakeDict["AxleVehicle"] = AxleArray["Vehicle"].tolist()
+	RakeDict["AxleWeight"] = np.round(AxleWeight, 2).tolist()
+	RakeDict["VehicleSerialNumber"] = VehicleArray.tolist()
+	RakeDict["VehicleAxleCount"] = VehicleAxleCount.tolist()
+	RakeDict["VehicleWeight"] = np.round(VehicleWeight, 2).tolist()
+	RakeDict["VehicleWE"] = (VehicleInvalidCount == 0).tolist()
+	RakeDict["EndTime"] = str(datetime.datetime.now())
+	return RakeDict
+
+#********************************************************************************************#
+#Description : Function to convert the signed weight of the weighment response
+#Arguments : Decoded wagon weigh response
+#Return : (SignOfWeight, Weight)
+#********************************************************************************************#
+def Merit_ResponseWeight(Response):
+	SignOfWeight = chr(Response.SignOfWeight)
+	Weight = Response.Weight
 	if(SignOfWeight == "+"):
 		Weight = Weight / (WAGON_DATA_VALUE_DIVIDER * WAGON_DATA_VALUE_DIVIDER)
-		WagonDict["Weight"] = Weight
 	elif(SignOfWeight == "-"):
 		Weight = NEGATIVE_WEIGHT_OFFSET - Weight;
 		Weight = Weight / (WAGON_DATA_VALUE_DIVIDER * WAGON_DATA_VALUE_DIVIDER)
-		WagonDict["Weight"] = Weight	
-	
-	WagonDict["Message"] = WagonWeighCommandDict[COMMAND90RES_MESSAGE][WagonWeighDataList[COMMAND90RES_MESSAGE]]
-	WagonDict["Direction"] = WagonWeighDataList[COMMAND90RES_DIRECTION]
-	WagonDict["WagonsWeighed"] = WagonWeighDataList[COMMAND90RES_WAGONS_WEIGHED]
-	WagonDict["LastAxle"] = LastAxle
-	WagonDict["SpeedTLPair1"] = SpeedTLPair1
-	WagonDict["SpeedTLPair2"] = SpeedTLPair2
-	WagonDict["SpeedFromWeigh"] = SpeedFromWeigh
-	WagonDict["AxleCountPair1"] = AxleCountPair1
-	WagonDict["AxleCountPair2"] = AxleCountPair2
-	WagonDict["AxleCountPair3"] = AxleCountPair3
-	WagonDict["AxleCountPair4"] = AxleCountPair4
-	WagonDict["AxleWeight"] = AxleWeight
-	WagonDict["AxleIgnore"] = AxleIgnore
+	return (SignOfWeight, Weight)
+
+#********************************************************************************************#
+#Description : Function to parse the Default weight
+#Arguments : Decoded wagon weigh response, WagonCount
+#Return : Wagon Weighment Dictionary
+#********************************************************************************************#
+def Merit_DefaultWeightParse(Response, WagonCount):
+	WagonDict = {}
+	
+	WagonDict["SignOfWeight"] = ""
+	WagonDict["Weight"] = "WL.Mode"
+	
+	if(WagonCount == 0):
+		SignOfWeight, Weight = Merit_ResponseWeight(Response)
+		WagonDict["SignOfWeight"] = SignOfWeight
+		if((SignOfWeight == "+") or (SignOfWeight == "-")):
+			WagonDict["Weight"] = Weight
+		print("Weight On Status Control Page : ", Weight)
+	return WagonDict
+
+#********************************************************************************************#
+#Description : Function to parse the weighment response details
+#Arguments : Decoded wagon weigh response
+#Return : Weighment Dictionary
+#********************************************************************************************#
+def Merit_ContinuousWeighmentPostData(Response):
+	WagonDict = {}
+	
+	WagonDict["SignOfWeight"], WagonDict["Weight"] = Merit_ResponseWeight(Response)
+	WagonDict["Message"] = WagonWeighCommandDict[COMMAND90RES_MESSAGE][Response.Message]
+	WagonDict["Direction"] = Response.Direction
+	WagonDict["WagonsWeighed"] = Response.WagonsWeighed
+	WagonDict["LastAxle"] = Response.LastAxle
+	WagonDict["SpeedTLPair1"] = Response.SpeedTLPair1 / WAGON_DATA_VALUE_DIVIDER
+	WagonDict["SpeedTLPair2"] = Response.SpeedTLPair2 / WAGON_DATA_VALUE_DIVIDER
+	WagonDict["SpeedFromWeigh"] = Response.SpeedFromWeigh / WAGON_DATA_VALUE_DIVIDER
+	WagonDict["AxleCountPair1"] = Response.AxleCountPair1
+	WagonDict["AxleCountPair2"] = Response.AxleCountPair2
+	WagonDict["AxleCountPair3"] = Response.AxleCountPair3
+	WagonDict["AxleCountPair4"] = Response.AxleCountPair4
+	WagonDict["AxleWeight"] = Response.AxleWeight
+	WagonDict["AxleIgnore"] = Response.AxleIgnore
 	return WagonDict
 		
 #********************************************************************************************#
 #Description : Function to parse the wagon weight response details
-#Arguments : WagonWeighData list
+#Arguments : Decoded wagon weigh response
 #Return : Wagon Weighment Dictionary
 #********************************************************************************************#
-def Merit_WagonWeightDataParse(WagonWeighDataList):
-	global m_CurrentWeighmentWagonNumber
-	global m_PreviousWeighmentWagonNumber
+def Merit_WagonWeightDataParse(Response):
 	global m_LocoCount
-	global m_LocoFlag
 	
 	WagonDict = {}
-	JsonRespString = ""
-	
-	WagonSerialNumber = WagonWeighDataList[COMMAND90RES_WAGON_SERIAL_NUMBER]
-	WagonType	= int(np.array(WagonWeighDataList[COMMAND90RES_WAGON_TYPE]).astype(np.int8))		
-	WagonWeight = (WagonWeighDataList[COMMAND90RES_WAGON_WEIGHT_MSB] << 16) + (WagonWeighDataList[COMMAND90RES_WAGON_WEIGHT_MID] << 8) + WagonWeighDataList[COMMAND90RES_WAGON_WEIGHT_LSB]
-	WagonWeight	= WagonWeight / (WAGON_DATA_VALUE_DIVIDER * WAGON_DATA_VALUE_DIVIDER)
-	Axle1Weight = ((WagonWeighDataList[COMMAND90RES_AXLE1WEIGHT_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLE1WEIGHT_LSB]) / (WAGON_DATA_VALUE_DIVIDER * WAGON_DATA_VALUE_DIVIDER)
-	Axle2Weight = ((WagonWeighDataList[COMMAND90RES_AXLE2WEIGHT_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLE2WEIGHT_LSB]) / (WAGON_DATA_VALUE_DIVIDER * WAGON_DATA_VALUE_DIVIDER)
-	Axle3Weight = ((WagonWeighDataList[COMMAND90RES_AXLE3WEIGHT_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLE3WEIGHT_LSB]) / (WAGON_DATA_VALUE_DIVIDER * WAGON_DATA_VALUE_DIVIDER)
-	Axle4Weight = ((WagonWeighDataList[COMMAND90RES_AXLE4WEIGHT_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLE4WEIGHT_LSB]) / (WAGON_DATA_VALUE_DIVIDER * WAGON_DATA_VALUE_DIVIDER)
-	WagonSpeed 	= (WagonWeighDataList[COMMAND90RES_WAGON_SPEED_MSB] << 8) + WagonWeighDataList[COMMAND90RES_WAGON_SPEED_LSB]
-	WagonSpeed	= WagonSpeed / WAGON_DATA_VALUE_DIVIDER	
-	WagonDict["WagonSerialNumber"] = WagonSerialNumber - m_LocoCount
+	
+	WagonType = Response.WagonType
+	WagonDict["WagonSerialNumber"] = Response.WagonSerialNumber - m_LocoCount
 	if((WagonType == THREE_AXLE_LOCO) or (WagonType == FOUR_AXLE_LOCO)):
 		WagonDict["WagonSerialNumber"] = 0
 	WagonDict["WagonType"] = WagonType
-	WagonDict["WagonWeight"] = WagonWeight
-	WagonDict["WagonSpeed"] = WagonSpeed
-	WagonDict["Axle1Weight"] = Axle1Weight
-	WagonDict["Axle2Weight"] = Axle2Weight
-	WagonDict["Axle3Weight"] = Axle3Weight
-	WagonDict["Axle4Weight"] = Axle4Weight
-	SignOfWeight = chr(WagonWeighDataList[COMMAND90RES_SIGN_OF_WEIGHT])
-	Weight  = (WagonWeighDataList[COMMAND90RES_WEIGHT_MSB] << 16) + (WagonWeighDataList[COMMAND90RES_WEIGHT_MID] << 8) + WagonWeighDataList[COMMAND90RES_WEIGHT_LSB]
-	LastAxle = (WagonWeighDataList[COMMAND90RES_LASTAXLE_MSB] << 8) + WagonWeighDataList[COMMAND90RES_LASTAXLE_LSB]
-	SpeedTLPair1 = (WagonWeighDataList[COMMAND90RES_SPEED_TLPAIR1_MSB] << 8) + WagonWeighDataList[COMMAND90RES_SPEED_TLPAIR1_LSB]
-	SpeedTLPair1 = SpeedTLPair1 / WAGON_DATA_VALUE_DIVIDER
-	SpeedTLPair2 = (WagonWeighDataList[COMMAND90RES_SPEED_TLPAIR2_MSB] << 8) + WagonWeighDataList[COMMAND90RES_SPEED_TLPAIR2_LSB]
-	SpeedTLPair2 = SpeedTLPair2 / WAGON_DATA_VALUE_DIVIDER
-	SpeedFromWeigh = (WagonWeighDataList[COMMAND90RES_SPEED_FROM_WEIGH_MSB] << 8)+ WagonWeighDataList[COMMAND90RES_SPEED_FROM_WEIGH_LSB]
-	SpeedFromWeigh = SpeedFromWeigh / WAGON_DATA_VALUE_DIVIDER
-	AxleCountPair1 = (WagonWeighDataList[COMMAND90RES_AXLECOUNT_PAIR1_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLECOUNT_PAIR1_LSB]
-	AxleCountPair2 = (WagonWeighDataList[COMMAND90RES_AXLECOUNT_PAIR2_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLECOUNT_PAIR2_LSB]
-	AxleCountPair3 = (WagonWeighDataList[COMMAND90RES_AXLECOUNT_PAIR3_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLECOUNT_PAIR3_LSB]
-	AxleCountPair4 = (WagonWeighDataList[COMMAND90RES_AXLECOUNT_PAIR4_MSB] << 8) + WagonWeighDataList[COMMAND90RES_AXLECOUNT_PAIR4_LSB]
-	AxleWeight	   = (WagonWeighDataList[COMMAND90RES_AXLE_WEIGHED_MSB] << 8) +WagonWeighDataList[ COMMAND90RES_AXLE_WEIGHED_LSB]
-	AxleIgnore 	   = (WagonWeighDataList[COMMAND90RES_AXLE_INGNORED_MSB] << 8) +WagonWeighDataList[ COMMAND90RES_AXLE_INGNORED_LSB]
-	WagonDict["SignOfWeight"] = SignOfWeight
-	WagonDict["Weight"] = Weight
-	if(SignOfWeight == "+"):
-		Weight = Weight / (WAGON_DATA_VALUE_DIVIDER * WAGON_DATA_VALUE_DIVIDER)
-		WagonDict["Weight"] = Weight
-	elif(SignOfWeight == "-"):
-		Weight = NEGATIVE_WEIGHT_OFFSET - Weight;
-		Weight = Weight / (WAGON_DATA_VALUE_DIVIDER * WAGON_DATA_VALUE_DIVIDER)
-		WagonDict["Weight"] = Weight	
-	
-	WagonDict["Message"] = WagonWeighCommandDict[COMMAND90RES_MESSAGE][WagonWeighDataList[COMMAND90RES_MESSAGE]]
-	WagonDict["Direction"] = WagonWeighDataList[COMMAND90RES_DIRECTION]
-	WagonDict["WagonsWeighed"] = WagonWeighDataList[COMMAND90RES_WAGONS_WEIGHED]
-	WagonDict["LastAxle"] = LastAxle
-	WagonDict["SpeedTLPair1"] = SpeedTLPair1
-	WagonDict["SpeedTLPair2"] = SpeedTLPair2
-	WagonDict["SpeedFromWeigh"] = SpeedFromWeigh
-	WagonDict["AxleCountPair1"] = AxleCountPair1
-	WagonDict["AxleCountPair2"] = AxleCountPair2
-	WagonDict["AxleCountPair3"] = AxleCountPair3
-	WagonDict["AxleCountPair4"] = AxleCountPair4
-	WagonDict["AxleWeight"] = AxleWeight
-	WagonDict["AxleIgnore"] = AxleIgnore
+	WagonDict["WagonWeight"] = Response.WagonWeight / (WAGON_DATA_VALUE_DIVIDER * WAGON_DATA_VALUE_DIVIDER)
+	WagonDict["WagonSpeed"] = Response.WagonSpeed / WAGON_DATA_VALUE_DIVIDER
+	#Axle weights are published unsigned, the signed value only carries the AxleWeightDict status
+	WagonDict["Axle1Weight"] = (Response.Axle1Weight & 0xffff) / (WAGON_DATA_VALUE_DIVIDER * WAGON_DATA_VALUE_DIVIDER)
+	WagonDict["Axle2Weight"] = (Response.Axle2Weight & 0xffff) / (WAGON_DATA_VALUE_DIVIDER * WAGON_DATA_VALUE_DIVIDER)
+	WagonDict["Axle3Weight"] = (Response.Axle3Weight & 0xffff) / (WAGON_DATA_VALUE_DIVIDER * WAGON_DATA_VALUE_DIVIDER)
+	WagonDict["Axle4Weight"] = (Response.Axle4Weight & 0xffff) / (WAGON_DATA_VALUE_DIVIDER * WAGON_DATA_VALUE_DIVIDER)
+	WagonDict.update(Merit_ContinuousWeighmentPostData(Response))
 	WagonDict["WE"] = False
 	return WagonDict
 
-#********************************************************************************************#
-#Description : Function to read the input and output status of TLC
-#Arguments : Priority of command 
-#Return : None
-#********************************************************************************************#	
-def Merit_Status(Priority):
-	global m_TLCStatusFlag 
-	global m_NoPostFlag
-	
-	if(m_NoPostFlag == False):
-		Merit_WriteCommand(MERIT_DIGITAL_OUTPUT_STATUS_READ_CMD, [], 0, Priority)		
-		time.sleep(MERIT_DEFAULT_QUERY_DELAY)
-		Merit_WriteCommand(MERIT_DIGITAL_INPUT_STATUS_READ_CMD, [], 0, Priority)
-		time.sleep(MERIT_DEFAULT_QUERY_DELAY)
-		Merit_WriteCommand(MERIT_WAGON_WEIGHT_WRITE_CMD, [0,TEST_WAGON,RESOULUTION_LSB,RESOULUTION_MSB], WAGON_WEIGH_COMMAND_PAYLOAD_SIZE, Priority)
-		time.sleep(MERIT_DEFAULT_QUERY_DELAY)
-	
 #********************************************************************************************#
 #Description : Function to parse the digital output status
 #Arguments : DigitalOutputStatus DataList
@@ -1145,37 +2298,22 @@ def Merit_DigitalOutputStatusParse(DigitalOutputStatusDataList):
 	global m_TLCMqttClient
 	global m_TLCStatusControlFlag
 	OutputDict = {}
-	JsonRespString = ""
 	
-	CurrentOutputStatus = (DigitalOutputStatusDataList[CURRENT_OUTPUT_STATUS_MSB] << 8) + DigitalOutputStatusDataList[CURRENT_OUTPUT_STATUS_LSB]
-	ActualOutputStatus = int((DigitalOutputStatusDataList[ACTUAL_OUTPUT_STATUS_MSB] << 8) + DigitalOutputStatusDataList[ACTUAL_OUTPUT_STATUS_LSB])
+	Response = MeritResponseDecoderDict[MERIT_DIGITAL_OUTPUT_STATUS_READ_CMD].Decode(DigitalOutputStatusDataList)
+	CurrentOutputStatus = Response.CurrentStatus
+	ActualOutputStatus = Response.ActualStatus
 	
 	OutputStatus = ActualOutputStatus
 	if (m_TLCStatusControlFlag == True):
 		OutputStatus = CurrentOutputStatus
 		
-	OutputDict[OutputStatusDict[COMMAND4RES_SYSTEM_READY]] = int(OutputStatus) % 2
-	OutputDict[OutputStatusDict[COMMAND4RES_OVERSPEED_LAMP_RELAY]] = (int(OutputStatus) >> COMMAND4RES_OVERSPEED_LAMP_RELAY) % 2
-	OutputDict[OutputStatusDict[COMMAND4RES_ALARM_HOOTER]] = (int(OutputStatus) >> COMMAND4RES_ALARM_HOOTER) % 2	
-	OutputDict[OutputStatusDict[PIN_4]] = (int(OutputStatus) >> PIN_4) % 2
-	OutputDict[OutputStatusDict[PIN_5]] = (int(OutputStatus) >> PIN_5) % 2
-	OutputDict[OutputStatusDict[PIN_6]] = (int(OutputStatus) >> PIN_6) % 2
-	OutputDict[OutputStatusDict[PIN_7]] = (int(OutputStatus) >> PIN_7) % 2
-	OutputDict[OutputStatusDict[PIN_8]] = (int(OutputStatus) >> PIN_8) % 2
-	OutputDict[OutputStatusDict[COMMAND4RES_SYSTEM_READY_LAMP]] = (int(OutputStatus) >> COMMAND4RES_SYSTEM_READY_LAMP) % 2 
-	OutputDict[OutputStatusDict[COMMAND4RES_OVERSPEED_LAMP]] = (int(OutputStatus) >> COMMAND4RES_OVERSPEED_LAMP) % 2
-	OutputDict[OutputStatusDict[COMMAND4RES_ADVANCE_OVERSPEED_LAMP]] = (int(OutputStatus) >> COMMAND4RES_ADVANCE_OVERSPEED_LAMP) % 2
-	OutputDict[OutputStatusDict[COMMAND4RES_UNKNOWN_VECHILE]] = (int(OutputStatus) >> COMMAND4RES_UNKNOWN_VECHILE) % 2 
-	OutputDict[OutputStatusDict[COMMAND4RES_AD_FAILURE]] = (int(OutputStatus) >> COMMAND4RES_AD_FAILURE) % 2
-	OutputDict[OutputStatusDict[PIN_14]] = (int(OutputStatus) >> PIN_14) % 2
-	OutputDict[OutputStatusDict[PIN_15]] = (int(OutputStatus) >> PIN_15) % 2
-	OutputDict[OutputStatusDict[PIN_16]] = (int(OutputStatus) >> PIN_16) % 2
+	for StatusBit, StatusName in OutputStatusDict.items():
+		OutputDict[StatusName] = (OutputStatus >> StatusBit) & 1
 	
 	OutputDict["Message"] = ""
-	JsonRespString = json.dumps(OutputDict)
 	
-	Merit_Publish(m_TLCMqttClient,m_MqttTLCOutputStatusPostTopic, JsonRespString)
-	logging.info("CurrentOutputStatus : " + str(CurrentOutputStatus) + "ActualOutputStatus : " + str(int(ActualOutputStatus)))
+	Merit_PolicyPublish(MERIT_OUTPUT_STATUS_POLICY, m_TLCMqttClient, m_MqttTLCOutputStatusPostTopic, OutputDict)
+	logging.debug("CurrentOutputStatus : %d ActualOutputStatus : %d", CurrentOutputStatus, ActualOutputStatus)
 	#print("CurrentOutputStatus : " + str(CurrentOutputStatus) + "ActualOutputStatus : " + str(int(ActualOutputStatus)))
 	
 #********************************************************************************************#
@@ -1186,30 +2324,16 @@ def Merit_DigitalOutputStatusParse(DigitalOutputStatusDataList):
 def Merit_DigitalInputStatusParse(DigitalInputStatusDataList):
 	global m_TLCMqttClient
 	InputDict = {}
-	JsonRespString = ""
-	
-	CurrentInputStatus = (DigitalInputStatusDataList[CURRENT_INPUT_STATUS_MSB] << 8) + DigitalInputStatusDataList[CURRENT_INPUT_STATUS_LSB]
-	ActualInputStatus = int((DigitalInputStatusDataList[ACTUAL_INPUT_STATUS_MSB] << 8) + DigitalInputStatusDataList[ACTUAL_INPUT_STATUS_LSB])
-	InputDict[InputStatusDict[COMMAND10RES_TRACKSWITCH_1A]] = int(ActualInputStatus) % 2 
-	InputDict[InputStatusDict[COMMAND10RES_TRACKSWITCH_1B]] = (int(ActualInputStatus) >> COMMAND10RES_TRACKSWITCH_1B) % 2
-	InputDict[InputStatusDict[COMMAND10RES_TRACKSWITCH_2A]] = (int(ActualInputStatus) >> COMMAND10RES_TRACKSWITCH_2A) % 2
-	InputDict[InputStatusDict[COMMAND10RES_TRACKSWITCH_2B]] = (int(ActualInputStatus) >> COMMAND10RES_TRACKSWITCH_2B) % 2 
-	InputDict[InputStatusDict[COMMAND10RES_TRACKSWITCH_3A]] = (int(ActualInputStatus) >> COMMAND10RES_TRACKSWITCH_3A) % 2 
-	InputDict[InputStatusDict[COMMAND10RES_TRACKSWITCH_3B]] = (int(ActualInputStatus) >> COMMAND10RES_TRACKSWITCH_3B) % 2 
-	InputDict[InputStatusDict[COMMAND10RES_TRACKSWITCH_4A]] = (int(ActualInputStatus) >> COMMAND10RES_TRACKSWITCH_4A) % 2
-	InputDict[InputStatusDict[COMMAND10RES_TRACKSWITCH_4B]] = (int(ActualInputStatus) >> COMMAND10RES_TRACKSWITCH_4B) % 2 
-	InputDict[InputStatusDict[COMMAND10RES_START_WEIGH]] = (int(ActualInputStatus) >> COMMAND10RES_START_WEIGH) % 2 
-	InputDict[InputStatusDict[COMMAND10RES_END_WEIGH]] = (int(ActualInputStatus) >> COMMAND10RES_END_WEIGH) % 2
-	InputDict[InputStatusDict[COMMAND10RES_AOS_IN_DIR_5A]] = (int(ActualInputStatus) >> COMMAND10RES_AOS_IN_DIR_5A) % 2
-	InputDict[InputStatusDict[COMMAND10RES_AOS_IN_DIR_5B]] = (int(ActualInputStatus) >> COMMAND10RES_AOS_IN_DIR_5B) % 2
-	InputDict[InputStatusDict[COMMAND10RES_AOS_OUT_DIR_6B]] = (int(ActualInputStatus) >> COMMAND10RES_AOS_OUT_DIR_6B) % 2 
-	InputDict[InputStatusDict[COMMAND10RES_AOS_OUT_DIR_6A]] = (int(ActualInputStatus) >> COMMAND10RES_AOS_OUT_DIR_6A) % 2 
-	InputDict[InputStatusDict[PIN_15]] = (int(ActualInputStatus) >> PIN_15) % 2 
-	InputDict[InputStatusDict[PIN_16]] = (int(ActualInputStatus) >> PIN_16) % 2 
+	
+	Response = MeritResponseDecoderDict[MERIT_DIGITAL_INPUT_STATUS_READ_CMD].Decode(DigitalInputStatusDataList)
+	CurrentInputStatus = Response.CurrentStatus
+	ActualInputStatus = Response.ActualStatus
+	m_TLCPollScheduler.InputStatus(ActualInputStatus)
+	for StatusBit, StatusName in InputStatusDict.items():
+		InputDict[StatusName] = (ActualInputStatus >> StatusBit) & 1
 	InputDict["Message"] = ""
-	JsonRespString = json.dumps(InputDict)
-	Merit_Publish(m_TLCMqttClient,m_MqttTLCInputStatusPostTopic, JsonRespString)
-	logging.info("CurrentInputStatus : "  + str( CurrentInputStatus) + "ActualInputStatus : " + str(ActualInputStatus))
+	Merit_PolicyPublish(MERIT_INPUT_STATUS_POLICY, m_TLCMqttClient, m_MqttTLCInputStatusPostTopic, InputDict)
+	logging.debug("CurrentInputStatus : %d ActualInputStatus : %d", CurrentInputStatus, ActualInputStatus)
 	
 #********************************************************************************************#
 #Description : Function to parse the TLC Firmware version from the list
@@ -1218,10 +2342,10 @@ def Merit_DigitalInputStatusParse(DigitalInputStatusDataList):
 #********************************************************************************************#	
 def Merit_VersionReqParse(DataList):
 	global m_TLCFirmwareVersion
-	stringlist = ""
-	for x in DataList[1:]:
-		stringlist = stringlist + chr(x)
+	global m_TLCFirmwareVersionReadFlag
+	stringlist = MeritResponseDecoderDict[MERIT_VERSION_OF_CODE_READ_CMD].Decode(DataList).Text
 	m_TLCFirmwareVersion = stringlist
+	m_TLCFirmwareVersionReadFlag = True
 	logging.info("TLC Version: " + str(stringlist) + ", Version Number : " + stringlist[12:])
 	
 #********************************************************************************************#
@@ -1231,10 +2355,10 @@ def Merit_VersionReqParse(DataList):
 #********************************************************************************************#	
 def Merit_VersionReleaseDataReqParse(DataList): 
 	global m_TLCFirmwareReleaseDate  
-	stringlist = ""
-	for x in DataList[1:]:
-		stringlist = stringlist + chr(x)
+	global m_TLCFirmwareReleaseDateReadFlag
+	stringlist = MeritResponseDecoderDict[MERIT_CODE_RELAESE_DATE_READ_CMD].Decode(DataList).Text
 	m_TLCFirmwareReleaseDate = stringlist
+	m_TLCFirmwareReleaseDateReadFlag = True
 	logging.info("Version Release Date : " + stringlist)
 
 #********************************************************************************************#
@@ -1244,10 +2368,8 @@ def Merit_VersionReleaseDataReqParse(DataList):
 #********************************************************************************************#
 def Merit_ClearQueue():
 	global m_TLCSerialCommandWriteQueue
-	with m_TLCSerialCommandWriteQueue.mutex:
-		logging.info(str("******************** QUEUE CLEARED **********************\n"))
-		m_TLCSerialCommandWriteQueue.queue.clear()
-		time.sleep(MERIT_DEFAULT_QUERY_DELAY)
+	logging.info(str("******************** QUEUE CLEARED **********************\n"))
+	Merit_DropQueuedCommands()
 
 #********************************************************************************************#
 #Description : Function to control the output status
@@ -1259,13 +2381,11 @@ def Merit_OutputStatusControl(OutputControlPinNumber, OnStatus):
 		Merit_ClearQueue()
 		if(OnStatus == 'true'):
 			print("PIN "+ str(OutputControlPinNumber) + " ON")
-			Merit_WriteCommand(MERIT_OUTPUT_STATUS_WRITE_CMD, [OutputControlPinNumber, MERIT_STATUS_HIGH_PULSE], MERIT_STATUS_PAYLOAD_SIZE, WAGON_DATA_PRIORITY)  
-			time.sleep(MERIT_DEFAULT_QUERY_DELAY)
+			Merit_WriteCommand(MERIT_OUTPUT_STATUS_WRITE_CMD, [OutputControlPinNumber, MERIT_STATUS_HIGH_PULSE], MERIT_STATUS_PAYLOAD_SIZE, WAGON_DATA_PRIORITY).Wait()
 			logging.info("PIN "+ str(OutputControlPinNumber) + " ON")
 		elif(OnStatus == 'false'):
 			print("PIN "+ str(OutputControlPinNumber) + " OFF")
-			Merit_WriteCommand(MERIT_OUTPUT_STATUS_WRITE_CMD, [OutputControlPinNumber, MERIT_STATUS_LOW_PULSE], MERIT_STATUS_PAYLOAD_SIZE, WAGON_DATA_PRIORITY) 
-			time.sleep(MERIT_DEFAULT_QUERY_DELAY)
+			Merit_WriteCommand(MERIT_OUTPUT_STATUS_WRITE_CMD, [OutputControlPinNumber, MERIT_STATUS_LOW_PULSE], MERIT_STATUS_PAYLOAD_SIZE, WAGON_DATA_PRIORITY).Wait()
 			logging.info("PIN "+ str(OutputControlPinNumber) + " OFF")
 		
 #********************************************************************************************#
@@ -1275,8 +2395,7 @@ def Merit_OutputStatusControl(OutputControlPinNumber, OnStatus):
 #********************************************************************************************# 
 def Merit_OutputStatusReset():
 	Merit_ClearQueue()
-	Merit_WriteCommand(MERIT_OUTPUT_STATUS_RESET_WRITE_CMD, [], 0, WAGON_DATA_PRIORITY)  
-	time.sleep(MERIT_DEFAULT_QUERY_DELAY)
+	Merit_WriteCommand(MERIT_OUTPUT_STATUS_RESET_WRITE_CMD, [], 0, WAGON_DATA_PRIORITY).Wait()
 
 #********************************************************************************************#
 #Description : Function to write the Serial Port Printout And ScoreBoard Availablity
@@ -1290,15 +2409,14 @@ def Merit_ScoreBoardAvailablity(payloadString):
 	HostIdArr = bytes(m_HostWGID, 'utf-8')
 	arraylength = len(SBArr) + len(HostIdArr)
 	print("SB ID", (SBArr))
-	Merit_WriteCommand(MERIT_SCOREBOARD_AVAIL_WRITE_CMD, [SBArr, HostIdArr], arraylength, WAGON_DATA_PRIORITY)  
-	time.sleep(4 * MERIT_DEFAULT_QUERY_DELAY)
+	Merit_WriteCommand(MERIT_SCOREBOARD_AVAIL_WRITE_CMD, SBArr + HostIdArr, arraylength, WAGON_DATA_PRIORITY).Wait()
 
 #********************************************************************************************#
-#Description : Function to reset the output status
-#Arguments : None
+#Description : Function to set the weighbridge id and build its topics
+#Arguments : WGID
 #Return : None
 #********************************************************************************************# 
-def Merit_GetWBID():
+def Merit_GetWBID(WGID = MERIT_DEFAULT_WGID):
 	global m_HostWGID   
 	global m_MqttWeighmentPostTopic 
 	global m_MqttTLCInitTopic 
@@ -1310,15 +2428,20 @@ def Merit_GetWBID():
 	global m_MqttStatusControlTopic 
 	global m_MqttMeritScoreBoardAvailablityTopic
 	global m_ErrorStatusTopic
+	global m_MqttAxleWeightsTopic
+	global m_MqttRakeBatchTopic
+	global m_MqttRakeBatchRequestTopic
+	global m_MqttEncodingControlTopic
+	global m_MqttLinkMetricsTopic
 	global CLIENT_ID
 	
 	CurrentTime = str(datetime.datetime.now())
 	
-	CLIENT_ID = "MBMAGH01" + CurrentTime
+	CLIENT_ID = WGID + CurrentTime
 	
-	m_HostWGID = str(socket.gethostname())
+	#m_HostWGID = str(socket.gethostname())
 	#print("HostName : "+ str(socket.gethostname()))
-	m_HostWGID = "MBMAGH01"
+	m_HostWGID = WGID
 	m_MqttWeighmentPostTopic = "/Merit/" + m_HostWGID + "/Weighment/"
 	m_MqttTLCInitTopic = "/Merit/" + m_HostWGID + "/COMMAND/"
 	m_MqttTLCStatusTopic = "/Merit/" + m_HostWGID + "/Status/"
@@ -1329,6 +2452,13 @@ def Merit_GetWBID():
 	m_MqttStatusControlTopic = "/Merit/" + m_HostWGID + "/Status/Control/"
 	m_MqttMeritScoreBoardAvailablityTopic = "/Merit/" + m_HostWGID + "/ScoreBoard/"
 	m_ErrorStatusTopic = "/Merit/" + m_HostWGID + "/ErrorStatus/"
+	m_MqttAxleWeightsTopic = "/Merit/" + m_HostWGID + "/AxleWeights/"
+	m_MqttRakeBatchTopic = "/Merit/" + m_HostWGID + "/RakeBatch/"
+	m_MqttRakeBatchRequestTopic = "/Merit/" + m_HostWGID + "/RakeBatch/sendFrom/"
+	m_MqttEncodingControlTopic = "/Merit/" + m_HostWGID + "/Encoding/"
+	m_MqttLinkMetricsTopic = "/Merit/" + m_HostWGID + "/LinkMetrics/"
+	Merit_BuildTopicEncoders()
+	Merit_BuildTopicQos()
 	
 #***********************************************************************************#
 #******************************* MQTT Functions *****************************************#
@@ -1338,26 +2468,43 @@ def Merit_GetWBID():
 #Arguments : None
 #Return : None
 #********************************************************************************************#	
-def Merit_MqttStart():
+def Merit_MqttStart(NetworkLoop = None):
 	global m_TLCMqttClient
 	try:
-		m_TLCMqttClient = Merit_ConnectMqtt(CLIENT_ID, USERNAME, PASSWORD, BROKER, BROKER_PORT)
+		m_TLCMqttClient = Merit_ConnectMqtt(CLIENT_ID, USERNAME, PASSWORD, BROKER, BROKER_PORT, NetworkLoop)
 	except Exception as ex:
 		logging.error("Exception at mqtt connecting function : " + str(ex))
 		print("Exception at mqtt connecting function : " + str(ex))
 		
 #********************************************************************************************#
 #Description : function to connect mqtt client
-#Arguments : Mqtt Client id, Username, Password, Broker, BrokerPort
+#Arguments : Mqtt Client id, Username, Password, Broker, BrokerPort, MeritAsyncMqttLoop driving the socket (None for the paho network thread)
 #Return : mqtt client
+#Notes : With a NetworkLoop the client only gets the broker address here, the loop connects it.
+#		 A session process uses m_SessionLink, the connection belongs to the session hub.
 #********************************************************************************************#		
-def Merit_ConnectMqtt(clientId, UserName, Password, Broker, BrokerPort):
+def Merit_ConnectMqtt(clientId, UserName, Password, Broker, BrokerPort, NetworkLoop = None):
 	#client = mqtt_client.Client(clientId)
 	#client.username_pw_set(UserName, Password)
+	if(m_SessionLink is not None):
+		client = m_SessionLink
+		client.on_connect = Merit_OnConnect
+		client.on_disconnect = Merit_OnDisConnect
+		client.on_publish = Merit_OnPublish
+		client.on_refused = Merit_OnSessionPublishRefused
+		client.loop_start()
+		return client
 	client = mqtt_client.Client(clientId, transport = 'websockets')
 	try:
 		client.on_connect = Merit_OnConnect
 		client.on_disconnect = Merit_OnDisConnect
+		client.on_publish = Merit_OnPublish
+		client.max_inflight_messages_set(MERIT_MQTT_INFLIGHT_WINDOW)
+		client.reconnect_delay_set(min_delay = 1, max_delay = MERIT_MQTT_RECONNECT_MAX_DELAY)
+		if(NetworkLoop is not None):
+			NetworkLoop.Attach(client)
+			client.connect_async(Broker, BrokerPort)
+			return client
 		client.connect(Broker, BrokerPort)
 		client.loop_start()
 	except Exception as ex:
@@ -1375,8 +2522,16 @@ def Merit_OnConnect(client, userdata, flags, rc):
 	try:
 		if rc == 0:
 			MqttConnectFlag = True
+			m_MqttConnectEvent.set()
 			logging.info("Connected to MQTT Broker!")
 			print("Connected to MQTT Broker!")
+			if(m_MqttSubscribedFlag == True):
+				Merit_MqttSubscribeTopics()		#the broker forgets the subscriptions of a clean session
+			if(m_MqttOutbox is not None):
+				logging.info("Mqtt Outbox Backlog : " + str(m_MqttOutbox.Depth()))
+				m_MqttOutbox.Wake()
+			with m_WagonPublishCondition:
+				m_WagonPublishCondition.notify_all()		#wagons held back while the link was down
 		else:
 			logging.error("Failed to connect, return code %d\n" + str(rc))	
 			print("Failed to connect, return code %d\n" + str(rc))
@@ -1388,42 +2543,186 @@ def Merit_OnConnect(client, userdata, flags, rc):
 #Description : Callback function for mqtt disconnect
 #Arguments : Mqtt Client, userdata, rc
 #Return : None
+#Notes : The network loop started by loop_start reconnects with backoff, publishes go to the outbox meanwhile
 #********************************************************************************************#
 def Merit_OnDisConnect(client, userdata, rc):
 	global MqttConnectFlag
 	try:
+		MqttConnectFlag = False
+		m_MqttConnectEvent.clear()
 		if rc == 0:
-			MqttConnectFlag = False
 			logging.info("DisConnected from MQTT Broker!")
-			client.reconnect()
-		logging.info("DisConnecting Clbk")
+		else:
+			logging.error("Mqtt Link Lost, return code : " + str(rc) + ", Reconnecting")
 		print("DisConnecting Clbk")
-		client.reconnect()
 	except Exception as ex:
 		logging.error("Exception at Mqtt OnDisConnectMessage : " + str(ex))
 		print("Exception at Mqtt OnDisConnectMessage : "+ str(ex))
 	
 #********************************************************************************************#
-#Description : function to publich the mqtt topic
-#Arguments : MqttClient, MqttTopic, MqttMessage
+#Description : Callback function for the mqtt publish acknowledgment (QoS 1/2), or the publish sent (QoS 0)
+#Arguments : Mqtt Client, userdata, message id
 #Return : None
+#Notes : Called by the paho network thread, must not publish
+#********************************************************************************************#
+def Merit_OnPublish(client, userdata, mid):
+	try:
+		m_MqttInFlight.Ack(mid)
+		if(m_MqttOutbox is not None):
+			m_MqttOutbox.Wake()					#window has room again
+		with m_WagonPublishCondition:
+			m_WagonPublishCondition.notify_all()
+	except Exception as ex:
+		logging.error("Exception at Mqtt OnPublish : " + str(ex))
+		
+#********************************************************************************************#
+#Description : function to publich the mqtt topic
+#Arguments : MqttClient, MqttTopic, MqttMessage (JSON string or dictionary)
+#Return : 0 once the message is sent or stored in the outbox
+#Notes : Sent directly while the link is up and the outbox is empty, otherwise queued behind the backlog
 #********************************************************************************************#
 def Merit_Publish(client, topic, message):
 	global m_SerialCommErrorFlag
 	status = 0
 	if(m_SerialCommErrorFlag == False):
-		try:
-			result = client.publish(topic, message)		
-			status = result[0]
-			if status == 0:
-				logging.info(str(f"Send `{message}` to topic `{topic}`"))
-			else:
-				logging.error(str(f"Error!!!!!! : Failed to send `{message}` to topic {topic}, Status : `{status}` "))
-		except Exception as ex:
-			logging.error("Exception at Mqtt Publish : " + str(ex))
-			print("Exception at Mqtt Publish : "+ str(ex))
+		message = Merit_EncodeMessage(topic, message)
+		if((MqttConnectFlag == True) and (m_MqttOutbox.Depth() == 0)):
+			status = Merit_MqttSend(client, topic, message)
+		else:
+			status = -1
+		if(status != 0):
+			if(m_MqttOutbox.Depth() == 0):
+				logging.info("Mqtt Outbox Started : topic `%s`", topic)
+			m_MqttOutbox.Put(topic, message)
+			logging.debug("Queued to topic `%s`, Bytes : %d, Outbox Backlog : %d", topic, len(message), m_MqttOutbox.Depth())
+			status = 0
+	return status
+
+#********************************************************************************************#
+#Description : function to encode a message with the payload encoding of its topic
+#Arguments : MqttTopic, MqttMessage (JSON string or dictionary)
+#Return : Payload
+#********************************************************************************************#
+def Merit_EncodeMessage(topic, message):
+	Encoder = m_TopicEncoderDict.get(topic)
+	if(Encoder is not None):
+		return Encoder.Encode(message)
+	if(isinstance(message, dict)):
+		return json.dumps(message)
+	return message
+
+#********************************************************************************************#
+#Description : function to hand one message to the mqtt client at the QoS of its topic
+#Arguments : MqttClient, MqttTopic, MqttMessage, Callback(MessageId, AckFlag) for the acknowledgment, called at once at QoS 0, or None
+#Return : Publish status, 0 on success, MQTT_ERR_QUEUE_SIZE while the in-flight window is full
+#Notes : paho keeps a QoS 1/2 message published while the link is down and sends it after the reconnect
+#********************************************************************************************#
+def Merit_MqttSend(client, topic, message, Callback = None):
+	status = mqtt_client.MQTT_ERR_NO_CONN
+	Qos = m_TopicQosDict.get(topic, MERIT_MQTT_DEFAULT_QOS)
+	if((Qos > 0) and (m_MqttInFlight.Full() == True)):
+		return mqtt_client.MQTT_ERR_QUEUE_SIZE
+	try:
+		result = client.publish(topic, message, Qos)		
+		status = result[0]
+		if((Qos > 0) and (status == mqtt_client.MQTT_ERR_NO_CONN)):
+			status = mqtt_client.MQTT_ERR_SUCCESS
+		if((Qos > 0) and (status == mqtt_client.MQTT_ERR_SUCCESS)):
+			m_MqttInFlight.Add(result[1], topic, Callback)
+		elif((status == mqtt_client.MQTT_ERR_SUCCESS) and (Callback is not None)):
+			Callback(result[1], True)			#nothing is acknowledged at QoS 0
+		if status == 0:
+			logging.debug("Send to topic `%s`, Bytes : %d", topic, len(message))
+		else:
+			logging.error("Error!!!!!! : Failed to send `%s` to topic %s, Status : `%s` ", message, topic, status)
+	except Exception as ex:
+		logging.error("Exception at Mqtt Publish : " + str(ex))
+		print("Exception at Mqtt Publish : "+ str(ex))
+	return status
+
+#********************************************************************************************#
+#Description : function to publish a polled message through its publish policy
+#Arguments : Policy name, MqttClient, MqttTopic, Message dictionary
+#Return : Publish status, 0 also when the policy held the message back
+#********************************************************************************************#
+def Merit_PolicyPublish(PolicyName, client, topic, MessageDict):
+	global m_PublishPolicyDict
+	Policy = m_PublishPolicyDict[PolicyName]
+	if(Policy.Check(MessageDict) == False):
+		return 0
+	status = Merit_Publish(client, topic, MessageDict)
+	if(status == 0):
+		Policy.Published(MessageDict)
 	return status
 
+#********************************************************************************************#
+#Description : function to get the topics that have a name in the topic configurations
+#Arguments : None
+#Return : Dict of topic name : topic
+#********************************************************************************************#
+def Merit_TopicNameDict():
+	return {MERIT_WEIGHMENT_TOPIC_NAME : m_MqttWeighmentPostTopic, MERIT_WEIGHT_STATUS_TOPIC_NAME : m_MqttWeightStatusTopic,
+		MERIT_RAKE_BATCH_TOPIC_NAME : m_MqttRakeBatchTopic, MERIT_AXLE_WEIGHTS_TOPIC_NAME : m_MqttAxleWeightsTopic}
+
+#********************************************************************************************#
+#Description : function to build the QoS of every configured topic
+#Arguments : None
+#Return : None
+#********************************************************************************************#
+def Merit_BuildTopicQos():
+	global m_TopicQosDict
+	TopicDict = Merit_TopicNameDict()
+	m_TopicQosDict = {TopicDict[Name] : Qos for Name, Qos in MeritTopicQosConfigDict.items()}
+
+#********************************************************************************************#
+#Description : function to publish the broker link metrics, outbox and acknowledgment window
+#Arguments : None
+#Return : None
+#********************************************************************************************#
+def Merit_PublishLinkMetrics():
+	MetricsDict = m_MqttInFlight.Metrics()
+	MetricsDict["Outbox"] = m_MqttOutbox.Metrics()
+	logging.info("Mqtt Link Metrics : " + json.dumps(MetricsDict))
+	Merit_Publish(m_TLCMqttClient, m_MqttLinkMetricsTopic, MetricsDict)
+
+#********************************************************************************************#
+#Description : function to build the payload encoder of every configured topic
+#Arguments : None
+#Return : None
+#********************************************************************************************#
+def Merit_BuildTopicEncoders():
+	global m_TopicEncoderDict
+	TopicDict = Merit_TopicNameDict()
+	EncoderDict = {}
+	for Name, (Encoding, FieldNameList, CompressFlag) in m_TopicEncodingConfigDict.items():
+		EncoderDict[TopicDict[Name]] = MeritPayloadEncoder(Encoding, MeritPayloadSchemaDict[MERIT_WAGON_PAYLOAD_SCHEMA_ID], FieldNameList, CompressFlag)
+	m_TopicEncoderDict = EncoderDict
+
+#********************************************************************************************#
+#Description : function to change the payload encoding of a topic on a consumer request
+#Arguments : Request dictionary {"Topic", "Encoding", "Compress", "Fields"}
+#Return : None
+#********************************************************************************************#
+def Merit_SetTopicEncoding(RequestDict):
+	Name = RequestDict.get("Topic")
+	Encoding = RequestDict.get("Encoding", MERIT_ENCODING_JSON)
+	if((Name not in m_TopicEncodingConfigDict) or (Encoding not in (MERIT_ENCODING_JSON, MERIT_ENCODING_BINARY))):
+		logging.error("Invalid Encoding Request : " + str(RequestDict))
+		return
+	m_TopicEncodingConfigDict[Name] = (Encoding, RequestDict.get("Fields"), bool(RequestDict.get("Compress", False)))
+	Merit_BuildTopicEncoders()
+	logging.info("Topic Encoding : " + Name + " : " + str(m_TopicEncodingConfigDict[Name]))
+
+#********************************************************************************************#
+#Description : function to make every publish policy send its next message as a keyframe
+#Arguments : None
+#Return : None
+#********************************************************************************************#
+def Merit_ResetPublishPolicies():
+	global m_PublishPolicyDict
+	for Policy in m_PublishPolicyDict.values():
+		Policy.Reset()
+
 #********************************************************************************************#
 #Description : function to subscribe the mqtt topic
 #Arguments : MqttClient, MqttTopic
@@ -1432,7 +2731,7 @@ def Merit_Publish(client, topic, message):
 def Merit_Subscribe(client: mqtt_client, topic):
 	try:
 		client.subscribe(topic)
-		client.on_message = Merit_OnMessage
+		client.on_message = Merit_AsyncOnMessage if(m_AsyncCommandExecutor is not None) else Merit_QueueOnMessage
 		logging.info(str(f"Topic {topic} is Subscribed"))	
 		print(str(f"Topic {topic} is Subscribed"))
 	except Exception as ex:
@@ -1440,12 +2739,24 @@ def Merit_Subscribe(client: mqtt_client, topic):
 		print("Exception at Mqtt Subscribe : "+ str(ex))
 
 #********************************************************************************************#
-#Description : Callback function for mqtt message from subscribed topic
+#Description : Callback function for mqtt message from subscribed topic, hands the message to the mqtt command worker
+#Arguments : Mqtt Client, userdata, message
+#Return : None
+#Notes : The commands wait for TLC replies, the paho network thread keeps handling the acknowledgments
+#		 and the keepalive meanwhile
+#********************************************************************************************#
+def Merit_QueueOnMessage(client, userdata, msg):
+	m_MqttCommandExecutor.submit(Merit_OnMessage, client, userdata, msg)
+
+#********************************************************************************************#
+#Description : Function to run the command of an mqtt message from subscribed topic
 #Arguments : Mqtt Client, userdata, message
 #Return : None
 #********************************************************************************************#
 def Merit_OnMessage(client, userdata, msg):
 	global m_MqttPostCurrentWagonNumber
+	global m_MqttPostAckedWagonNumber
+	global m_WagonAckedSet
 	global m_TLCStatusFlag
 	global m_LocoCount
 	global m_AXLETOELIMINATE
@@ -1461,19 +2772,23 @@ def Merit_OnMessage(client, userdata, msg):
 		Topic = msg.topic
 		payload = msg.payload.decode()
 		logging.info(str(f"Received Data from `{msg.topic}` topic!"))
+		FlagChangeFlag = Topic in (m_MqttTLCInitTopic, m_MqttTLCStatusTopic, m_MqttStatusControlTopic)		#topics changing the monitor flags
 		#Weighment Initiate Topic
 		if(Topic == m_MqttTLCInitTopic):
 			payloadList = payload.split(",")
 			if(payloadList[0] == m_MqttInitiate):
 				if(len(payloadList) >= MERIT_STATUS_PAYLOAD_SIZE):
 					logging.info("AXLE TO BE ELIMINATED " + str(int(payloadList[1])))
-					m_AXLETOELIMINATE = int(payloadList[1])
+					AxleToEliminate = int(payloadList[1])
 				else:
-					m_AXLETOELIMINATE = 0
-				Merit_Init()
+					AxleToEliminate = 0
+				if(AxleToEliminate != m_AXLETOELIMINATE):
+					Merit_InvalidateCommandFrameCache(MERIT_INIT_AND_AXLE_ELIMINATE_WRITE_CMD)
+				m_AXLETOELIMINATE = AxleToEliminate
 				logging.info("InitiateReceived")
-				m_NoPostFlag = False
-				m_TLCStatusControlFlag = False
+				if(Merit_Init() == True):
+					m_NoPostFlag = False
+					m_TLCStatusControlFlag = False
 			elif(payload == m_MqttTerminate):
 				Merit_ClearQueue()
 				Merit_Terminate()
@@ -1485,7 +2800,21 @@ def Merit_OnMessage(client, userdata, msg):
 			#m_NoPostFlag = False
 			#print("Merit Req Wagon Serial Number" * 100)
 			logging.info("Merit Req Wagon Serial Number" + str(payload))
-			m_MqttPostCurrentWagonNumber = int(payload) 
+			with m_WagonPublishCondition:
+				m_MqttPostCurrentWagonNumber = int(payload) 
+				m_MqttPostAckedWagonNumber = m_MqttPostCurrentWagonNumber
+				m_WagonAckedSet = set()
+				m_WagonPublishCondition.notify_all()
+		#Rake batch request Topic, payload : RakeId[,FromWagon], empty RakeId for the current rake
+		elif(Topic == m_MqttRakeBatchRequestTopic):
+			payloadList = payload.split(",")
+			RakeId = int(payloadList[0]) if(payloadList[0].strip() != "") else m_RakeId
+			FromWagon = int(payloadList[1]) if(len(payloadList) >= MERIT_STATUS_PAYLOAD_SIZE) else 1
+			logging.info("Rake Batch Requested : Rake " + str(RakeId) + " From Wagon " + str(FromWagon))
+			Merit_RakeBatchPublish(RakeId, FromWagon, None, True)
+		#Payload encoding Topic
+		elif(Topic == m_MqttEncodingControlTopic):
+			Merit_SetTopicEncoding(json.loads(payload))
 		#Status Topic			
 		elif(Topic == m_MqttTLCStatusTopic):
 			if(payload == m_MqttInitiate):
@@ -1518,6 +2847,9 @@ def Merit_OnMessage(client, userdata, msg):
 					m_TLCStatusControlFlag = True
 					m_NoPostFlag = False
 					Merit_OutputStatusControl(int(payloadList[0]), payloadList[1])
+		if(FlagChangeFlag == True):
+			m_TLCPollScheduler.Restart()		#poll with the new flags right away
+			Merit_ResetPublishPolicies()		#and publish the current state
 			
 	except Exception as ex:
 		logging.error("Exception at Mqtt OnMessage : " + str(ex))
@@ -1530,11 +2862,15 @@ def Merit_OnMessage(client, userdata, msg):
 #********************************************************************************************#		
 def Merit_MqttSubscribeTopics():
 	global m_TLCMqttClient
+	global m_MqttSubscribedFlag
 	try:
 		Merit_Subscribe(m_TLCMqttClient, m_MqttTLCInitTopic)
 		Merit_Subscribe(m_TLCMqttClient, m_MqttTLCStatusTopic)
 		Merit_Subscribe(m_TLCMqttClient, m_MqttWagonRequestTopic)
 		Merit_Subscribe(m_TLCMqttClient, m_MqttStatusControlTopic)
+		Merit_Subscribe(m_TLCMqttClient, m_MqttRakeBatchRequestTopic)
+		Merit_Subscribe(m_TLCMqttClient, m_MqttEncodingControlTopic)
+		m_MqttSubscribedFlag = True
 	except Exception as ex:
 		logging.error("Exception at subscribing topics : " + str(ex))
 		print("Exception at subscribing topics :  "+ str(ex))
@@ -1555,7 +2891,7 @@ def Merit_VersionPost():
 	
 	VersionObj1 = {'TLC_FirmwareVersion' : m_TLCFirmwareVersion, 'TLC_FirmwareReleaseDate' : m_TLCFirmwareReleaseDate, 'TLC_PyCodeVersion' : m_TLCPyCodeVersion, 'TLC_PyCodeReleaseDate' : m_TLCPyCodeReleaseDate , 'wgid' : m_HostWGID}
 	
-	VersionObj = {'TLC_FirmwareVersion ' : m_TLCFirmwareVersion, 'TLC_FirmwareReleaseDate' : m_TLCFirmwareReleaseDate, 'TLC_PyCodeVersion ' : m_TLCPyCodeVersion, 'TLC_PyCodeReleaseDate' : m_TLCPyCodeReleaseDate, 'wgid' : m_HostWGID}
+	VersionObj = Merit_VersionObject()
 	try:
 		res = requests.post(m_VersionPostURL, json = VersionObj)
 		print("Post Req Response code : " + str(res.status_code))
@@ -1566,69 +2902,865 @@ def Merit_VersionPost():
 		print("Exception at http version post : "+ str(ex))			   
 	return status
 		
+#********************************************************************************************#
+#Description : function to build the version object posted to m_VersionPostURL
+#Arguments : None
+#Return : Version dictionary
+#********************************************************************************************#		
+def Merit_VersionObject():
+	return {'TLC_FirmwareVersion ' : m_TLCFirmwareVersion, 'TLC_FirmwareReleaseDate' : m_TLCFirmwareReleaseDate, 'TLC_PyCodeVersion ' : m_TLCPyCodeVersion, 'TLC_PyCodeReleaseDate' : m_TLCPyCodeReleaseDate, 'wgid' : m_HostWGID}
+
 #********************************************************************************************#
 #Description : Function to publish Merit wagon weighment details to mqtt server
 #Arguments : None
 #Return : None
+#Notes : Sleeps on m_WagonPublishCondition until a wagon is stored, the cursor is moved by a sendFrom
+#		 request or a rake batch is due, the counters are read as one snapshot under the condition lock.
+#		 At QoS 1/2 the wagons go to the client directly while the link is up and the in-flight window
+#		 has room, the wagon store holds them meanwhile instead of the outbox.
 #********************************************************************************************#	
 def Merit_MqttPublishWagonDetails():
-	global m_TLCMqttClient
-	global m_WagonCount 
+	while(1):
+		with m_WagonPublishCondition:
+			while(True):
+				NextWagon = Merit_NextWagonToPublish()
+				if((NextWagon[0] is not None) or (Merit_RakeBatchDue() == True)):
+					break
+				m_WagonPublishCondition.wait(Merit_WagonPublishWaitTime())
+				m_MqttInFlight.Expire(MERIT_MQTT_ACK_TIMEOUT)
+		if(NextWagon[0] is not None):
+			if(Merit_PublishWagon(*NextWagon) != 0):
+				with m_WagonPublishCondition:
+					m_WagonPublishCondition.wait(MERIT_MQTT_ACK_CHECK_INTERVAL)		#client refused, try again later
+		if(Merit_RakeBatchDue() == True):
+			Merit_RakeBatchPublishDue(False)
+
+#********************************************************************************************#
+#Description : Function to get the wagon at the publish cursor, called with m_WagonPublishCondition held
+#Arguments : None
+#Return : (Wagon record or None if nothing is to be sent now, RakeId, Wagon number, AckFlag)
+#Notes : At QoS 1/2 (AckFlag) the wagons go to the client directly while the link is up and the in-flight
+#		 window has room, the wagon store holds them meanwhile instead of the outbox. The cursor skips the
+#		 wagons already acknowledged, so after an acknowledgment timeout only the lost wagon is sent again.
+#********************************************************************************************#
+def Merit_NextWagonToPublish():
 	global m_MqttPostCurrentWagonNumber
-	global m_MeritWagonDetailsDict
-	global m_LocoCount
+	AckFlag = (m_TopicQosDict.get(m_MqttWeighmentPostTopic, MERIT_MQTT_DEFAULT_QOS) > 0)
+	while(m_MqttPostCurrentWagonNumber in m_WagonAckedSet):
+		m_MqttPostCurrentWagonNumber = m_MqttPostCurrentWagonNumber + 1
+	WagonNumber = int(m_MqttPostCurrentWagonNumber)
+	RakeId = m_RakeId
+	LastWagonNumber = m_WagonCount - m_LocoCount
+	WagonRecord = None
+	if((LastWagonNumber != 0) and (WagonNumber <= LastWagonNumber)):
+		WagonRecord = m_WagonStore.GetWagon(RakeId, WagonNumber)
+	if((AckFlag == True) and ((MqttConnectFlag == False) or (m_MqttInFlight.Full() == True))):
+		WagonRecord = None					#sent once the link is up and the window has room
+	return (WagonRecord, RakeId, WagonNumber, AckFlag)
+
+#********************************************************************************************#
+#Description : Function to get how long the wagon publisher may sleep
+#Arguments : None
+#Return : Seconds, None until notified
+#********************************************************************************************#
+def Merit_WagonPublishWaitTime():
+	if(m_MqttInFlight.Count() > 0):
+		return MERIT_MQTT_ACK_CHECK_INTERVAL		#acknowledgment timeouts are checked meanwhile
+	return None
+
+#********************************************************************************************#
+#Description : Function to publish one wagon and move the publish cursor past it
+#Arguments : Wagon record, RakeId, Wagon number, AckFlag
+#Return : Publish status, 0 on success
+#********************************************************************************************#
+def Merit_PublishWagon(WagonRecord, RakeId, WagonNumber, AckFlag):
+	global m_MqttPostCurrentWagonNumber
+	if(AckFlag == True):
+		status = Merit_MqttSend(m_TLCMqttClient, m_MqttWeighmentPostTopic, Merit_EncodeMessage(m_MqttWeighmentPostTopic, WagonRecord),
+			lambda MessageId, Acked, RakeId = RakeId, WagonNumber = WagonNumber : Merit_WagonAck(RakeId, WagonNumber, Acked))
+	else:
+		status = Merit_Publish(m_TLCMqttClient, m_MqttWeighmentPostTopic, WagonRecord)
+	if(status == 0):
+		with m_WagonPublishCondition:
+			if((m_MqttPostCurrentWagonNumber == WagonNumber) and (m_RakeId == RakeId)):		#not moved by a sendFrom or a new rake meanwhile
+				m_MqttPostCurrentWagonNumber = WagonNumber + 1
+				if(AckFlag == False):
+					Merit_WagonAck(RakeId, WagonNumber, True)
+	return status
+
+#********************************************************************************************#
+#Description : Function to take the acknowledgment of a published wagon
+#Arguments : RakeId, Wagon number, AckFlag (False when the broker did not acknowledge it in time)
+#Return : None
+#Notes : m_MqttPostAckedWagonNumber moves over consecutive acknowledged wagons, a wagon not acknowledged
+#		 moves the publish cursor back so it is sent again
+#********************************************************************************************#
+def Merit_WagonAck(RakeId, WagonNumber, AckFlag):
+	global m_MqttPostAckedWagonNumber
+	global m_MqttPostCurrentWagonNumber
+	with m_WagonPublishCondition:
+		if((RakeId != m_RakeId) or (WagonNumber < m_MqttPostAckedWagonNumber)):
+			return
+		if(AckFlag == True):
+			m_WagonAckedSet.add(WagonNumber)
+			while(m_MqttPostAckedWagonNumber in m_WagonAckedSet):
+				m_WagonAckedSet.discard(m_MqttPostAckedWagonNumber)
+				m_MqttPostAckedWagonNumber = m_MqttPostAckedWagonNumber + 1
+		elif(m_MqttPostCurrentWagonNumber > WagonNumber):
+			logging.error("Wagon " + str(WagonNumber) + " Not Acknowledged, Publishing Again")
+			m_MqttPostCurrentWagonNumber = WagonNumber
+		m_WagonPublishCondition.notify_all()
 	
-	while(1):
-		LengthOfDict = len(m_MeritWagonDetailsDict)
-		if(LengthOfDict > 0):
-			while(((m_WagonCount - m_LocoCount) != 0) and (m_MqttPostCurrentWagonNumber <= (m_WagonCount - m_LocoCount))):
-				if m_MqttPostCurrentWagonNumber in m_MeritWagonDetailsDict:
-					if(Merit_Publish(m_TLCMqttClient, m_MqttWeighmentPostTopic, m_MeritWagonDetailsDict[int(m_MqttPostCurrentWagonNumber)]) == 0):
-						m_MqttPostCurrentWagonNumber = m_MqttPostCurrentWagonNumber + 1
-					time.sleep(0.05)
-				time.sleep(0.01)
-		time.sleep(0.001)	
+#********************************************************************************************#
+#Description : Function to build the rake batch payload of a list of wagon records
+#Arguments : RakeId, List of (WagonNumber, Record json string), Rake complete flag
+#Return : Payload (str, or zlib compressed bytes)
+#Notes : An empty list gives the summary alone, sent to close a rake whose wagons all went in earlier batches
+#********************************************************************************************#
+def Merit_RakeBatchPayload(RakeId, WagonRecordList, CompleteFlag):
+	WagonList = [json.loads(Record) for WagonNumber, Record in WagonRecordList]
+	BatchDict = {}
+	BatchDict["RakeId"] = RakeId
+	BatchDict["WBID"] = m_HostWGID
+	BatchDict["FirstWagon"] = WagonRecordList[0][0] if(WagonList) else None
+	BatchDict["LastWagon"] = WagonRecordList[-1][0] if(WagonList) else None
+	BatchDict["WagonCount"] = len(WagonList)
+	BatchDict["Weight"] = round(sum(Wagon.get("WagonWeight", 0) for Wagon in WagonList), 2)
+	BatchDict["StartTime"] = WagonList[0].get("StartTime", "") if(WagonList) else ""
+	BatchDict["EndTime"] = WagonList[-1].get("EndTime", "") if(WagonList) else ""
+	BatchDict["Complete"] = CompleteFlag
+	BatchDict["Wagons"] = WagonList
+	Payload = json.dumps(BatchDict, separators = (",", ":"))
+	if(m_RakeBatchCompressFlag == True):
+		return zlib.compress(Payload.encode(), MERIT_RAKE_BATCH_COMPRESS_LEVEL)
+	return Payload
+
+#********************************************************************************************#
+#Description : Function to publish the wagons of a rake as batches of m_RakeBatchSize wagons
+#Arguments : RakeId, First wagon number, Last wagon number (None for the last stored), Rake complete flag
+#Return : Number of the wagon after the last one published
+#Notes : The complete flag is only set on the last batch
+#********************************************************************************************#
+def Merit_RakeBatchPublish(RakeId, FromWagon, ToWagon, CompleteFlag):
+	WagonRecordList = [Entry for Entry in m_WagonStore.GetRakeRecords(RakeId) if((Entry[0] >= FromWagon) and ((ToWagon is None) or (Entry[0] <= ToWagon)))]
+	if(len(WagonRecordList) == 0):
+		if(CompleteFlag == True):
+			logging.info("Rake Batch : No Wagons To Publish For Rake " + str(RakeId) + " From Wagon " + str(FromWagon))
+			Merit_Publish(m_TLCMqttClient, m_MqttRakeBatchTopic, Merit_RakeBatchPayload(RakeId, [], True))
+		return FromWagon
+	BatchSize = m_RakeBatchSize if(m_RakeBatchSize > 0) else len(WagonRecordList)
+	for Index in range(0, len(WagonRecordList), BatchSize):
+		BatchList = WagonRecordList[Index : Index + BatchSize]
+		LastBatchFlag = ((Index + BatchSize) >= len(WagonRecordList))
+		Merit_Publish(m_TLCMqttClient, m_MqttRakeBatchTopic, Merit_RakeBatchPayload(RakeId, BatchList, CompleteFlag and LastBatchFlag))
+	return WagonRecordList[-1][0] + 1
+
+#********************************************************************************************#
+#Description : Function to check if a batch of m_RakeBatchSize wagons of the current rake is waiting
+#Arguments : None
+#Return : True if due
+#********************************************************************************************#
+def Merit_RakeBatchDue():
+	return ((m_RakeBatchPublishFlag == True) and (m_RakeBatchSize > 0) and ((m_WagonStore.RakeWagonCount() - m_RakeBatchNextWagon + 1) >= m_RakeBatchSize))
+
+#********************************************************************************************#
+#Description : Function to publish the batches of the current rake that are due
+#Arguments : Rake complete flag, True publishes the rest of the rake
+#Return : None
+#********************************************************************************************#
+def Merit_RakeBatchPublishDue(CompleteFlag):
+	global m_RakeBatchNextWagon
+	with m_RakeBatchLock:
+		WagonCount = m_WagonStore.RakeWagonCount()
+		if(CompleteFlag == True):
+			m_RakeBatchNextWagon = Merit_RakeBatchPublish(m_RakeId, m_RakeBatchNextWagon, None, True)
+		elif((m_RakeBatchSize > 0) and ((WagonCount - m_RakeBatchNextWagon + 1) >= m_RakeBatchSize)):
+			LastWagon = m_RakeBatchNextWagon + (((WagonCount - m_RakeBatchNextWagon + 1) // m_RakeBatchSize) * m_RakeBatchSize) - 1
+			m_RakeBatchNextWagon = Merit_RakeBatchPublish(m_RakeId, m_RakeBatchNextWagon, LastWagon, False)
 	
-#********************************************************************************************#  
-#Description : Entry point of this program
-#Notes : To make sure that don't allow this script to import as module in another file (if imported then __name__ will be file name)
 #********************************************************************************************#
-if __name__=="__main__": #To run as a standalone script
+#Description : Function to open the persistent wagon store
+#Arguments : Store database file
+#Return : None
+#********************************************************************************************#
+def Merit_OpenWagonStore(FileName = MERIT_WAGON_STORE_FILE):
+	global m_WagonStore
+	
+	m_WagonStore = MeritWagonStore(FileName)
+	logging.info("Wagon Store Opened : " + FileName)
+	
+#********************************************************************************************#
+#Description : Function to open the mqtt outbox, the backlog of a previous run is sent once connected
+#Arguments : Outbox database file
+#Return : None
+#********************************************************************************************#
+def Merit_OpenMqttOutbox(FileName = MERIT_OUTBOX_FILE):
+	global m_MqttOutbox
+	
+	m_MqttOutbox = MeritMqttOutbox(lambda Topic, Payload, Callback : Merit_MqttSend(m_TLCMqttClient, Topic, Payload, Callback) == 0, lambda : MqttConnectFlag, FileName)
+	logging.info("Mqtt Outbox Opened : " + FileName + ", Backlog : " + str(m_MqttOutbox.Depth()))
+	
+#********************************************************************************************#
+#Description : Function to load the startup cache of the last TLC port and firmware identity
+#Arguments : None
+#Return : Startup cache dictionary, empty if there is no usable cache
+#********************************************************************************************#
+def Merit_LoadStartupCache():
+	CacheDict = {}
+	try:
+		with open(MERIT_STARTUP_CACHE_FILE, "r") as CacheFile:
+			CacheDict = json.load(CacheFile)
+		logging.info("Startup cache loaded : " + str(CacheDict))
+	except FileNotFoundError:
+		logging.info("No startup cache, cold start")
+	except Exception as ex:
+		logging.error("Exception at startup cache load : " + str(ex))
+		CacheDict = {}
+	return CacheDict
 
-	Merit_GetWBID()
-	MqttThread = Thread(target = Merit_MqttStart, daemon = True)
-	MqttThread.start()
-	while(MqttConnectFlag == False):		#Check the mqtt is connected to the broker
-		time.sleep(1)
+#********************************************************************************************#
+#Description : Function to save the TLC port and firmware identity for the next start
+#Arguments : None
+#Return : None
+#Notes : Written to a temporary file and renamed so a power cut never leaves a half written cache
+#********************************************************************************************#
+def Merit_SaveStartupCache():
+	global m_StartupCacheDict
+	CacheDict = {"Port" : m_TLCLastPort, "SerialNumber" : m_TLCLastSerialNumber, "FirmwareVersion" : m_TLCFirmwareVersion, "FirmwareReleaseDate" : m_TLCFirmwareReleaseDate}
+	if(CacheDict == m_StartupCacheDict):
+		return
+	try:
+		with open(MERIT_STARTUP_CACHE_FILE + ".tmp", "w") as CacheFile:
+			json.dump(CacheDict, CacheFile)
+		os.replace(MERIT_STARTUP_CACHE_FILE + ".tmp", MERIT_STARTUP_CACHE_FILE)
+		m_StartupCacheDict = CacheDict
+		logging.info("Startup cache saved : " + str(CacheDict))
+	except Exception as ex:
+		logging.error("Exception at startup cache save : " + str(ex))
+
+#********************************************************************************************#
+#Description : Function to record the time a startup stage completed
+#Arguments : Stage name
+#Return : None
+#********************************************************************************************#
+def Merit_StartupMetric(Stage):
+	global m_StartupMetricDict
+	m_StartupMetricDict[Stage] = round(time.monotonic() - m_ProcessStartTime, 3)
+	logging.info("Startup " + Stage + " : " + str(m_StartupMetricDict[Stage]) + " s")
+
+#********************************************************************************************#
+#Description : Startup stage to connect the mqtt client and subscribe the topics
+#Arguments : None
+#Return : None
+#********************************************************************************************#
+def Merit_StartupMqtt():
+	Merit_MqttStart()
+	m_MqttConnectEvent.wait()				#Check the mqtt is connected to the broker
 	Merit_MqttSubscribeTopics()				#Subscribe the mqtt topics
+	Merit_StartupMetric("MqttConnected")
+
+#********************************************************************************************#
+#Description : Startup stage to find the TLC port, last known port first, and start the serial writer
+#Arguments : None
+#Return : None
+#********************************************************************************************#
+def Merit_StartupSerial():
+	global m_MeritPort
+	global m_NoPostFlag
+	while(True):
+		m_MeritPort = Merit_FindTLCPort(m_StartupCacheDict.get("Port", ""), m_StartupCacheDict.get("SerialNumber", ""))   #Monitor TLC ComPort
+		if(m_MeritPort != ""):
+			break
+		logging.error(str("Cannot find TLC port"))
+		time.sleep(3)						#3 Sec timeout for logging purpose
+	Merit_StartupMetric("PortFound")
+	m_NoPostFlag = True
+	Merit_StartSerialWriter()
+	FirmwareThread = threading.Thread(target = Merit_StartupFirmwareIdentity, args=(), daemon = True)
+	FirmwareThread.start()
+
+#********************************************************************************************#
+#Description : Startup stage to read the TLC firmware version and release date in the background
+#Arguments : None
+#Return : None
+#Notes : Weighing does not wait for this, the cached identity is used until the TLC answers
+#********************************************************************************************#
+def Merit_StartupFirmwareIdentity():
+	while((m_TLCFirmwareVersionReadFlag == False) or (m_TLCFirmwareReleaseDateReadFlag == False)):
+		Merit_SerialWriterVersionRequesAndDate()	#Get TLC firmware version and release date
+		StartTime = time.monotonic()
+		while(((m_TLCFirmwareVersionReadFlag == False) or (m_TLCFirmwareReleaseDateReadFlag == False)) and ((time.monotonic() - StartTime) < MERIT_FIRMWARE_QUERY_TIMEOUT)):
+			time.sleep(MERIT_STARTUP_POLL_DELAY)
+	Merit_StartupMetric("FirmwareIdentity")
+	Merit_SaveStartupCache()
+
+#********************************************************************************************#
+#Description : Startup stage to post the TLC firmware and python code version
+#Arguments : None
+#Return : None
+#Notes : Posts the cached identity as soon as it is known and posts again if the TLC reports a different one
+#********************************************************************************************#
+def Merit_StartupVersionPost():
+	PostedIdentity = None
 	while(True):
-		m_MeritPort = Merit_FindTLCPort()   #Monitor TLC ComPort	
+		Identity = (m_TLCFirmwareVersion, m_TLCFirmwareReleaseDate)
+		if(("" not in Identity) and (Identity != PostedIdentity)):
+			if(Merit_VersionPost() == True):	#Post TLC Firmware and Python Code Version
+				PostedIdentity = Identity
+				Merit_StartupMetric("VersionPosted")
+			else:
+				time.sleep(MERIT_VERSION_POST_RETRY_DELAY)
+				continue
+		if((m_TLCFirmwareVersionReadFlag == True) and (m_TLCFirmwareReleaseDateReadFlag == True) and (Identity == PostedIdentity)):
+			break
+		time.sleep(MERIT_STARTUP_POLL_DELAY)
+
+#********************************************************************************************#
+#Description : Function to run the startup stages concurrently
+#Arguments : None
+#Return : None
+#Notes : Returns once mqtt is connected and the TLC port is open, firmware identity and
+#		 version post carry on in the background
+#********************************************************************************************#
+def Merit_Startup():
+	global m_StartupCacheDict
+	global m_TLCFirmwareVersion
+	global m_TLCFirmwareReleaseDate
+	
+	m_StartupCacheDict = Merit_LoadStartupCache()
+	m_TLCFirmwareVersion = m_StartupCacheDict.get("FirmwareVersion", "")
+	m_TLCFirmwareReleaseDate = m_StartupCacheDict.get("FirmwareReleaseDate", "")
+	MqttThread = Thread(target = Merit_StartupMqtt, daemon = True)
+	MqttThread.start()
+	SerialThread = Thread(target = Merit_StartupSerial, daemon = True)
+	SerialThread.start()
+	VersionPostThread = Thread(target = Merit_StartupVersionPost, daemon = True)
+	VersionPostThread.start()
+	MqttThread.join()
+	SerialThread.join()
+	Merit_SaveStartupCache()
+	Merit_StartupMetric("Ready")
+
+#***********************************************************************************#
+#******************************* Asyncio Engine *****************************************#
+#***********************************************************************************#
+#********************************************************************************************#
+#Description : Function to wait for a transaction from a coroutine, like MeritTransaction.Wait
+#Arguments : MeritTransaction
+#Return : Response, None if the command failed, was dropped from the queue or did not complete in time
+#Notes : Shielded so a timeout does not cancel the transaction, as Wait leaves it queued too
+#********************************************************************************************#
+async def Merit_AsyncWaitTransaction(Transaction):
+	try:
+		return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(Transaction)), MERIT_TRANSACTION_QUEUE_TIMEOUT + ((Transaction.m_RetryCount + 1) * Transaction.m_Timeout))
+	except asyncio.CancelledError:
+		if(Transaction.cancelled() == False):
+			raise							#engine stopping
+		logging.info("Command " + str(Transaction.m_Command) + " dropped from queue")
+	except Exception as ex:
+		logging.error("Command " + str(Transaction.m_Command) + " : " + str(ex))
+	return None
+
+#********************************************************************************************#
+#Description : Coroutine of Merit_SerialReadFrame, waits on the serial reader instead of a blocking read
+#Arguments : Command to read, Reply timeout
+#Return : (ReceiveStatus, Unstuffed frame bytes or None)
+#********************************************************************************************#
+async def Merit_AsyncSerialReadFrame(Command, Timeout = MERIT_SERIAL_TIMEOUT):
+	ReceiveSuccessFlag = MERIT_READ_TIMEOUT
+	Deadline = time.monotonic() + Timeout
+	
+	while(True):
+		ReceiveSuccessFlag, Frame = Merit_TakeFrame(Command, ReceiveSuccessFlag)
+		if(Frame is not None):
+			return (ReceiveSuccessFlag, Frame)
+		WaitTime = Deadline - time.monotonic()
+		if((WaitTime <= 0) or (await m_AsyncSerial.WaitData(WaitTime) == False)):
+			break
+	return (ReceiveSuccessFlag, None)
+
+#********************************************************************************************#
+#Description : Coroutine of Merit_SerialRead100ms
+#Arguments : Command to read, Reply timeout
+#Return : (ReceiveStatus, decoded response record or payload bytes, None if nothing valid was read)
+#Notes : Serial port exceptions are raised to the caller
+#********************************************************************************************#
+async def Merit_AsyncSerialRead(Command, Timeout = MERIT_SERIAL_TIMEOUT):
+	StartTime = datetime.datetime.now()
+	try:
+		ReceiveSuccessFlag, Frame = await Merit_AsyncSerialReadFrame(Command, Timeout)
+	except serial.SerialException as e:
+		logging.error(str(e)) 
+		raise
+	except Exception as ex:
+		logging.error("******************** Exception : , data : " + str(ex) + " *******************************")
+		return (MERIT_READ_TIMEOUT, None)
+	return Merit_ResponseFrameParse(Command, ReceiveSuccessFlag, Frame, StartTime)
+
+#********************************************************************************************#
+#Description : Coroutine of Merit_RunTransaction
+#Arguments : MeritTransaction
+#Return : None
+#********************************************************************************************#
+async def Merit_AsyncRunTransaction(Transaction):
+	global m_SerialCommFailureCount
+	
+	if(Transaction.set_running_or_notify_cancel() == False):
+		return
+	Command = Transaction.m_Command
+	ReceiveSuccessFlag = MERIT_READ_TIMEOUT
+	for i in range(Transaction.m_RetryCount + 1):
+		try:
+			logging.debug("Command to send : %d", Command)
+			m_AsyncSerial.Write(Transaction.m_Frame)
+			m_TLCFrameRing.Record(MERIT_FRAME_TX, Transaction.m_Frame)
+			ReceiveSuccessFlag, Response = await Merit_AsyncSerialRead(Command, Transaction.m_Timeout)
+			m_SerialCommFailureCount = 0
+			if(ReceiveSuccessFlag == MERIT_READ_SUCCESS):
+				Transaction.set_result(Response)
+				return
+		except serial.SerialException as e:
+			if(Merit_SerialCommFailure(e) == True):
+				Transaction.set_exception(e)
+				await asyncio.sleep(1)
+				return
+		except Exception as ex:
+			logging.error(str(ex))
+			Transaction.set_exception(ex)
+			return
+	Transaction.set_exception(MeritTransactionError(Command, ReceiveSuccessFlag))
+
+#********************************************************************************************#
+#Description : Coroutine of Merit_SerialWriterQueue, runs the queued transactions one at a time
+#Arguments : MeritAsyncWake set on every put to the command queue
+#Return : None
+#********************************************************************************************#
+async def Merit_AsyncSerialWriter(Wake):
+	while(True):
+		try:
+			Wake.Clear()
+			try:
+				data = m_TLCSerialCommandWriteQueue.get_nowait()
+			except Empty:
+				await Wake.Wait()
+				continue
+			Transaction = data[2][3]
+			if(Transaction is None):
+				continue
+			if(Transaction.Expired() == True):
+				m_TLCSerialCommandWriteQueue.m_ExpiredCount = m_TLCSerialCommandWriteQueue.m_ExpiredCount + 1
+				logging.info("Expired Command Dropped : " + str(Transaction.m_Command))
+				Transaction.cancel()
+				continue
+			await Merit_AsyncRunTransaction(Transaction)
+		except asyncio.CancelledError:
+			raise
+		except Exception as ex:
+			logging.error(str(ex))
+
+#********************************************************************************************#
+#Description : Coroutine of Merit_PollDueCommands
+#Arguments : Poll command list, Priority of command, MeritAsyncWake set when the poll scheduler is woken
+#Return : None
+#********************************************************************************************#
+async def Merit_AsyncPollDueCommands(PollList, Priority, Wake):
+	for Command in m_TLCPollScheduler.DueCommands(PollList):
+		PollTime = time.monotonic()
+		Payload, Length = Merit_PollPayload(Command)
+		await Merit_AsyncWaitTransaction(Merit_WriteCommand(Command, Payload, Length, Priority, MERIT_POLL_TIME_TO_LIVE))
+		m_TLCPollScheduler.Polled(Command, PollTime)
+	WaitTime = m_TLCPollScheduler.NextWaitTime(PollList)
+	if(WaitTime > 0):
+		await Wake.Wait(WaitTime)
+	Wake.Clear()
+
+#********************************************************************************************#
+#Description : Coroutine of the monitor loop of __main__, polls the TLC and finds the port again after a failure
+#Arguments : MeritAsyncWake of the poll scheduler
+#Return : None
+#********************************************************************************************#
+async def Merit_AsyncMonitor(Wake):
+	global m_MeritPort
+	global m_SerialCommErrorFlag
+	global m_MqttPostCurrentWagonNumber
+	Loop = asyncio.get_running_loop()
+	
+	while(True):
+		if(m_SerialCommErrorFlag == False):
+			await Merit_AsyncPollDueCommands(Merit_MonitorPollList(), WAGON_EMPTY_SCAN_PRIORITY, Wake)
+			continue
+		Merit_DropQueuedCommands()
+		m_AsyncSerial.Detach()
+		m_MeritPort = await Loop.run_in_executor(None, Merit_FindTLCPort, m_TLCLastPort, m_TLCLastSerialNumber)
 		if  m_MeritPort != "":
-			m_NoPostFlag = True
-			TLCThread = threading.Thread(target = Merit_SerialWriterQueue, args=(), daemon = True)
-			TLCThread.start()
+			m_AsyncSerial.Attach(m_TLCSerialPort)
+			with m_WagonPublishCondition:
+				m_MqttPostCurrentWagonNumber = 0
+			m_SerialCommErrorFlag = False
+			Merit_ResetPublishPolicies()
+			Merit_SaveStartupCache()
+		await asyncio.sleep(3)
+
+#********************************************************************************************#
+#Description : Coroutine of Merit_MqttPublishWagonDetails
+#Arguments : MeritAsyncWake set on every m_WagonPublishCondition.notify_all
+#Return : None
+#********************************************************************************************#
+async def Merit_AsyncPublishWagonDetails(Wake):
+	while(True):
+		Wake.Clear()
+		with m_WagonPublishCondition:
+			NextWagon = Merit_NextWagonToPublish()
+		if((NextWagon[0] is None) and (Merit_RakeBatchDue() == False)):
+			await Wake.Wait(Merit_WagonPublishWaitTime())
+			m_MqttInFlight.Expire(MERIT_MQTT_ACK_TIMEOUT)
+			continue
+		if(NextWagon[0] is not None):
+			if(Merit_PublishWagon(*NextWagon) != 0):
+				Wake.Clear()
+				await Wake.Wait(MERIT_MQTT_ACK_CHECK_INTERVAL)		#client refused, try again later
+		if(Merit_RakeBatchDue() == True):
+			Merit_RakeBatchPublishDue(False)
+
+#********************************************************************************************#
+#Description : Callback function for mqtt message in the asyncio engine
+#Arguments : Mqtt Client, userdata, message
+#Return : None
+#Notes : The commands wait for TLC replies, they run in order on the command worker, off the event loop
+#********************************************************************************************#
+def Merit_AsyncOnMessage(client, userdata, msg):
+	m_AsyncCommandExecutor.submit(Merit_OnMessage, client, userdata, msg)
+
+#********************************************************************************************#
+#Description : Coroutine of Merit_VersionPost, posts on asyncio streams
+#Arguments : None
+#Return : success or fail(True/False)
+#********************************************************************************************#
+async def Merit_AsyncVersionPost():
+	status = False
+	try:
+		StatusCode = await Merit_AsyncHttpPostJson(m_VersionPostURL, Merit_VersionObject())
+		print("Post Req Response code : " + str(StatusCode))
+		if(StatusCode == m_PostSuccessCode):
+			status = True
+	except Exception as ex:
+		logging.error("Exception at http version post : " + str(ex))
+		print("Exception at http version post : "+ str(ex))
+	return status
+
+#********************************************************************************************#
+#Description : Coroutine of Merit_StartupVersionPost
+#Arguments : None
+#Return : None
+#********************************************************************************************#
+async def Merit_AsyncStartupVersionPost():
+	PostedIdentity = None
+	while(True):
+		Identity = (m_TLCFirmwareVersion, m_TLCFirmwareReleaseDate)
+		if(("" not in Identity) and (Identity != PostedIdentity)):
+			if(await Merit_AsyncVersionPost() == True):
+				PostedIdentity = Identity
+				Merit_StartupMetric("VersionPosted")
+			else:
+				await asyncio.sleep(MERIT_VERSION_POST_RETRY_DELAY)
+				continue
+		if((m_TLCFirmwareVersionReadFlag == True) and (m_TLCFirmwareReleaseDateReadFlag == True) and (Identity == PostedIdentity)):
+			break
+		await asyncio.sleep(MERIT_STARTUP_POLL_DELAY)
+
+#********************************************************************************************#
+#Description : Coroutine of Merit_StartupFirmwareIdentity
+#Arguments : None
+#Return : None
+#********************************************************************************************#
+async def Merit_AsyncStartupFirmwareIdentity():
+	while((m_TLCFirmwareVersionReadFlag == False) or (m_TLCFirmwareReleaseDateReadFlag == False)):
+		VersionTransaction = Merit_WriteCommand(MERIT_VERSION_OF_CODE_READ_CMD, [], 0, WAGON_DATA_PRIORITY)
+		ReleaseDateTransaction = Merit_WriteCommand(MERIT_CODE_RELAESE_DATE_READ_CMD, [], 0, WAGON_DATA_PRIORITY)
+		await Merit_AsyncWaitTransaction(VersionTransaction)
+		await Merit_AsyncWaitTransaction(ReleaseDateTransaction)
+		StartTime = time.monotonic()
+		while(((m_TLCFirmwareVersionReadFlag == False) or (m_TLCFirmwareReleaseDateReadFlag == False)) and ((time.monotonic() - StartTime) < MERIT_FIRMWARE_QUERY_TIMEOUT)):
+			await asyncio.sleep(MERIT_STARTUP_POLL_DELAY)
+	Merit_StartupMetric("FirmwareIdentity")
+	Merit_SaveStartupCache()
+
+#********************************************************************************************#
+#Description : Coroutine of Merit_StartupMqtt, the client socket is driven by m_AsyncMqttLoop
+#Arguments : None
+#Return : Task of the mqtt network loop, None in a session process
+#********************************************************************************************#
+async def Merit_AsyncStartupMqtt():
+	Merit_MqttStart(m_AsyncMqttLoop)
+	MqttTask = asyncio.create_task(m_AsyncMqttLoop.Run()) if(m_AsyncMqttLoop is not None) else None
+	while(m_MqttConnectEvent.is_set() == False):
+		await asyncio.sleep(MERIT_STARTUP_POLL_DELAY)	#not in the executor, asyncio.run joins it at shutdown
+	Merit_MqttSubscribeTopics()
+	Merit_StartupMetric("MqttConnected")
+	return MqttTask
+
+#********************************************************************************************#
+#Description : Coroutine of Merit_StartupSerial, the port is probed in the default executor
+#Arguments : None
+#Return : Task of the firmware identity stage
+#********************************************************************************************#
+async def Merit_AsyncStartupSerial():
+	global m_MeritPort
+	global m_NoPostFlag
+	while(True):
+		m_MeritPort = await asyncio.get_running_loop().run_in_executor(None, Merit_FindTLCPort, m_StartupCacheDict.get("Port", ""), m_StartupCacheDict.get("SerialNumber", ""))
+		if(m_MeritPort != ""):
+			break
+		logging.error(str("Cannot find TLC port"))
+		await asyncio.sleep(3)
+	Merit_StartupMetric("PortFound")
+	m_NoPostFlag = True
+	m_AsyncSerial.Attach(m_TLCSerialPort)
+	return asyncio.create_task(Merit_AsyncStartupFirmwareIdentity())
+
+#********************************************************************************************#
+#Description : Coroutine of Merit_Startup
+#Arguments : None
+#Return : List of the tasks that carry on in the background
+#********************************************************************************************#
+async def Merit_AsyncStartup():
+	global m_StartupCacheDict
+	global m_TLCFirmwareVersion
+	global m_TLCFirmwareReleaseDate
+	
+	m_StartupCacheDict = Merit_LoadStartupCache()
+	m_TLCFirmwareVersion = m_StartupCacheDict.get("FirmwareVersion", "")
+	m_TLCFirmwareReleaseDate = m_StartupCacheDict.get("FirmwareReleaseDate", "")
+	VersionPostTask = asyncio.create_task(Merit_AsyncStartupVersionPost())
+	MqttTask, FirmwareTask = await asyncio.gather(Merit_AsyncStartupMqtt(), Merit_AsyncStartupSerial())
+	Merit_SaveStartupCache()
+	Merit_StartupMetric("Ready")
+	return [Task for Task in (VersionPostTask, MqttTask, FirmwareTask) if(Task is not None)]
+
+#********************************************************************************************#
+#Description : Coroutine running the whole program on one event loop, the asyncio engine
+#Arguments : StartupFlag, False when the mqtt client and the open TLC port are set up by the caller (benchmark)
+#Return : None once Merit_AsyncStop is called
+#Notes : Serial port, mqtt socket, wagon publisher, TLC monitor and the version post run on the loop, the
+#		 mqtt commands on m_AsyncCommandExecutor. The wagon store and the outbox keep their SQLite threads.
+#********************************************************************************************#
+async def Merit_AsyncEngine(StartupFlag = True):
+	global m_AsyncSerial
+	global m_AsyncMqttLoop
+	global m_AsyncCommandExecutor
+	global m_AsyncStopEvent
+	
+	Loop = asyncio.get_running_loop()
+	m_AsyncStopEvent = MeritAsyncWake(Loop)
+	WriterWake = MeritAsyncWake(Loop)
+	MonitorWake = MeritAsyncWake(Loop)
+	PublishWake = MeritAsyncWake(Loop)
+	m_TLCSerialCommandWriteQueue.m_WakeCallback = WriterWake.Set
+	m_TLCPollScheduler.m_WakeCallback = MonitorWake.Set
+	m_WagonPublishCondition.m_WakeCallback = PublishWake.Set
+	m_AsyncCommandExecutor = ThreadPoolExecutor(MERIT_ASYNC_COMMAND_WORKERS)
+	m_AsyncSerial = MeritAsyncSerialTransport(Loop, m_TLCFrameDecoder, m_TLCFrameRing)
+	TaskList = [asyncio.create_task(Merit_AsyncSerialWriter(WriterWake))]
+	try:
+		if(StartupFlag == True):
+			if(m_SessionLink is None):
+				m_AsyncMqttLoop = MeritAsyncMqttLoop(Loop, MERIT_MQTT_RECONNECT_MAX_DELAY)
+			TaskList = TaskList + await Merit_AsyncStartup()
+		else:
+			m_AsyncSerial.Attach(m_TLCSerialPort)
+		TaskList.append(asyncio.create_task(Merit_AsyncPublishWagonDetails(PublishWake)))
+		TaskList.append(asyncio.create_task(Merit_AsyncMonitor(MonitorWake)))
+		logging.info("Asyncio Engine Running")
+		await m_AsyncStopEvent.Wait()
+	finally:
+		for Task in TaskList:
+			Task.cancel()
+		await asyncio.gather(*TaskList, return_exceptions = True)
+		m_AsyncSerial.Detach()
+		m_TLCSerialCommandWriteQueue.m_WakeCallback = None
+		m_TLCPollScheduler.m_WakeCallback = None
+		m_WagonPublishCondition.m_WakeCallback = None
+		m_AsyncCommandExecutor.shutdown(wait = False)
+		logging.info("Asyncio Engine Stopped")
+
+#********************************************************************************************#
+#Description : Function to stop the asyncio engine, from any thread
+#Arguments : None
+#Return : None
+#********************************************************************************************#
+def Merit_AsyncStop():
+	if(m_AsyncStopEvent is not None):
+		m_AsyncStopEvent.Set()
+
+#********************************************************************************************#
+#Description : Function to start writing every serial frame sent and read to a capture file
+#Arguments : Capture file name, strftime pattern
+#Return : None
+#********************************************************************************************#
+def Merit_StartSerialCapture(FileName = MERIT_CAPTURE_FILE_NAME):
+	global m_SerialCapture
+	
+	Merit_StopSerialCapture()
+	m_SerialCapture = MeritSerialCapture(time.strftime(FileName))
+	m_TLCFrameRing.m_Capture = m_SerialCapture
+	logging.info("Serial Capture Started : " + m_SerialCapture.m_FileName)
+
+#********************************************************************************************#
+#Description : Function to stop the serial capture and close its file
+#Arguments : None
+#Return : None
+#********************************************************************************************#
+def Merit_StopSerialCapture():
+	global m_SerialCapture
+	
+	if(m_SerialCapture is None):
+		return
+	m_TLCFrameRing.m_Capture = None
+	m_SerialCapture.Close()
+	m_SerialCapture = None
+
+#********************************************************************************************#
+#Description : Function to run the program for one TLC until a KeyboardInterrupt, in the engine selected at startup
+#Arguments : Engine (MERIT_ENGINE_THREADED or MERIT_ENGINE_ASYNCIO), WGID, Serial capture file name (empty for no capture)
+#Return : None
+#********************************************************************************************#
+def Merit_RunEngine(Engine, WGID, CaptureFile = ""):
+	global m_MeritPort
+	global m_SerialCommErrorFlag
+	global m_MqttPostCurrentWagonNumber
+	
+	Merit_GetWBID(WGID)
+	if(CaptureFile != ""):
+		Merit_StartSerialCapture(CaptureFile)
+	Merit_OpenWagonStore()
+	Merit_OpenMqttOutbox()
+	logging.info("Engine : " + Engine + ", WGID : " + WGID)
+	try:
+		if(Engine == MERIT_ENGINE_ASYNCIO):
+			asyncio.run(Merit_AsyncEngine())
+		else:
+			Merit_Startup()							#Mqtt, TLC port, firmware identity and version post run concurrently
+			MqttPublishThread = threading.Thread(target = Merit_MqttPublishWagonDetails, args=(), daemon = True)
+			MqttPublishThread.start()
 			while(True):
-				if((m_TLCFirmwareReleaseDate == "") and (m_TLCFirmwareVersion == "")):
-					Merit_SerialWriterVersionRequesAndDate()	#Get TLC firmware version and release date
+				if(m_SerialCommErrorFlag == False):
+					Merit_TLCMonitor()  #Monitoring the TLC Functions based on Mqtt Commands
 				else:
-					m_TLCSerialCommandWriteQueue.queue.clear()
-					if(Merit_VersionPost() == True):	#Post TLC Firmware and Python Code Version
-						MqttPublishThread = threading.Thread(target = Merit_MqttPublishWagonDetails, args=(), daemon = True)
-						MqttPublishThread.start()
-						while(True):
-							if(m_SerialCommErrorFlag == False):
-								Merit_TLCMonitor()  #Monitoring the TLC Functions based on Mqtt Commands
-							else:
-								m_TLCSerialCommandWriteQueue.queue.clear()
-								m_MeritPort = Merit_FindTLCPort()
-								if  m_MeritPort != "":
-									m_MqttPostCurrentWagonNumber = 0
-									m_SerialCommErrorFlag = False
-								time.sleep(3)   
-							
-							time.sleep(0.001)
-				time.sleep(1)
-		else:
-			logging.error(str("Cannot find TLC port"))
-		time.sleep(3)						#3 Sec timeout for logging purpose
-			
\ No newline at end of file
+					Merit_DropQueuedCommands()
+					m_MeritPort = Merit_FindTLCPort(m_TLCLastPort, m_TLCLastSerialNumber)
+					if  m_MeritPort != "":
+						with m_WagonPublishCondition:
+							m_MqttPostCurrentWagonNumber = 0
+						m_SerialCommErrorFlag = False
+						Merit_ResetPublishPolicies()
+						Merit_SaveStartupCache()
+					time.sleep(3)   
+				
+				time.sleep(0.001)
+	except KeyboardInterrupt:
+		logging.info("Shutdown Requested")
+	m_MqttCommandExecutor.shutdown(wait = False)
+	Merit_StopSerialWriter()					#a command the worker waits on is cancelled
+	m_WagonStore.Close()					#writes the records still queued
+	m_MqttOutbox.Close()					#the backlog stays on disk for the next start
+	if(m_TLCSerialPort is not None):
+		m_TLCSerialPort.close()
+	Merit_StopSerialCapture()
+	if(m_TLCMqttClient is not None):
+		m_TLCMqttClient.loop_stop()
+		m_TLCMqttClient.disconnect()
+
+#********************************************************************************************#
+#Description : Callback of the session link for a QoS 0 publish the session hub could not send, kept in the outbox
+#Arguments : Topic, Encoded payload
+#Return : None
+#********************************************************************************************#
+def Merit_OnSessionPublishRefused(Topic, Payload):
+	logging.info("Publish Returned By Session Hub, Queued : topic `%s`", Topic)
+	m_MqttOutbox.Put(Topic, Payload)
+
+#********************************************************************************************#
+#Description : Entry point of a session process, runs the program for one TLC of the session hub
+#Arguments : Session index, WGID, TLC port name, Engine, Uplink queue to the hub, Downlink queue from the hub, Serial capture file name
+#Return : None
+#Notes : Works in MERIT_SESSION_DIR/<WGID> so the log, wagon store, outbox and startup cache belong to the session.
+#		 SIGTERM from the hub stops it like a KeyboardInterrupt, a Ctrl-C on the terminal is left to the hub.
+#********************************************************************************************#
+def Merit_SessionMain(SessionIndex, WGID, Port, Engine, Uplink, Downlink, CaptureFile = ""):
+	global m_SessionLink
+	global m_TLCPinnedPort
+	
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+	signal.signal(signal.SIGTERM, signal.default_int_handler)
+	SessionDir = os.path.join(MERIT_SESSION_DIR, WGID)
+	os.makedirs(SessionDir, exist_ok = True)
+	os.chdir(SessionDir)
+	Merit_SetupLogging(LOG_FILE_NAME)
+	m_SessionLink = MeritSessionMqttClient(SessionIndex, Uplink, Downlink)
+	m_TLCPinnedPort = Port
+	try:
+		Merit_RunEngine(Engine, WGID, CaptureFile)
+	except KeyboardInterrupt:
+		logging.info("Shutdown Requested")		#stopped during the startup stages
+		Merit_StopSerialCapture()
+	Merit_StopLogging()						#a process of multiprocessing leaves without the atexit handlers
+
+#********************************************************************************************#
+#Description : Function to run several TLCs, one session process each, over one mqtt connection
+#Arguments : List of "WGID=PORT", Engine of the sessions, Serial capture file name of the sessions (empty for no capture)
+#Return : None
+#Notes : Session processes that stop are started again every MERIT_SESSION_SUPERVISE_INTERVAL
+#********************************************************************************************#
+def Merit_RunSessionHub(SessionArgList, Engine, CaptureFile = ""):
+	Hub = MeritSessionHub(Merit_SessionMain, Engine, (CaptureFile, ))
+	for SessionArg in SessionArgList:
+		WGID, Separator, Port = SessionArg.partition("=")
+		Hub.AddSession(WGID, Port)
+	client = mqtt_client.Client("MeritHub" + str(datetime.datetime.now()), transport = 'websockets')
+	client.max_inflight_messages_set(MERIT_MQTT_INFLIGHT_WINDOW * len(SessionArgList))
+	client.reconnect_delay_set(min_delay = 1, max_delay = MERIT_MQTT_RECONNECT_MAX_DELAY)
+	Hub.Attach(client)
+	Hub.Start()
+	client.connect_async(BROKER, BROKER_PORT)
+	client.loop_start()
+	logging.info("Session Hub Running, Sessions : " + str(SessionArgList) + ", Engine : " + Engine)
+	try:
+		while(True):
+			time.sleep(MERIT_SESSION_SUPERVISE_INTERVAL)
+			Hub.Supervise()
+	except KeyboardInterrupt:
+		logging.info("Shutdown Requested")
+	Hub.Stop()
+	logging.info("Session Hub Metrics : " + json.dumps(Hub.Metrics()))
+	client.loop_stop()
+	client.disconnect()
+
+#********************************************************************************************#
+#Description : Function to parse the command line
+#Arguments : None
+#Return : Parsed arguments
+#********************************************************************************************#
+def Merit_ParseArguments():
+	Parser = argparse.ArgumentParser(description = "Track Logic Controller to Mqtt edge program")
+	Parser.add_argument("--engine", choices = (MERIT_ENGINE_THREADED, MERIT_ENGINE_ASYNCIO), default = MERIT_ENGINE_DEFAULT,
+		help = "threads (default) or one asyncio event loop for serial, mqtt and HTTP")
+	Parser.add_argument("--wgid", default = MERIT_DEFAULT_WGID, help = "Weighbridge id of the topics")
+	Parser.add_argument("--port", default = "", help = "TLC serial port, the only port probed (default: search all ports)")
+	Parser.add_argument("--session", action = "append", metavar = "WGID=PORT",
+		help = "Run one TLC session process per WGID=PORT, sharing one mqtt connection (repeat for every TLC)")
+	Parser.add_argument("--capture", nargs = "?", const = MERIT_CAPTURE_FILE_NAME, default = "", metavar = "FILE",
+		help = "Write every serial frame to a capture file for TLCReplay.py (strftime pattern, default " + MERIT_CAPTURE_FILE_NAME.replace("%", "%%") + ")")
+	return Parser.parse_args()
+
+#********************************************************************************************#  
+#Description : Entry point of this program
+#Notes : To make sure that don't allow this script to import as module in another file (if imported then __name__ will be file name)
+#********************************************************************************************#
+if __name__=="__main__": #To run as a standalone script
+
+	Args = Merit_ParseArguments()
+	if(Args.session):
+		Merit_RunSessionHub(Args.session, Args.engine, Args.capture)
+	else:
+		m_TLCPinnedPort = Args.port
+		Merit_RunEngine(Args.engine, Args.wgid, Args.capture)